@@ -92,6 +92,132 @@ schema = {
                 'required': False,
                 'type': 'string',
                 'empty': False
+            },
+            'checksum': {
+                'required': False,
+                'type': 'string',
+                'allowed': ['sha256', 'sha512', 'blake2b', 'xxh64', 'xxh3_64', 'xxh128']
+            },
+            'settle_time': {
+                'required': False,
+                'type': 'integer',
+                'min': 0
+            },
+            'pipeline': {
+                'required': False,
+                'type': 'integer',
+                'min': 0
+            },
+            'mms': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'max_pdu_size':    {'type': 'integer', 'min': 0},
+                    'max_outstanding': {'type': 'integer', 'min': 0}
+                }
+            },
+            'recv_size': {
+                'required': False,
+                'type': 'integer',
+                'min': 1
+            },
+            'vendor': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'include':      {'type': 'list', 'schema': {'type': 'string', 'empty': False}},
+                    'exclude':      {'type': 'list', 'schema': {'type': 'string', 'empty': False}},
+                    'priority':     {'type': 'list', 'schema': {'type': 'string', 'regex': '^[.].+'}},
+                    'duplicates':   {'type': 'list', 'schema': {'type': 'list', 'minlength': 2, 'maxlength': 2, 'schema': {'type': 'string', 'empty': False}}},
+                    'trigger_time': {'type': 'string', 'empty': False}
+                }
+            },
+            'dedupe': {
+                'required': False,
+                'type': 'boolean'
+            },
+            'convert': {
+                'required': False,
+                'type': 'string',
+                'allowed': ['npy', 'parquet']
+            },
+            'events': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'spool':  {'type': 'boolean'},
+                    'socket': {'type': 'string', 'empty': False},
+                    'fifo':   {'type': 'string', 'empty': False}
+                }
+            },
+            'schedule': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'cycle_time':   {'type': 'integer', 'min': 0},
+                    'device_time':  {'type': 'integer', 'min': 0},
+                    'device_bytes': {'type': 'integer', 'min': 0}
+                }
+            },
+            'watermark': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'spot_check':     {'type': 'integer', 'min': 0},
+                    'margin':         {'type': 'integer', 'min': 0},
+                    'continue_after': {'type': 'boolean'},
+                    'hold':           {'type': 'integer', 'min': 0}
+                }
+            },
+            'cleanup': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'keep_last': {'type': 'integer', 'min': 0},
+                    'min_age':   {'type': 'integer', 'min': 0},
+                    'verify':    {'type': 'boolean'},
+                    'dry_run':   {'type': 'boolean'}
+                }
+            },
+            'select': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'prefer': {'type': 'list', 'schema': {'type': 'string', 'allowed': ['cfg', 'cff', 'zip']}},
+                    'expand': {'type': 'boolean'}
+                }
+            },
+            'reports': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'poll_interval': {'type': 'integer', 'min': 0},
+                    'hold':          {'type': 'integer', 'min': 0},
+                    'followup':      {'type': 'integer', 'min': 0},
+                    'reconnect':     {'type': 'integer', 'min': 1}
+                }
+            },
+            'breaker': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'threshold':     {'type': 'integer', 'min': 1},
+                    'backoff':       {'type': 'integer', 'min': 0},
+                    'backoff_max':   {'type': 'integer', 'min': 0},
+                    'probe_timeout': {'type': 'integer', 'min': 1}
+                }
+            },
+            'retention': {
+                'required': False,
+                'type': 'dict',
+                'schema': {
+                    'max_age':        {'type': 'integer', 'min': 0},
+                    'max_bytes':      {'type': 'integer', 'min': 0},
+                    'keep_last':      {'type': 'integer', 'min': 0},
+                    'compress_after': {'type': 'integer', 'min': 0},
+                    'compression':    {'type': 'string', 'allowed': ['zip', 'zstd']},
+                    'io_rate':        {'type': 'integer', 'min': 0}
+                }
             }
         }
     },
@@ -140,7 +266,7 @@ schema = {
                     'required': False,
                     'type': 'integer',
                     'min': 0,
-                    'dependencies_protocol': ['FTP']
+                    'dependencies_protocol': ['IEC61850', 'FTP']
                 },
                 'req_timeout': {
                     'required': False,
@@ -203,6 +329,137 @@ schema = {
                     'type': 'string',
                     'empty': False,
                     'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'checksum': {
+                    'required': False,
+                    'type': 'string',
+                    'allowed': ['sha256', 'sha512', 'blake2b', 'xxh64', 'xxh3_64', 'xxh128'],
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'settle_time': {
+                    'required': False,
+                    'type': 'integer',
+                    'min': 0,
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'pipeline': {
+                    'required': False,
+                    'type': 'integer',
+                    'min': 0,
+                    'dependencies_protocol': ['IEC61850']
+                },
+                'mms': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'max_pdu_size':    {'type': 'integer', 'min': 0},
+                        'max_outstanding': {'type': 'integer', 'min': 0}
+                    },
+                    'dependencies_protocol': ['IEC61850']
+                },
+                'recv_size': {
+                    'required': False,
+                    'type': 'integer',
+                    'min': 1,
+                    'dependencies_protocol': ['FTP']
+                },
+                'vendor': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'include':      {'type': 'list', 'schema': {'type': 'string', 'empty': False}},
+                        'exclude':      {'type': 'list', 'schema': {'type': 'string', 'empty': False}},
+                        'priority':     {'type': 'list', 'schema': {'type': 'string', 'regex': '^[.].+'}},
+                        'duplicates':   {'type': 'list', 'schema': {'type': 'list', 'minlength': 2, 'maxlength': 2, 'schema': {'type': 'string', 'empty': False}}},
+                        'trigger_time': {'type': 'string', 'empty': False}
+                    },
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'dedupe': {
+                    'required': False,
+                    'type': 'boolean',
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'convert': {
+                    'required': False,
+                    'type': 'string',
+                    'allowed': ['npy', 'parquet'],
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'schedule': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'device_time':  {'type': 'integer', 'min': 0},
+                        'device_bytes': {'type': 'integer', 'min': 0}
+                    },
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'watermark': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'spot_check':     {'type': 'integer', 'min': 0},
+                        'margin':         {'type': 'integer', 'min': 0},
+                        'continue_after': {'type': 'boolean'},
+                        'hold':           {'type': 'integer', 'min': 0}
+                    },
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'cleanup': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'keep_last': {'type': 'integer', 'min': 0},
+                        'min_age':   {'type': 'integer', 'min': 0},
+                        'verify':    {'type': 'boolean'},
+                        'dry_run':   {'type': 'boolean'}
+                    },
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'select': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'prefer': {'type': 'list', 'schema': {'type': 'string', 'allowed': ['cfg', 'cff', 'zip']}},
+                        'expand': {'type': 'boolean'}
+                    },
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'reports': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'rcb':           {'type': 'list', 'schema': {'type': 'string'}},
+                        'poll_interval': {'type': 'integer', 'min': 0},
+                        'hold':          {'type': 'integer', 'min': 0},
+                        'followup':      {'type': 'integer', 'min': 0},
+                        'reconnect':     {'type': 'integer', 'min': 1}
+                    },
+                    'dependencies_protocol': ['IEC61850']
+                },
+                'breaker': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'threshold':     {'type': 'integer', 'min': 1},
+                        'backoff':       {'type': 'integer', 'min': 0},
+                        'backoff_max':   {'type': 'integer', 'min': 0},
+                        'probe_timeout': {'type': 'integer', 'min': 1}
+                    },
+                    'dependencies_protocol': ['IEC61850', 'FTP']
+                },
+                'retention': {
+                    'required': False,
+                    'type': 'dict',
+                    'schema': {
+                        'max_age':        {'type': 'integer', 'min': 0},
+                        'max_bytes':      {'type': 'integer', 'min': 0},
+                        'keep_last':      {'type': 'integer', 'min': 0},
+                        'compress_after': {'type': 'integer', 'min': 0},
+                        'compression':    {'type': 'string', 'allowed': ['zip', 'zstd']},
+                        'io_rate':        {'type': 'integer', 'min': 0}
+                    }
                 }
             }
         }
@@ -0,0 +1,353 @@
+import os
+import errno
+import shutil
+import logging
+import threading
+import queue
+
+# Import local directory index
+from .index import get_local_index
+
+# Import catalog record name
+from .catalog import record_key
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.archive')
+
+
+# Max number of files moved in one batch
+BATCH_SIZE = 256
+
+# Copy chunk size for cross-device moves (bytes)
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def fsync_dir(dirname):
+    """
+    Flush directory entries to disk
+    
+    Parameters
+    ----------
+    dirname : str
+        Path to directory
+    """
+    
+    try:
+        fd = os.open(dirname, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def copy_file(src, dst):
+    """
+    Copy file data with copy_file_range (in-kernel copy) if supported by
+    operating system and file systems, otherwise copy data in user space.
+    Destination file data is flushed to disk.
+    
+    Parameters
+    ----------
+    src : str
+        Source file path
+    dst : str
+        Destination file path
+    """
+    
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        in_kernel = hasattr(os, 'copy_file_range')
+        
+        if in_kernel:
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_CHUNK_SIZE) > 0:
+                    pass
+            except OSError as err:
+                if err.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+                # Restart copy in user space
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+                in_kernel = False
+        
+        if not in_kernel:
+            shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+        
+        fdst.flush()
+        os.fsync(fdst.fileno())
+    
+    shutil.copystat(src, dst)
+
+
+def move_file(src, dst):
+    """
+    Move file with rename on the same file system and fall back to copy and
+    delete for cross-device destination
+    
+    Parameters
+    ----------
+    src : str
+        Source file path
+    dst : str
+        Destination file path
+    
+    Returns
+    -------
+    renamed : bool
+        True if file is renamed, False if file is copied to another file system
+    """
+    
+    try:
+        os.rename(src, dst)
+        return True
+    except OSError as err:
+        if err.errno != errno.EXDEV:
+            raise
+    
+    copy_file(src, dst)
+    os.remove(src)
+    
+    return False
+
+
+class ArchiveWorker(threading.Thread):
+    """
+    Background worker which moves local disturbance records to archive
+    directory
+    
+    Download loops enqueue archive candidates and continue with the next
+    device. Worker moves queued files in batches: archive directory is
+    created once per batch and directories are flushed to disk once per
+    batch.
+    """
+    
+    def __init__(self, batch_size=BATCH_SIZE):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        batch_size : int
+            Max number of files moved in one batch. Default 256
+        """
+        
+        super().__init__(name='drec-archive', daemon=True)
+        
+        self.batch_size = batch_size
+        
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+    
+    
+    def put(self, path, archive_dirname, catalog=None):
+        """
+        Enqueue local file for archiving
+        
+        Parameters
+        ----------
+        path : str
+            Local file path
+        archive_dirname : str
+            Archive directory path
+        catalog : DeviceCatalog
+            Record catalog (drec.catalog) updated with archive directory of
+            moved record. Default None
+        
+        Returns
+        -------
+        queued : bool
+            True if file is queued, False if file is already waiting in queue
+        """
+        
+        with self._lock:
+            if path in self._pending:
+                return False
+            self._pending.add(path)
+        
+        self._queue.put((path, archive_dirname, catalog))
+        
+        return True
+    
+    
+    def is_pending(self, path):
+        """
+        Return True if local file is waiting to be archived
+        """
+        
+        with self._lock:
+            return path in self._pending
+    
+    
+    def qsize(self):
+        """
+        Return number of files waiting to be archived
+        """
+        
+        with self._lock:
+            return len(self._pending)
+    
+    
+    def run(self):
+        """
+        Worker loop
+        """
+        
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            
+            # Collect batch of queued files
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            
+            try:
+                self._archive(batch)
+            except:
+                logger.exception('Archive batch failed')
+            finally:
+                with self._lock:
+                    for path, archive_dirname, catalog in batch:
+                        self._pending.discard(path)
+                for item in batch:
+                    self._queue.task_done()
+            
+            if stop:
+                break
+    
+    
+    def _archive(self, batch):
+        """
+        Move batch of files to archive directories
+        
+        Parameters
+        ----------
+        batch : list of tuples
+            List of (path, archive_dirname, catalog)
+        """
+        
+        # Directories which have to be flushed to disk
+        sync_dirs = set()
+        
+        # Moved records per catalog
+        moves = {}
+        
+        # Create archive directories once per batch
+        for archive_dirname in {archive_dirname for path, archive_dirname, catalog in batch}:
+            os.makedirs(archive_dirname, mode=0o755, exist_ok=True)
+        
+        for path, archive_dirname, catalog in batch:
+            if not os.path.isfile(path):
+                continue
+            
+            dst = os.path.join(archive_dirname, os.path.basename(path))
+            try:
+                renamed = move_file(path, dst)
+            except OSError as err:
+                logger.error('Moving to archive failed %s: %s', path, err)
+                continue
+            
+            logger.debug('Moved to archive: %s%s', path, '' if renamed else ' (copied)')
+            
+            # Update local directory index
+            get_local_index(os.path.dirname(path)).discard(path)
+            
+            sync_dirs.add(os.path.dirname(path))
+            sync_dirs.add(archive_dirname)
+        
+            if catalog is not None:
+                moves.setdefault(catalog, set()).add((os.path.dirname(path), record_key(os.path.basename(path)), archive_dirname))
+        
+        # Flush directory entries once per batch
+        for dirname in sync_dirs:
+            fsync_dir(dirname)
+        
+        # Update catalog once per batch
+        for catalog, catalog_moves in moves.items():
+            catalog.move(catalog_moves)
+    
+    
+    def flush(self):
+        """
+        Block until all queued files are archived
+        """
+        
+        self._queue.join()
+    
+    
+    def stop(self, timeout=None):
+        """
+        Archive queued files and stop worker
+        
+        Parameters
+        ----------
+        timeout : float
+            Max time to wait in seconds. Default None (wait until done)
+        """
+        
+        self._queue.put(None)
+        self.join(timeout)
+
+
+# Archive worker instance
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_archive_worker():
+    """
+    Return running archive worker
+    
+    Worker is started on first call.
+    
+    Returns
+    -------
+    worker : ArchiveWorker
+        Archive worker
+    """
+    
+    global _worker
+    
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = ArchiveWorker()
+            _worker.start()
+        
+        return _worker
+
+
+def shutdown(timeout=None):
+    """
+    Archive queued files and stop archive worker
+    
+    Parameters
+    ----------
+    timeout : float
+        Max time to wait in seconds. Default None (wait until done)
+    """
+    
+    global _worker
+    
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            logger.debug('Stopping archive worker (%s files queued)', _worker.qsize())
+            _worker.stop(timeout)
+        _worker = None
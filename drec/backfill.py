@@ -0,0 +1,241 @@
+import os
+import json
+import logging
+import threading
+from time import monotonic
+
+# Import download manifest state directory
+from .manifest import STATE_DIRNAME
+
+# Import staging group key
+from .staging import group_key
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.backfill')
+
+
+# Checkpoint file name within local state directory
+CHECKPOINT_FILENAME = 'backfill.json'
+
+# Record order
+NEWEST = 'newest'
+OLDEST = 'oldest'
+ORDERS = (NEWEST, OLDEST)
+
+# Min interval in seconds between progress reports
+PROGRESS_INTERVAL = 10
+
+
+def format_eta(seconds):
+    """
+    Format remaining time as HH:MM:SS
+    
+    Parameters
+    ----------
+    seconds : float or None
+        Remaining time in seconds
+    
+    Returns
+    -------
+    eta : str
+        Remaining time or -- if unknown
+    """
+    
+    if seconds is None:
+        return '--:--:--'
+    
+    seconds = int(seconds)
+    
+    return '{:02d}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+class Backfill:
+    """
+    Resumable bulk download of device records
+    
+    Checkpoint file in local state directory keeps backfill progress, so
+    after restart progress and ETA include records done in previous runs.
+    Partially downloaded records are kept in staging directory (drec.staging)
+    and are resumed before any other record.
+    """
+    
+    def __init__(self, local_dirname, order=NEWEST, throttle=None, progress_interval=PROGRESS_INTERVAL):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        local_dirname : str
+            Path to local directory
+        order : str
+            Record order newest or oldest. Default newest
+        throttle : Throttle
+            Download bandwidth throttle (drec.common) which can be shared by
+            devices. Throttle is consumed by downloader per received block.
+            Default None (unlimited)
+        progress_interval : float
+            Min interval in seconds between progress reports. Default 10 s
+        """
+        
+        if order not in ORDERS:
+            raise ValueError('Unsupported backfill order {}'.format(order))
+        
+        self.path = os.path.join(local_dirname, STATE_DIRNAME, CHECKPOINT_FILENAME)
+        self.order = order
+        self.throttle = throttle
+        self.progress_interval = progress_interval
+        
+        self._lock = threading.Lock()
+        self._state = {'done_records': 0, 'done_bytes': 0, 'total_records': 0, 'total_bytes': 0}
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self._state.update({key: state[key] for key in self._state if key in state})
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            logger.warning('Invalid backfill checkpoint %s', self.path)
+        
+        self._start = monotonic()
+        self._session_bytes = 0
+        self._last_report = 0
+        self.dev_address = None
+    
+    
+    def _save(self):
+        """
+        Save checkpoint
+        """
+        
+        os.makedirs(os.path.dirname(self.path), mode=0o755, exist_ok=True)
+        
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+    
+    
+    def sort(self, dist_recs, staged=()):
+        """
+        Sort records by timestamp (newest or oldest first)
+        
+        Partially downloaded records are moved to the front so they are
+        resumed before any other record.
+        
+        Parameters
+        ----------
+        dist_recs : list of list of tuples
+            Grouped device file list (group_dev_file_list)
+        staged : set
+            Keys of partially downloaded records (drec.staging.staged_keys)
+        """
+        
+        dist_recs.sort(key=lambda dist_rec: max(timestamp for path, size, timestamp in dist_rec),
+                       reverse=self.order == NEWEST)
+        dist_recs.sort(key=lambda dist_rec: group_key(dist_rec) not in staged)
+    
+    
+    def start(self, dev_address, records, nbytes):
+        """
+        Start backfill session
+        
+        Parameters
+        ----------
+        dev_address : str
+            Device address (progress report)
+        records : int
+            Number of records to download
+        nbytes : int
+            Listed size of records to download
+        """
+        
+        with self._lock:
+            self.dev_address = dev_address
+            self._state['total_records'] = self._state['done_records'] + records
+            self._state['total_bytes'] = self._state['done_bytes'] + nbytes
+            self._start = monotonic()
+            self._session_bytes = 0
+            self._save()
+        
+        logger.info('Backfill %s: %s records (%s bytes) to download, %s already done',
+                    dev_address, records, nbytes, self._state['done_records'])
+    
+    
+    def file_done(self, nbytes):
+        """
+        Record completely received file of current record
+        
+        Parameters
+        ----------
+        nbytes : int
+            File size in bytes
+        """
+        
+        with self._lock:
+            self._session_bytes += nbytes
+        
+    
+    def record_done(self, nbytes):
+        """
+        Record finalized record and report progress
+        
+        Parameters
+        ----------
+        nbytes : int
+            Record size in bytes
+        """
+        
+        with self._lock:
+            self._state['done_records'] += 1
+            self._state['done_bytes'] += nbytes
+            self._save()
+        
+        self.report()
+    
+    
+    def report(self, force=False):
+        """
+        Log progress and ETA
+        
+        Parameters
+        ----------
+        force : bool
+            Report even if progress interval has not elapsed. Default False
+        """
+        
+        now = monotonic()
+        if not force and now - self._last_report < self.progress_interval:
+            return
+        self._last_report = now
+        
+        with self._lock:
+            state = dict(self._state)
+            elapsed = now - self._start
+            rate = self._session_bytes / elapsed if elapsed > 0 else 0
+        
+        remaining = max(state['total_bytes'] - state['done_bytes'], 0)
+        eta = remaining / rate if rate > 0 else None
+        
+        logger.info('Backfill %s: %s/%s records, %.1f/%.1f MB, %.2f MB/s, ETA %s',
+                    self.dev_address,
+                    state['done_records'], state['total_records'],
+                    state['done_bytes'] / 1e6, state['total_bytes'] / 1e6,
+                    rate / 1e6, format_eta(eta))
+    
+    
+    def progress(self):
+        """
+        Return backfill progress
+        
+        Returns
+        -------
+        progress : dict
+            done_records, total_records, done_bytes, total_bytes
+        """
+        
+        with self._lock:
+            return {key: self._state[key] for key in ('done_records', 'total_records', 'done_bytes', 'total_bytes')}
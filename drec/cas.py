@@ -0,0 +1,387 @@
+import os
+import json
+import errno
+import hashlib
+import logging
+import threading
+import time
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.cas')
+
+
+# Content-addressed store directory within root path
+CAS_DIRNAME = '.cas'
+
+# Object directory and probe index file name within store
+OBJECTS_DIRNAME = 'objects'
+PROBE_FILENAME = 'probe.jsonl'
+
+# Number of bytes read from device file for quick probe
+PROBE_SIZE = 4096
+
+# Min interval in seconds between garbage collection runs
+GC_INTERVAL = 3600
+
+
+def probe_key(size, timestamp, head_digest, algorithm):
+    """
+    Return quick probe key of device file
+    
+    Parameters
+    ----------
+    size : int
+        Device file size
+    timestamp : float
+        Device file timestamp
+    head_digest : str
+        Hex digest of first PROBE_SIZE bytes
+    algorithm : str
+        Checksum algorithm of stored objects
+    
+    Returns
+    -------
+    key : str
+        Probe key
+    """
+    
+    return '{}:{}'.format(probe_prefix(size, timestamp, algorithm), head_digest)
+
+
+def probe_prefix(size, timestamp, algorithm):
+    """
+    Return probe key prefix of device file (size and timestamp)
+    
+    Parameters
+    ----------
+    size : int
+        Device file size
+    timestamp : float
+        Device file timestamp
+    algorithm : str
+        Checksum algorithm of stored objects
+    
+    Returns
+    -------
+    prefix : str
+        Probe key prefix
+    """
+    
+    return '{}:{}:{}'.format(algorithm, int(size), int(timestamp))
+
+
+def head_digest(path, size=PROBE_SIZE):
+    """
+    Return hex digest of first block of local file (probe key)
+    
+    Parameters
+    ----------
+    path : str
+        Local file path
+    size : int
+        Number of bytes. Default PROBE_SIZE
+    
+    Returns
+    -------
+    digest : str
+        SHA-256 hex digest
+    """
+    
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(size)).hexdigest()
+
+
+class ContentStore:
+    """
+    Content-addressed store of disturbance record files
+    
+    Files are stored once per checksum under objects/<algorithm>/<xx>/<digest>
+    and local files with the same content are hard links to the stored
+    object. Probe index maps (size, timestamp, first block digest) of device
+    files to checksum of already stored content so known files don't have to
+    be downloaded again. First block is read from device only if probe index
+    contains file with the same size and timestamp (has_candidate).
+    """
+    
+    def __init__(self, path):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            Path to store directory
+        """
+        
+        self.path = path
+        self.enabled = True
+        
+        self._lock = threading.Lock()
+        self._probes = {}
+        self._prefixes = set()
+        self._last_gc = 0
+        
+        self._load_probes()
+    
+    
+    def _load_probes(self):
+        """
+        Load probe index
+        """
+        
+        path = os.path.join(self.path, PROBE_FILENAME)
+        if not os.path.isfile(path):
+            return
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Skip partially written line
+                    continue
+                self._probes[entry['key']] = entry['digest']
+                self._prefixes.add(entry['key'].rsplit(':', 1)[0])
+    
+    
+    def object_path(self, algorithm, digest):
+        """
+        Return stored object path
+        """
+        
+        return os.path.join(self.path, OBJECTS_DIRNAME, algorithm, digest[:2], digest)
+    
+    
+    def contains(self, algorithm, digest):
+        """
+        Return True if content is stored
+        """
+        
+        return os.path.isfile(self.object_path(algorithm, digest))
+    
+    
+    def _disable(self, err):
+        """
+        Disable deduplication (hard links are not supported)
+        """
+        
+        logger.warning('Deduplication disabled %s: %s', self.path, err)
+        self.enabled = False
+    
+    
+    def put(self, path, algorithm, digest):
+        """
+        Add local file to store
+        
+        If content is already stored local file is replaced with hard link to
+        stored object, otherwise local file is linked into store.
+        
+        Parameters
+        ----------
+        path : str
+            Local file path
+        algorithm : str
+            Checksum algorithm
+        digest : str
+            Hex digest of local file
+        
+        Returns
+        -------
+        deduplicated : bool
+            True if local file is replaced with link to stored object
+        """
+        
+        if not self.enabled:
+            return False
+        
+        obj = self.object_path(algorithm, digest)
+        
+        try:
+            if not os.path.isfile(obj):
+                os.makedirs(os.path.dirname(obj), mode=0o755, exist_ok=True)
+                try:
+                    os.link(path, obj)
+                    return False
+                except FileExistsError:
+                    # Stored concurrently
+                    pass
+            
+            if os.path.samefile(obj, path):
+                return False
+            
+            # Replace local file atomically with link to stored object
+            tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.cas')
+            os.link(obj, tmp_path)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as err:
+            if err.errno in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                self._disable(err)
+                return False
+            raise
+    
+    
+    def link(self, algorithm, digest, dst):
+        """
+        Create hard link of stored object
+        
+        Parameters
+        ----------
+        algorithm : str
+            Checksum algorithm
+        digest : str
+            Hex digest
+        dst : str
+            Destination path
+        """
+        
+        os.link(self.object_path(algorithm, digest), dst)
+    
+    
+    def has_candidate(self, size, timestamp, algorithm):
+        """
+        Return True if stored content with the same size and timestamp may
+        exist (first block of device file has to be probed)
+        
+        Parameters
+        ----------
+        size : int
+            Device file size
+        timestamp : float
+            Device file timestamp
+        algorithm : str
+            Checksum algorithm
+        """
+        
+        if not self.enabled:
+            return False
+        
+        with self._lock:
+            return probe_prefix(size, timestamp, algorithm) in self._prefixes
+    
+    
+    def lookup_probe(self, key, algorithm):
+        """
+        Return digest of stored content for probe key
+        
+        Parameters
+        ----------
+        key : str
+            Probe key
+        algorithm : str
+            Checksum algorithm
+        
+        Returns
+        -------
+        digest : str or None
+            Hex digest or None if content is unknown or not stored anymore
+        """
+        
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            digest = self._probes.get(key)
+        
+        if digest is not None and self.contains(algorithm, digest):
+            return digest
+        
+        return None
+    
+    
+    def add_probe(self, key, digest):
+        """
+        Add probe key of downloaded device file
+        
+        Parameters
+        ----------
+        key : str
+            Probe key
+        digest : str
+            Hex digest of downloaded file
+        """
+        
+        with self._lock:
+            if self._probes.get(key) == digest:
+                return
+            
+            os.makedirs(self.path, mode=0o755, exist_ok=True)
+            with open(os.path.join(self.path, PROBE_FILENAME), 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'digest': digest}, sort_keys=True) + '\n')
+            self._probes[key] = digest
+            self._prefixes.add(key.rsplit(':', 1)[0])
+    
+    
+    def gc(self):
+        """
+        Remove stored objects which are not linked from any local file
+        
+        Returns
+        -------
+        count : int
+            Number of removed objects
+        """
+        
+        count = 0
+        objects_path = os.path.join(self.path, OBJECTS_DIRNAME)
+        
+        for dirpath, dirnames, filenames in os.walk(objects_path):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    if os.stat(path).st_nlink == 1:
+                        os.remove(path)
+                        count += 1
+                except FileNotFoundError:
+                    pass
+        
+        self._last_gc = time.monotonic()
+        
+        if count:
+            logger.debug('Removed %s unreferenced objects from %s', count, self.path)
+        
+        return count
+    
+    
+    def gc_if_due(self, interval=GC_INTERVAL):
+        """
+        Run garbage collection if interval has elapsed since last run
+        """
+        
+        if time.monotonic() - self._last_gc >= interval:
+            self.gc()
+
+
+# Content store registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_store(path):
+    """
+    Return content-addressed store for path
+    
+    Store is created on first call and reused during the lifetime of the
+    process.
+    
+    Parameters
+    ----------
+    path : str
+        Path to store directory
+    
+    Returns
+    -------
+    store : ContentStore
+        Content-addressed store
+    """
+    
+    path = os.path.abspath(path)
+    
+    with _registry_lock:
+        store = _registry.get(path)
+        if store is None:
+            store = ContentStore(path)
+            _registry[path] = store
+        
+        return store
@@ -0,0 +1,436 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+import time
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.catalog')
+
+
+# Default catalog path within root path
+CATALOG_PATH = os.path.join('.drec', 'catalog.db')
+
+# Catalog record columns (query results)
+COLUMNS = (
+    'substation',
+    'bay',
+    'name',
+    'location',
+    'device',
+    'comment',
+    'dev_address',
+    'dirname',
+    'record',
+    'trigger_time',
+    'start_time',
+    'station_name',
+    'rec_dev_id',
+    'rev_year',
+    'channels',
+    'analog_channels',
+    'digital_channels',
+    'frequency',
+    'sampling_rates',
+    'file_type',
+    'files',
+    'size',
+    'added'
+)
+
+# Device attributes stored with each record
+DEVICE_KEYS = ('substation', 'bay', 'name', 'location', 'device', 'comment', 'dev_address')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    id               INTEGER PRIMARY KEY,
+    substation       TEXT,
+    bay              TEXT,
+    name             TEXT,
+    location         TEXT,
+    device           TEXT,
+    comment          TEXT,
+    dev_address      TEXT,
+    dirname          TEXT NOT NULL,
+    record           TEXT NOT NULL,
+    trigger_time     TEXT,
+    start_time       TEXT,
+    station_name     TEXT,
+    rec_dev_id       TEXT,
+    rev_year         TEXT,
+    channels         INTEGER,
+    analog_channels  INTEGER,
+    digital_channels INTEGER,
+    frequency        REAL,
+    sampling_rates   TEXT,
+    file_type        TEXT,
+    files            TEXT,
+    size             INTEGER,
+    added            REAL,
+    UNIQUE (dirname, record)
+);
+CREATE INDEX IF NOT EXISTS records_trigger_time ON records (trigger_time);
+CREATE INDEX IF NOT EXISTS records_substation ON records (substation, trigger_time);
+CREATE INDEX IF NOT EXISTS records_device ON records (device, trigger_time);
+CREATE INDEX IF NOT EXISTS records_bay ON records (bay, trigger_time);
+'''
+
+
+def record_key(basename):
+    """
+    Return catalog record name of local file (basename without extensions)
+    
+    Parameters
+    ----------
+    basename : str
+        Local file basename (record file or checksum sidecar)
+    
+    Returns
+    -------
+    record : str
+        Record name
+    """
+    
+    return os.path.splitext(basename)[0].split('.', 1)[0]
+
+
+def format_cfg_datetime(value):
+    """
+    Format Comtrade config date and time as sortable string
+    
+    Parameters
+    ----------
+    value : tuple
+        (year, month, day, hour, minute, second) from read_cfg_header
+    
+    Returns
+    -------
+    datetime : str
+        Date and time in format YYYY-MM-DD HH:MM:SS.ffffff
+    """
+    
+    year, month, day, hour, minute, second = value
+    
+    return '{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:09.6f}'.format(year, month, day, hour, minute, second)
+
+
+class Catalog:
+    """
+    SQLite catalog of downloaded disturbance records
+    
+    One row per record (group of files with the same local basename) with
+    device attributes, trigger time and Comtrade config header. Trigger time
+    is stored as sortable string so time range queries use index.
+    """
+    
+    def __init__(self, path):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            Path to SQLite database file
+        """
+        
+        self.path = path
+        
+        self._lock = threading.Lock()
+        
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, mode=0o755, exist_ok=True)
+        
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.row_factory = sqlite3.Row
+        self._con.execute('PRAGMA journal_mode=WAL')
+        self._con.execute('PRAGMA synchronous=NORMAL')
+        self._con.executescript(SCHEMA)
+    
+    
+    def close(self):
+        """
+        Close database connection
+        """
+        
+        with self._lock:
+            self._con.close()
+    
+    
+    def add(self, device, local_files, header=None):
+        """
+        Add or update record
+        
+        Parameters
+        ----------
+        device : dict
+            Device attributes (substation, bay, name, location, device,
+            comment, dev_address)
+        local_files : list of str
+            Local record file paths (YYYYMMDD_HHMMSS_ prefix)
+        header : dict
+            Comtrade config header (read_cfg_header). Default None
+        """
+        
+        if not local_files:
+            return
+        
+        dirname = os.path.dirname(local_files[0])
+        basenames = sorted(os.path.basename(path) for path in local_files)
+        record = record_key(basenames[0])
+        
+        size = 0
+        for path in local_files:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        
+        row = {key: device.get(key) for key in DEVICE_KEYS}
+        row.update({
+            'dirname': dirname,
+            'record': record,
+            'trigger_time': None,
+            'start_time': None,
+            'station_name': None,
+            'rec_dev_id': None,
+            'rev_year': None,
+            'channels': None,
+            'analog_channels': None,
+            'digital_channels': None,
+            'frequency': None,
+            'sampling_rates': None,
+            'file_type': None,
+            'files': json.dumps(basenames),
+            'size': size,
+            'added': time.time()
+        })
+        
+        if header is not None:
+            row.update({key: header[key] for key in ('station_name', 'rec_dev_id', 'rev_year',
+                                                     'channels', 'analog_channels', 'digital_channels',
+                                                     'frequency', 'file_type')})
+            row['trigger_time'] = format_cfg_datetime(header['trigger_time'])
+            row['start_time'] = format_cfg_datetime(header['start_time'])
+            row['sampling_rates'] = json.dumps(header['sampling_rates'])
+        else:
+            # Trigger time from local file name prefix
+            prefix = record[:15]
+            row['trigger_time'] = '{}-{}-{} {}:{}:{}.000000'.format(prefix[0:4], prefix[4:6], prefix[6:8],
+                                                                    prefix[9:11], prefix[11:13], prefix[13:15])
+        
+        columns = ', '.join(row)
+        values = ', '.join(':' + key for key in row)
+        updates = ', '.join('{0}=excluded.{0}'.format(key) for key in row if key not in ('dirname', 'record'))
+        
+        with self._lock:
+            with self._con:
+                self._con.execute('INSERT INTO records ({}) VALUES ({}) ON CONFLICT (dirname, record) DO UPDATE SET {}'.format(
+                    columns, values, updates), row)
+    
+    
+    def move(self, moves):
+        """
+        Update directory of moved records
+        
+        Parameters
+        ----------
+        moves : iterable of tuples
+            (dirname, record, new_dirname). New directory is archive
+            directory or bundle file path of compacted record
+        """
+        
+        with self._lock:
+            with self._con:
+                self._con.executemany('UPDATE OR REPLACE records SET dirname = ? WHERE dirname = ? AND record = ?',
+                                      [(new_dirname, dirname, record) for dirname, record, new_dirname in moves])
+    
+    
+    def remove(self, removes):
+        """
+        Delete records
+        
+        Parameters
+        ----------
+        removes : iterable of tuples
+            (dirname, record) or (dirname, None) for all records of
+            directory (deleted bundle)
+        """
+        
+        with self._lock:
+            with self._con:
+                for dirname, record in removes:
+                    if record is None:
+                        self._con.execute('DELETE FROM records WHERE dirname = ?', (dirname,))
+                    else:
+                        self._con.execute('DELETE FROM records WHERE dirname = ? AND record = ?', (dirname, record))
+    
+    
+    def query(self, substation=None, bay=None, device=None, name=None, start=None, end=None, limit=None, newest=False):
+        """
+        Query records
+        
+        Parameters
+        ----------
+        substation, bay, device, name : str
+            Filter by device attributes (exact match or SQL LIKE pattern if
+            value contains %). Default None
+        start : str
+            Min trigger time (YYYY-MM-DD [HH:MM:SS]). Default None
+        end : str
+            Max trigger time (YYYY-MM-DD [HH:MM:SS]), exclusive. Default None
+        limit : int
+            Max number of records. Default None
+        newest : bool
+            Return newest records if number of records is limited.
+            Default False (oldest records)
+        
+        Returns
+        -------
+        records : list of dict
+            Records ordered by trigger time
+        """
+        
+        where = []
+        params = []
+        
+        for column, value in (('substation', substation), ('bay', bay), ('device', device), ('name', name)):
+            if value is not None:
+                # Exact match uses index, pattern with % uses SQL LIKE
+                where.append('{} {} ?'.format(column, 'LIKE' if '%' in value else '='))
+                params.append(value)
+        
+        if start is not None:
+            where.append('trigger_time >= ?')
+            params.append(start)
+        
+        if end is not None:
+            where.append('trigger_time < ?')
+            params.append(end)
+        
+        sql = 'SELECT {} FROM records'.format(', '.join(COLUMNS))
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY trigger_time DESC' if newest else ' ORDER BY trigger_time'
+        if limit:
+            sql += ' LIMIT {:d}'.format(limit)
+        
+        with self._lock:
+            rows = self._con.execute(sql, params).fetchall()
+        
+        records = []
+        for row in rows:
+            record = dict(row)
+            record['files'] = json.loads(record['files']) if record['files'] else []
+            record['sampling_rates'] = json.loads(record['sampling_rates']) if record['sampling_rates'] else []
+            records.append(record)
+        
+        if newest:
+            records.reverse()
+        
+        return records
+
+
+class DeviceCatalog:
+    """
+    Catalog bound to device attributes
+    
+    Passed to download methods which add finalized records.
+    """
+    
+    def __init__(self, catalog, device):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        catalog : Catalog
+            Record catalog
+        device : dict
+            Device attributes
+        """
+        
+        self.catalog = catalog
+        self.device = {key: device.get(key) for key in DEVICE_KEYS}
+    
+    
+    def add(self, local_files, header=None):
+        """
+        Add finalized record
+        
+        Catalog errors are logged and don't interrupt download.
+        
+        Parameters
+        ----------
+        local_files : list of str
+            Local record file paths
+        header : dict
+            Comtrade config header (read_cfg_header). Default None
+        """
+        
+        try:
+            self.catalog.add(self.device, local_files, header)
+        except sqlite3.Error as err:
+            logger.error('Catalog update failed %s: %s', self.catalog.path, err)
+
+
+    def move(self, moves):
+        """
+        Update directory of archived or compacted records (Catalog.move)
+        
+        Catalog errors are logged and don't interrupt archiving.
+        """
+        
+        try:
+            self.catalog.move(moves)
+        except sqlite3.Error as err:
+            logger.error('Catalog update failed %s: %s', self.catalog.path, err)
+    
+    
+    def remove(self, removes):
+        """
+        Delete records removed by retention policy (Catalog.remove)
+        
+        Catalog errors are logged and don't interrupt retention.
+        """
+        
+        try:
+            self.catalog.remove(removes)
+        except sqlite3.Error as err:
+            logger.error('Catalog update failed %s: %s', self.catalog.path, err)
+
+
+# Catalog registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_catalog(path):
+    """
+    Return record catalog for database path
+    
+    Catalog is opened on first call and reused during the lifetime of the
+    process.
+    
+    Parameters
+    ----------
+    path : str
+        Path to SQLite database file
+    
+    Returns
+    -------
+    catalog : Catalog
+        Record catalog
+    """
+    
+    path = os.path.abspath(path)
+    
+    with _registry_lock:
+        catalog = _registry.get(path)
+        if catalog is None:
+            catalog = Catalog(path)
+            _registry[path] = catalog
+        
+        return catalog
@@ -0,0 +1,233 @@
+import os
+import logging
+import time
+
+# Import checksum helpers
+from .integrity import file_digest
+
+# Import record completeness
+from .stability import is_complete
+
+# Import record watermark (record order)
+from .watermark import record_mark
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.cleanup')
+
+
+# Default device cleanup policy
+# keep_last - number of newest records kept on device (0 - every verified
+#             record is deleted)
+# min_age - records newer than min age in seconds are kept on device
+# verify - local files are verified against manifest checksum before delete
+# dry_run - records are only logged, not deleted
+POLICY = {
+    'keep_last': 0,
+    'min_age': 86400,
+    'verify': True,
+    'dry_run': False
+}
+
+
+def merge_policy(general, device):
+    """
+    Merge GENERAL and DEVICE cleanup policy with default policy
+    
+    Device policy parameters supersede general policy parameters.
+    
+    Parameters
+    ----------
+    general : dict or None
+        Cleanup policy from GENERAL section
+    device : dict or None
+        Cleanup policy from DEVICE section
+    
+    Returns
+    -------
+    policy : dict or None
+        Merged cleanup policy or None if device cleanup is not used
+    """
+    
+    if general is None and device is None:
+        return None
+    
+    policy = dict(POLICY)
+    for p in (general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY})
+    
+    return policy
+
+
+def select(dist_recs, keep_last=POLICY['keep_last'], min_age=POLICY['min_age'], now=None):
+    """
+    Return device records which can be deleted
+    
+    Incomplete records (still being written by device) are never selected.
+    Newest keep_last complete records and records newer than min age are
+    kept.
+    
+    Parameters
+    ----------
+    dist_recs : list of list of tuples
+        Grouped device file list (group_dev_file_list)
+    keep_last : int
+        Number of newest records kept on device. Default 0
+    min_age : float
+        Min record age in seconds. Default 1 day
+    now : float
+        Current time. Default time.time()
+    
+    Returns
+    -------
+    dist_recs : list of list of tuples
+        Records which can be deleted, oldest first
+    """
+    
+    now = time.time() if now is None else now
+    
+    complete = sorted((dist_rec for dist_rec in dist_recs if is_complete(dist_rec)), key=record_mark, reverse=True)
+    
+    return [dist_rec for dist_rec in reversed(complete[keep_last:]) if now - record_mark(dist_rec)[0] >= min_age]
+
+
+def is_verified(dist_rec, index, manifest, verify=POLICY['verify']):
+    """
+    Return True if all files of record are downloaded and verified
+    
+    Every device file must have local file with manifest entry of the same
+    device path and size, received size equal to listed size and (if
+    verify is set) local file checksum equal to manifest checksum.
+    
+    Parameters
+    ----------
+    dist_rec : list of tuples
+        Record files (dev_path, dev_size, dev_timestamp)
+    index : LocalDirIndex
+        Local directory index (drec.index)
+    manifest : Manifest
+        Download manifest (drec.manifest)
+    verify : bool
+        Verify local file checksum. Default True
+    
+    Returns
+    -------
+    verified : bool
+        True if record can be deleted from device
+    """
+    
+    for dev_path, dev_size, dev_timestamp in dist_rec:
+        entry = index.find(os.path.basename(dev_path))
+        if entry is None:
+            return False
+        
+        attrs = manifest.get(os.path.basename(entry[0]))
+        if attrs is None or attrs.get('dev_path') != dev_path:
+            return False
+        
+        # Device file changed or file was not received completely
+        # Note: Some devices list size 0 (size is not checked)
+        if int(dev_size) and (attrs.get('dev_size') != int(dev_size) or attrs.get('size') != int(dev_size)):
+            return False
+        
+        try:
+            if os.path.getsize(entry[0]) != attrs.get('size'):
+                return False
+            if verify and file_digest(entry[0], attrs['algorithm']) != attrs['digest']:
+                logger.warning('Checksum mismatch %s, record is kept on device', entry[0])
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+    
+    return True
+
+
+class DeviceCleanup:
+    """
+    Device-side cleanup of finalized records
+    
+    Complete records which are downloaded and verified are deleted from
+    device (IEC 61850 DeleteFile or FTP DELE), so device listings stay
+    small. Local files of deleted records are moved to archive directory in
+    the next cycle (records which don't exist on device anymore).
+    """
+    
+    def __init__(self, keep_last=POLICY['keep_last'], min_age=POLICY['min_age'], verify=POLICY['verify'], dry_run=POLICY['dry_run']):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        keep_last : int
+            Number of newest records kept on device. Default 0
+        min_age : float
+            Min record age in seconds. Default 1 day
+        verify : bool
+            Verify local file checksum before delete. Default True
+        dry_run : bool
+            Log records which would be deleted. Default False
+        """
+        
+        self.keep_last = keep_last
+        self.min_age = min_age
+        self.verify = verify
+        self.dry_run = dry_run
+    
+    
+    def run(self, dist_recs, delete, index, manifest, interrupt=None, now=None, downloaded=None):
+        """
+        Delete verified records from device
+        
+        Cleanup stops at first delete error (record may be partially deleted,
+        remaining files are incomplete record and are not deleted again).
+        
+        Parameters
+        ----------
+        dist_recs : list of list of tuples
+            Grouped device file list (group_dev_file_list)
+        delete : callable
+            Delete device file delete(dev_path), raises ConnectionError
+        index : LocalDirIndex
+            Local directory index (drec.index)
+        manifest : Manifest
+            Download manifest (drec.manifest)
+        interrupt : threading.Event.Event() object
+            Cleanup stops if interrupt flag is set. Default None
+        now : float
+            Current time. Default time.time()
+        downloaded : callable
+            Return record files which are downloaded downloaded(dist_rec)
+            (drec.selection). Only these files are verified, all record
+            files are deleted. Default None (all record files are verified)
+        
+        Returns
+        -------
+        deleted : list of list of tuples
+            Deleted records (records which would be deleted in dry run)
+        """
+        
+        deleted = []
+        
+        for dist_rec in select(dist_recs, self.keep_last, self.min_age, now):
+            if interrupt is not None and interrupt.is_set():
+                break
+            
+            if not is_verified(dist_rec if downloaded is None else downloaded(dist_rec), index, manifest, self.verify):
+                logger.debug('Not deleted from device (not verified): %s', dist_rec[0][0])
+                continue
+            
+            try:
+                for dev_path, dev_size, dev_timestamp in dist_rec:
+                    if self.dry_run:
+                        logger.info('Dry run, not deleted from device: %s', dev_path)
+                    else:
+                        delete(dev_path)
+                        logger.info('Deleted from device: %s', dev_path)
+            except ConnectionError as err:
+                logger.error('Device cleanup stopped: %s', err)
+                break
+            
+            deleted.append(dist_rec)
+        
+        return deleted
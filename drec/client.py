@@ -1,9 +1,11 @@
 import os
 import yaml
 import logging
-import logging.handlers
 import cerberus
 import re
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 # IEC61850 library
 from .iec61850 import iec61850
@@ -11,6 +13,57 @@ from .iec61850 import iec61850
 # FTP library
 from .ftp import ftp
 
+# Archive retention
+from . import retention
+
+# Checksum verification
+from . import integrity
+
+# Content-addressed store
+from . import cas
+
+# Record catalog
+from . import catalog
+
+# Record events
+from . import events
+
+# Device health (circuit breaker)
+from . import health
+
+# Cycle scheduler
+from . import scheduler
+
+# Resumable backfill
+from . import backfill as bf
+
+# Listing watermark
+from . import watermark
+
+# Report-triggered downloads
+from . import reports
+
+# Device cleanup
+from . import cleanup
+
+# Record representation selection
+from . import selection
+
+# MMS transport profile
+from . import transport
+
+# Vendor profile
+from . import vendor
+
+# Queue-based logging
+from . import logs
+
+# Cycle profiling
+from . import profiling
+
+# I/O throttle
+from .common import Throttle
+
 
 # Set logger
 logger = logging.getLogger('drec')
@@ -221,8 +274,249 @@ def valid_args(args, valid_args):
     return {key: val for key, val in args.items() if key in valid_args}
 
 
+def device_args(data, index):
+    """
+    Generate download method arguments of device
+    
+    Local download directory is created if it doesn't exist.
+    
+    Parameters
+    ----------
+    data : dict
+        Configuration file data
+    index : int
+        Device index
+    
+    Returns
+    -------
+    args : dict
+        Download method arguments (general and device parameters, local
+        directory, catalog, event publisher, content store, listing
+        watermark, device cleanup and record selector)
+    """
+    
+    device = data['DEVICE'][index]
+    
+    # Disturbance record local storage dirname
+    local_dirname = gen_dir_path(data, index)
+    
+    # Create local download directiory if it doesn't exist
+    if not os.path.isdir(local_dirname):
+        os.makedirs(local_dirname)
+    
+    logger.debug('Download path: %s', local_dirname)
+    
+    # Create list of general function call arguments
+    valid_arg_list = (
+        'protocol',
+        'dev_port',
+        'dev_dir',
+        'user',
+        'password',
+        'con_timeout',
+        'req_timeout',
+        'poll_timeout',
+        'ret_timeout',
+        'no_retry',
+        'dev_tz',
+        'local_tz',
+        'checksum',
+        'settle_time',
+        'pipeline',
+        'recv_size',
+        'dedupe',
+        'convert'
+    )
+    
+    # Create list of function call arguments
+    # Device specific arguments take precedence over general arguments
+    args = valid_args(data['GENERAL'], valid_arg_list)
+    args['local_dirname'] = local_dirname
+    for key in device.keys():
+        args[key] = device[key]
+    
+    # Policy sections are replaced with policy objects (raw config is not passed to download)
+    for key in ('watermark', 'cleanup', 'select'):
+        args.pop(key, None)
+    
+    # Record catalog is shared by all devices under root path
+    args['catalog'] = catalog.DeviceCatalog(
+        catalog.get_catalog(os.path.join(data['GENERAL']['root_path'], catalog.CATALOG_PATH)),
+        dict(device, substation=data['GENERAL']['substation']))
+    
+    # Record finalized events are published by all devices under root path
+    event_config = data['GENERAL'].get('events')
+    if event_config:
+        args['events'] = events.DevicePublisher(
+            events.get_publisher(
+                spool=os.path.join(data['GENERAL']['root_path'], events.SPOOL_PATH) if event_config.get('spool', True) else None,
+                socket=event_config.get('socket'),
+                fifo=event_config.get('fifo')),
+            dict(device, substation=data['GENERAL']['substation']))
+    
+    # Content-addressed store for deduplication is shared by all devices under root path
+    if args.get('dedupe'):
+        args['cas_dirname'] = os.path.join(data['GENERAL']['root_path'], cas.CAS_DIRNAME)
+    
+    # Listing watermark of device
+    mark_policy = watermark.merge_policy(data['GENERAL'].get('watermark'), device.get('watermark'))
+    if mark_policy is not None:
+        args['watermark'] = watermark.Watermark(local_dirname, **mark_policy)
+    
+    # Device cleanup of downloaded and verified records
+    cleanup_policy = cleanup.merge_policy(data['GENERAL'].get('cleanup'), device.get('cleanup'))
+    if cleanup_policy is not None:
+        args['cleanup'] = cleanup.DeviceCleanup(**cleanup_policy)
+    
+    # Cheapest complete representation of records listed in several formats
+    select_policy = selection.merge_policy(data['GENERAL'].get('select'), device.get('select'))
+    if select_policy is not None:
+        args['selector'] = selection.RecordSelector(**select_policy)
+    
+    # Vendor profile (listing filters, extension priority, duplicate formats and trigger time)
+    if data['GENERAL'].get('vendor') or device.get('vendor'):
+        try:
+            args['vendor'] = vendor.get_profile(vendor.merge_policy(data['GENERAL'].get('vendor'), device.get('vendor')))
+        except ValueError as err:
+            logger.error('%s, default vendor profile is used', err)
+            args.pop('vendor', None)
+    
+    # MMS transport settings (configured settings supersede probed profile)
+    if args.get('protocol') == 'IEC61850':
+        profile = transport.load_profile(local_dirname)
+        mms = transport.merge_policy(data['GENERAL'].get('mms'), device.get('mms'), profile)
+        if mms is not None:
+            args['mms'] = mms
+        if profile is not None and profile.get('pipeline') and 'pipeline' not in args:
+            args['pipeline'] = profile['pipeline']
+    
+    return args
+
+
+def download_device(args, interrupt):
+    """
+    Download disturbance records of device
+    
+    Parameters
+    ----------
+    args : dict
+        Download method arguments (device_args)
+    interrupt : threading.Event.Event() object
+        Event() object from threading.Event library used to gracefully
+        terminate program
+    
+    Returns
+    -------
+    success : bool or None
+        Download result or None if protocol is not supported
+    """
+    
+    success = None
+    
+    # Record trigger of report-driven device
+    record_trigger = reports.find(args['local_dirname'])
+    started = time.time()
+    
+    # Download disturbance records via IEC61850
+    if args['protocol'] == 'IEC61850':
+        valid_arg_list = (
+            'dev_address',
+            'local_dirname',
+            'dev_dir',
+            'dev_port',
+            'con_timeout',
+            'req_timeout',
+            'poll_timeout',
+            'ret_timeout',
+            'no_retry',
+            'local_tz',
+            'checksum',
+            'settle_time',
+            'pipeline',
+            'mms',
+            'vendor',
+            'selector',
+            'cas_dirname',
+            'catalog',
+            'convert',
+            'events',
+            'budget',
+            'backfill',
+            'watermark',
+            'cleanup'
+        )
+        args = valid_args(args, valid_arg_list)
+        drec = iec61850.IEC61850(interrupt)
+        success = drec.download(**args)
+        
+        # Destroy iec61850 instance
+        drec.destroy()
+    
+    # Download disturbance records via FTP
+    elif args['protocol'] == 'FTP':
+        valid_arg_list = (
+            'dev_address',
+            'local_dirname',
+            'dev_dir',
+            'dev_port',
+            'user',
+            'password',
+            'con_timeout',
+            'poll_timeout',
+            'ret_timeout',
+            'no_retry',
+            'dev_tz',
+            'local_tz',
+            'checksum',
+            'settle_time',
+            'recv_size',
+            'vendor',
+            'selector',
+            'cas_dirname',
+            'catalog',
+            'convert',
+            'events',
+            'budget',
+            'backfill',
+            'watermark',
+            'cleanup'
+        )
+        args = valid_args(args, valid_arg_list)
+        drec = ftp.FTPClient(interrupt)
+        success = drec.download(**args)
+    
+    # Records made after download started stay pending
+    if success and record_trigger is not None:
+        record_trigger.served(started)
+    
+    return success
+
+
+def report_connect(args, rcb):
+    """
+    Return report connection factory of IEC 61850 device
+    
+    Parameters
+    ----------
+    args : dict
+        Download method arguments (device_args)
+    rcb : list of str
+        Report control block references
+    
+    Returns
+    -------
+    connect : callable
+        Report connection factory (drec.reports.ReportWatcher)
+    """
+    
+    def connect(handler):
+        return iec61850.ReportClient(args['dev_address'], args.get('dev_port', 102), rcb, args.get('req_timeout', 5)).open(handler)
+    
+    return connect
+
+
 # Main loop
-def client(config, sleep_timer, interrupt):
+def client(config, sleep_timer, interrupt, control=None):
     """
     Client method
     
@@ -235,6 +529,9 @@ def client(config, sleep_timer, interrupt):
     interrupt : threading.Event.Event() object
         Event() object from threading.Event library used to gracefully
         terminate program
+    control : Controller
+        Control socket (drec.control). On-demand poll requests are served
+        between devices and while waiting. Default None
     """
     
     # Loop through config files
@@ -242,113 +539,371 @@ def client(config, sleep_timer, interrupt):
         # Read config file
         data = read_config(config_file)
         
-        # Log dirname
-        logger_dirname = os.path.dirname(gen_log_path(data))
+        # Route log records to time rotating log file of substation
+        # Note: Log file is opened once and written by log listener thread (drec.logs)
+        logs.set_route(gen_log_path(data))
         
-        # Create local download directiory if it doesn't exist
-        if not os.path.isdir(logger_dirname):
-            os.makedirs(logger_dirname)
+        # Profile cycle if requested (--profile or control socket profile request)
+        # Note: Profile files are written next to substation log file
+        profiler = profiling.get_profiler()
+        profiler.start_cycle(os.path.dirname(gen_log_path(data)), data['GENERAL']['substation'])
         
-        # Creating logger time rotating file handler
-        trf_handler = logging.handlers.TimedRotatingFileHandler(gen_log_path(data), 
-                                                                when='midnight',
-                                                                backupCount=30)
-        trf_handler.setLevel(logging.INFO)
-        trf_format = logging.Formatter('%(asctime)s - %(name)-13s - %(levelname)-8s - %(message)s')
-        trf_handler.setFormatter(trf_format)
-        logger.addHandler(trf_handler)
-        
-        # Create list of general function call arguments
-        valid_arg_list = (
-            'protocol',
-            'dev_port',
-            'dev_dir',
-            'user',
-            'password',
-            'con_timeout',
-            'req_timeout',
-            'poll_timeout',
-            'ret_timeout',
-            'no_retry',
-            'dev_tz',
-            'local_tz'
-        )
-        general_args = valid_args(data['GENERAL'], valid_arg_list)
+        # Cycle scheduler (device order, cycle deadline and device download budgets)
+        cycle = scheduler.get_scheduler(os.path.abspath(config_file))
+        device_order = cycle.start(len(data['DEVICE']), (data['GENERAL'].get('schedule') or {}).get('cycle_time', 0))
         
         # Loop through devices
-        for index, device in enumerate(data['DEVICE']):
-            # Disturbance record local storage dirname
-            local_dirname = gen_dir_path(data, index)
+        for index in device_order:
+            device = data['DEVICE'][index]
+            
+            # Defer remaining devices to the next cycle if cycle deadline is reached
+            # Note: First device is always served so every device is eventually served
+            if index != device_order[0] and cycle.expired():
+                logger.warning('Cycle deadline reached, %s devices deferred to the next cycle',
+                               len(device_order) - device_order.index(index))
+                break
+            
+            # Serve on-demand poll requests before the next device
+            if control is not None:
+                control.serve()
+                control.sweep('{}/{}'.format(data['GENERAL']['substation'], device.get('name') or device.get('dev_address')))
+            
+            # Download arguments of device
+            args = device_args(data, index)
+            local_dirname = args['local_dirname']
+            
+            # Download budget of device in current cycle
+            schedule = scheduler.merge_policy(data['GENERAL'].get('schedule'), device.get('schedule'))
+            if schedule:
+                args['budget'] = cycle.budget(schedule.get('device_time', 0), schedule.get('device_bytes', 0))
+            
+            # Report-driven device is listed when record is made and every poll interval (safety net)
+            # Note: Record ready for download wakes client through control socket
+            record_trigger = None
+            report_policy = reports.merge_policy(data['GENERAL'].get('reports'), device.get('reports'))
+            if report_policy is not None and args.get('protocol') == 'IEC61850':
+                record_trigger = reports.watch(
+                    local_dirname,
+                    '{}/{}'.format(data['GENERAL']['substation'], device.get('name') or device.get('dev_address')),
+                    report_connect(args, report_policy['rcb']),
+                    report_policy,
+                    functools.partial(control.request, data['GENERAL']['substation'], device.get('name') or device.get('dev_address')) if control is not None else None)
+            
+            # Device health (circuit breaker) of all devices under root path is saved in one state file
+            breaker = health.get_monitor(os.path.join(data['GENERAL']['root_path'], health.HEALTH_PATH)).device(
+                local_dirname, args.get('protocol'), args.get('dev_address'), args.get('dev_port'),
+                health.merge_policy(data['GENERAL'].get('breaker'), device.get('breaker')))
+            
+            # Half open breaker allows one download attempt without retries
+            success = None
+            idle = record_trigger is not None and not record_trigger.due()
+            allowed = not idle and breaker.allow()
+            if breaker.state == health.HALF_OPEN:
+                args['no_retry'] = 0
             
-            # Create local download directiory if it doesn't exist
-            if not os.path.isdir(local_dirname):
-                os.makedirs(local_dirname)
-            
-            logger.debug('Download path: %s', local_dirname)
-            
-            # Create list of function call arguments
-            # Device specific arguments take precedence over general arguments
-            args = general_args.copy()
-            args['local_dirname'] = local_dirname
-            for key in device.keys():
-                args[key] = device[key]
-            
-            # Download disturbance records via IEC61850
-            if args['protocol'] == 'IEC61850':
-                valid_arg_list = (
-                    'dev_address',
-                    'local_dirname',
-                    'dev_dir',
-                    'dev_port',
-                    'req_timeout',
-                    'poll_timeout',
-                    'ret_timeout',
-                    'no_retry',
-                    'local_tz'
-                )
-                args = valid_args(args, valid_arg_list)
-                drec = iec61850.IEC61850(interrupt)
-                drec.download(**args)
-
-                # Destroy iec61850 instance
-                drec.destroy()
-            
-            # Download disturbance records via FTP
-            elif args['protocol'] == 'FTP':
-                valid_arg_list = (
-                    'dev_address',
-                    'local_dirname',
-                    'dev_dir',
-                    'dev_port',
-                    'user',
-                    'password',
-                    'con_timeout',
-                    'poll_timeout',
-                    'ret_timeout'
-                    'no_retry',
-                    'dev_tz',
-                    'local_tz'
-                )
-                args = valid_args(args, valid_arg_list)
-                drec = ftp.FTPClient(interrupt)
-                drec.download(**args)
+            # Skip report-driven device until record is made or safety net listing is due
+            if idle:
+                logger.debug('Skipped %s (no record made)', args.get('dev_address'))
+            
+            # Skip unreachable device until backoff expires
+            elif not allowed:
+                logger.debug('Skipped %s (circuit open)', args.get('dev_address'))
+            
+            # Download disturbance records
+            else:
+                success = download_device(args, interrupt)
+            
+            # Update device health (interrupted download is not a device failure)
+            if success is not None and (success or not interrupt.is_set()):
+                breaker.record(success)
+            
+            # Next cycle starts after last served device
+            cycle.served(index)
+            
+            # Apply archive retention policy in background
+            policy = retention.merge_policy(data['GENERAL'].get('retention'), device.get('retention'))
+            if policy:
+                retention.get_retention_worker().put(os.path.join(local_dirname, 'archive'), policy, args['catalog'])
             
             # Check interrupt flag and exit if necesary
             if interrupt.is_set(): break
         
+        # Remove content store objects which are not linked anymore
+        cas_dirname = os.path.join(data['GENERAL']['root_path'], cas.CAS_DIRNAME)
+        if os.path.isdir(cas_dirname) and not interrupt.is_set():
+            cas.get_store(cas_dirname).gc_if_due()
+        
+        # Log devices with open circuit breaker
+        health_count = health.get_monitor(os.path.join(data['GENERAL']['root_path'], health.HEALTH_PATH)).summary()
+        if health_count[health.OPEN] or health_count[health.HALF_OPEN]:
+            logger.info('Device health: %s closed, %s open, %s half open',
+                        health_count[health.CLOSED], health_count[health.OPEN], health_count[health.HALF_OPEN])
+        
         # Check interrupt flag and log exit message
         if interrupt.is_set():
             logger.info('Exited gracefully after interrupt')
         
-        # Remove logger time rotating file handler
-        logger.removeHandler(trf_handler)
+        # Write cycle profile (profiling switches off after requested cycles)
+        profiler.end_cycle()
+        
+        # Stop routing log records to log file of substation
+        logs.set_route(None)
         
         # Delay between reading/processing CONFIG files
         if 0 <= config_count < len(config)-1:
             if sleep_timer > 0:
                 logger.debug('Timeout between reading/processing CONFIG files: {} s'.format(sleep_timer))
-            interrupt.wait(sleep_timer)
+            if control is not None:
+                control.wait(sleep_timer)
+            else:
+                interrupt.wait(sleep_timer)
         
         # Check interrupt flag and break loop
         if interrupt.is_set():
             break
+
+
+def backfill(config, workers, rate, order, interrupt):
+    """
+    Backfill disturbance records of all devices
+    
+    Devices are downloaded in parallel in one pass. Progress is saved to
+    checkpoint file of each device so backfill resumes where it stopped
+    after interrupt.
+    
+    Parameters
+    ----------
+    config : iterable
+        Configuration file or files
+    workers : int
+        Number of devices downloaded in parallel
+    rate : int
+        Max total download rate in bytes per second (0 is unlimited)
+    order : str
+        Record order newest or oldest
+    interrupt : threading.Event.Event() object
+        Event() object from threading.Event library used to gracefully
+        terminate program
+    
+    Returns
+    -------
+    success : bool
+        True if all devices are downloaded without error
+    """
+    
+    # Bandwidth cap shared by all devices
+    throttle = Throttle(rate, interrupt=interrupt) if rate else None
+    
+    # Collect download arguments of all devices
+    tasks = []
+    for config_file in config:
+        data = read_config(config_file)
+        for index in range(len(data['DEVICE'])):
+            args = device_args(data, index)
+            args['backfill'] = bf.Backfill(args['local_dirname'], order, throttle)
+            tasks.append(args)
+    
+    logger.info('Backfill of %s devices (%s parallel, %s first)', len(tasks), workers, order)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda args: download_device(args, interrupt), tasks))
+    
+    # Total progress
+    progress = [args['backfill'].progress() for args in tasks]
+    logger.info('Backfill %s: %s/%s records, %.1f/%.1f MB',
+                'interrupted' if interrupt.is_set() else 'finished',
+                sum(p['done_records'] for p in progress), sum(p['total_records'] for p in progress),
+                sum(p['done_bytes'] for p in progress) / 1e6, sum(p['total_bytes'] for p in progress) / 1e6)
+    
+    return all(results)
+
+
+def poll(config, request, interrupt):
+    """
+    Download requested devices (on-demand poll)
+    
+    Parameters
+    ----------
+    config : iterable
+        Configuration file or files
+    request : PollRequest
+        Poll request (drec.control) with matches(substation, device) method
+    interrupt : threading.Event.Event() object
+        Event() object from threading.Event library used to gracefully
+        terminate program
+    
+    Returns
+    -------
+    results : list of dict
+        substation, device (substation/name), dev_address, success and
+        finalized records (list of file paths per record) per device
+    """
+    
+    results = []
+    
+    for config_file in config:
+        data = read_config(config_file)
+        substation = data['GENERAL']['substation']
+        
+        for index, device in enumerate(data['DEVICE']):
+            # Check interrupt flag and exit if necesary
+            if interrupt.is_set(): break
+            
+            if not request.matches(substation, device):
+                continue
+            
+            label = '{}/{}'.format(substation, device.get('name') or device.get('dev_address'))
+            logger.info('On-demand poll %s', label)
+            
+            # Collect finalized records (events are still published)
+            args = device_args(data, index)
+            collector = events.RecordCollector(args.get('events'))
+            args['events'] = collector
+            
+            success = download_device(args, interrupt)
+            
+            results.append({
+                'substation': substation,
+                'device': label,
+                'dev_address': device.get('dev_address'),
+                'success': bool(success),
+                'records': collector.records
+            })
+    
+    return results
+
+
+def probe(config, request, interrupt):
+    """
+    Probe MMS transport settings of IEC 61850 devices
+    
+    Throughput of candidate max PDU sizes and numbers of files read at the
+    same time is measured by downloading record files to temporary
+    directory. Fastest settings are saved as MMS transport profile of device
+    and used by following downloads (configured mms settings supersede
+    profile).
+    
+    Parameters
+    ----------
+    config : iterable
+        Configuration file or files
+    request : PollRequest
+        Probe request (drec.control) with matches(substation, device) method
+    interrupt : threading.Event.Event() object
+        Event() object from threading.Event library used to gracefully
+        terminate program
+    
+    Returns
+    -------
+    success : bool
+        True if at least one device is probed and all probes succeed
+    """
+    
+    results = []
+    
+    for config_file in config:
+        data = read_config(config_file)
+        substation = data['GENERAL']['substation']
+        
+        for index, device in enumerate(data['DEVICE']):
+            # Check interrupt flag and exit if necesary
+            if interrupt.is_set(): break
+            
+            if not request.matches(substation, device):
+                continue
+            
+            args = device_args(data, index)
+            if args.get('protocol') != 'IEC61850':
+                continue
+            
+            label = '{}/{}'.format(substation, device.get('name') or device.get('dev_address'))
+            connection = {
+                'dev_port': args.get('dev_port', 102),
+                'con_timeout': args.get('con_timeout', 10),
+                'req_timeout': args.get('req_timeout', 5)
+            }
+            
+            try:
+                files = transport.probe_files(iec61850.list_files(args['dev_address'], args.get('dev_dir', 'COMTRADE'), **connection))
+            except ConnectionError as err:
+                logger.error('Probe %s failed: %s', label, err)
+                results.append(False)
+                continue
+            
+            if not files:
+                logger.error('Probe %s failed: no record files on device', label)
+                results.append(False)
+                continue
+            
+            logger.info('Probe %s with %s files (%s bytes)', label, len(files), sum(int(f[1]) for f in files))
+            
+            best, probe_results = transport.probe(
+                functools.partial(iec61850.measure_transport, args['dev_address'], files, **connection),
+                interrupt=interrupt)
+            
+            if best is None or interrupt.is_set():
+                logger.error('Probe %s failed', label)
+                results.append(False)
+                continue
+            
+            profile = transport.new_profile(best, probe_results)
+            transport.save_profile(args['local_dirname'], profile)
+            logger.info('Probe %s: max PDU size %s, max outstanding %s, pipeline %s (%.1f kB/s)',
+                        label, profile['max_pdu_size'], profile['max_outstanding'], profile['pipeline'], profile['throughput'] / 1000)
+            results.append(True)
+    
+    if not results:
+        logger.error('No IEC 61850 device probed')
+    
+    return bool(results) and all(results)
+
+
+def verify(config, workers, interrupt):
+    """
+    Verify local and archived disturbance records against checksum sidecar
+    files
+    
+    Parameters
+    ----------
+    config : iterable
+        Configuration file or files
+    workers : int
+        Number of parallel verification threads
+    interrupt : threading.Event.Event() object
+        Event() object from threading.Event library used to gracefully
+        terminate program
+    
+    Returns
+    -------
+    valid : bool
+        True if no checksum mismatch or read error is found
+    """
+    
+    # Number of files per verification status
+    status_count = dict.fromkeys((integrity.OK, integrity.MISMATCH, integrity.MISSING, integrity.ERROR), 0)
+    
+    # Collect local and archive directories of all devices
+    paths = []
+    for config_file in config:
+        data = read_config(config_file)
+        for index, device in enumerate(data['DEVICE']):
+            local_dirname = gen_dir_path(data, index)
+            paths.extend(integrity.data_files(local_dirname))
+            paths.extend(integrity.data_files(os.path.join(local_dirname, 'archive')))
+    
+    logger.info('Verifying %s files', len(paths))
+    
+    for path, status in integrity.verify_files(paths, workers, interrupt):
+        status_count[status] += 1
+        if status in (integrity.MISMATCH, integrity.ERROR):
+            logger.error('Checksum %s: %s', status, path)
+        elif status == integrity.MISSING:
+            logger.debug('No checksum: %s', path)
+    
+    logger.info('Verified: %s ok, %s mismatch, %s error, %s without checksum',
+                status_count[integrity.OK],
+                status_count[integrity.MISMATCH],
+                status_count[integrity.ERROR],
+                status_count[integrity.MISSING])
+    
+    return status_count[integrity.MISMATCH] == 0 and status_count[integrity.ERROR] == 0
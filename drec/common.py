@@ -1,9 +1,16 @@
 import os
 import copy
+import contextlib
+import itertools
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import logging
 import zipfile
+import threading
+from time import monotonic
+
+# Import checksum sidecar helpers
+from .integrity import strip_sidecar
 
 
 def str_to_timestamp(dt_str, tz='UTC', format_code='%Y-%m-%d %H:%M:%S.%f'):
@@ -108,24 +115,28 @@ def timestamp_to_str(timestamp, tz='UTC', format_code='%Y-%m-%d %H:%M:%S.%f'):
     return dt.strftime(format_code)
 
 
-def filter_file_list(file_list, directory='COMTRADE', rem_hdr_zip=True):
+def filter_file_list(file_list, directory='COMTRADE', rem_hdr_zip=True, duplicates=None):
     """
     Filter and sort file list based on filename:
         - Replace directory separators for GNU/Linux (replace '\\' with '/')
         - Sort files by filename
         - Remove empty COMTRADE directories
         - Remove files which are not disturbance records
-        - Remove zipped HDR files (ABB IEDs)
+        - Remove duplicate formats (zipped HDR files of ABB IEDs by default)
     
     Parameters
     ----------
-    file_list : list of tuples
-        List of files (path, size, timestamp)
+    file_list : iterable of tuples
+        List or listing generator of files (path, size, timestamp)
     directory : str
         Directory for disturbance records.
         Default COMTRADE
     rem_hdr_zip : bool
-        Remove zipped HDR file from the list
+        Remove zipped HDR file from the list (if duplicates are not set)
+    duplicates : iterable of tuples
+        Duplicate format rules (drop, keep). File ending with drop suffix is
+        removed if file with keep suffix instead of drop suffix is listed.
+        Default None ((h.zip, .zip) if rem_hdr_zip is set)
     
     Returns
     -------
@@ -134,28 +145,23 @@ def filter_file_list(file_list, directory='COMTRADE', rem_hdr_zip=True):
     """
     
     # Replace directory separators for GNU/Linux (replace '\' with '/')
-    # Sort the list by filename
-    sorted_file_list = sorted([(path.replace('\\', '/'), size, time) for (path, size, time) in file_list])
-    
     # Remove empty COMTRADE directories
     # Remove files which are not disturbance records
+    # Sort the list by filename
     # Note: Empty directory COMTRADE does not contain basename
-    filtered_file_list = [f for f in sorted_file_list if directory in f[0] and os.path.basename(f[0])]
-    
-    # Remove zipped HDR files from the list (ABB IEDs)
-    if rem_hdr_zip:
-        for index in range(len(filtered_file_list)-1, -1, -1):
-            # Note: It's necesary to search through items from the end of the list (in reverse order)
-            #       because items are removed from the list which is being searched
-            if filtered_file_list[index][0].lower().endswith('h.zip'):
-                # Remove h from filename (fifth symbol from the back)
-                search_zip = filtered_file_list[index][0][:-5] + filtered_file_list[index][0][-4:]
-                for (file, size, time) in filtered_file_list:
-                    if file == search_zip:
-                        # If zipped disturbance record and zipped HDR file is found in the list
-                        # remove zipped HDR file from the list
-                        filtered_file_list.pop(index)
-                        break
+    # Note: Files are filtered while listing is consumed (only filtered list is kept in memory)
+    filtered_file_list = sorted(f for f in ((path.replace('\\', '/'), size, time) for (path, size, time) in file_list)
+                                if directory in f[0] and os.path.basename(f[0]))
+    
+    # Remove duplicate formats from the list (zipped HDR files of ABB IEDs)
+    if duplicates is None:
+        duplicates = (('h.zip', '.zip'),) if rem_hdr_zip else ()
+    
+    if duplicates:
+        paths = {f[0].lower() for f in filtered_file_list}
+        filtered_file_list = [f for f in filtered_file_list
+                              if not any(f[0].lower().endswith(drop.lower()) and (f[0][:-len(drop)] + keep).lower() in paths
+                                         for drop, keep in duplicates)]
     
     return filtered_file_list
 
@@ -270,14 +276,14 @@ def group_file_list(ordered_file_list):
     return grouped_dir_list
 
 
-def group_dev_file_list(file_list, directory='COMTRADE', criteria=('.cfg', '.cff', '.zip', '.dat', '.hdr', '.inf')):
+def group_dev_file_list(file_list, directory='COMTRADE', criteria=('.cfg', '.cff', '.zip', '.dat', '.hdr', '.inf'), duplicates=None):
     """
     Filter, sort, order and group file list based on filename and :
         - Replace directory separators for GNU/Linux (replace '\\' with '/')
         - Sort files by filename
         - Remove empty COMTRADE directories
         - Remove files which are not disturbance records
-        - Remove zipped HDR files (ABB IEDs)
+        - Remove duplicate formats (zipped HDR files of ABB IEDs by default)
         - Order list by criteria
         - Group list by filename
     
@@ -288,14 +294,18 @@ def group_dev_file_list(file_list, directory='COMTRADE', criteria=('.cfg', '.cff
     
     Parameters
     ----------
-    file_list : list of tuples
-        List of files (path, size, timestamp)
+    file_list : iterable of tuples
+        List or listing generator of files (path, size, timestamp). Listing
+        generator is consumed once
     directory : str
         Device directory for disturbance records.
         Default COMTRADE
     criteria : iterable
         Criteria for ordering files with the same filename.
         Default ('.cfg', '.cff', '.zip', '.dat', '.hdr', '.inf')
+    duplicates : iterable of tuples
+        Duplicate format rules (drop, keep) (filter_file_list).
+        Default None (zipped HDR files of ABB IEDs)
     
     Returns
     -------
@@ -303,12 +313,13 @@ def group_dev_file_list(file_list, directory='COMTRADE', criteria=('.cfg', '.cff
         Grouped list of disturbance record files
     """
     
-    return group_file_list(
-             order_file_list(
-               filter_file_list(file_list, directory), criteria))
+    # Sorted list is grouped by filename and files are ordered per group (no intermediate ordered list)
+    return [order_file_list(list(files), criteria)
+            for name, files in itertools.groupby(filter_file_list(file_list, directory, duplicates=duplicates),
+                                                 key=lambda f: os.path.basename(os.path.splitext(f[0])[0]))]
 
 
-def is_downloaded(dev_path, local_dir_path, dev_size=0, dev_timestamp=0, size=False, time=False):
+def is_downloaded(dev_path, local_dir_path, dev_size=0, dev_timestamp=0, size=False, time=False, index=None):
     """
     Check is file downloaded from device.
     Local filename must end with device basename.
@@ -333,6 +344,9 @@ def is_downloaded(dev_path, local_dir_path, dev_size=0, dev_timestamp=0, size=Fa
     time : bool
         Compare local and device file timestamp.
         Default False
+    index : LocalDirIndex
+        Local directory index (drec.index) used instead of listing the local
+        directory. Default None
     
     Returns
     -------
@@ -342,19 +356,30 @@ def is_downloaded(dev_path, local_dir_path, dev_size=0, dev_timestamp=0, size=Fa
     
     # Check does local file exist
     dev_basename = os.path.basename(dev_path)
-    local_path = ''
-    for local_basename in os.listdir(local_dir_path):
-        if local_basename.endswith(dev_basename):
-            local_path = os.path.join(local_dir_path, local_basename)
-            break
-    
-    # Check if path/basename is file
-    if not os.path.isfile(local_path):
-        return False
+    
+    if index is not None:
+        # Query local directory index
+        entry = index.find(dev_basename)
+        if entry is None:
+            return False
+        local_path, local_size, local_mtime = entry
+    else:
+        local_path = ''
+        for local_basename in os.listdir(local_dir_path):
+            if local_basename.endswith(dev_basename):
+                local_path = os.path.join(local_dir_path, local_basename)
+                break
+        
+        # Check if path/basename is file
+        if not os.path.isfile(local_path):
+            return False
+        
+        local_size = os.path.getsize(local_path) if size else 0
+        local_mtime = os.path.getmtime(local_path) if time else 0
 
     # Compare device and local file size
     # Note: Siprotec 4 size is always 0
-    if size and os.path.getsize(local_path) != dev_size:
+    if size and local_size != dev_size:
         return False
     
     # Compare device and local timestamp
@@ -366,14 +391,14 @@ def is_downloaded(dev_path, local_dir_path, dev_size=0, dev_timestamp=0, size=Fa
     #       Timestamp = Current time - (timezone offset + current DST offset).
     # Note: GE C70 relays return time when file directory was read (not when file was created).
 
-    if time and int(os.path.getmtime(local_path)) != int(dev_timestamp):
+    if time and int(local_mtime) != int(dev_timestamp):
         return False
     
     # File is already downloaded. All checks are OK
     return True
 
 
-def dir_list_diff(dev_dir_list, local_dir_path, dev_dir='COMTRADE'):
+def dir_list_diff(dev_dir_list, local_dir_path, dev_dir='COMTRADE', index=None, duplicates=None):
     """
     Difference between local and device file directory.
     Check: local file name must end with device basename.
@@ -386,6 +411,12 @@ def dir_list_diff(dev_dir_list, local_dir_path, dev_dir='COMTRADE'):
         Path to local directory
     dev_dir : str
         Device directory for disturbance records. Default COMTRADE.
+    index : LocalDirIndex
+        Local directory index (drec.index) used instead of listing the local
+        directory. Default None
+    duplicates : iterable of tuples
+        Duplicate format rules (drop, keep) (filter_file_list).
+        Default None (zipped HDR files of ABB IEDs)
     
     Returns
     -------
@@ -394,19 +425,273 @@ def dir_list_diff(dev_dir_list, local_dir_path, dev_dir='COMTRADE'):
     """
     
     # Set of filtered device file list
-    dev_files   = {os.path.basename(path) for path, size, timestamp in filter_file_list(dev_dir_list, dev_dir)}
+    dev_files   = {os.path.basename(path) for path, size, timestamp in filter_file_list(dev_dir_list, dev_dir, duplicates=duplicates)}
     
     # Set of Local files (exclude directories)
-    local_files = {filename for filename in os.listdir(local_dir_path) if os.path.isfile(os.path.join(local_dir_path, filename))}
+    if index is not None:
+        local_files = index.files()
+    else:
+        local_files = {filename for filename in os.listdir(local_dir_path) if os.path.isfile(os.path.join(local_dir_path, filename))}
     
     # Set of matches between local and device files 
-    match_files = {local_file for local_file in local_files for dev_file in dev_files if local_file.endswith(dev_file)}
+    # Note: Local files with YYYYMMDD_HHMMSS_ prefix are matched directly by device basename
+    # Note: Checksum sidecar files are matched by data file name
+    match_files = set()
+    for local_file in local_files:
+        data_file = strip_sidecar(local_file)
+        if data_file[16:] in dev_files or any(data_file.endswith(dev_file) for dev_file in dev_files):
+            match_files.add(local_file)
     
     # Difference between local and device files
     return [os.path.join(local_dir_path, filename) for filename in sorted(local_files - match_files)]
 
 
-def get_trigger_time(path, logger=None, tz='UTC'):
+def _cfg_lines(path):
+    """
+    Yield text lines of Comtrade config from cfg, cff or zip file
+    
+    Lines are read while they are consumed. CFF file is read only to the end
+    of CFG section (INF, HDR and DAT sections are not read).
+    
+    Parameters
+    ----------
+    path : str
+        Path to comtrade cfg, cff or zip (which contains cfg or cff) file
+    
+    Yields
+    ------
+    line : str
+        Config line (CFG section of CFF file) without line terminator
+    
+    Raises
+    ------
+    ValueError
+        if file type is not supported or zip file doesn't contain config
+    """
+    
+    ext = os.path.splitext(path)[1].lower()
+    
+    with contextlib.ExitStack() as stack:
+        if ext in ('.cfg', '.cff'):
+            f = stack.enter_context(open(path, 'rb'))
+        elif ext == '.zip':
+            # Search for .cfg or .cff file within zip file
+            comtrade_zip = stack.enter_context(zipfile.ZipFile(path))
+            for zip_file in comtrade_zip.namelist():
+                ext = os.path.splitext(zip_file)[1].lower()
+                if ext in ('.cfg', '.cff'):
+                    f = stack.enter_context(comtrade_zip.open(zip_file))
+                    break
+            else:
+                raise ValueError('Comtrade config not found in {}'.format(path))
+        else:
+            raise ValueError('Unsupported file type {}'.format(path))
+    
+        # Search for CFG file separator in CFF file
+        if ext == '.cff':
+            for line in f:
+                if line.strip().lower() == b'--- file type: cfg ---':
+                    break
+    
+        for line in f:
+            line = line.decode('utf-8', errors='replace').rstrip('\r\n')
+            
+            # CFG section of CFF file ends with the next file separator
+            if ext == '.cff' and line.lstrip().lower().startswith('--- file type:'):
+                break
+    
+            yield line
+
+
+def _cfg_datetime(value):
+    """
+    Parse Comtrade config date and time
+    
+    Parameters
+    ----------
+    value : str
+        Date and time in format mm/dd/yy,hh:mm:ss.ssssss (Comtrade 1991) or
+        dd/mm/yyyy,hh:mm:ss.ssssss (Comtrade >1991)
+    
+    Returns
+    -------
+    datetime : tuple
+        (year, month, day, hour, minute, second) where second is float
+    """
+    
+    # Extract date and time
+    date, time = value.strip().split(',')
+    
+    # Date
+    temp_date = date.split('/')
+    
+    if len(temp_date[2]) <= 2:
+        # Comtrade standard 1991
+        month = int(temp_date[0])
+        day   = int(temp_date[1])
+        year  = int(temp_date[2])
+        if year >= 70:
+            year += 1900
+        else:
+            year += 2000
+    else:
+        # Comtrade format >1991
+        day   = int(temp_date[0])
+        month = int(temp_date[1])
+        year  = int(temp_date[2])
+    
+    # Time
+    temp_time = time.split(':')
+    hour   = int(temp_time[0])
+    minute = int(temp_time[1])
+    second = float(temp_time[2])
+    
+    return (year, month, day, hour, minute, second)
+
+
+def read_cfg_header(path):
+    """
+    Read Comtrade config header
+    
+    Parameters
+    ----------
+    path : str
+        Path to comtrade cfg, cff or zip (which contains cfg or cff) file
+    
+    Returns
+    -------
+    header : dict or None
+        Config header or None if file is not valid Comtrade config:
+            - station_name : str
+            - rec_dev_id : str
+            - rev_year : str (1991 if not set)
+            - channels, analog_channels, digital_channels : int
+            - analog : list of dict (id, phase, unit, a, b, primary,
+              secondary, ps)
+            - digital : list of dict (id, normal)
+            - frequency : float (line frequency)
+            - sampling_rates : list of (rate, end sample)
+            - start_time, trigger_time : tuple (year, month, day, hour,
+              minute, second)
+            - file_type : str (ASCII, BINARY, BINARY32, FLOAT32)
+            - time_mult : float
+    """
+    
+    try:
+        with contextlib.closing(_cfg_lines(path)) as lines:
+            return _read_cfg_header(lines)
+    except (OSError, ValueError, IndexError, StopIteration, zipfile.BadZipFile):
+        return None
+
+
+def _read_cfg_header(lines):
+    """
+    Parse Comtrade config header from config lines (read_cfg_header)
+    """
+    
+    # Read first line - station_name, rec_dev_id, rev_year
+    temp_list = [item.strip() for item in next(lines).split(',')]
+    header = {
+        'station_name': temp_list[0],
+        'rec_dev_id': temp_list[1] if len(temp_list) > 1 else '',
+        'rev_year': temp_list[2] if len(temp_list) > 2 and temp_list[2] else '1991'
+    }
+    
+    # Read second line - number of channels, analog channels, digital channels
+    temp_list = next(lines).split(',')
+    header['channels'] = int(temp_list[0])
+    header['analog_channels'] = int(temp_list[1].strip().rstrip('Aa')) if len(temp_list) > 1 else 0
+    header['digital_channels'] = int(temp_list[2].strip().rstrip('Dd')) if len(temp_list) > 2 else 0
+    
+    # Read analog and digital channels
+    header['analog'] = []
+    for ch in range(header['analog_channels']):
+        temp_list = [item.strip() for item in next(lines).split(',')]
+        header['analog'].append({
+            'id': temp_list[1],
+            'phase': temp_list[2],
+            'unit': temp_list[4],
+            'a': float(temp_list[5]),
+            'b': float(temp_list[6]),
+            'primary': float(temp_list[10]) if len(temp_list) > 12 else 1.0,
+            'secondary': float(temp_list[11]) if len(temp_list) > 12 else 1.0,
+            'ps': temp_list[12].upper() if len(temp_list) > 12 else 'P'
+        })
+    
+    header['digital'] = []
+    for ch in range(header['channels'] - header['analog_channels']):
+        temp_list = [item.strip() for item in next(lines).split(',')]
+        header['digital'].append({
+            'id': temp_list[1],
+            'normal': int(temp_list[-1]) if temp_list[-1] else 0
+        })
+    
+    # Read line frequency
+    header['frequency'] = float(next(lines))
+    
+    # Read number of sampling rates
+    nrates = int(next(lines))
+    
+    # Read sampling rates
+    header['sampling_rates'] = []
+    for index in range(nrates if nrates > 0 else 1):
+        rate, endsamp = next(lines).split(',')[:2]
+        header['sampling_rates'].append((float(rate), int(endsamp)))
+    
+    # Read first sample date and time
+    header['start_time'] = _cfg_datetime(next(lines))
+    
+    # Read trigger date and time
+    header['trigger_time'] = _cfg_datetime(next(lines))
+    
+    # Read data file type and time multiplication factor (optional)
+    header['file_type'] = next(lines, 'ASCII').strip().upper()
+    time_mult = next(lines, '').strip()
+    header['time_mult'] = float(time_mult) if time_mult else 1.0
+    
+    return header
+
+
+def read_cfg_trigger_time(path):
+    """
+    Read trigger date and time line of Comtrade config
+    
+    Channel lines are skipped without parsing, so trigger time is read from
+    config which is not valid for read_cfg_header (malformed channel line).
+    
+    Parameters
+    ----------
+    path : str
+        Path to comtrade cfg, cff or zip (which contains cfg or cff) file
+    
+    Returns
+    -------
+    trigger_time : tuple or None
+        (year, month, day, hour, minute, second) or None if trigger time
+        can't be read
+    """
+    
+    try:
+        with contextlib.closing(_cfg_lines(path)) as lines:
+            # Skip first line - station_name, rec_dev_id, rev_year
+            next(lines)
+            
+            # Skip analog and digital channels and line frequency
+            for ch in range(int(next(lines).split(',')[0]) + 1):
+                next(lines)
+            
+            # Skip sampling rates and first sample date and time
+            nrates = int(next(lines))
+            for index in range((nrates if nrates > 0 else 1) + 1):
+                next(lines)
+            
+            # Read trigger date and time
+            return _cfg_datetime(next(lines))
+    except (OSError, ValueError, IndexError, StopIteration, zipfile.BadZipFile):
+        return None
+
+
+def get_trigger_time(path, logger=None, tz='UTC', header=None, pattern=None):
     """
     Get trigger time from Comtrade file.
     In case od invalid Comtrade file use file creation date and time.
@@ -420,6 +705,12 @@ def get_trigger_time(path, logger=None, tz='UTC'):
     tz : str
         Local time zone settings (pytz). Used only in case it's not possible to read
         trigger time stamp from comtrade file. Default UTC
+    header : dict
+        Config header (read_cfg_header) if file is already read. Default None
+    pattern : re.Pattern
+        Trigger time in file name with named groups year, month, day, hour,
+        minute and second. Used if trigger time can't be read from Comtrade
+        file. Default None
     
     Returns
     -------
@@ -432,125 +723,24 @@ def get_trigger_time(path, logger=None, tz='UTC'):
     https://en.wikipedia.org/wiki/List_of_tz_database_time_zones
     """
     
-    ext = os.path.splitext(path)[1].lower()
+    if header is None:
+        header = read_cfg_header(path)
     
-    try:
-        if ext in ('.cfg', '.cff'):
-            # Read config file line by line and return trigger time
-            with open(path, 'r', encoding='utf-8', newline='\r\n') as f:
-                # Search for CFG file separator in CFF file
-                if ext == '.cff':
-                    for line in f:
-                        if line.strip() == '--- file type: CFG ---':
-                            break
-                
-                # Read first line - station_name, rec_rev_id, rev_year
-                f.readline()
-                
-                # Read second line - number of channels, analog channels, digital channels
-                temp_list = f.readline().split(',')
-                TT = int(temp_list[0])
-                
-                # Read analog and digital channels
-                for ch in range(TT):
-                    f.readline()
-                
-                # Read sampling frequency
-                f.readline()
-                
-                # Read number of sampling rates
-                nrates = int(f.readline()) 
-                if nrates == 0:
-                    nrates = 1
-                
-                # Read sampling rates
-                for index in range(nrates):
-                    f.readline()
-                
-                # Read first sample date and time
-                f.readline()
-                
-                # Read trigger date and time
-                trigger = f.readline().strip()
-        
-        elif ext == '.zip':
-            # Open zip file
-            # List files within zip file
-            # Search for .cfg or .cff file
-            # Read config file line by line and return trigger time
-            with zipfile.ZipFile(path) as comtrade_zip:
-                for zip_file in comtrade_zip.namelist():
-                    zip_ext = os.path.splitext(zip_file)[1].lower()
-                    if zip_ext in ('.cfg', '.cff'):
-                        with comtrade_zip.open(zip_file) as f:
-                            # Search for CFG file separator in CFF file
-                            if zip_ext == '.cff':
-                                for line in f:
-                                    if line.decode('utf-8').strip() == '--- file type: CFG ---':
-                                        break
-                            
-                            # Read first line - station_name, rec_rev_id, rev_year
-                            f.readline()
-                            
-                            # Read second line - number of channels, analog channels, digital channels
-                            temp_list = f.readline().decode('utf-8').split(',')
-                            TT = int(temp_list[0])
-                            
-                            # Read analog and digital channels
-                            for ch in range(TT):
-                                f.readline()
-                            
-                            # Read sampling frequency
-                            f.readline()
-                            
-                            # Read number of sampling rates
-                            nrates = int(f.readline().decode('utf-8')) 
-                            if nrates == 0:
-                                nrates = 1
-                            
-                            # Read sampling rates
-                            for index in range(nrates):
-                                f.readline()
-                            
-                            # Read first sample date and time
-                            f.readline()
-                            
-                            # Read trigger date and time
-                            trigger = f.readline().decode('utf-8').strip()
-                            
-                        # Break loop
-                        break
-        
-        if ext in ('.cfg', '.cff', '.zip'):
-            # Extract date and time
-            date, time = trigger.split(',')
-            
-            # Date
-            temp_date = date.split('/')
-            
-            if len(temp_date[2]) <= 2:
-                # Comtrade standard 1991
-                month = int(temp_date[0])
-                day   = int(temp_date[1])
-                year  = int(temp_date[2])
-                if year >= 70:
-                    year += 1900
-                else:
-                    year += 2000
-            else:
-                # Comtrade format >1991
-                day   = int(temp_date[0])
-                month = int(temp_date[1])
-                year  = int(temp_date[2])
-            
-            # Time
-            temp_time = time.split(':')
-            hour   = int(temp_time[0])
-            minute = int(temp_time[1])
-            second = round(float(temp_time[2]))
-            
-            trigger_time = '{:04d}{:02d}{:02d}_{:02d}{:02d}{:02d}'.format(year, month, day, hour, minute, second)
-    except:
+    # Trigger time line of config which is not fully valid (malformed channel line)
+    trigger = header['trigger_time'] if header is not None else read_cfg_trigger_time(path)
+    
+    match = pattern.search(os.path.basename(path)) if trigger is None and pattern is not None else None
+    
+    if trigger is not None:
+        year, month, day, hour, minute, second = trigger
+        trigger_time = '{:04d}{:02d}{:02d}_{:02d}{:02d}{:02d}'.format(year, month, day, hour, minute, round(second))
+    elif match is not None:
+        # Trigger time encoded in file name (vendor profile)
+        fields = match.groupdict(default='0')
+        year = int(fields.get('year', 0))
+        trigger_time = '{:04d}{:02d}{:02d}_{:02d}{:02d}{:02d}'.format(year + 2000 if year < 100 else year,
+                                                                      *(int(fields.get(key, 0)) for key in ('month', 'day', 'hour', 'minute', 'second')))
+    else:
         if not logger:
             logger = logging.getLogger('drec')
         logger.warning('Error reading disturbance record trigger timestamp')
@@ -603,3 +793,57 @@ def file_attr_format_str_len(file_list):
             print(str_len[i])
     
     return tuple(str_len)
+
+
+class Throttle:
+    """
+    Token bucket I/O throttle
+    
+    Limits average data rate of the caller. Method consume() blocks until
+    requested number of bytes is allowed by the configured rate.
+    """
+    
+    def __init__(self, rate=0, burst=None, interrupt=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        rate : int
+            Max data rate in bytes per second. Default 0 (unlimited)
+        burst : int
+            Max burst size in bytes. Default one second of data
+        interrupt : threading.Event.Event() object
+            Event() object used to interrupt waiting. Default None
+        """
+        
+        self.rate = rate
+        self.burst = burst if burst else rate
+        self._interrupt = interrupt if interrupt else threading.Event()
+        self._tokens = self.burst
+        self._time = monotonic()
+        self._lock = threading.Lock()
+    
+    
+    def consume(self, nbytes):
+        """
+        Wait until nbytes can be transferred
+        
+        Parameters
+        ----------
+        nbytes : int
+            Number of bytes
+        """
+        
+        if self.rate <= 0:
+            return
+        
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._time) * self.rate)
+            self._time = now
+            self._tokens -= nbytes
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        
+        if delay > 0:
+            self._interrupt.wait(delay)
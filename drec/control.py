@@ -0,0 +1,481 @@
+import os
+import json
+import socket
+import logging
+import threading
+from collections import deque
+from time import monotonic
+from time import time
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.control')
+
+
+# Request file suffix (requests read on SIGUSR1)
+REQUEST_SUFFIX = '.req'
+
+# Max request line length in bytes
+MAX_REQUEST_SIZE = 65536
+
+# Interval in seconds for checking interrupt flag while waiting
+WAIT_INTERVAL = 0.5
+
+
+def send_request(path, request, timeout=None):
+    """
+    Send request to control socket and return response
+    
+    Parameters
+    ----------
+    path : str
+        Control socket path
+    request : dict
+        Control request
+    timeout : float
+        Response timeout in seconds. Default None (wait for response)
+    
+    Returns
+    -------
+    response : dict
+        Control response
+    
+    Raises
+    ------
+    OSError
+        Client is not running or timeout expired
+    """
+    
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall((json.dumps(request) + '\n').encode())
+        line = sock.makefile('rb').readline()
+    
+    if not line:
+        raise ConnectionError('No response from {}'.format(path))
+    
+    return json.loads(line)
+
+
+class PollRequest:
+    """
+    On-demand poll of devices
+    """
+    
+    def __init__(self, substation=None, device=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        substation : str
+            Substation name. Default None (all substations)
+        device : str
+            Device name, device or address. Default None (all devices)
+        """
+        
+        self.substation = substation
+        self.device = device
+        self.results = None
+        self.error = None
+        
+        self._done = threading.Event()
+    
+    
+    def matches(self, substation, device):
+        """
+        Return True if device is requested
+        
+        Parameters
+        ----------
+        substation : str
+            Substation name (GENERAL section)
+        device : dict
+            Device parameters (DEVICE section)
+        """
+        
+        if self.substation is not None and self.substation != substation:
+            return False
+        
+        if self.device is not None and self.device not in (device.get('name'), device.get('device'), device.get('dev_address')):
+            return False
+        
+        return True
+    
+    
+    def finish(self, results, error=None):
+        """
+        Set poll results and release waiting client
+        
+        Parameters
+        ----------
+        results : list of dict
+            Poll results per device
+        error : str
+            Error message if poll failed. Default None
+        """
+        
+        self.results = results
+        self.error = error
+        self._done.set()
+    
+    
+    def wait(self, timeout=None):
+        """
+        Wait until poll is finished
+        
+        Returns
+        -------
+        results : list of dict or None
+            Poll results or None if timeout expired
+        """
+        
+        self._done.wait(timeout)
+        
+        return self.results
+
+
+class Controller:
+    """
+    Control socket of running client
+    
+    Requests are JSON lines on UNIX stream socket, each answered with one
+    JSON line:
+        
+        {"cmd": "poll", "substation": "...", "device": "...", "wait": true}
+        {"cmd": "status"}
+        {"cmd": "profile", "cycles": 1}
+    
+    Poll requests jump the queue: requested devices are downloaded before
+    the next device of the current sweep or immediately if client is
+    sleeping between sweeps. Poll response is sent when requested devices
+    are downloaded and lists finalized records. Requests (one JSON line
+    each, without response) can also be written to request file which is
+    read on SIGUSR1; SIGUSR1 without request file polls all devices.
+    """
+    
+    def __init__(self, path, poll, interrupt, profile=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            Control socket path
+        poll : callable
+            Called with PollRequest, downloads requested devices and returns
+            list of results per device (drec.client.poll)
+        interrupt : threading.Event.Event() object
+            Event() object from threading.Event library used to gracefully
+            terminate program
+        profile : callable
+            Called with number of profiled cycles, returns profiling state
+            (drec.profiling). Default None (profile request is not
+            supported)
+        """
+        
+        self.path = path
+        self.poll = poll
+        self.profile = profile
+        self.request_path = path + REQUEST_SUFFIX
+        self.interrupt = interrupt
+        
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._signal = False
+        self._closed = threading.Event()
+        self._sock = None
+        self._thread = None
+        
+        self.state = 'idle'
+        self.device = None
+        self.last = {}
+    
+    
+    def start(self):
+        """
+        Bind control socket and start accept thread
+        """
+        
+        # Remove stale socket of previous process
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        os.chmod(self.path, 0o660)
+        self._sock.listen()
+        self._sock.settimeout(WAIT_INTERVAL)
+        
+        self._thread = threading.Thread(target=self._accept, name='drec-control', daemon=True)
+        self._thread.start()
+        
+        logger.info('Control socket %s', self.path)
+    
+    
+    def close(self):
+        """
+        Close control socket and release waiting clients
+        """
+        
+        self._closed.set()
+        
+        if self._thread is not None:
+            self._thread.join()
+        
+        if self._sock is not None:
+            self._sock.close()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        
+        with self._lock:
+            while self._queue:
+                self._queue.popleft().finish([])
+    
+    
+    def _accept(self):
+        """
+        Accept control connections
+        """
+        
+        while not self._closed.is_set():
+            try:
+                con, address = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            
+            threading.Thread(target=self._handle, args=(con,), daemon=True).start()
+    
+    
+    def _handle(self, con):
+        """
+        Handle control connection (one request and one response)
+        """
+        
+        with con:
+            try:
+                con.settimeout(None)
+                line = con.makefile('rb').readline(MAX_REQUEST_SIZE)
+                response = self.execute(json.loads(line))
+            except ValueError as err:
+                response = {'ok': False, 'error': 'Invalid request: {}'.format(err)}
+            
+            try:
+                con.sendall((json.dumps(response, sort_keys=True) + '\n').encode())
+            except OSError:
+                logger.debug('Control client disconnected')
+    
+    
+    def execute(self, request):
+        """
+        Execute control request
+        
+        Parameters
+        ----------
+        request : dict
+            Control request (cmd poll, status or profile)
+        
+        Returns
+        -------
+        response : dict
+            Control response
+        """
+        
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'Invalid request'}
+        
+        cmd = request.get('cmd')
+        
+        if cmd == 'status':
+            return dict(self.status(), ok=True)
+        
+        if cmd == 'poll':
+            poll = self.request(request.get('substation'), request.get('device'))
+            if not request.get('wait', True):
+                return {'ok': True, 'queued': True}
+            
+            results = poll.wait()
+            if poll.error is not None:
+                return {'ok': False, 'error': 'Poll failed: {}'.format(poll.error), 'devices': results or []}
+            if not results:
+                return {'ok': False, 'error': 'No device polled', 'devices': []}
+            
+            return {'ok': all(r['success'] for r in results), 'devices': results}
+        
+        if cmd == 'profile' and self.profile is not None:
+            try:
+                return dict(self.profile(request.get('cycles', 1)), ok=True)
+            except (TypeError, ValueError) as err:
+                return {'ok': False, 'error': 'Invalid cycles: {}'.format(err)}
+        
+        return {'ok': False, 'error': 'Unknown command {}'.format(cmd)}
+    
+    
+    def request(self, substation=None, device=None):
+        """
+        Queue on-demand poll and wake client
+        
+        Returns
+        -------
+        poll : PollRequest
+            Queued poll request
+        """
+        
+        poll = PollRequest(substation, device)
+        
+        with self._lock:
+            self._queue.append(poll)
+        self._wake.set()
+        
+        logger.info('Poll requested: substation %s, device %s', substation or '*', device or '*')
+        
+        return poll
+    
+    
+    def notify(self):
+        """
+        Read request file on next serve (SIGUSR1 handler)
+        """
+        
+        self._signal = True
+        self._wake.set()
+    
+    
+    def _read_request_file(self):
+        """
+        Queue requests from request file and remove it
+        """
+        
+        self._signal = False
+        
+        try:
+            with open(self.request_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            os.remove(self.request_path)
+        except FileNotFoundError:
+            self.request()
+            return
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                logger.warning('Invalid request in %s', self.request_path)
+                continue
+            self.request(request.get('substation'), request.get('device'))
+    
+    
+    def status(self):
+        """
+        Return client status
+        
+        Returns
+        -------
+        status : dict
+            state (idle, sweep or poll), current device, number of queued
+            poll requests per requested device and last on-demand poll
+            result per device
+        """
+        
+        with self._lock:
+            queue = {}
+            for poll in self._queue:
+                label = '{}/{}'.format(poll.substation or '*', poll.device or '*')
+                queue[label] = queue.get(label, 0) + 1
+            
+            return {
+                'state': self.state,
+                'device': self.device,
+                'queue': queue,
+                'pending': len(self._queue),
+                'last': dict(self.last)
+            }
+    
+    
+    def sweep(self, label):
+        """
+        Set device of regular sweep (status)
+        """
+        
+        with self._lock:
+            self.state = 'sweep' if label else 'idle'
+            self.device = label
+    
+    
+    def serve(self):
+        """
+        Download devices of queued poll requests
+        
+        Called by client between devices and while waiting.
+        """
+        
+        if self._signal:
+            self._read_request_file()
+        
+        self._wake.clear()
+        
+        with self._lock:
+            state, device = self.state, self.device
+        
+        while not self.interrupt.is_set():
+            with self._lock:
+                if not self._queue:
+                    break
+                poll = self._queue[0]
+                self.state, self.device = 'poll', '{}/{}'.format(poll.substation or '*', poll.device or '*')
+            
+            # Failed poll is finished with error (waiting control client is released)
+            try:
+                results = self.poll(poll)
+            except Exception as err:
+                logger.exception('On-demand poll failed')
+                poll.finish([], str(err) or type(err).__name__)
+            else:
+                # Note: Status is read by control socket thread
+                with self._lock:
+                    for result in results:
+                        self.last[result['device']] = {'time': time(), 'success': result['success'], 'records': len(result['records'])}
+                poll.finish(results)
+            
+            with self._lock:
+                self._queue.popleft()
+        
+        with self._lock:
+            self.state, self.device = state, device
+    
+    
+    def wait(self, timeout):
+        """
+        Wait timeout seconds (sleep between config files or loops)
+        
+        Poll requests are served while waiting. Waiting ends early if
+        interrupt flag is set.
+        
+        Parameters
+        ----------
+        timeout : float
+            Timeout in seconds
+        """
+        
+        self.sweep(None)
+        
+        deadline = monotonic() + timeout
+        
+        while not self.interrupt.is_set():
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            
+            if self._wake.wait(min(remaining, WAIT_INTERVAL)):
+                self.serve()
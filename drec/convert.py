@@ -0,0 +1,495 @@
+import os
+import io
+import json
+import shutil
+import logging
+import threading
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Import from common
+from .common import read_cfg_header
+
+# Optional NumPy (columnar conversion)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Optional Apache Arrow (Parquet output)
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.convert')
+
+
+# Columnar output directory within local directory
+COLUMNAR_DIRNAME = 'columnar'
+
+# Supported output formats
+FORMATS = ('npy', 'parquet')
+
+# Analog sample data type per DAT file type
+ANALOG_DTYPE = {
+    'BINARY': '<i2',
+    'BINARY32': '<i4',
+    'FLOAT32': '<f4'
+}
+
+# Missing analog sample values per DAT file type
+ANALOG_MISSING = {
+    'ASCII': 99999,
+    'BINARY': -32768,
+    'BINARY32': -2147483648
+}
+
+# Missing timestamp value of binary DAT file types
+TIMESTAMP_MISSING = 0xFFFFFFFF
+
+# Start method of worker processes
+# Note: Converter is started while download threads are running (fork of
+# process with threads can deadlock on locks held by other threads)
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def is_available(fmt='npy'):
+    """
+    Return True if modules required for output format are installed
+    """
+    
+    if fmt == 'parquet':
+        return np is not None and pyarrow is not None
+    
+    return np is not None
+
+
+def record_sources(local_files):
+    """
+    Find Comtrade config and data sources of record
+    
+    Parameters
+    ----------
+    local_files : iterable of str
+        Record file paths
+    
+    Returns
+    -------
+    sources : tuple or None
+        (config path, data loader) where data loader returns DAT content as
+        bytes, or None if record has no Comtrade data
+    """
+    
+    by_ext = {}
+    for path in local_files:
+        by_ext.setdefault(os.path.splitext(path)[1].lower(), path)
+    
+    if '.cfg' in by_ext and '.dat' in by_ext:
+        dat_path = by_ext['.dat']
+        return (by_ext['.cfg'], lambda: _read_file(dat_path))
+    
+    if '.cff' in by_ext:
+        cff_path = by_ext['.cff']
+        return (cff_path, lambda: _cff_data(_read_file(cff_path)))
+    
+    if '.zip' in by_ext:
+        zip_path = by_ext['.zip']
+        with zipfile.ZipFile(zip_path) as comtrade_zip:
+            names = {os.path.splitext(name)[1].lower(): name for name in comtrade_zip.namelist()}
+        if '.cff' in names:
+            return (zip_path, lambda: _cff_data(_read_zip(zip_path, names['.cff'])))
+        if '.cfg' in names and '.dat' in names:
+            return (zip_path, lambda: _read_zip(zip_path, names['.dat']))
+    
+    return None
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _read_zip(path, name):
+    with zipfile.ZipFile(path) as comtrade_zip:
+        return comtrade_zip.read(name)
+
+
+def _cff_data(data):
+    """
+    Return DAT section of CFF file
+    
+    Parameters
+    ----------
+    data : bytes
+        CFF file content
+    
+    Returns
+    -------
+    data : bytes
+        DAT section content
+    """
+    
+    start = data.find(b'--- file type: DAT')
+    if start < 0:
+        raise ValueError('DAT section not found')
+    
+    end = data.find(b'\n', start)
+    section = data[start:end].decode('utf-8').strip().rstrip('-').strip()
+    data = data[end+1:]
+    
+    # Binary section header: --- file type: DAT BINARY: <number of bytes> ---
+    if ':' in section.split('DAT', 1)[1]:
+        nbytes = int(section.rsplit(':', 1)[1])
+        data = data[:nbytes]
+    
+    return data
+
+
+def parse_dat(data, header):
+    """
+    Parse Comtrade DAT content
+    
+    Binary formats are decoded with one structured view of the buffer
+    (no per-sample parsing).
+    
+    Parameters
+    ----------
+    data : bytes
+        DAT content
+    header : dict
+        Config header (read_cfg_header)
+    
+    Returns
+    -------
+    samples : tuple
+        (sample numbers, timestamps, raw analog samples (N x A), packed
+        digital samples (N x ceil(D/8) uint8, little bit order))
+    """
+    
+    file_type = header['file_type']
+    na = header['analog_channels']
+    nd = header['digital_channels']
+    nbytes = (nd + 7) // 8
+    
+    if file_type == 'ASCII':
+        text = data.decode('utf-8', errors='replace')
+        values = np.loadtxt(io.StringIO(text), delimiter=',', dtype=np.float64, ndmin=2)
+        sample = values[:, 0].astype(np.uint32)
+        timestamp = values[:, 1].astype(np.uint32)
+        analog = values[:, 2:2+na]
+        bits = values[:, 2+na:2+na+nd].astype(np.uint8)
+        digital = np.packbits(bits, axis=1, bitorder='little') if nd else np.zeros((len(values), 0), np.uint8)
+    elif file_type in ANALOG_DTYPE:
+        nwords = (nd + 15) // 16
+        dtype = np.dtype([('sample', '<u4'),
+                          ('timestamp', '<u4'),
+                          ('analog', ANALOG_DTYPE[file_type], (na,)),
+                          ('digital', '<u2', (nwords,))])
+        count = len(data) // dtype.itemsize
+        records = np.frombuffer(data, dtype=dtype, count=count)
+        sample = records['sample']
+        timestamp = records['timestamp']
+        analog = records['analog']
+        # Little endian 16-bit words have the same bit order as packbits (little)
+        digital = records['digital'].view(np.uint8).reshape(count, 2 * nwords)[:, :nbytes]
+    else:
+        raise ValueError('Unsupported DAT file type {}'.format(file_type))
+    
+    return (sample, timestamp, analog, digital)
+
+
+def scale_analog(analog, header):
+    """
+    Convert raw analog samples to values (a * x + b)
+    
+    Missing samples are converted to NaN.
+    
+    Parameters
+    ----------
+    analog : ndarray
+        Raw analog samples (N x A)
+    header : dict
+        Config header (read_cfg_header)
+    
+    Returns
+    -------
+    values : ndarray
+        Analog values (N x A float64)
+    """
+    
+    a = np.array([ch['a'] for ch in header['analog']], dtype=np.float64)
+    b = np.array([ch['b'] for ch in header['analog']], dtype=np.float64)
+    
+    values = analog * a + b
+    
+    missing = ANALOG_MISSING.get(header['file_type'])
+    if missing is not None:
+        values[analog == missing] = np.nan
+    
+    return values
+
+
+def sample_time(timestamp, header):
+    """
+    Return sample timestamps in microseconds
+    
+    DAT timestamps are used if they're set (time multiplication factor is
+    not 0 and timestamps are not all 0 or missing). Otherwise timestamps are
+    computed from sampling rates of config.
+    
+    Parameters
+    ----------
+    timestamp : ndarray
+        DAT timestamps (uint32)
+    header : dict
+        Config header (read_cfg_header)
+    
+    Returns
+    -------
+    time_us : ndarray
+        Timestamps in microseconds (int64)
+    """
+    
+    rates = header['sampling_rates']
+    unset = not header['time_mult'] or np.all((timestamp == 0) | (timestamp == TIMESTAMP_MISSING))
+    
+    # Note: Sampling rate 0 means timestamps are used (no fixed rate)
+    if not unset or len(timestamp) < 2 or not rates or any(rate <= 0 for rate, endsamp in rates):
+        return (timestamp.astype(np.int64) * header['time_mult']).astype(np.int64)
+    
+    # Sample interval of every sample (last rate continues after last end sample)
+    count = len(timestamp)
+    interval = np.full(count, 1e6 / rates[-1][0])
+    start = 0
+    for rate, endsamp in rates:
+        end = min(max(endsamp, start), count)
+        interval[start:end] = 1e6 / rate
+        start = end
+    interval[0] = 0
+    
+    return np.rint(np.cumsum(interval)).astype(np.int64)
+
+
+def convert_record(local_files, out_dirname, fmt='npy'):
+    """
+    Convert Comtrade record to columnar format
+    
+    npy output is directory <out_dirname>/<record> with memory mappable
+    arrays (np.load(path, mmap_mode='r')):
+        - analog.npy : scaled analog values (N x A float64)
+        - digital.npy : packed digital channels (N x ceil(D/8) uint8,
+          little bit order, np.unpackbits(..., bitorder='little'))
+        - sample.npy, time.npy : sample numbers and timestamps (uint32 and
+          int64 in microseconds)
+        - meta.json : channel definitions and config header
+    parquet output is file <out_dirname>/<record>.parquet with one column
+    per channel.
+    
+    Parameters
+    ----------
+    local_files : iterable of str
+        Record file paths
+    out_dirname : str
+        Output directory
+    fmt : str
+        Output format npy or parquet. Default npy
+    
+    Returns
+    -------
+    path : str or None
+        Output path or None if record has no Comtrade data
+    """
+    
+    local_files = list(local_files)
+    sources = record_sources(local_files)
+    if sources is None:
+        return None
+    
+    cfg_path, load_data = sources
+    header = read_cfg_header(cfg_path)
+    if header is None:
+        raise ValueError('Invalid Comtrade config {}'.format(cfg_path))
+    
+    sample, timestamp, analog, digital = parse_dat(load_data(), header)
+    values = scale_analog(analog, header)
+    time_us = sample_time(timestamp, header)
+    
+    record = os.path.basename(sorted(local_files)[0]).split('.', 1)[0]
+    os.makedirs(out_dirname, mode=0o755, exist_ok=True)
+    
+    meta = dict(header, record=record, files=sorted(os.path.basename(path) for path in local_files))
+    
+    if fmt == 'parquet':
+        columns = {'sample': sample, 'time': time_us}
+        for index, ch in enumerate(header['analog']):
+            columns['A{}_{}'.format(index + 1, ch['id'])] = values[:, index]
+        for index, ch in enumerate(header['digital']):
+            bits = (digital[:, index // 8] >> (index % 8)) & 1
+            columns['D{}_{}'.format(index + 1, ch['id'])] = bits.astype(bool)
+        
+        table = pyarrow.table(columns)
+        table = table.replace_schema_metadata({'comtrade': json.dumps(meta)})
+        
+        path = os.path.join(out_dirname, record + '.parquet')
+        tmp_path = path + '.tmp'
+        pyarrow.parquet.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+    else:
+        path = os.path.join(out_dirname, record)
+        tmp_path = path + '.tmp'
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        
+        np.save(os.path.join(tmp_path, 'analog.npy'), np.ascontiguousarray(values))
+        np.save(os.path.join(tmp_path, 'digital.npy'), np.ascontiguousarray(digital))
+        np.save(os.path.join(tmp_path, 'sample.npy'), np.ascontiguousarray(sample))
+        np.save(os.path.join(tmp_path, 'time.npy'), time_us)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        
+        # Replace previous conversion
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+    
+    return path
+
+
+class Converter:
+    """
+    Background columnar conversion of finalized records
+    
+    Records are converted in process pool so parsing doesn't block download
+    loops and uses all CPUs. Worker processes are not forked from client
+    process (START_METHOD).
+    """
+    
+    def __init__(self, workers=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        workers : int
+            Number of worker processes. Default number of CPUs
+        """
+        
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD))
+        self._lock = threading.Lock()
+        self._pending = set()
+    
+    
+    def put(self, local_files, out_dirname, fmt='npy'):
+        """
+        Enqueue record for conversion
+        
+        Parameters
+        ----------
+        local_files : iterable of str
+            Record file paths
+        out_dirname : str
+            Output directory
+        fmt : str
+            Output format npy or parquet. Default npy
+        """
+        
+        local_files = tuple(local_files)
+        
+        with self._lock:
+            if local_files in self._pending:
+                return
+            self._pending.add(local_files)
+        
+        future = self._executor.submit(convert_record, local_files, out_dirname, fmt)
+        future.add_done_callback(lambda f: self._done(local_files, f))
+    
+    
+    def _done(self, local_files, future):
+        """
+        Log conversion result
+        """
+        
+        with self._lock:
+            self._pending.discard(local_files)
+        
+        if future.cancelled():
+            return
+        
+        err = future.exception()
+        if err is not None:
+            logger.error('Columnar conversion failed %s: %s', local_files[0], err)
+        elif future.result() is not None:
+            logger.debug('Converted: %s', future.result())
+    
+    
+    def qsize(self):
+        """
+        Return number of records waiting for conversion
+        """
+        
+        with self._lock:
+            return len(self._pending)
+    
+    
+    def stop(self, cancel=False):
+        """
+        Stop worker processes
+        
+        Parameters
+        ----------
+        cancel : bool
+            Cancel queued conversions. Default False (wait until done)
+        """
+        
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+
+# Converter instance
+_converter = None
+_converter_lock = threading.Lock()
+
+
+def get_converter():
+    """
+    Return columnar converter
+    
+    Converter is started on first call.
+    
+    Returns
+    -------
+    converter : Converter
+        Columnar converter
+    """
+    
+    global _converter
+    
+    with _converter_lock:
+        if _converter is None:
+            _converter = Converter()
+        
+        return _converter
+
+
+def shutdown(interrupt=False):
+    """
+    Stop columnar converter
+    
+    Parameters
+    ----------
+    interrupt : bool
+        Cancel queued conversions. Default False (wait until done)
+    """
+    
+    global _converter
+    
+    with _converter_lock:
+        if _converter is not None:
+            logger.debug('Stopping columnar converter (%s records queued)', _converter.qsize())
+            _converter.stop(cancel=interrupt)
+        _converter = None
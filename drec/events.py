@@ -0,0 +1,549 @@
+import os
+import json
+import stat
+import errno
+import socket
+import logging
+import threading
+import time
+
+# Import from catalog
+from .catalog import DEVICE_KEYS
+from .catalog import format_cfg_datetime
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.events')
+
+
+# Default event spool path within root path
+SPOOL_PATH = os.path.join('.drec', 'events.jsonl')
+
+# Consumer offset directory within spool directory
+CONSUMERS_DIRNAME = 'consumers'
+
+# Event types
+RECORD_FINALIZED = 'record_finalized'
+
+
+def record_event(device, files, header=None):
+    """
+    Create record finalized event
+    
+    Parameters
+    ----------
+    device : dict
+        Device attributes (substation, bay, name, location, device,
+        comment, dev_address)
+    files : list of dict
+        Finalized files (path, dev_path, dev_size, size, algorithm, digest)
+    header : dict
+        Comtrade config header (read_cfg_header). Default None
+    
+    Returns
+    -------
+    event : dict
+        Event (JSON serializable)
+    """
+    
+    paths = sorted(f['path'] for f in files)
+    
+    return {
+        'event': RECORD_FINALIZED,
+        'time': time.time(),
+        'device': {key: device.get(key) for key in DEVICE_KEYS},
+        'dirname': os.path.dirname(paths[0]) if paths else None,
+        'record': os.path.basename(paths[0]).split('.', 1)[0] if paths else None,
+        'trigger_time': format_cfg_datetime(header['trigger_time']) if header is not None else None,
+        'size': sum(f['size'] for f in files),
+        'files': sorted(files, key=lambda f: f['path'])
+    }
+
+
+class EventSpool:
+    """
+    Append-only JSON lines spool of events with consumer offsets
+    
+    Each event is written as one line. Consumers read events from their
+    committed byte offset and commit new offset after events are processed,
+    so every consumer receives every event at least once, also events
+    published while the consumer was not running.
+    """
+    
+    def __init__(self, path):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            Path to spool file
+        """
+        
+        self.path = path
+        self.consumers_path = os.path.join(os.path.dirname(path), CONSUMERS_DIRNAME)
+        
+        self._lock = threading.Lock()
+    
+    
+    def append(self, event):
+        """
+        Append event to spool
+        
+        Parameters
+        ----------
+        event : dict
+            Event (JSON serializable)
+        """
+        
+        line = (json.dumps(event, sort_keys=True) + '\n').encode('utf-8')
+        
+        with self._lock:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, mode=0o755, exist_ok=True)
+            # Single write in append mode so concurrent readers never see interleaved lines
+            with open(self.path, 'ab') as f:
+                f.write(line)
+    
+    
+    def read(self, offset=0, limit=None):
+        """
+        Read events after byte offset
+        
+        Partially written last line is not returned.
+        
+        Parameters
+        ----------
+        offset : int
+            Byte offset of first event. Default 0
+        limit : int
+            Max number of events. Default None
+        
+        Yields
+        ------
+        event : tuple
+            (offset after event, event)
+        """
+        
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        
+        with f:
+            if offset > os.fstat(f.fileno()).st_size:
+                logger.warning('Offset %s is beyond end of spool %s (spool was replaced), reading from start', offset, self.path)
+                offset = 0
+            
+            f.seek(offset)
+            count = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                
+                offset += len(line)
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    logger.warning('Invalid event in %s', self.path)
+                    continue
+                
+                yield (offset, event)
+                
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+    
+    
+    def _offset_path(self, consumer):
+        """
+        Return offset file path of consumer
+        """
+        
+        if not consumer or os.sep in consumer or consumer.startswith('.'):
+            raise ValueError('Invalid consumer name {}'.format(consumer))
+        
+        return os.path.join(self.consumers_path, consumer + '.offset')
+    
+    
+    def get_offset(self, consumer):
+        """
+        Return committed byte offset of consumer (0 for new consumer)
+        """
+        
+        try:
+            with open(self._offset_path(consumer)) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+    
+    
+    def commit(self, consumer, offset):
+        """
+        Commit byte offset of consumer
+        
+        Parameters
+        ----------
+        consumer : str
+            Consumer name
+        offset : int
+            Byte offset after last processed event
+        """
+        
+        path = self._offset_path(consumer)
+        os.makedirs(self.consumers_path, mode=0o755, exist_ok=True)
+        
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('{:d}\n'.format(offset))
+        os.replace(tmp_path, path)
+    
+    
+    def consume(self, consumer, limit=None):
+        """
+        Read events after committed offset of consumer
+        
+        Offset of event is committed when consumer requests next event, so
+        event which was being processed when consumer stopped is read again.
+        
+        Parameters
+        ----------
+        consumer : str
+            Consumer name
+        limit : int
+            Max number of events. Default None
+        
+        Yields
+        ------
+        event : dict
+            Event
+        """
+        
+        for offset, event in self.read(self.get_offset(consumer), limit):
+            yield event
+            self.commit(consumer, offset)
+
+
+class SocketSink:
+    """
+    UNIX datagram socket event sink
+    
+    Events are sent as one JSON datagram each. Events are dropped when no
+    consumer is bound to socket path or consumer doesn't keep up.
+    """
+    
+    def __init__(self, path):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            Consumer socket path
+        """
+        
+        self.path = path
+        
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+    
+    
+    def send(self, data):
+        """
+        Send event data
+        
+        Parameters
+        ----------
+        data : bytes
+            Encoded event
+        
+        Returns
+        -------
+        sent : bool
+            True if event was delivered to socket
+        """
+        
+        try:
+            self._sock.sendto(data, self.path)
+            return True
+        except (FileNotFoundError, ConnectionRefusedError):
+            logger.debug('No event consumer on socket %s', self.path)
+        except BlockingIOError:
+            logger.warning('Event consumer on socket %s is not keeping up, event dropped', self.path)
+        
+        return False
+    
+    
+    def close(self):
+        self._sock.close()
+
+
+class FifoSink:
+    """
+    Named pipe event sink
+    
+    Events are written as JSON lines. Named pipe is created if it doesn't
+    exist. Events are dropped when no consumer has pipe open for reading or
+    pipe is full.
+    """
+    
+    def __init__(self, path):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            Named pipe path
+        """
+        
+        self.path = path
+        
+        self._fd = None
+    
+    
+    def _open(self):
+        """
+        Open named pipe for non-blocking write
+        """
+        
+        try:
+            if not stat.S_ISFIFO(os.stat(self.path).st_mode):
+                raise ValueError('Event pipe {} is not named pipe'.format(self.path))
+        except FileNotFoundError:
+            os.mkfifo(self.path, 0o640)
+        
+        try:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as err:
+            if err.errno != errno.ENXIO:
+                raise
+            # No reader
+            self._fd = None
+        
+        return self._fd is not None
+    
+    
+    def send(self, data):
+        """
+        Write event data
+        
+        Parameters
+        ----------
+        data : bytes
+            Encoded event
+        
+        Returns
+        -------
+        sent : bool
+            True if event was written to pipe
+        """
+        
+        if self._fd is None and not self._open():
+            logger.debug('No event consumer on pipe %s', self.path)
+            return False
+        
+        try:
+            os.write(self._fd, data)
+            return True
+        except BrokenPipeError:
+            # Reader closed pipe, reopen on next event
+            logger.debug('Event consumer closed pipe %s', self.path)
+            self.close()
+        except BlockingIOError:
+            logger.warning('Event consumer on pipe %s is not keeping up, event dropped', self.path)
+        
+        return False
+    
+    
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class EventPublisher:
+    """
+    Publish events to spool, UNIX socket and named pipe
+    """
+    
+    def __init__(self, spool=None, socket=None, fifo=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        spool : str
+            Spool file path. Default None
+        socket : str
+            Consumer UNIX datagram socket path. Default None
+        fifo : str
+            Named pipe path. Default None
+        """
+        
+        self.spool = EventSpool(spool) if spool else None
+        self.sinks = []
+        
+        if socket:
+            self.sinks.append(SocketSink(socket))
+        if fifo:
+            self.sinks.append(FifoSink(fifo))
+        
+        self._lock = threading.Lock()
+    
+    
+    def publish(self, event):
+        """
+        Publish event
+        
+        Errors are logged and don't interrupt download.
+        
+        Parameters
+        ----------
+        event : dict
+            Event (JSON serializable)
+        """
+        
+        if self.spool is not None:
+            try:
+                self.spool.append(event)
+            except OSError as err:
+                logger.error('Event spool write failed %s: %s', self.spool.path, err)
+        
+        data = (json.dumps(event, sort_keys=True) + '\n').encode('utf-8')
+        
+        with self._lock:
+            for sink in self.sinks:
+                try:
+                    sink.send(data)
+                except (OSError, ValueError) as err:
+                    logger.error('Event publish failed %s: %s', sink.path, err)
+    
+    
+    def close(self):
+        """
+        Close sockets and pipes
+        """
+        
+        with self._lock:
+            for sink in self.sinks:
+                sink.close()
+
+
+class DevicePublisher:
+    """
+    Event publisher bound to device attributes
+    
+    Passed to download methods which publish finalized records.
+    """
+    
+    def __init__(self, publisher, device):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        publisher : EventPublisher
+            Event publisher
+        device : dict
+            Device attributes
+        """
+        
+        self.publisher = publisher
+        self.device = {key: device.get(key) for key in DEVICE_KEYS}
+    
+    
+    def publish(self, files, header=None):
+        """
+        Publish record finalized event
+        
+        Parameters
+        ----------
+        files : list of dict
+            Finalized files (path, dev_path, dev_size, size, algorithm,
+            digest)
+        header : dict
+            Comtrade config header (read_cfg_header). Default None
+        """
+        
+        self.publisher.publish(record_event(self.device, files, header))
+
+
+class RecordCollector:
+    """
+    Event publisher which collects finalized records
+    
+    Used by on-demand poll (drec.control) to report finalized records.
+    Records are forwarded to device event publisher if it is set.
+    """
+    
+    def __init__(self, events=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        events : DevicePublisher
+            Device event publisher. Default None
+        """
+        
+        self.events = events
+        self.records = []
+    
+    
+    def publish(self, files, header=None):
+        """
+        Collect finalized record and forward it to event publisher
+        
+        Parameters
+        ----------
+        files : list of dict
+            Finalized files (path, dev_path, dev_size, size, algorithm,
+            digest)
+        header : dict
+            Comtrade config header (read_cfg_header). Default None
+        """
+        
+        self.records.append([f['path'] for f in files])
+        
+        if self.events is not None:
+            self.events.publish(files, header)
+
+
+# Publisher registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_publisher(spool=None, socket=None, fifo=None):
+    """
+    Return event publisher for spool, socket and pipe paths
+    
+    Publisher is created on first call and reused during the lifetime of
+    the process.
+    
+    Parameters
+    ----------
+    spool : str
+        Spool file path. Default None
+    socket : str
+        Consumer UNIX datagram socket path. Default None
+    fifo : str
+        Named pipe path. Default None
+    
+    Returns
+    -------
+    publisher : EventPublisher
+        Event publisher
+    """
+    
+    key = tuple(os.path.abspath(path) if path else None for path in (spool, socket, fifo))
+    
+    with _registry_lock:
+        publisher = _registry.get(key)
+        if publisher is None:
+            publisher = EventPublisher(*key)
+            _registry[key] = publisher
+        
+        return publisher
@@ -1,8 +1,12 @@
 import os
 import shutil
+import hashlib
 import logging
 import traceback
 import time
+import fcntl
+import select
+import socket
 
 # Import FTP
 import ftplib
@@ -12,14 +16,68 @@ from ..common import str_to_timestamp
 from ..common import is_downloaded
 from ..common import group_dev_file_list
 from ..common import get_trigger_time
+from ..common import read_cfg_header
 from ..common import dir_list_diff
 from ..common import file_attr_format_str_len
 
+# Import local directory index
+from ..index import get_local_index
+
+# Import archive worker
+from ..archive import get_archive_worker
+
+# Import download manifest and checksum helpers
+from ..manifest import get_manifest
+from ..integrity import CHECKSUM
+from ..integrity import REFETCH_ATTEMPTS
+from ..integrity import new_hasher
+from ..integrity import write_sidecar
+
+# Import content-addressed store
+from ..cas import PROBE_SIZE
+from ..cas import probe_key
+from ..cas import head_digest
+from ..cas import get_store
+
+# Import columnar converter
+from ..convert import COLUMNAR_DIRNAME
+from ..convert import get_converter
+from ..convert import is_available
+
+# Import record staging
+from ..staging import STAGING_DIRNAME
+from ..staging import StagedGroup
+from ..staging import staged_keys
+from ..staging import gc as staging_gc
+from ..staging import group_key
+
+# Import record stability check
+from ..stability import SETTLE_TIME
+from ..stability import is_changed
+from ..stability import get_stability
+
+# Import vendor profile
+from ..vendor import DEFAULT as DEFAULT_VENDOR
+
+# Import sampled debug dumps
+from ..logs import sample
+
+# Import record representation selection
+from ..selection import expand
+from ..selection import expand_targets
+
 
 # Set logger name to module name
 logger = logging.getLogger('drec.ftp')
 
 
+# Size in bytes of one data connection read
+RECV_SIZE = 1 << 20
+
+# Socket receive buffer size in bytes of data connection (SO_RCVBUF)
+RCVBUF_SIZE = 4 << 20
+
+
 class FTPClient(ftplib.FTP):
     """
     Class for disturbance record download via FTP
@@ -43,7 +101,7 @@ class FTPClient(ftplib.FTP):
         self._interrupt = interrupt
     
     
-    def download(self, dev_address, local_dirname, dev_dir='COMTRADE', dev_port=21, user='anonymous', password='', con_timeout=30, poll_timeout=0, ret_timeout=10, no_retry=1, dev_tz='UTC', local_tz='UTC'):
+    def download(self, dev_address, local_dirname, dev_dir='COMTRADE', dev_port=21, user='anonymous', password='', con_timeout=30, poll_timeout=0, ret_timeout=10, no_retry=1, dev_tz='UTC', local_tz='UTC', checksum=CHECKSUM, settle_time=SETTLE_TIME, recv_size=RECV_SIZE, vendor=None, selector=None, cas_dirname=None, catalog=None, convert=None, events=None, budget=None, backfill=None, watermark=None, cleanup=None):
         """
         Download disturbance records
         
@@ -73,6 +131,57 @@ class FTPClient(ftplib.FTP):
             Device timezone. Default is UTC
         local_tz : str
             Local timezone. Default is UTC
+        checksum : str
+            Checksum algorithm computed during download (sha256, sha512,
+            blake2b, xxh64, xxh3_64, xxh128). Default is sha256
+        settle_time : int
+            Record settle time in seconds. Incomplete records and records
+            which changed since previous listing and are newer than settle
+            time are not downloaded. Default is 60 s
+        recv_size : int
+            Size in bytes of one data connection read. Default is 1 MiB
+        vendor : VendorProfile
+            Vendor profile (drec.vendor). Files which are not accepted are
+            not listed, record files are ordered by profile extension
+            priority and duplicate formats are removed. Default is None
+            (ABB zipped HDR files are removed)
+        selector : RecordSelector
+            Record representation selection (drec.selection). Only the
+            cheapest complete representation of record listed in several
+            formats is downloaded. Default is None (all record files are
+            downloaded)
+        cas_dirname : str
+            Content-addressed store directory used for deduplication.
+            Default is None (deduplication is disabled)
+        catalog : DeviceCatalog
+            Record catalog (drec.catalog) updated with finalized records.
+            Default is None
+        convert : str
+            Columnar output format (npy or parquet) of finalized records.
+            Default is None (conversion is disabled)
+        events : DevicePublisher
+            Event publisher (drec.events) notified of finalized records.
+            Default is None
+        budget : Budget
+            Download budget (drec.scheduler) of current cycle. Records which
+            are not started when budget is exhausted are deferred to the next
+            cycle and newest records are downloaded first. Default is None
+            (unlimited)
+        backfill : Backfill
+            Backfill checkpoint (drec.backfill). Records are downloaded in
+            backfill order with progress report. Default is None
+        watermark : Watermark
+            Listing watermark (drec.watermark). Records older than watermark
+            are skipped except in periodic full listing check. Default is None
+        cleanup : DeviceCleanup
+            Device cleanup policy (drec.cleanup). Downloaded and verified
+            records are deleted from device. Default is None
+        
+        Returns
+        -------
+        success : bool
+            True if file directory is read and all records are downloaded
+            without connection error
         
         Note
         ----
@@ -83,11 +192,37 @@ class FTPClient(ftplib.FTP):
         # Download counter for poll timeout
         download_count = 0
         
+        # Vendor profile (listing filters, extension priority, duplicate formats and trigger time)
+        if vendor is None:
+            vendor = DEFAULT_VENDOR
+        
+        # Fall back to default checksum algorithm if algorithm is not available
+        try:
+            new_hasher(checksum)
+        except ValueError as err:
+            logger.warning('%s. Using %s', err, CHECKSUM)
+            checksum = CHECKSUM
+        
+        # Disable columnar conversion if required modules are not installed
+        if convert and not is_available(convert):
+            logger.warning('Columnar conversion to %s is not available (missing numpy or pyarrow module)', convert)
+            convert = None
+        
+        # Backfill bandwidth throttle is consumed per received block (steady rate)
+        throttle = backfill.throttle if backfill is not None else None
+        
+        # Download result (device health)
+        success = False
+        
+        # Staging directory is kept between attempts and restarts (partially downloaded records are resumed)
+        # Remove stale staged records
+        local_tmp_dirname = os.path.join(local_dirname, STAGING_DIRNAME)
+        staging_gc(local_tmp_dirname)
+        
         for attempt in range(no_retry + 1):
-            # Remove .tmp directory
-            local_tmp_dirname = os.path.join(local_dirname, '.tmp')
-            if os.path.isdir(local_tmp_dirname):
-                shutil.rmtree(local_tmp_dirname)
+            # Full listing check (records older than watermark are checked only periodically)
+            # Note: Backfill always lists all records
+            full = watermark is None or backfill is not None or watermark.due()
             
             try:
                 # Check interrupt flag and exit if necesary
@@ -105,44 +240,124 @@ class FTPClient(ftplib.FTP):
                 # Set the current directory on the FTP server
                 self.cwd(dev_dir)
                 
-                # Download file directory
-                dev_file_list = self.get_file_directory(dev_tz)
+                # Read file directory (MLSD entries while listing is received)
+                # Note: SIZE and MDTM commands are not sent for downloaded files if listing is not fully checked
+                # Note: Listing time is kept to detect timestamps which are listing time (resume of staged files)
+                listed = time.time()
+                dev_file_list = self.iter_file_directory(dev_tz, known=None if full else get_local_index(local_dirname).find, accept=vendor.accepts)
                 
-                # Formated file structure output
+                # Filter, order and group the list while listing is received
+                # Note: Only filtered entries are kept in memory
+                dist_recs = group_dev_file_list(dev_file_list, '', vendor.priority, vendor.duplicates)
                 
-                # Get string lengths for formated file structure
-                format_str_len = file_attr_format_str_len(dev_file_list)
+                logger.debug('Listed %s records: %s', len(dist_recs), dev_address)
                 
-                # Print header
-                logger.debug('IED file structure:')
-                format_str = '%-{}s%{}s%{}s'.format(*format_str_len)
-                logger.debug(format_str, 'NAME', 'SIZE', 'TIME')
-                logger.debug('-' * sum(format_str_len))
+                # Formated file structure output (filtered listing)
+                # Note: Listing is dumped once per dump interval per device
+                if logger.isEnabledFor(logging.DEBUG) and sample(('listing', dev_address)):
+                    # Get string lengths for formated file structure
+                    format_str_len = file_attr_format_str_len(f for dist_rec in dist_recs for f in dist_rec)
                 
-                # Print file attributes
-                format_str = '%-{}s%{}d%{}.3f'.format(*format_str_len)
-                for f in dev_file_list:
-                    logger.debug(format_str, *f)
+                    # Print header
+                    logger.debug('IED file structure:')
+                    format_str = '%-{}s%{}s%{}s'.format(*format_str_len)
+                    logger.debug(format_str, 'NAME', 'SIZE', 'TIME')
+                    logger.debug('-' * sum(format_str_len))
+                
+                    # Print file attributes
+                    format_str = '%-{}s%{}d%{}.3f'.format(*format_str_len)
+                    for dist_rec in dist_recs:
+                        for f in dist_rec:
+                            logger.debug(format_str, *f)
                 
                 # Check interrupt flag and exit if necesary
                 if self._interrupt.is_set(): break
                 
-                # Loop through disturbance records (filter, order, group the list)
-                for dist_rec in group_dev_file_list(dev_file_list, ''):
+                # Local directory index (basename suffix -> path, size, mtime)
+                local_index = get_local_index(local_dirname)
+                
+                # Download manifest (local basename -> size and checksum)
+                manifest = get_manifest(local_dirname)
+                
+                # Content-addressed store (deduplication)
+                store = get_store(cas_dirname) if cas_dirname else None
+                
+                # Download only the cheapest complete representation of records listed in several formats
+                # Note: Device cleanup deletes all formats of record
+                dev_recs = {group_key(dist_rec): dist_rec for dist_rec in dist_recs}
+                variants = {}
+                if selector is not None:
+                    variants = {key: selector.select(dist_rec) for key, dist_rec in dev_recs.items()}
+                    dist_recs = [variants[group_key(dist_rec)][1] for dist_rec in dist_recs]
+                
+                # Backfill order and progress (partially downloaded record first)
+                if backfill is not None:
+                    backfill.sort(dist_recs, staged_keys(local_tmp_dirname))
+                    pending = [dist_rec for dist_rec in dist_recs
+                               if not all(is_downloaded(dev_path, local_dirname, index=local_index) for dev_path, dev_size, dev_timestamp in dist_rec)]
+                    backfill.start(dev_address, len(pending), sum(int(dev_size) for dist_rec in pending for dev_path, dev_size, dev_timestamp in dist_rec))
+                
+                # Newest records first if download is budgeted (new records are not delayed by backlog)
+                elif budget is not None:
+                    dist_recs.sort(key=lambda dist_rec: max(timestamp for path, size, timestamp in dist_rec), reverse=True)
+                
+                # Skip records older than watermark
+                if not full:
+                    dist_recs = watermark.filter(dist_recs)
+                
+                # Records which are not being written by device anymore
+                settled = get_stability(local_dirname, settle_time).settled(dist_recs)
+                
+                # Number of records deferred to the next cycle
+                deferred = 0
+                unsettled = 0
+                mismatched = 0
+                
+                # Downloaded and pending records (watermark)
+                done_recs = []
+                pending_recs = []
+                
+                # Loop through disturbance records
+                for dist_rec in dist_recs:
                     # Check interrupt flag and exit if necesary
                     if self._interrupt.is_set(): break
                     
                     # Check if files are already downloaded
-                    # If files are not downloaded set download to True
+                    # If files are not downloaded or device file size changed set download to True
                     download = False
                     for dev_path, dev_size, dev_timestamp in dist_rec:
-                        if not is_downloaded(dev_path, local_dirname):
+                        if not is_downloaded(dev_path, local_dirname, index=local_index):
+                            download = True
+                            break
+                        if is_changed(dev_path, dev_size, local_index, manifest):
+                            logger.info('Device file size changed: %s %s', dev_address, dev_path)
                             download = True
                             break
                     
+                    if not download:
+                        done_recs.append(dist_rec)
+                    
+                    # Defer record which is still being written by device
+                    if download and group_key(dist_rec) not in settled:
+                        unsettled += 1
+                        pending_recs.append(dist_rec)
+                        continue
+                    
+                    # Defer record to the next cycle if budget is exhausted
+                    if download and budget is not None and budget.exhausted():
+                        deferred += 1
+                        pending_recs.append(dist_rec)
+                        continue
+                    
                     if download and not self._interrupt.is_set():
-                        # Create .tmp dir if it doesn't exist
-                        os.makedirs(local_tmp_dirname, mode=0o700, exist_ok=True)
+                        # Record staging directory (.tmp/<record>)
+                        group = StagedGroup(local_tmp_dirname, dist_rec, listed)
+                        
+                        # Received size and checksum per file
+                        checksums = {}
+                        
+                        # Record with file which is not received completely is not finalized
+                        incomplete = False
                         
                         # Loop through files and download them
                         for dev_path, dev_size, dev_timestamp in dist_rec:
@@ -150,8 +365,15 @@ class FTPClient(ftplib.FTP):
                             dev_basename = os.path.basename(dev_path)
                             dev_dirname = os.path.dirname(dev_path)
                             
-                            # Local download path to .tmp directory
-                            local_path = os.path.join(local_tmp_dirname, dev_basename)
+                            # Local download path to staging directory
+                            local_path = os.path.join(group.path, dev_basename)
+                            
+                            # Skip file completely received in previous attempt
+                            resumed = group.completed(dev_path, dev_size, dev_timestamp, checksum)
+                            if resumed is not None:
+                                checksums[dev_basename] = resumed
+                                logger.debug('Resumed: %s %s', dev_address, dev_path)
+                                continue
                             
                             # Polling timeout
                             if download_count > 0:
@@ -162,47 +384,199 @@ class FTPClient(ftplib.FTP):
                             # Check interrupt flag and exit if necesary
                             #if self._interrupt.is_set(): break
                             
-                            # Download disturbance record
-                            logger.debug('Started downloading: %s %s', dev_address, dev_path)
-                            self.retr(dev_path, local_path)
-                            logger.debug('Downloaded: %s %s -> %s', dev_address, dev_path, local_path)
+                            # Probe device file (size, timestamp and first block) against content-addressed store
+                            # Note: First block is read from device only if stored file has the same size and timestamp
+                            probed = store is not None and store.enabled and int(dev_size) > PROBE_SIZE
+                            digest = None
+                            if probed and store.has_candidate(dev_size, dev_timestamp, checksum):
+                                head = self.retr_head(dev_path, PROBE_SIZE)
+                                digest = store.lookup_probe(probe_key(dev_size, dev_timestamp, hashlib.sha256(head).hexdigest(), checksum), checksum)
+                            
+                            # Local file is linked to stored content (shared inode attributes are not changed)
+                            linked = digest is not None
+                                
+                            if digest is not None:
+                                # Link known content instead of downloading
+                                store.link(checksum, digest, local_path)
+                                local_size = int(dev_size)
+                                logger.debug('Linked from content store: %s %s -> %s', dev_address, dev_path, local_path)
+                            else:
+                                # Download disturbance record
+                                # Checksum is computed from received data while file is written
+                                # Note: File is downloaded again if received size differs from listed size
+                                for refetch in range(REFETCH_ATTEMPTS + 1):
+                                    hasher = new_hasher(checksum)
+                                    logger.debug('Started downloading: %s %s', dev_address, dev_path)
+                                    local_size = self.retr(dev_path, local_path, hasher=hasher, size=int(dev_size), recv_size=recv_size, throttle=throttle)
+                                    logger.debug('Downloaded: %s %s -> %s', dev_address, dev_path, local_path)
+                                
+                                    # Note: Some devices list size 0 (size is not checked)
+                                    if not dev_size or local_size == int(dev_size):
+                                        break
+                            
+                                    logger.warning('Size mismatch %s %s: received %s B, listed %s B', dev_address, dev_path, local_size, dev_size)
+                                    os.remove(local_path)
+                                else:
+                                    # Truncated file is not finalized (record stays staged and it's downloaded again)
+                                    # Note: Next records are downloaded (record doesn't stop device download)
+                                    logger.error('Size mismatch after %s re-fetch attempts %s %s', REFETCH_ATTEMPTS, dev_address, dev_path)
+                                    incomplete = True
+                                    continue
+                                
+                                digest = hasher.hexdigest()
+                                
+                                # Count downloaded bytes
+                                if budget is not None:
+                                    budget.consume(local_size)
+                                
+                                # Remember probe of completely downloaded file
+                                # Note: First block is read from local file
+                                if probed and local_size == int(dev_size):
+                                    store.add_probe(probe_key(dev_size, dev_timestamp, head_digest(local_path), checksum), digest)
+                            
+                            checksums[dev_basename] = (dev_path, int(dev_size), local_size, digest)
                             
                             # Set local timestamp
-                            os.utime(local_path, (dev_timestamp, dev_timestamp))
+                            if not linked:
+                                os.utime(local_path, (dev_timestamp, dev_timestamp))
+                            
+                            # Mark file as completely received
+                            group.mark_done(dev_basename, checksums[dev_basename], dev_timestamp, checksum)
+                            
+                            # Count received bytes to backfill progress
+                            if backfill is not None:
+                                backfill.file_done(local_size)
                             
                             # Increase download count for poll request
                             download_count += 1
                         
-                        # Move downloaded files from .tmp to parent local directory
-                        # Read comtrade file and find trigger_time
-                        trigger_time = get_trigger_time(os.path.join(local_tmp_dirname, os.path.basename(dist_rec[0][0])), tz=local_tz)
+                        # Defer staged record to the next cycle
+                        if incomplete:
+                            mismatched += 1
+                            pending_recs.append(dist_rec)
+                            continue
+                        
+                        # Move downloaded files from staging directory to parent local directory
+                        # Read comtrade config header and find trigger_time
+                        cfg_path = os.path.join(group.path, os.path.basename(dist_rec[0][0]))
+                        header = read_cfg_header(cfg_path)
+                        trigger_time = get_trigger_time(cfg_path, tz=local_tz, header=header, pattern=vendor.trigger_pattern)
+                        
+                        # Representation of record (None if all record files are downloaded)
+                        variant = variants.get(group_key(dist_rec), (None,))[0]
                         
                         # Copy files with attributes (such as timestamp) and add date as filename prefix
-                        tmp_files = (f for f in os.listdir(local_tmp_dirname) if os.path.isfile(os.path.join(local_tmp_dirname, f)))
-                        for basename in tmp_files:
+                        local_files = []
+                        record_files = []
+                        for basename in checksums:
                             local_file = os.path.join(local_dirname, trigger_time + '_' + basename)
-                            local_tmp_file = os.path.join(local_tmp_dirname, basename)
-                            shutil.copy2(local_tmp_file, local_file)
+                            local_files.append(local_file)
+                            local_tmp_file = os.path.join(group.path, basename)
+                            
+                            # Remove previously downloaded file (device file changed)
+                            # Note: Local file may be hard link to content-addressed store
+                            if os.path.lexists(local_file):
+                                os.remove(local_file)
+                            
+                            # Staging file linked to content store is linked (data is not copied)
+                            if os.stat(local_tmp_file).st_nlink > 1:
+                                os.link(local_tmp_file, local_file)
+                            else:
+                                shutil.copy2(local_tmp_file, local_file)
+                            dev_path, dev_size, local_size, digest = checksums[basename]
+                            
+                            # Replace duplicate content with hard link to content-addressed store
+                            if store is not None and store.put(local_file, checksum, digest):
+                                logger.info('Deduplicated: %s', local_file)
+                            
+                            local_index.add(local_file)
+                            
+                            # Write checksum sidecar file and manifest entry
+                            local_index.add(write_sidecar(local_file, digest, checksum))
+                            manifest.add(os.path.basename(local_file), dev_path=dev_path, dev_size=dev_size, size=local_size, algorithm=checksum, digest=digest, variant=variant)
+                            record_files.append({'path': local_file, 'dev_path': dev_path, 'dev_size': dev_size, 'size': local_size, 'algorithm': checksum, 'digest': digest, 'variant': variant})
                             logger.info('Downloaded: %s %s -> %s', dev_address, basename, local_file)
                         
-                        # Delete .tmp directory with all files
-                        shutil.rmtree(local_tmp_dirname)
+                        # Expand selected ZIP or CFF file to CFG and DAT files (canonical layout)
+                        # Note: Expanded files are named after device CFG and DAT files which are not downloaded
+                        if selector is not None and selector.expand and variant in ('zip', 'cff'):
+                            targets = expand_targets(dev_recs[group_key(dist_rec)], os.path.join(local_dirname, trigger_time + '_'))
+                            try:
+                                expanded = expand(local_files[0], targets, checksum) if targets else []
+                            except (OSError, ValueError) as err:
+                                logger.warning('Not expanded %s: %s', local_files[0], err)
+                                expanded = []
+                            
+                            for expanded_file, expanded_size, digest in expanded:
+                                local_index.add(expanded_file)
+                                local_index.add(write_sidecar(expanded_file, digest, checksum))
+                                manifest.add(os.path.basename(expanded_file), size=expanded_size, algorithm=checksum, digest=digest, variant=variant, expanded_from=os.path.basename(local_files[0]))
+                                logger.info('Expanded: %s -> %s', local_files[0], expanded_file)
+                            local_files.extend(expanded_file for expanded_file, expanded_size, digest in expanded)
+                        
+                        # Add record to catalog
+                        if catalog is not None:
+                            catalog.add(local_files, header)
+                        
+                        # Convert record to columnar format in background
+                        if convert:
+                            get_converter().put(local_files, os.path.join(local_dirname, COLUMNAR_DIRNAME), convert)
+                        
+                        # Publish record finalized event
+                        if events is not None:
+                            events.publish(record_files, header)
+                        
+                        # Update backfill checkpoint and progress
+                        if backfill is not None:
+                            backfill.record_done(sum(local_size for dev_path, dev_size, local_size, digest in checksums.values()))
+                        
+                        # Delete record staging directory with all files
+                        group.remove()
+                        done_recs.append(dist_rec)
+                
+                if deferred:
+                    logger.info('Deferred %s records %s (budget exhausted)', deferred, dev_address)
+                
+                if unsettled:
+                    logger.info('Deferred %s records %s (record is being written)', unsettled, dev_address)
+                
+                if mismatched:
+                    logger.warning('Deferred %s records %s (size mismatch)', mismatched, dev_address)
+                
+                if backfill is not None:
+                    backfill.report(force=True)
                 
                 # Check interrupt flag and exit if necesary
                 if self._interrupt.is_set(): break
                 
+                # Move watermark to the newest downloaded record and save full listing check
+                if watermark is not None:
+                    watermark.advance(done_recs, pending_recs)
+                    if full:
+                        watermark.checked()
+                
                 # Compare list of local files with list of device disturbance record files and search for differences
                 # Move local disturbance records which do not exist in device anymore to archive directory
+                # Note: Files are moved by background archive worker
                 archive_path = os.path.join(local_dirname, 'archive')
+                archive_worker = get_archive_worker()
 
                 # dir_list_diff for FTP protocol uses empty directory string (dev_dir = '') since FTP uses
                 # relative path and download directory must be set before browsing or downloading files
-                for f in dir_list_diff(dev_file_list, local_dirname, ''):
-                    os.makedirs(archive_path, mode=0o755, exist_ok=True)
-                    logger.debug('Moving to archive: %s', f)
-                    shutil.move(f, os.path.join(archive_path, os.path.basename(f)))
+                for f in dir_list_diff((f for dist_rec in dev_recs.values() for f in dist_rec), local_dirname, '', index=local_index, duplicates=vendor.duplicates):
+                    if archive_worker.put(f, archive_path, catalog):
+                        logger.debug('Queued for archive: %s', f)
+                
+                # Delete downloaded and verified records from device
+                # Note: Local files are archived in the next cycle
+                if cleanup is not None:
+                    cleaned = cleanup.run([dev_recs[group_key(dist_rec)] for dist_rec in dist_recs], self.del_file, local_index, manifest, self._interrupt,
+                                          downloaded=selector.files if selector is not None else None)
+                    if cleaned:
+                        logger.info('%s %s records from %s', 'Dry run, would delete' if cleanup.dry_run else 'Deleted', len(cleaned), dev_address)
                 
                 # Break the retry loop if code is executed without errors
+                success = True
                 break
             
             except ConnectionError as err:
@@ -263,6 +637,8 @@ class FTPClient(ftplib.FTP):
             # Close connection unilaterally
             self.close()
         logger.debug('Disconnected from %s:%s', dev_address, dev_port)
+        
+        return success
     
     
     def mdtm(self, filename):
@@ -282,15 +658,19 @@ class FTPClient(ftplib.FTP):
             timestamp in format YYYYMMDDHHMMSS
         """
         
-        self.voidcmd('MDTM ' + filename)[4:].strip()
+        return self.voidcmd('MDTM ' + filename)[4:].strip()
     
     
-    def retr(self, file_name, local_file_name=''):
+    def retr(self, file_name, local_file_name='', hasher=None, size=0, recv_size=RECV_SIZE, splice=False, throttle=None):
         """
         RETR FTP command
         
         Download the file from the server
         
+        Data connection is read into preallocated buffer with recv_size
+        reads (no Python callback and bytes object per block). Local file is
+        preallocated from listed size and truncated to received size.
+        
         Parameters
         ----------
         file_name : str
@@ -299,15 +679,199 @@ class FTPClient(ftplib.FTP):
             Local file path (dirname + hostname).
             Defaults to FTP server hostname if local_file_name parameter is not
             set.
+        hasher : hash object
+            Hash object (hashlib) updated with received data. Default None
+        size : int
+            Listed file size in bytes used to preallocate local file.
+            Default 0 (file is not preallocated)
+        recv_size : int
+            Size in bytes of one data connection read. Default 1 MiB
+        splice : bool
+            Move data from socket to local file in kernel (Linux splice)
+            if hasher is not set. Default False
+        throttle : Throttle
+            Bandwidth throttle (drec.common) consumed per received block.
+            Default None (unlimited)
+        
+        Returns
+        -------
+        size : int
+            Number of received bytes
         """
         
         # Set local file name if it's not set
         if not local_file_name:
             local_file_name = os.path.basename(file_name)
         
+        self.voidcmd('TYPE I')
+        
         # Download file
         with open(local_file_name, 'wb') as f:
-            ret = self.retrbinary('RETR ' + file_name, f.write)
+            # Preallocate local file (less fragmentation and early ENOSPC)
+            if size > 0 and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                except OSError:
+                    pass
+            
+            with self.transfercmd('RETR ' + file_name) as conn:
+                try:
+                    conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, max(RCVBUF_SIZE, recv_size))
+                except OSError:
+                    pass
+        
+                if splice and hasher is None and hasattr(os, 'splice'):
+                    received = self._recv_splice(conn, f, recv_size, throttle)
+                else:
+                    received = self._recv_into(conn, f, hasher, recv_size, throttle)
+            
+            # Preallocated size is larger than received size
+            if received < size:
+                f.truncate(received)
+        
+        self.voidresp()
+        
+        return received
+    
+    
+    def _recv_into(self, conn, f, hasher, recv_size, throttle=None):
+        """
+        Read data connection into local file with preallocated buffer
+        
+        Returns
+        -------
+        size : int
+            Number of received bytes
+        """
+        
+        buffer = bytearray(recv_size)
+        view = memoryview(buffer)
+        received = 0
+        
+        while True:
+            n = conn.recv_into(buffer)
+            if not n:
+                break
+            
+            f.write(view[:n])
+            if hasher is not None:
+                hasher.update(view[:n])
+            received += n
+        
+            # Note: Data connection is not read until block is allowed by throttle
+            if throttle is not None:
+                throttle.consume(n)
+        
+        return received
+    
+    
+    def _recv_splice(self, conn, f, recv_size, throttle=None):
+        """
+        Move data connection to local file in kernel through pipe (Linux
+        splice)
+        
+        Returns
+        -------
+        size : int
+            Number of received bytes
+        """
+        
+        timeout = conn.gettimeout()
+        read_fd, write_fd = os.pipe()
+        received = 0
+        
+        try:
+            # Pipe capacity is one read (default 64 KiB)
+            try:
+                fcntl.fcntl(write_fd, fcntl.F_SETPIPE_SZ, recv_size)
+            except (AttributeError, OSError):
+                pass
+            
+            while True:
+                try:
+                    n = os.splice(conn.fileno(), write_fd, recv_size)
+                except BlockingIOError:
+                    # Socket with timeout is non-blocking
+                    if not select.select([conn], [], [], timeout)[0]:
+                        raise socket.timeout('timed out')
+                    continue
+                
+                if not n:
+                    break
+                
+                if throttle is not None:
+                    throttle.consume(n)
+                
+                while n:
+                    written = os.splice(read_fd, f.fileno(), n)
+                    n -= written
+                    received += written
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+        
+        return received
+    
+    
+    def retr_head(self, file_name, size):
+        """
+        Download first bytes of the file from the server
+        
+        Data transfer is closed after size bytes are received.
+        
+        Parameters
+        ----------
+        file_name : str
+            FTP server file name (hostname)
+        size : int
+            Number of bytes
+        
+        Returns
+        -------
+        data : bytes
+            First bytes of the file
+        """
+        
+        data = bytearray()
+        
+        self.voidcmd('TYPE I')
+        with self.transfercmd('RETR ' + file_name) as conn:
+            while len(data) < size:
+                chunk = conn.recv(size - len(data))
+                if not chunk:
+                    break
+                data += chunk
+        
+        # Server replies 226 (transfer complete) or 426 (transfer aborted)
+        try:
+            self.voidresp()
+        except ftplib.error_temp:
+            pass
+        
+        return bytes(data)
+    
+    
+    def del_file(self, file_name):
+        """
+        DELE FTP command
+        
+        Delete the file from the server
+        
+        Parameters
+        ----------
+        file_name : str
+            FTP server file name
+        
+        Raises
+        ------
+        ConnectionError
+            if file is not deleted from the server
+        """
+        
+        try:
+            self.delete(file_name)
+        except (ftplib.error_perm, ftplib.error_temp, ftplib.error_reply) as err:
+            raise ConnectionError('Failed to delete file {} from device. {}'.format(file_name, err))
     
     
     def noop(self):
@@ -345,16 +909,56 @@ class FTPClient(ftplib.FTP):
             return 'closed'
     
     
-    def get_file_directory(self, dev_tz='UTC'):
+    def mlsd_entries(self):
         """
-        Returns the directory entries of the current directory on the server
+        Yields MLSD entries of the current directory while listing is received
         
-        Returns
-        -------
-        file_list : list of tuples
-            List of files (path, size, timestamp)
+        Unlike ftplib.FTP.mlsd() listing lines are not collected before the
+        first entry is returned. Control connection must not be used for
+        other commands until the generator is exhausted.
+        
+        Yields
+        ------
+        entry : tuple
+            Entry (name, facts) with lower case fact names
+        """
+        
+        self.sendcmd('TYPE A')
+        with self.transfercmd('MLSD') as conn, conn.makefile('r', encoding=self.encoding) as fp:
+            for line in fp:
+                facts_found, _, name = line.rstrip('\r\n').partition(' ')
+                facts = {}
+                for fact in facts_found[:-1].split(';'):
+                    key, _, value = fact.partition('=')
+                    facts[key.lower()] = value
+                yield name, facts
+        self.voidresp()
+    
+    
+    def iter_file_directory(self, dev_tz='UTC', known=None, accept=None):
+        """
+        Yields the directory entries of the current directory on the server
+        
+        MLSD entries are yielded while listing is received. NLST fallback
+        (MLSD command is not supported) yields entries after SIZE and MDTM
+        commands of each file.
+        
+        Parameters
+        ----------
         dev_tz : str
             Device time zone. Default is UTC
+        known : callable
+            Called with file basename. If return value is true, file is
+            listed with size and timestamp 0 without SIZE and MDTM commands
+            (NLST fallback only). Default is None
+        accept : callable
+            Called with file path. Files which are not accepted are not
+            listed (no SIZE and MDTM commands). Default is None
+        
+        Yields
+        ------
+        entry : tuple
+            File (path, size, timestamp)
         
         Raises
         ------
@@ -367,7 +971,6 @@ class FTPClient(ftplib.FTP):
         https://en.wikipedia.org/wiki/List_of_tz_database_time_zones
         """
         
-        file_list = []
         current_time = time.time()
         
         # SIZE command error counter
@@ -378,56 +981,104 @@ class FTPClient(ftplib.FTP):
         error_count_MDTM = 0
         MAX_ERROR_COUNT_MDTM = 2
         
+        # Number of listed MLSD entries
+        count = 0
+        
         try:
             # Get list of files with MLSD command
-            for filename, facts in self.mlsd():
-                if facts['type'] == 'file':
-                    path = filename
-                    size = facts['size']
-                    timestamp = str_to_epoch(facts['modify'])
-                    #print(path, size, timestamp)
-                    file_list.append((path, size, timestamp))
-        except:
-            # If MLSD FTP command is not supported fallback to NLST command
+            for filename, facts in self.mlsd_entries():
+                count += 1
+                if facts.get('type') == 'file' and (accept is None or accept(filename)):
+                    # Note: MLSD modify fact is UTC time YYYYMMDDHHMMSS[.sss]
+                    modify = facts.get('modify')
+                    timestamp = str_to_timestamp(modify[:14], format_code='%Y%m%d%H%M%S') if modify else current_time
+                    yield (filename, int(facts.get('size', 0)), timestamp)
+            return
+        except Exception as err:
+            # Listing broken after entries were yielded can't fall back to NLST (entries would be listed twice)
+            if count:
+                self.abort()
+                raise ConnectionError('Error retrieving file directory: {}'.format(err))
+        
+        # If MLSD FTP command is not supported fallback to NLST command
+        try:
+            filenames = self.nlst()
+        except Exception as err:
+            self.abort()
+            raise ConnectionError('Error retrieving file directory: {}'.format(err))
+        
+        for filename in filenames:
+            # Skip files which are not disturbance records
+            if accept is not None and not accept(filename):
+                continue
+            
+            # Skip commands for known (already downloaded) files
+            if known is not None and known(os.path.basename(filename)):
+                yield (filename, 0, 0)
+                continue
+            
+            # Check is name file or directory.
+            # If name is directory set to directory and return to previous
+            # If name is file check size and timestamp
             try:
-                for filename in self.nlst():
-                    # Check is name file or directory.
-                    # If name is directory set to directory and return to previous
-                    # If name is file check size and timestamp
+                self.cwd(filename)
+                self.cwd('..')
+            except:
+                # is file
+                path = filename
+                    
+                # Get file size with SIZE command
+                # if command is supported by FTP server.
+                # Otherwise set to 0.
+                if error_count_SIZE < MAX_ERROR_COUNT_SIZE:
+                    try:
+                        size = self.size(filename)
+                    except:
+                        size = 0
+                        error_count_SIZE += 1
+                else:
+                    size = 0
+                    
+                # Get file timestamp with MDTM command
+                # if command is supported by FTP server.
+                # Otherwise set to localtime of FTP query.
+                if error_count_MDTM < MAX_ERROR_COUNT_MDTM:
                     try:
-                        self.cwd(filename)
-                        self.cwd('..')
+                        timestamp = str_to_timestamp(self.mdtm(filename), tz=dev_tz, format_code='%Y%m%d%H%M%S')
                     except:
-                        # is file
-                        path = filename
+                        timestamp = current_time
+                        error_count_MDTM += 1
+                else:
+                    timestamp = current_time
                         
-                        # Get file size with SIZE command
-                        # if command is supported by FTP server.
-                        # Otherwise set to 0.
-                        if error_count_SIZE < MAX_ERROR_COUNT_SIZE:
-                            try:
-                                size = self.size(filename)
-                            except:
-                                size = 0
-                                error_count_SIZE += 1
-                        else:
-                            size = 0
+                yield (path, size, timestamp)
                         
-                        # Get file timestamp with MDTM command
-                        # if command is supported by FTP server.
-                        # Otherwise set to localtime of FTP query.
-                        if error_count_MDTM < MAX_ERROR_COUNT_MDTM:
-                            try:
-                                timestamp = str_to_timestamp(self.mdtm(filename), tz=dev_tz, format_code='%Y%m%d%H%M%S')
-                            except:
-                                timestamp = current_time
-                                error_count_MDTM += 1
-                        else:
-                            timestamp = current_time
                         
-                        file_list.append((path, size, timestamp))
-            except:
-                self.abort()
-                raise ConnectionError
-        finally:
-            return file_list
+    def get_file_directory(self, dev_tz='UTC', known=None, accept=None):
+        """
+        Returns the directory entries of the current directory on the server
+        
+        Parameters
+        ----------
+        dev_tz : str
+            Device time zone. Default is UTC
+        known : callable
+            Called with file basename. If return value is true, file is
+            listed with size and timestamp 0 without SIZE and MDTM commands
+            (NLST fallback only). Default is None
+        accept : callable
+            Called with file path. Files which are not accepted are not
+            listed (no SIZE and MDTM commands). Default is None
+        
+        Returns
+        -------
+        file_list : list of tuples
+            List of files (path, size, timestamp)
+        
+        Raises
+        ------
+        ConnectionError
+            error retriving file directory from device
+        """
+        
+        return list(self.iter_file_directory(dev_tz, known, accept))
@@ -0,0 +1,425 @@
+import os
+import json
+import socket
+import random
+import logging
+import threading
+import time
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.health')
+
+
+# Device health state file within root path
+HEALTH_PATH = os.path.join('.drec', 'health.json')
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Default device ports per protocol (TCP probe)
+DEFAULT_PORTS = {'IEC61850': 102, 'FTP': 21}
+
+# Default breaker policy
+POLICY = {
+    'threshold': 3,         # Consecutive failed downloads before breaker opens
+    'backoff': 60,          # Initial backoff in seconds
+    'backoff_max': 3600,    # Max backoff in seconds
+    'probe_timeout': 3      # TCP probe connect timeout in seconds
+}
+
+
+def merge_policy(general, device):
+    """
+    Merge GENERAL and DEVICE breaker policy with default policy
+    
+    Device policy parameters supersede general policy parameters.
+    
+    Parameters
+    ----------
+    general : dict or None
+        Breaker policy from GENERAL section
+    device : dict or None
+        Breaker policy from DEVICE section
+    
+    Returns
+    -------
+    policy : dict
+        Merged breaker policy
+    """
+    
+    policy = dict(POLICY)
+    for p in (general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY})
+    
+    return policy
+
+
+def backoff_delay(opened, base, maximum, rnd=random):
+    """
+    Return backoff delay with jitter
+    
+    Delay doubles each time breaker opens again without recovery. Random
+    jitter (half to full delay) spreads probes of devices which failed at
+    the same time (for example after substation network outage).
+    
+    Parameters
+    ----------
+    opened : int
+        Number of times breaker opened since last successful download
+    base : float
+        Initial delay in seconds
+    maximum : float
+        Max delay in seconds
+    rnd : random.Random
+        Random number generator. Default random module
+    
+    Returns
+    -------
+    delay : float
+        Delay in seconds
+    """
+    
+    delay = min(maximum, base * 2 ** max(opened - 1, 0))
+    
+    return rnd.uniform(delay / 2, delay)
+
+
+def tcp_probe(address, port, timeout):
+    """
+    Check if device accepts TCP connections
+    
+    Parameters
+    ----------
+    address : str
+        Device IP address or hostname
+    port : int
+        Device port
+    timeout : float
+        Connect timeout in seconds
+    
+    Returns
+    -------
+    reachable : bool
+        True if TCP connection is established
+    """
+    
+    try:
+        with socket.create_connection((address, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class DeviceHealth:
+    """
+    Circuit breaker of one device
+    
+    Breaker is closed while downloads succeed. After threshold consecutive
+    failed downloads breaker opens and device is skipped until backoff
+    expires. Then device is probed with TCP connect only; if probe succeeds
+    breaker is half open and one download attempt (without retries) decides
+    whether breaker closes or opens again with doubled backoff.
+    """
+    
+    def __init__(self, monitor, key, protocol, address, port=None, policy=None, state=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        monitor : HealthMonitor
+            Monitor which saves state
+        key : str
+            Device key
+        protocol : str
+            Device protocol (IEC61850 or FTP)
+        address : str
+            Device IP address or hostname
+        port : int
+            Device port. Default protocol port
+        policy : dict
+            Breaker policy. Default POLICY
+        state : dict
+            Saved state. Default None (breaker is closed)
+        """
+        
+        self.monitor = monitor
+        self.key = key
+        self.protocol = protocol
+        self.address = address
+        self.port = port if port else DEFAULT_PORTS.get(protocol)
+        self.policy = dict(POLICY, **(policy or {}))
+        
+        state = state or {}
+        self.state = state.get('state', CLOSED)
+        self.failures = state.get('failures', 0)
+        self.opened = state.get('opened', 0)
+        self.next_attempt = state.get('next_attempt', 0)
+        self.total_failures = state.get('total_failures', 0)
+        self.total_successes = state.get('total_successes', 0)
+        self.total_skipped = state.get('total_skipped', 0)
+        self.last_success = state.get('last_success')
+        self.last_failure = state.get('last_failure')
+    
+    
+    def as_dict(self):
+        """
+        Return state and counters (metrics)
+        """
+        
+        return {
+            'protocol': self.protocol,
+            'address': self.address,
+            'port': self.port,
+            'state': self.state,
+            'failures': self.failures,
+            'opened': self.opened,
+            'next_attempt': self.next_attempt,
+            'total_failures': self.total_failures,
+            'total_successes': self.total_successes,
+            'total_skipped': self.total_skipped,
+            'last_success': self.last_success,
+            'last_failure': self.last_failure
+        }
+    
+    
+    def allow(self, now=None):
+        """
+        Return True if device should be downloaded now
+        
+        Device with open breaker is probed when backoff expires.
+        
+        Parameters
+        ----------
+        now : float
+            Current time. Default time.time()
+        
+        Returns
+        -------
+        allowed : bool
+            True if download should be attempted
+        """
+        
+        if self.state == CLOSED:
+            return True
+        
+        now = time.time() if now is None else now
+        
+        if now < self.next_attempt:
+            self.total_skipped += 1
+            logger.debug('Circuit open %s, next probe in %.0f s', self.address, self.next_attempt - now)
+            return False
+        
+        if self.port and not tcp_probe(self.address, self.port, self.policy['probe_timeout']):
+            logger.debug('Probe failed %s:%s', self.address, self.port)
+            self.total_skipped += 1
+            self._open(now)
+            return False
+        
+        logger.info('Probe succeeded %s, circuit half open', self.address)
+        self.state = HALF_OPEN
+        self.monitor.save()
+        
+        return True
+    
+    
+    def record(self, success, now=None):
+        """
+        Record download result
+        
+        Parameters
+        ----------
+        success : bool
+            True if download succeeded
+        now : float
+            Current time. Default time.time()
+        """
+        
+        now = time.time() if now is None else now
+        
+        if success:
+            if self.state != CLOSED:
+                logger.info('Circuit closed %s, device recovered after %s failures', self.address, self.failures)
+            self.state = CLOSED
+            self.failures = 0
+            self.opened = 0
+            self.next_attempt = 0
+            self.total_successes += 1
+            self.last_success = now
+        else:
+            self.failures += 1
+            self.total_failures += 1
+            self.last_failure = now
+            if self.state == HALF_OPEN or self.failures >= self.policy['threshold']:
+                self._open(now)
+                return
+        
+        self.monitor.save()
+    
+    
+    def _open(self, now):
+        """
+        Open breaker and schedule next probe
+        """
+        
+        self.opened += 1
+        delay = backoff_delay(self.opened, self.policy['backoff'], self.policy['backoff_max'])
+        self.state = OPEN
+        self.next_attempt = now + delay
+        
+        logger.warning('Circuit open %s after %s failures, next probe in %.0f s', self.address, self.failures, delay)
+        
+        self.monitor.save()
+
+
+class HealthMonitor:
+    """
+    Device health states of all devices under root path
+    
+    State is saved to JSON file after each change so breaker state survives
+    process restart and can be read by monitoring (metrics).
+    """
+    
+    def __init__(self, path):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            Path to health state file
+        """
+        
+        self.path = path
+        
+        self._lock = threading.RLock()
+        self._devices = {}
+        self._saved = {}
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._saved = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            logger.warning('Invalid health state file %s', path)
+    
+    
+    def device(self, key, protocol, address, port=None, policy=None):
+        """
+        Return circuit breaker of device
+        
+        Parameters
+        ----------
+        key : str
+            Device key (local directory)
+        protocol : str
+            Device protocol (IEC61850 or FTP)
+        address : str
+            Device IP address or hostname
+        port : int
+            Device port. Default protocol port
+        policy : dict
+            Breaker policy. Default POLICY
+        
+        Returns
+        -------
+        health : DeviceHealth
+            Device circuit breaker
+        """
+        
+        with self._lock:
+            health = self._devices.get(key)
+            if health is None:
+                health = DeviceHealth(self, key, protocol, address, port, policy, self._saved.get(key))
+                self._devices[key] = health
+            else:
+                # Config may change between cycles
+                health.protocol = protocol
+                health.address = address
+                health.port = port if port else DEFAULT_PORTS.get(protocol)
+                health.policy = dict(POLICY, **(policy or {}))
+            
+            return health
+    
+    
+    def states(self):
+        """
+        Return state and counters of all devices
+        """
+        
+        with self._lock:
+            states = dict(self._saved)
+            states.update({key: health.as_dict() for key, health in self._devices.items()})
+            return states
+    
+    
+    def save(self):
+        """
+        Save health states
+        """
+        
+        with self._lock:
+            states = self.states()
+            
+            try:
+                dirname = os.path.dirname(self.path)
+                if dirname:
+                    os.makedirs(dirname, mode=0o755, exist_ok=True)
+                
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(states, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except OSError as err:
+                logger.error('Health state save failed %s: %s', self.path, err)
+    
+    
+    def summary(self):
+        """
+        Return number of devices per breaker state
+        """
+        
+        count = dict.fromkeys((CLOSED, OPEN, HALF_OPEN), 0)
+        for state in self.states().values():
+            count[state.get('state', CLOSED)] += 1
+        
+        return count
+
+
+# Health monitor registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_monitor(path):
+    """
+    Return health monitor for state file path
+    
+    Monitor is created on first call and reused during the lifetime of the
+    process.
+    
+    Parameters
+    ----------
+    path : str
+        Path to health state file
+    
+    Returns
+    -------
+    monitor : HealthMonitor
+        Health monitor
+    """
+    
+    path = os.path.abspath(path)
+    
+    with _registry_lock:
+        monitor = _registry.get(path)
+        if monitor is None:
+            monitor = HealthMonitor(path)
+            _registry[path] = monitor
+        
+        return monitor
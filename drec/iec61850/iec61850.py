@@ -1,5 +1,8 @@
 import os
+import time
 import shutil
+import tempfile
+import hashlib
 import logging
 import traceback
 
@@ -10,9 +13,56 @@ from .libiec61850 import iec61850
 from ..common import is_downloaded
 from ..common import group_dev_file_list
 from ..common import get_trigger_time
+from ..common import read_cfg_header
 from ..common import dir_list_diff
 from ..common import file_attr_format_str_len
 
+# Import local directory index
+from ..index import get_local_index
+
+# Import archive worker
+from ..archive import get_archive_worker
+
+# Import download manifest and checksum helpers
+from ..manifest import get_manifest
+from ..integrity import CHECKSUM
+from ..integrity import REFETCH_ATTEMPTS
+from ..integrity import new_hasher
+from ..integrity import write_sidecar
+
+# Import content-addressed store
+from ..cas import PROBE_SIZE
+from ..cas import probe_key
+from ..cas import head_digest
+from ..cas import get_store
+
+# Import columnar converter
+from ..convert import COLUMNAR_DIRNAME
+from ..convert import get_converter
+from ..convert import is_available
+
+# Import record staging
+from ..staging import STAGING_DIRNAME
+from ..staging import StagedGroup
+from ..staging import staged_keys
+from ..staging import gc as staging_gc
+from ..staging import group_key
+
+# Import record stability check
+from ..stability import SETTLE_TIME
+from ..stability import is_changed
+from ..stability import get_stability
+
+# Import vendor profile
+from ..vendor import DEFAULT as DEFAULT_VENDOR
+
+# Import sampled debug dumps
+from ..logs import sample
+
+# Import record representation selection
+from ..selection import expand
+from ..selection import expand_targets
+
 
 # Set logger name to module name
 logger = logging.getLogger('drec.iec61850')
@@ -41,7 +91,34 @@ class IEC61850(iec61850.IEC61850_client):
         self._interrupt = interrupt
     
     
-    def download(self, dev_address, local_dirname, dev_dir='COMTRADE', dev_port=102, req_timeout=5, poll_timeout=0, ret_timeout=10, no_retry=1, local_tz='UTC'):
+    def set_transport(self, con_timeout=10, req_timeout=5, mms=None):
+        """
+        Set connection timeouts and MMS association parameters
+        
+        NOTE: This method has to be called before connect method is called.
+        
+        Parameters
+        ----------
+        con_timeout : int
+            Connection timeout in seconds. Default is 10 s
+        req_timeout : int
+            Request timeout in seconds. Default is 5 s
+        mms : dict
+            MMS transport policy (drec.transport) with max_pdu_size and
+            max_outstanding (0 is library default). Default is None
+        """
+        
+        self.set_connect_timeout(con_timeout * 1000)
+        self.set_request_timeout(req_timeout * 1000)
+        
+        if mms is not None:
+            if mms.get('max_pdu_size'):
+                self.set_max_pdu_size(mms['max_pdu_size'])
+            if mms.get('max_outstanding'):
+                self.set_max_outstanding(mms['max_outstanding'])
+    
+    
+    def download(self, dev_address, local_dirname, dev_dir='COMTRADE', dev_port=102, con_timeout=10, req_timeout=5, poll_timeout=0, ret_timeout=10, no_retry=1, local_tz='UTC', checksum=CHECKSUM, settle_time=SETTLE_TIME, pipeline=1, mms=None, vendor=None, selector=None, cas_dirname=None, catalog=None, convert=None, events=None, budget=None, backfill=None, watermark=None, cleanup=None):
         """
         Download disturbance records
         
@@ -55,6 +132,8 @@ class IEC61850(iec61850.IEC61850_client):
             IED directory for disturbance records. Default is COMTRADE
         dev_port : int
             IED port. Default is 102
+        con_timeout : int
+            Connection timeout in seconds. Default is 10 s
         req_timeout : int
             Request timeout in miliseconds. libIEC61850 internally uses
             request timeout parameter as 32-bit unsigned int in miliseconds.
@@ -67,6 +146,64 @@ class IEC61850(iec61850.IEC61850_client):
             Number of retries after error. Default 1
         local_tz : str
             Local timezone. Default is UTC
+        checksum : str
+            Checksum algorithm computed during download (sha256, sha512,
+            blake2b, xxh64, xxh3_64, xxh128). Default is sha256
+        settle_time : int
+            Record settle time in seconds. Incomplete records and records
+            which changed since previous listing and are newer than settle
+            time are not downloaded. Default is 60 s
+        pipeline : int
+            Number of record files read at the same time over one MMS
+            association (capped at IED negotiated limit of outstanding
+            requests, 0 is negotiated limit). Default is 1 (files are read
+            one after another)
+        mms : dict
+            MMS transport policy (drec.transport) with max_pdu_size and
+            max_outstanding proposed to IED at association (0 is library
+            default). Default is None (library defaults)
+        vendor : VendorProfile
+            Vendor profile (drec.vendor). Files which are not accepted are
+            not listed, record files are ordered by profile extension
+            priority and duplicate formats are removed. Default is None
+            (ABB zipped HDR files are removed)
+        selector : RecordSelector
+            Record representation selection (drec.selection). Only the
+            cheapest complete representation of record listed in several
+            formats is downloaded. Default is None (all record files are
+            downloaded)
+        cas_dirname : str
+            Content-addressed store directory used for deduplication.
+            Default is None (deduplication is disabled)
+        catalog : DeviceCatalog
+            Record catalog (drec.catalog) updated with finalized records.
+            Default is None
+        convert : str
+            Columnar output format (npy or parquet) of finalized records.
+            Default is None (conversion is disabled)
+        events : DevicePublisher
+            Event publisher (drec.events) notified of finalized records.
+            Default is None
+        budget : Budget
+            Download budget (drec.scheduler) of current cycle. Records which
+            are not started when budget is exhausted are deferred to the next
+            cycle and newest records are downloaded first. Default is None
+            (unlimited)
+        backfill : Backfill
+            Backfill checkpoint (drec.backfill). Records are downloaded in
+            backfill order with progress report. Default is None
+        watermark : Watermark
+            Listing watermark (drec.watermark). Records older than watermark
+            are skipped except in periodic full listing check. Default is None
+        cleanup : DeviceCleanup
+            Device cleanup policy (drec.cleanup). Downloaded and verified
+            records are deleted from device. Default is None
+        
+        Returns
+        -------
+        success : bool
+            True if file directory is read and all records are downloaded
+            without connection error
         
         Note
         ----
@@ -77,11 +214,40 @@ class IEC61850(iec61850.IEC61850_client):
         # Download counter for poll timeout
         download_count = 0
         
+        # Vendor profile (listing filters, extension priority, duplicate formats and trigger time)
+        if vendor is None:
+            vendor = DEFAULT_VENDOR
+        
+        # Fall back to default checksum algorithm if algorithm is not available
+        try:
+            new_hasher(checksum)
+        except ValueError as err:
+            logger.warning('%s. Using %s', err, CHECKSUM)
+            checksum = CHECKSUM
+        
+        # Disable columnar conversion if required modules are not installed
+        if convert and not is_available(convert):
+            logger.warning('Columnar conversion to %s is not available (missing numpy or pyarrow module)', convert)
+            convert = None
+        
+        # Backfill bandwidth throttle is consumed per received block (steady rate)
+        throttle = backfill.throttle if backfill is not None else None
+        
+        # Download result (device health)
+        success = False
+        
+        # Staging directory is kept between attempts and restarts (partially downloaded records are resumed)
+        # Remove stale staged records
+        local_tmp_dirname = os.path.join(local_dirname, STAGING_DIRNAME)
+        staging_gc(local_tmp_dirname)
+        
+        # Connection timeouts and MMS association parameters are kept by connection between attempts
+        self.set_transport(con_timeout, req_timeout, mms)
+        
         for attempt in range(no_retry + 1):
-            # Remove .tmp directory
-            local_tmp_dirname = os.path.join(local_dirname, '.tmp')
-            if os.path.isdir(local_tmp_dirname):
-                shutil.rmtree(local_tmp_dirname)
+            # Full listing check (records older than watermark are checked only periodically)
+            # Note: Backfill always lists all records
+            full = watermark is None or backfill is not None or watermark.due()
             
             try:
                 # Check interrupt flag and exit if necesary
@@ -95,47 +261,143 @@ class IEC61850(iec61850.IEC61850_client):
                 # Check interrupt flag and exit if necesary
                 if self._interrupt.is_set(): break
                 
-                # Download file directory
-                dev_file_list = self.get_file_directory('')
+                # Read file directory (one directory response after another) and convert timestamp from ms to s
+                # Note: Listing is narrowed to files after watermark name if continueAfter is enabled
+                # Note: Files which are not accepted by vendor profile are dropped while listing is read
+                # Note: Listing time is kept to detect timestamps which are listing time (resume of staged files)
+                continue_after = watermark.listing_after() if watermark is not None and not full else ''
+                listed = time.time()
+                dev_file_list = ((name, size, time/1000) for name, size, time in self.iter_file_directory('', continue_after, vendor.accepts))
                 
-                # Convert timestamp from ms to s
-                dev_file_list = tuple(((name, size, time/1000) for name, size, time in dev_file_list))
+                # Filter, order and group the list while listing is received
+                # Note: Only filtered entries are kept in memory
+                dist_recs = group_dev_file_list(dev_file_list, dev_dir, vendor.priority, vendor.duplicates)
                 
-                # Formated file structure output
+                logger.debug('Listed %s records: %s', len(dist_recs), dev_address)
                 
-                # Get string lengths for formated file structure
-                format_str_len = file_attr_format_str_len(dev_file_list)
+                # Formated file structure output (filtered listing)
+                # Note: Listing is dumped once per dump interval per device
+                if logger.isEnabledFor(logging.DEBUG) and sample(('listing', dev_address)):
+                    # Get string lengths for formated file structure
+                    format_str_len = file_attr_format_str_len(f for dist_rec in dist_recs for f in dist_rec)
                 
-                # Print header
-                logger.debug('IED file structure:')
-                format_str = '%-{}s%{}s%{}s'.format(*format_str_len)
-                logger.debug(format_str, 'NAME', 'SIZE', 'TIME')
-                logger.debug('-' * sum(format_str_len))
+                    # Print header
+                    logger.debug('IED file structure:')
+                    format_str = '%-{}s%{}s%{}s'.format(*format_str_len)
+                    logger.debug(format_str, 'NAME', 'SIZE', 'TIME')
+                    logger.debug('-' * sum(format_str_len))
                 
-                # Print file attributes
-                format_str = '%-{}s%{}d%{}.3f'.format(*format_str_len)
-                for f in dev_file_list:
-                    logger.debug(format_str, *f)
+                    # Print file attributes
+                    format_str = '%-{}s%{}d%{}.3f'.format(*format_str_len)
+                    for dist_rec in dist_recs:
+                        for f in dist_rec:
+                            logger.debug(format_str, *f)
                 
                 # Check interrupt flag and exit if necesary
                 if self._interrupt.is_set(): break
                 
-                # Loop through disturbance records (filter, order, group the list)
-                for dist_rec in group_dev_file_list(dev_file_list, dev_dir):
+                # Local directory index (basename suffix -> path, size, mtime)
+                local_index = get_local_index(local_dirname)
+                
+                # Download manifest (local basename -> size and checksum)
+                manifest = get_manifest(local_dirname)
+                
+                # Content-addressed store (deduplication)
+                store = get_store(cas_dirname) if cas_dirname else None
+                
+                # Download only the cheapest complete representation of records listed in several formats
+                # Note: Device cleanup deletes all formats of record
+                dev_recs = {group_key(dist_rec): dist_rec for dist_rec in dist_recs}
+                variants = {}
+                if selector is not None:
+                    variants = {key: selector.select(dist_rec) for key, dist_rec in dev_recs.items()}
+                    dist_recs = [variants[group_key(dist_rec)][1] for dist_rec in dist_recs]
+                
+                # Backfill order and progress (partially downloaded record first)
+                if backfill is not None:
+                    backfill.sort(dist_recs, staged_keys(local_tmp_dirname))
+                    pending = [dist_rec for dist_rec in dist_recs
+                               if not all(is_downloaded(dev_path, local_dirname, index=local_index) for dev_path, dev_size, dev_timestamp in dist_rec)]
+                    backfill.start(dev_address, len(pending), sum(int(dev_size) for dist_rec in pending for dev_path, dev_size, dev_timestamp in dist_rec))
+                
+                # Newest records first if download is budgeted (new records are not delayed by backlog)
+                elif budget is not None:
+                    dist_recs.sort(key=lambda dist_rec: max(timestamp for path, size, timestamp in dist_rec), reverse=True)
+                
+                # Skip records older than watermark
+                if not full:
+                    dist_recs = watermark.filter(dist_recs)
+                
+                # Records which are not being written by device anymore
+                settled = get_stability(local_dirname, settle_time).settled(dist_recs)
+                
+                # Number of records deferred to the next cycle
+                deferred = 0
+                unsettled = 0
+                mismatched = 0
+                
+                # Downloaded and pending records (watermark)
+                done_recs = []
+                pending_recs = []
+                
+                # Loop through disturbance records
+                for dist_rec in dist_recs:
                     # Check interrupt flag and exit if necesary
                     if self._interrupt.is_set(): break
                     
                     # Check if files are already downloaded
-                    # If files are not downloaded set download to True
+                    # If files are not downloaded or device file size changed set download to True
                     download = False
                     for dev_path, dev_size, dev_timestamp in dist_rec:
-                        if not is_downloaded(dev_path, local_dirname):
+                        if not is_downloaded(dev_path, local_dirname, index=local_index):
                             download = True
                             break
+                        if is_changed(dev_path, dev_size, local_index, manifest):
+                            logger.info('Device file size changed: %s %s', dev_address, dev_path)
+                            download = True
+                            break
+                    
+                    if not download:
+                        done_recs.append(dist_rec)
+                    
+                    # Defer record which is still being written by device
+                    if download and group_key(dist_rec) not in settled:
+                        unsettled += 1
+                        pending_recs.append(dist_rec)
+                        continue
+                    
+                    # Defer record to the next cycle if budget is exhausted
+                    if download and budget is not None and budget.exhausted():
+                        deferred += 1
+                        pending_recs.append(dist_rec)
+                        continue
                     
                     if download and not self._interrupt.is_set():
-                        # Create .tmp dir if it doesn't exist
-                        os.makedirs(local_tmp_dirname, mode=0o700, exist_ok=True)
+                        # Record staging directory (.tmp/<record>)
+                        group = StagedGroup(local_tmp_dirname, dist_rec, listed)
+                        
+                        # Received size and checksum per file
+                        checksums = {}
+                        
+                        # Record with file which is not received completely is not finalized
+                        incomplete = False
+                        
+                        # Read record files with outstanding reads on one association
+                        # Note: Files probed against content store and refetched files are read one by one
+                        prefetched = {}
+                        if pipeline != 1:
+                            fetch = [(dev_path, os.path.join(group.path, os.path.basename(dev_path)), new_hasher(checksum))
+                                     for dev_path, dev_size, dev_timestamp in dist_rec
+                                     if group.completed(dev_path, dev_size, dev_timestamp, checksum) is None and
+                                     not (store is not None and int(dev_size) > PROBE_SIZE and store.has_candidate(dev_size, dev_timestamp, checksum))]
+                            if len(fetch) > 1:
+                                if download_count > 0:
+                                    if poll_timeout > 0:
+                                        logger.debug('Poll timeout: {} s'.format(poll_timeout))
+                                    self._interrupt.wait(poll_timeout)
+                                logger.debug('Started downloading %s files: %s %s', len(fetch), dev_address, group_key(dist_rec))
+                                for (dev_path, local_path, hasher), local_size in zip(fetch, self.get_files(fetch, pipeline, throttle)):
+                                    prefetched[dev_path] = (local_size, hasher)
                         
                         # Loop through files and download them
                         for dev_path, dev_size, dev_timestamp in dist_rec:
@@ -143,59 +405,220 @@ class IEC61850(iec61850.IEC61850_client):
                             dev_basename = os.path.basename(dev_path)
                             dev_dirname = os.path.dirname(dev_path)
                             
-                            # Local download path to .tmp directory
-                            local_path = os.path.join(local_tmp_dirname, dev_basename)
+                            # Local download path to staging directory
+                            local_path = os.path.join(group.path, dev_basename)
+                            
+                            # Skip file completely received in previous attempt
+                            resumed = group.completed(dev_path, dev_size, dev_timestamp, checksum) if dev_path not in prefetched else None
+                            if resumed is not None:
+                                checksums[dev_basename] = resumed
+                                logger.debug('Resumed: %s %s', dev_address, dev_path)
+                                continue
                             
                             # Polling timeout
-                            if download_count > 0:
+                            if download_count > 0 and dev_path not in prefetched:
                                 if poll_timeout > 0:
                                     logger.debug('Poll timeout: {} s'.format(poll_timeout))
                                 self._interrupt.wait(poll_timeout)
                             
-                            # Request timeout in miliseconds
-                            self.set_request_timeout(req_timeout * 1000)
-                            
                             # Check interrupt flag and exit if necesary
                             #if self._interrupt.is_set(): break
                             
-                            # Download disturbance record
-                            logger.debug('Started downloading: %s %s', dev_address, dev_path)
-                            self.get_file(dev_path, local_path)
-                            logger.debug('Downloaded: %s %s -> %s', dev_address, dev_path, local_path)
+                            # Probe device file (size, timestamp and first block) against content-addressed store
+                            # Note: First block is read from device only if stored file has the same size and timestamp
+                            probed = store is not None and store.enabled and int(dev_size) > PROBE_SIZE
+                            digest = None
+                            if probed and store.has_candidate(dev_size, dev_timestamp, checksum):
+                                head = self.get_file_head(dev_path, PROBE_SIZE)
+                                digest = store.lookup_probe(probe_key(dev_size, dev_timestamp, hashlib.sha256(head).hexdigest(), checksum), checksum)
+                            
+                            # Local file is linked to stored content (shared inode attributes are not changed)
+                            linked = digest is not None
+                                
+                            if digest is not None:
+                                # Link known content instead of downloading
+                                store.link(checksum, digest, local_path)
+                                local_size = int(dev_size)
+                                logger.debug('Linked from content store: %s %s -> %s', dev_address, dev_path, local_path)
+                            else:
+                                # Download disturbance record
+                                # Checksum is computed from received data while file is written
+                                # Note: File is downloaded again if received size differs from listed size
+                                for refetch in range(REFETCH_ATTEMPTS + 1):
+                                    if dev_path in prefetched:
+                                        local_size, hasher = prefetched.pop(dev_path)
+                                    else:
+                                        hasher = new_hasher(checksum)
+                                        logger.debug('Started downloading: %s %s', dev_address, dev_path)
+                                        local_size = self.get_file(dev_path, local_path, hasher=hasher, throttle=throttle)
+                                    logger.debug('Downloaded: %s %s -> %s', dev_address, dev_path, local_path)
+                                
+                                    # Note: Some devices list size 0 (size is not checked)
+                                    if not dev_size or local_size == int(dev_size):
+                                        break
+                            
+                                    logger.warning('Size mismatch %s %s: received %s B, listed %s B', dev_address, dev_path, local_size, dev_size)
+                                    os.remove(local_path)
+                                else:
+                                    # Truncated file is not finalized (record stays staged and it's downloaded again)
+                                    # Note: Next records are downloaded (record doesn't stop device download)
+                                    logger.error('Size mismatch after %s re-fetch attempts %s %s', REFETCH_ATTEMPTS, dev_address, dev_path)
+                                    incomplete = True
+                                    continue
+                                
+                                digest = hasher.hexdigest()
+                                
+                                # Count downloaded bytes
+                                if budget is not None:
+                                    budget.consume(local_size)
+                                
+                                # Remember probe of completely downloaded file
+                                # Note: First block is read from local file
+                                if probed and local_size == int(dev_size):
+                                    store.add_probe(probe_key(dev_size, dev_timestamp, head_digest(local_path), checksum), digest)
+                            
+                            checksums[dev_basename] = (dev_path, int(dev_size), local_size, digest)
                             
                             # Set local timestamp
-                            os.utime(local_path, (dev_timestamp, dev_timestamp))
+                            if not linked:
+                                os.utime(local_path, (dev_timestamp, dev_timestamp))
+                            
+                            # Mark file as completely received
+                            group.mark_done(dev_basename, checksums[dev_basename], dev_timestamp, checksum)
+                            
+                            # Count received bytes to backfill progress
+                            if backfill is not None:
+                                backfill.file_done(local_size)
                             
                             # Increase download count for poll request
                             download_count += 1
                         
-                        # Move downloaded files from .tmp to parent local directory
-                        # Read comtrade file and find trigger_time
-                        trigger_time = get_trigger_time(os.path.join(local_tmp_dirname, os.path.basename(dist_rec[0][0])), tz=local_tz)
+                        # Defer staged record to the next cycle
+                        if incomplete:
+                            mismatched += 1
+                            pending_recs.append(dist_rec)
+                            continue
+                        
+                        # Move downloaded files from staging directory to parent local directory
+                        # Read comtrade config header and find trigger_time
+                        cfg_path = os.path.join(group.path, os.path.basename(dist_rec[0][0]))
+                        header = read_cfg_header(cfg_path)
+                        trigger_time = get_trigger_time(cfg_path, tz=local_tz, header=header, pattern=vendor.trigger_pattern)
+                        
+                        # Representation of record (None if all record files are downloaded)
+                        variant = variants.get(group_key(dist_rec), (None,))[0]
                         
                         # Copy files with attributes (such as timestamp) and add date as filename prefix
-                        tmp_files = (f for f in os.listdir(local_tmp_dirname) if os.path.isfile(os.path.join(local_tmp_dirname, f)))
-                        for basename in tmp_files:
+                        local_files = []
+                        record_files = []
+                        for basename in checksums:
                             local_file = os.path.join(local_dirname, trigger_time + '_' + basename)
-                            local_tmp_file = os.path.join(local_tmp_dirname, basename)
-                            shutil.copy2(local_tmp_file, local_file)
+                            local_files.append(local_file)
+                            local_tmp_file = os.path.join(group.path, basename)
+                            
+                            # Remove previously downloaded file (device file changed)
+                            # Note: Local file may be hard link to content-addressed store
+                            if os.path.lexists(local_file):
+                                os.remove(local_file)
+                            
+                            # Staging file linked to content store is linked (data is not copied)
+                            if os.stat(local_tmp_file).st_nlink > 1:
+                                os.link(local_tmp_file, local_file)
+                            else:
+                                shutil.copy2(local_tmp_file, local_file)
+                            dev_path, dev_size, local_size, digest = checksums[basename]
+                            
+                            # Replace duplicate content with hard link to content-addressed store
+                            if store is not None and store.put(local_file, checksum, digest):
+                                logger.info('Deduplicated: %s', local_file)
+                            
+                            local_index.add(local_file)
+                            
+                            # Write checksum sidecar file and manifest entry
+                            local_index.add(write_sidecar(local_file, digest, checksum))
+                            manifest.add(os.path.basename(local_file), dev_path=dev_path, dev_size=dev_size, size=local_size, algorithm=checksum, digest=digest, variant=variant)
+                            record_files.append({'path': local_file, 'dev_path': dev_path, 'dev_size': dev_size, 'size': local_size, 'algorithm': checksum, 'digest': digest, 'variant': variant})
                             logger.info('Downloaded: %s %s -> %s', dev_address, basename, local_file)
                         
-                        # Delete .tmp directory with all files
-                        shutil.rmtree(local_tmp_dirname)
+                        # Expand selected ZIP or CFF file to CFG and DAT files (canonical layout)
+                        # Note: Expanded files are named after device CFG and DAT files which are not downloaded
+                        if selector is not None and selector.expand and variant in ('zip', 'cff'):
+                            targets = expand_targets(dev_recs[group_key(dist_rec)], os.path.join(local_dirname, trigger_time + '_'))
+                            try:
+                                expanded = expand(local_files[0], targets, checksum) if targets else []
+                            except (OSError, ValueError) as err:
+                                logger.warning('Not expanded %s: %s', local_files[0], err)
+                                expanded = []
+                            
+                            for expanded_file, expanded_size, digest in expanded:
+                                local_index.add(expanded_file)
+                                local_index.add(write_sidecar(expanded_file, digest, checksum))
+                                manifest.add(os.path.basename(expanded_file), size=expanded_size, algorithm=checksum, digest=digest, variant=variant, expanded_from=os.path.basename(local_files[0]))
+                                logger.info('Expanded: %s -> %s', local_files[0], expanded_file)
+                            local_files.extend(expanded_file for expanded_file, expanded_size, digest in expanded)
+                        
+                        # Add record to catalog
+                        if catalog is not None:
+                            catalog.add(local_files, header)
+                        
+                        # Convert record to columnar format in background
+                        if convert:
+                            get_converter().put(local_files, os.path.join(local_dirname, COLUMNAR_DIRNAME), convert)
+                        
+                        # Publish record finalized event
+                        if events is not None:
+                            events.publish(record_files, header)
+                        
+                        # Update backfill checkpoint and progress
+                        if backfill is not None:
+                            backfill.record_done(sum(local_size for dev_path, dev_size, local_size, digest in checksums.values()))
+                        
+                        # Delete record staging directory with all files
+                        group.remove()
+                        done_recs.append(dist_rec)
+                
+                if deferred:
+                    logger.info('Deferred %s records %s (budget exhausted)', deferred, dev_address)
+                
+                if unsettled:
+                    logger.info('Deferred %s records %s (record is being written)', unsettled, dev_address)
+                
+                if mismatched:
+                    logger.warning('Deferred %s records %s (size mismatch)', mismatched, dev_address)
+                
+                if backfill is not None:
+                    backfill.report(force=True)
                 
                 # Check interrupt flag and exit if necesary
                 if self._interrupt.is_set(): break
                 
+                # Move watermark to the newest downloaded record and save full listing check
+                if watermark is not None:
+                    watermark.advance(done_recs, pending_recs)
+                    if full:
+                        watermark.checked()
+                
                 # Compare list of local files with list of ied disturbance record files and search for differences
                 # Move local disturbance records which do not exist in IED anymore to archive directory
+                # Note: Files are moved by background archive worker
                 archive_path = os.path.join(local_dirname, 'archive')
-                for f in dir_list_diff(dev_file_list, local_dirname, dev_dir):
-                    os.makedirs(archive_path, mode=0o755, exist_ok=True)
-                    logger.debug('Moving to archive: %s', f)
-                    shutil.move(f, os.path.join(archive_path, os.path.basename(f)))
+                archive_worker = get_archive_worker()
+                # Note: Narrowed listing (continueAfter) doesn't contain older device files
+                if not continue_after:
+                    for f in dir_list_diff((f for dist_rec in dev_recs.values() for f in dist_rec), local_dirname, dev_dir, index=local_index, duplicates=vendor.duplicates):
+                        if archive_worker.put(f, archive_path, catalog):
+                            logger.debug('Queued for archive: %s', f)
+                
+                # Delete downloaded and verified records from device
+                # Note: Local files are archived in the next cycle
+                if cleanup is not None:
+                    cleaned = cleanup.run([dev_recs[group_key(dist_rec)] for dist_rec in dist_recs], self.del_file, local_index, manifest, self._interrupt,
+                                          downloaded=selector.files if selector is not None else None)
+                    if cleaned:
+                        logger.info('%s %s records from %s', 'Dry run, would delete' if cleanup.dry_run else 'Deleted', len(cleaned), dev_address)
                 
                 # Break the retry loop if code is executed without errors
+                success = True
                 break
             
             except ConnectionError as err:
@@ -236,3 +659,205 @@ class IEC61850(iec61850.IEC61850_client):
             # ConnectionError exception NOT CONNECTED will be raised
             pass
         logger.debug('Disconnected from %s:%s', dev_address, dev_port)
+        
+        return success
+
+
+class ReportClient(iec61850.IEC61850_client):
+    """
+    Report connection of disturbance recorder (RDRE RcdMade/FltNum reports)
+    
+    Separate connection to device which is kept open by report watcher
+    (drec.reports) while downloads use their own connections.
+    """
+    
+    def __init__(self, dev_address, dev_port=102, rcb=(), req_timeout=5):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        dev_address : str
+            IED IP address or hostname
+        dev_port : int
+            IED port. Default is 102
+        rcb : list of str
+            Report control block references
+        req_timeout : int
+            Request timeout in seconds. Default is 5 s
+        """
+        
+        # Initialize child class
+        super().__init__()
+        
+        self.dev_address = dev_address
+        self.dev_port = dev_port
+        self.rcb = list(rcb)
+        self.req_timeout = req_timeout
+        
+        self._enabled = []
+    
+    
+    def open(self, handler):
+        """
+        Connect to device and enable report control blocks
+        
+        Parameters
+        ----------
+        handler : callable
+            Report handler handler(rcb_reference, values)
+        
+        Returns
+        -------
+        client : ReportClient
+            Connected report client (report watcher session)
+        
+        Raises
+        ------
+        ConnectionError
+            Device is not connected or report control block is not enabled
+        """
+        
+        try:
+            self.set_request_timeout(self.req_timeout * 1000)
+            self.connect(self.dev_address, self.dev_port)
+            
+            for rcb in self.rcb:
+                members = self.enable_reporting(rcb, handler)
+                self._enabled.append(rcb)
+                logger.debug('Enabled report control block %s (%s)', rcb, ', '.join(members))
+        except:
+            self.close()
+            raise
+        
+        return self
+    
+    
+    def is_connected(self):
+        """
+        Return True if report connection is open
+        """
+        
+        return self.get_connection_state() == 'connected'
+    
+    
+    def close(self):
+        """
+        Disable report control blocks, close connection and release resources
+        """
+        
+        if self.is_connected():
+            for rcb in self._enabled:
+                try:
+                    self.disable_reporting(rcb)
+                except ConnectionError as err:
+                    logger.debug(err)
+        
+        self._enabled = []
+        
+        super().close()
+        self.destroy()
+
+
+def list_files(dev_address, dev_dir='COMTRADE', dev_port=102, con_timeout=10, req_timeout=5):
+    """
+    Return record files of device (MMS transport probe)
+    
+    Parameters
+    ----------
+    dev_address : str
+        IED IP address or hostname
+    dev_dir : str
+        IED directory for disturbance records. Default is COMTRADE
+    dev_port : int
+        IED port. Default is 102
+    con_timeout : int
+        Connection timeout in seconds. Default is 10 s
+    req_timeout : int
+        Request timeout in seconds. Default is 5 s
+    
+    Returns
+    -------
+    dev_file_list : list of tuples
+        Record files (dev_path, dev_size, dev_timestamp)
+    
+    Raises
+    ------
+    ConnectionError
+        if file directory is not read
+    """
+    
+    client = iec61850.IEC61850_client()
+    try:
+        client.set_connect_timeout(con_timeout * 1000)
+        client.set_request_timeout(req_timeout * 1000)
+        client.connect(dev_address, dev_port)
+        dev_file_list = client.get_file_directory()
+    finally:
+        client.close()
+        client.destroy()
+    
+    return [f for dist_rec in group_dev_file_list(tuple((name, size, t/1000) for name, size, t in dev_file_list), dev_dir) for f in dist_rec]
+
+
+def measure_transport(dev_address, files, dev_port=102, con_timeout=10, req_timeout=5, max_pdu_size=0, max_outstanding=0, pipeline=1):
+    """
+    Measure download throughput of MMS transport settings
+    
+    Files are downloaded to temporary directory over new association with
+    proposed max PDU size and max outstanding requests.
+    
+    Parameters
+    ----------
+    dev_address : str
+        IED IP address or hostname
+    files : list of tuples
+        Device files (dev_path, dev_size, dev_timestamp)
+    dev_port : int
+        IED port. Default is 102
+    con_timeout : int
+        Connection timeout in seconds. Default is 10 s
+    req_timeout : int
+        Request timeout in seconds. Default is 5 s
+    max_pdu_size : int
+        Max PDU size in bytes proposed to IED. Default 0 (library default)
+    max_outstanding : int
+        Max outstanding requests proposed to IED. Default 0 (library
+        default)
+    pipeline : int
+        Number of files read at the same time. Default 1
+    
+    Returns
+    -------
+    size : int
+        Number of received bytes
+    seconds : float
+        Download time in seconds (without association)
+    
+    Raises
+    ------
+    ConnectionError
+        if connection fails or file is not retrived from the IED
+    """
+    
+    client = IEC61850(None)
+    try:
+        client.set_transport(con_timeout, req_timeout, {'max_pdu_size': max_pdu_size, 'max_outstanding': max_outstanding})
+        client.connect(dev_address, dev_port)
+        logger.debug('Probe association %s:%s: max PDU size %s, max outstanding %s',
+                     dev_address, dev_port, client.get_max_pdu_size(), client.get_max_outstanding())
+        
+        with tempfile.TemporaryDirectory() as tmp_dirname:
+            fetch = [(dev_path, os.path.join(tmp_dirname, os.path.basename(dev_path)), None) for dev_path, dev_size, dev_timestamp in files]
+            
+            started = time.monotonic()
+            if pipeline == 1:
+                size = sum(client.get_file(*f) for f in fetch)
+            else:
+                size = sum(client.get_files(fetch, pipeline))
+            seconds = time.monotonic() - started
+    finally:
+        client.close()
+        client.destroy()
+    
+    return size, seconds
@@ -1,6 +1,6 @@
 from linked_list cimport *
 
-from libc.stdint cimport uint8_t, uint32_t, uint64_t
+from libc.stdint cimport uint8_t, int32_t, uint32_t, int64_t, uint64_t
 from libcpp cimport bool
 
 
@@ -92,6 +92,32 @@ cdef extern from "iec61850_client.h":
     ctypedef void (*IedConnection_GenericServiceHandler) (uint32_t invokeId, void* parameter, IedClientError err)
     
     
+    ###########################################################################
+    # MMS connection parameters (negotiated at association)
+    ###########################################################################
+    
+    ctypedef struct sMmsConnection:
+        pass
+    
+    ctypedef sMmsConnection* MmsConnection
+    
+    ctypedef struct MmsConnectionParameters:
+        int maxServOutstandingCalling
+        int maxServOutstandingCalled
+        int dataStructureNestingLevel
+        int maxPduSize
+    
+    MmsConnectionParameters MmsConnection_getMmsConnectionParameters(MmsConnection self)
+    
+    # Local detail is proposed max PDU size (has to be set before connect)
+    void MmsConnection_setLocalDetail(MmsConnection self, int32_t localDetail)
+    
+    int32_t MmsConnection_getLocalDetail(MmsConnection self)
+    
+    # Proposed max outstanding calls (has to be set before connect)
+    void MmsConnection_setMaxOutstandingCalls(MmsConnection self, int calling, int called)
+    
+    
     ###########################################################################
     # Association service
     ###########################################################################
@@ -122,7 +148,7 @@ cdef extern from "iec61850_client.h":
     
     # IedConnection_installStateChangedHandler(IedConnection self, IedConnection_StateChangedHandler handler, void* parameter)
     
-    # MmsConnection IedConnection_getMmsConnection(IedConnection self)
+    MmsConnection IedConnection_getMmsConnection(IedConnection self)
     
     
     ###########################################################################
@@ -144,7 +170,7 @@ cdef extern from "iec61850_client.h":
     
     LinkedList IedConnection_getFileDirectory(IedConnection self, IedClientError* error, const char* directoryName)
     
-    # LinkedList IedConnection_getFileDirectoryEx(IedConnection self, IedClientError* error, const char* directoryName, const char* continueAfter, bool* moreFollows)
+    LinkedList IedConnection_getFileDirectoryEx(IedConnection self, IedClientError* error, const char* directoryName, const char* continueAfter, bool* moreFollows)
     
     # ctypedef bool (*IedConnection_FileDirectoryEntryHandler) (uint32_t invokeId, void* parameter, IedClientError err, char* filename, uint32_t size, uint64_t lastModfified, bool moreFollows)
     
@@ -154,9 +180,9 @@ cdef extern from "iec61850_client.h":
     
     uint32_t IedConnection_getFile(IedConnection self, IedClientError* error, const char* fileName, IedClientGetFileHandler handler, void* handlerParameter)
     
-    # ctypedef bool (*IedConnection_GetFileAsyncHandler) (uint32_t invokeId, void* parameter, IedClientError err, uint32_t originalInvokeId, uint8_t* buffer, uint32_t bytesRead, bool moreFollows)
+    ctypedef bool (*IedConnection_GetFileAsyncHandler) (uint32_t invokeId, void* parameter, IedClientError err, uint32_t originalInvokeId, uint8_t* buffer, uint32_t bytesRead, bool moreFollows)
     
-    # uint32_t IedConnection_getFileAsync(IedConnection self, IedClientError* error, const char* fileName, IedConnection_GetFileAsyncHandler handler, void* parameter)
+    uint32_t IedConnection_getFileAsync(IedConnection self, IedClientError* error, const char* fileName, IedConnection_GetFileAsyncHandler handler, void* parameter) nogil
     
     void IedConnection_setFilestoreBasepath(IedConnection self, const char* basepath)
     
@@ -167,3 +193,106 @@ cdef extern from "iec61850_client.h":
     void IedConnection_deleteFile(IedConnection self, IedClientError* error, const char* fileName)
     
     # uint32_t IedConnection_deleteFileAsync(IedConnection self, IedClientError* error, const char* fileName, IedConnection_GenericServiceHandler handler, void* parameter)
+    
+    
+    ###########################################################################
+    # MMS data values (data set members of reports)
+    ###########################################################################
+    
+    ctypedef enum MmsType:
+        MMS_ARRAY = 0,
+        MMS_STRUCTURE,
+        MMS_BOOLEAN,
+        MMS_BIT_STRING,
+        MMS_INTEGER,
+        MMS_UNSIGNED,
+        MMS_FLOAT,
+        MMS_OCTET_STRING,
+        MMS_VISIBLE_STRING,
+        MMS_GENERALIZED_TIME,
+        MMS_BINARY_TIME,
+        MMS_BCD,
+        MMS_OBJ_ID,
+        MMS_STRING,
+        MMS_UTC_TIME,
+        MMS_DATA_ACCESS_ERROR
+    
+    ctypedef struct MmsValue:
+        pass
+    
+    MmsType MmsValue_getType(const MmsValue* self)
+    
+    uint32_t MmsValue_getArraySize(const MmsValue* self)
+    
+    MmsValue* MmsValue_getElement(const MmsValue* array, int index)
+    
+    bool MmsValue_getBoolean(const MmsValue* value)
+    
+    int64_t MmsValue_toInt64(const MmsValue* self)
+    
+    uint32_t MmsValue_toUint32(const MmsValue* value)
+    
+    float MmsValue_toFloat(const MmsValue* self)
+    
+    uint32_t MmsValue_getBitStringAsInteger(const MmsValue* self)
+    
+    const char* MmsValue_toString(MmsValue* self)
+    
+    uint64_t MmsValue_getUtcTimeInMs(const MmsValue* value)
+    
+    
+    ###########################################################################
+    # Reporting services
+    ###########################################################################
+    
+    ctypedef struct sClientReportControlBlock:
+        pass
+    
+    ctypedef sClientReportControlBlock* ClientReportControlBlock
+    
+    ctypedef struct sClientReport:
+        pass
+    
+    ctypedef sClientReport* ClientReport
+    
+    ctypedef enum ReasonForInclusion:
+        IEC61850_REASON_NOT_INCLUDED = 0,
+        IEC61850_REASON_DATA_CHANGE = 1,
+        IEC61850_REASON_QUALITY_CHANGE = 2,
+        IEC61850_REASON_DATA_UPDATE = 4,
+        IEC61850_REASON_INTEGRITY = 8,
+        IEC61850_REASON_GI = 16,
+        IEC61850_REASON_UNKNOWN = 32
+    
+    # Report control block elements (parametersMask of IedConnection_setRCBValues)
+    enum:
+        RCB_ELEMENT_RPT_ENA
+        RCB_ELEMENT_GI
+    
+    ctypedef void (*ReportCallbackFunction) (void* parameter, ClientReport report)
+    
+    ClientReportControlBlock IedConnection_getRCBValues(IedConnection self, IedClientError* error, const char* rcbReference, ClientReportControlBlock updateRcb)
+    
+    void IedConnection_setRCBValues(IedConnection self, IedClientError* error, ClientReportControlBlock rcb, uint32_t parametersMask, bool singleRequest)
+    
+    void IedConnection_installReportHandler(IedConnection self, const char* rcbReference, const char* rptId, ReportCallbackFunction handler, void* handlerParameter)
+    
+    void IedConnection_uninstallReportHandler(IedConnection self, const char* rcbReference)
+    
+    void ClientReportControlBlock_destroy(ClientReportControlBlock self)
+    
+    const char* ClientReportControlBlock_getRptId(ClientReportControlBlock self)
+    
+    const char* ClientReportControlBlock_getDataSetReference(ClientReportControlBlock self)
+    
+    void ClientReportControlBlock_setRptEna(ClientReportControlBlock self, bool rptEna)
+    
+    void ClientReportControlBlock_setGI(ClientReportControlBlock self, bool gi)
+    
+    const char* ClientReport_getRcbReference(ClientReport self)
+    
+    MmsValue* ClientReport_getDataSetValues(ClientReport self)
+    
+    ReasonForInclusion ClientReport_getReasonForInclusion(ClientReport self, int elementIndex)
+    
+    LinkedList IedConnection_getDataSetDirectory(IedConnection self, IedClientError* error, const char* dataSetReference, bool* isDeletable)
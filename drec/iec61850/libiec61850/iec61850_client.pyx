@@ -6,6 +6,8 @@ from libcpp cimport bool
 from cpython cimport int as py_int
 
 import os
+import threading
+from time import monotonic
 from enum import Enum
 
 
@@ -142,6 +144,28 @@ class IedClientError(Enum):
 # Debug flag - print statements
 DEBUG = 0
 
+# Interval in seconds for checking outstanding file reads
+WAIT_INTERVAL = 0.5
+
+
+cdef class _FileWriter:
+    """
+    Download handler parameter
+    
+    Holds local file pointer, optional hash object, optional bandwidth
+    throttle and number of received bytes. Checksum is updated from the
+    received buffer while file is written (local file is not read again).
+    If local file pointer is NULL data is collected in memory and download
+    is stopped after limit bytes.
+    """
+    
+    cdef FILE* fp
+    cdef object hasher
+    cdef object throttle
+    cdef uint64_t size
+    cdef uint64_t limit
+    cdef bytearray data
+
 
 # add noexcept on the end of line bellow in Cython 3.x.x version
 # cdef bool __downloadHandler(void* parameter, uint8_t* buffer, uint32_t bytesRead) noexcept:
@@ -152,7 +176,7 @@ cdef bool __downloadHandler(void* parameter, uint8_t* buffer, uint32_t bytesRead
     Parameters
     ----------
     parameter : void *
-        Pointer to 
+        Pointer to _FileWriter object
     buffer : uint8_t
     bytesRead : uint32_t
     
@@ -167,24 +191,191 @@ cdef bool __downloadHandler(void* parameter, uint8_t* buffer, uint32_t bytesRead
         if failed to write local file
     """
     
-    cdef FILE* fp = <FILE*> parameter
+    cdef _FileWriter writer = <_FileWriter> parameter
     if DEBUG:
         print('Received {} bytes'.format(bytesRead))
     
     if bytesRead > 0:
-        if fwrite(buffer, bytesRead, 1, fp) != 1:
+        if writer.fp is NULL:
+            writer.data += buffer[:bytesRead]
+        elif fwrite(buffer, bytesRead, 1, writer.fp) != 1:
             if DEBUG:
                 print('Failed to write local file')
             return False
+        
+        if writer.hasher is not None:
+            writer.hasher.update(buffer[:bytesRead])
+        
+        writer.size += bytesRead
+        
+        # Note: Next block is not requested until block is allowed by throttle
+        if writer.throttle is not None:
+            writer.throttle.consume(bytesRead)
+    
+    # Stop download after limit bytes
+    if writer.limit and writer.size >= writer.limit:
+        return False
+    
+    return True
+
+
+cdef class _AsyncFileWriter(_FileWriter):
+    """
+    Asynchronous download handler parameter
+    
+    File writer of one outstanding file read. Finished flag and error code
+    are set under condition lock when file read is finished.
+    """
+    
+    cdef object cond
+    cdef bool finished
+    cdef iec61850_client.IedClientError error
+
+
+# add noexcept on the end of line bellow in Cython 3.x.x version
+# cdef bool __getFileAsyncHandler(uint32_t invokeId, void* parameter, iec61850_client.IedClientError err, uint32_t originalInvokeId, uint8_t* buffer, uint32_t bytesRead, bool moreFollows) noexcept with gil:
+cdef bool __getFileAsyncHandler(uint32_t invokeId, void* parameter, iec61850_client.IedClientError err, uint32_t originalInvokeId, uint8_t* buffer, uint32_t bytesRead, bool moreFollows) with gil:
+    """
+    Asynchronous download handler method
+    
+    Called from libIEC61850 connection thread for every received file
+    block. Local file is closed when file read is finished or failed.
+    
+    Parameters
+    ----------
+    invokeId : uint32_t
+    parameter : void *
+        Pointer to _AsyncFileWriter object
+    err : IedClientError
+    originalInvokeId : uint32_t
+    buffer : uint8_t
+    bytesRead : uint32_t
+    moreFollows : bool
+    
+    Returns
+    -------
+    status : bool
+        True if file read continues
+    """
+    
+    cdef _AsyncFileWriter writer = <_AsyncFileWriter> parameter
+    cdef bool ok = True
+    
+    if writer.finished:
+        return False
+    
+    if err == IED_ERROR_OK:
+        ok = __downloadHandler(parameter, buffer, bytesRead)
+    
+    if err != IED_ERROR_OK or not ok or not moreFollows:
+        if writer.fp is not NULL:
+            fclose(writer.fp)
+            writer.fp = NULL
+        
+        with writer.cond:
+            writer.error = err if err != IED_ERROR_OK else (IED_ERROR_OK if ok else IED_ERROR_UNKNOWN)
+            writer.finished = True
+            writer.cond.notify_all()
+        
+        return False
     
     return True
 
 
+cdef class _ReportSubscription:
+    """
+    Report handler parameter
+    
+    Holds report control block reference, report ID, data set member
+    references and Python report handler called with received values.
+    """
+    
+    cdef str rcb
+    cdef bytes rpt_id
+    cdef list members
+    cdef object handler
+
+
+cdef object __mmsValue(iec61850_client.MmsValue* value):
+    """
+    Convert MMS value to Python value
+    
+    Structures and arrays are converted to lists, bit strings (quality) to
+    int, UTC time to timestamp in miliseconds. Unsupported types are None.
+    """
+    
+    cdef iec61850_client.MmsType mms_type
+    cdef uint32_t i
+    
+    if value is NULL:
+        return None
+    
+    mms_type = iec61850_client.MmsValue_getType(value)
+    
+    if mms_type == iec61850_client.MMS_ARRAY or mms_type == iec61850_client.MMS_STRUCTURE:
+        return [__mmsValue(iec61850_client.MmsValue_getElement(value, i)) for i in range(iec61850_client.MmsValue_getArraySize(value))]
+    if mms_type == iec61850_client.MMS_BOOLEAN:
+        return iec61850_client.MmsValue_getBoolean(value)
+    if mms_type == iec61850_client.MMS_INTEGER:
+        return iec61850_client.MmsValue_toInt64(value)
+    if mms_type == iec61850_client.MMS_UNSIGNED:
+        return iec61850_client.MmsValue_toUint32(value)
+    if mms_type == iec61850_client.MMS_FLOAT:
+        return iec61850_client.MmsValue_toFloat(value)
+    if mms_type == iec61850_client.MMS_BIT_STRING:
+        return iec61850_client.MmsValue_getBitStringAsInteger(value)
+    if mms_type == iec61850_client.MMS_VISIBLE_STRING or mms_type == iec61850_client.MMS_STRING:
+        return iec61850_client.MmsValue_toString(value).decode(errors='replace')
+    if mms_type == iec61850_client.MMS_UTC_TIME:
+        return iec61850_client.MmsValue_getUtcTimeInMs(value)
+    
+    return None
+
+
+# add noexcept on the end of line bellow in Cython 3.x.x version
+# cdef void __reportHandler(void* parameter, iec61850_client.ClientReport report) noexcept with gil:
+cdef void __reportHandler(void* parameter, iec61850_client.ClientReport report) with gil:
+    """
+    Report handler method
+    
+    Called from libIEC61850 connection thread for every received report.
+    Values of data set members included in report are passed to Python
+    report handler as dictionary {member reference: value}.
+    
+    Parameters
+    ----------
+    parameter : void *
+        Pointer to _ReportSubscription object
+    report : ClientReport
+    """
+    
+    cdef _ReportSubscription subscription = <_ReportSubscription> parameter
+    cdef iec61850_client.MmsValue* dataSetValues = iec61850_client.ClientReport_getDataSetValues(report)
+    cdef dict values = {}
+    cdef uint32_t i
+    
+    if dataSetValues is not NULL:
+        for i in range(iec61850_client.MmsValue_getArraySize(dataSetValues)):
+            if iec61850_client.ClientReport_getReasonForInclusion(report, i) == iec61850_client.IEC61850_REASON_NOT_INCLUDED:
+                continue
+            member = subscription.members[i] if i < len(subscription.members) else str(i)
+            values[member] = __mmsValue(iec61850_client.MmsValue_getElement(dataSetValues, i))
+    
+    # Exceptions can't be propagated to libIEC61850 thread
+    try:
+        subscription.handler(subscription.rcb, values)
+    except Exception as err:
+        if DEBUG:
+            print('Report handler error: {}'.format(err))
+
+
 cdef class IEC61850_client:
     cdef iec61850_client.IedConnection con
     cdef iec61850_client.IedClientError error
     cdef bytes hostname
     cdef int tcpPort
+    cdef dict reports
+    cdef list orphans
     
     
     def __init__(self):
@@ -192,6 +383,8 @@ cdef class IEC61850_client:
         Initialization method
         """
         
+        self.reports = {}
+        self.orphans = []
         self.create()
     
     
@@ -405,20 +598,28 @@ cdef class IEC61850_client:
         return IED_CONNECTION_STATE[self.get_state()]
     
     
-    def get_file_directory(self, str file_name=''):
+    cdef tuple _get_file_directory_page(self, bytes filename, bytes after, accept):
         """
-        Returns the directory entries of the specified file directory
+        Returns one page of directory entries (one MMS FileDirectory response)
         
         Parameters
         ----------
-        file_name : str
-            Specified file or directory.
-            Default: '' (NONE) - root directory
+        filename : bytes
+            Specified file or directory
+        after : bytes
+            List only entries after specified file (MMS continueAfter).
+            Empty - first page
+        accept : callable
+            Called with file path. Entries which are not accepted are not
+            returned
         
         Returns
         -------
-        file_list : list of tuples
-            List of files (path, size, timestamp)
+        page : tuple
+            (file_list, last, more_follows) where file_list is list of files
+            (path, size, timestamp), last is path of last received entry
+            (None if server sent no entry) and more_follows is True if server
+            has more entries
         
         Raises
         ------
@@ -430,39 +631,123 @@ cdef class IEC61850_client:
         cdef iec61850_client.LinkedList rootDirectory
         cdef iec61850_client.LinkedList directoryEntry
         cdef iec61850_client.FileDirectoryEntry entry
-        cdef bytes filename = file_name.encode()
+        cdef bool more_follows = False
         cdef str path
+        cdef str last = None
         cdef py_int size
         cdef py_int timestamp
         cdef list file_list = []
         
-        rootDirectory = iec61850_client.IedConnection_getFileDirectory(self.con, &error, filename)
+        if after:
+            rootDirectory = iec61850_client.IedConnection_getFileDirectoryEx(self.con, &error, filename, after, &more_follows)
+        else:
+            rootDirectory = iec61850_client.IedConnection_getFileDirectoryEx(self.con, &error, filename, NULL, &more_follows)
         
         if error != IED_ERROR_OK:
             raise ConnectionError('Error retrieving file directory: {} (code {})'.format(
                 IED_CLIENT_ERROR[error].upper(),
                 error))
-        else:
-            directoryEntry = iec61850_client.LinkedList_getNext(rootDirectory)
+        
+        directoryEntry = iec61850_client.LinkedList_getNext(rootDirectory)
+        
+        while directoryEntry is not NULL:
+            entry = <iec61850_client.FileDirectoryEntry> directoryEntry.data
             
-            while directoryEntry is not NULL:
-                entry = <iec61850_client.FileDirectoryEntry> directoryEntry.data
-                
-                path = iec61850_client.FileDirectoryEntry_getFileName(entry).decode()
-                size = iec61850_client.FileDirectoryEntry_getFileSize(entry)
-                timestamp = iec61850_client.FileDirectoryEntry_getLastModified(entry)
+            path = iec61850_client.FileDirectoryEntry_getFileName(entry).decode()
+            size = iec61850_client.FileDirectoryEntry_getFileSize(entry)
+            timestamp = iec61850_client.FileDirectoryEntry_getLastModified(entry)
+            if accept is None or accept(path):
                 file_list.append((path, size, timestamp))
-                if DEBUG:
-                    print('%s %i %i' % (path, size, timestamp))
-                
-                directoryEntry = iec61850_client.LinkedList_getNext(directoryEntry)
+            if DEBUG:
+                print('%s %i %i' % (path, size, timestamp))
+            
+            # Next request continues after last received entry
+            last = path
             
-            iec61850_client.LinkedList_destroyDeep(rootDirectory, <iec61850_client.LinkedListValueDeleteFunction> iec61850_client.FileDirectoryEntry_destroy)
+            directoryEntry = iec61850_client.LinkedList_getNext(directoryEntry)
+        
+        iec61850_client.LinkedList_destroyDeep(rootDirectory, <iec61850_client.LinkedListValueDeleteFunction> iec61850_client.FileDirectoryEntry_destroy)
+        
+        return (file_list, last, more_follows)
+    
+    
+    def iter_file_directory(self, str file_name='', str continue_after='', accept=None):
+        """
+        Yields the directory entries of the specified file directory
+        
+        Directory is read one MMS FileDirectory response after another
+        (moreFollows and continueAfter), so only one response is held in
+        memory. Connection must not be used for other requests until the
+        generator is exhausted.
+        
+        Parameters
+        ----------
+        file_name : str
+            Specified file or directory.
+            Default: '' (NONE) - root directory
+        continue_after : str
+            List only entries after specified file (MMS continueAfter).
+            Default: '' - all entries
+        accept : callable
+            Called with file path. Entries which are not accepted are not
+            listed. Default: None - all entries
+        
+        Yields
+        ------
+        entry : tuple
+            File (path, size, timestamp)
+        
+        Raises
+        ------
+        ConnectionError
+            Error retriving file directory from IED
+        """
         
-        return file_list
+        filename = file_name.encode()
+        after = continue_after.encode()
+        more_follows = True
+        
+        while more_follows:
+            file_list, last, more_follows = self._get_file_directory_page(filename, after, accept)
+            yield from file_list
+            
+            # Stop if server reports more entries but sends none
+            if last is None:
+                break
+            after = last.encode()
     
     
-    def get_file(self, str ied_file_name, str local_file_name=''):
+    def get_file_directory(self, str file_name='', str continue_after='', accept=None):
+        """
+        Returns the directory entries of the specified file directory
+        
+        Parameters
+        ----------
+        file_name : str
+            Specified file or directory.
+            Default: '' (NONE) - root directory
+        continue_after : str
+            List only entries after specified file (MMS continueAfter).
+            Default: '' - all entries
+        accept : callable
+            Called with file path. Entries which are not accepted are not
+            listed. Default: None - all entries
+        
+        Returns
+        -------
+        file_list : list of tuples
+            List of files (path, size, timestamp)
+        
+        Raises
+        ------
+        ConnectionError
+            Error retriving file directory from IED
+        """
+        
+        return list(self.iter_file_directory(file_name, continue_after, accept))
+    
+    
+    def get_file(self, str ied_file_name, str local_file_name='', hasher=None, throttle=None):
         """
         Download the file from the server
         
@@ -473,6 +758,16 @@ cdef class IEC61850_client:
         local_file_name : str
             Local file path (dirname + hostname).
             Defaults to IED hostname if local_file_name parameter is not set.
+        hasher : hash object
+            Hash object (hashlib) updated with received data. Default None
+        throttle : Throttle
+            Bandwidth throttle (drec.common) consumed per received block.
+            Default None (unlimited)
+        
+        Returns
+        -------
+        size : int
+            Number of received bytes
         
         Raises
         ------
@@ -485,7 +780,7 @@ cdef class IEC61850_client:
         cdef iec61850_client.IedClientError error
         cdef bytes iedFileName = ied_file_name.encode()
         cdef bytes localFileName = b''
-        cdef FILE* fp
+        cdef _FileWriter writer = _FileWriter()
         
         # Create local file name
         if local_file_name:
@@ -502,11 +797,17 @@ cdef class IEC61850_client:
         
         # Create C pointer to local file and open file
         localFileName += local_file.encode()
-        fp = fopen(localFileName, 'w')
+        writer.fp = fopen(localFileName, 'w')
+        writer.hasher = hasher
+        writer.throttle = throttle
+        writer.size = 0
+        writer.limit = 0
         
-        if fp is not NULL:
+        if writer.fp is not NULL:
             # Download a file from the server
-            iec61850_client.IedConnection_getFile(self.con, &error, iedFileName, __downloadHandler, <void*> fp)
+            iec61850_client.IedConnection_getFile(self.con, &error, iedFileName, __downloadHandler, <void*> writer)
+            
+            fclose(writer.fp)
             
             if error != IED_ERROR_OK:
                 raise ConnectionError('Failed to get file {} from IED. {} (code {})'.format(
@@ -514,11 +815,263 @@ cdef class IEC61850_client:
                     IED_CLIENT_ERROR[error].upper(),
                     error))
             
-            fclose(fp)
+            return writer.size
         else:
             raise IOError('Failed to open local file {}'.format(local_file))
     
     
+    def get_file_head(self, str ied_file_name, uint64_t size):
+        """
+        Download first bytes of the file from the server
+        
+        Download is stopped after size bytes are received.
+        
+        Parameters
+        ----------
+        ied_file_name : str
+            IED file path (dirname + hostname)
+        size : int
+            Number of bytes
+        
+        Returns
+        -------
+        data : bytes
+            First bytes of the file
+        
+        Raises
+        ------
+        ConnectionError
+            if file is not retrived from the IED
+        """
+        
+        cdef iec61850_client.IedClientError error
+        cdef bytes iedFileName = ied_file_name.encode()
+        cdef _FileWriter writer = _FileWriter()
+        
+        writer.fp = NULL
+        writer.hasher = None
+        writer.throttle = None
+        writer.size = 0
+        writer.limit = size
+        writer.data = bytearray()
+        
+        # Download a file from the server
+        iec61850_client.IedConnection_getFile(self.con, &error, iedFileName, __downloadHandler, <void*> writer)
+        
+        # Download stopped by handler is reported as error
+        if error != IED_ERROR_OK and writer.size < size:
+            raise ConnectionError('Failed to get file {} from IED. {} (code {})'.format(
+                ied_file_name,
+                IED_CLIENT_ERROR[error].upper(),
+                error))
+        
+        return bytes(writer.data[:size])
+    
+    
+    def set_max_pdu_size(self, int size):
+        """
+        Set max MMS PDU size proposed to IED
+        
+        NOTE: This method has to be called before connect method is called.
+        IED can negotiate smaller PDU size.
+        
+        Parameters
+        ----------
+        size : int
+            Max PDU size in bytes
+        """
+        
+        iec61850_client.MmsConnection_setLocalDetail(iec61850_client.IedConnection_getMmsConnection(self.con), size)
+    
+    
+    def get_max_pdu_size(self):
+        """
+        Return max MMS PDU size
+        
+        Returns
+        -------
+        size : int
+            Max PDU size negotiated with IED or proposed max PDU size if not
+            connected
+        """
+        
+        if self.get_state() != IED_STATE_CONNECTED:
+            return iec61850_client.MmsConnection_getLocalDetail(iec61850_client.IedConnection_getMmsConnection(self.con))
+        
+        return iec61850_client.MmsConnection_getMmsConnectionParameters(
+            iec61850_client.IedConnection_getMmsConnection(self.con)).maxPduSize
+    
+    
+    def set_max_outstanding(self, int calling, int called=0):
+        """
+        Set max number of outstanding requests proposed to IED
+        
+        NOTE: This method has to be called before connect method is called.
+        IED can negotiate smaller limit.
+        
+        Parameters
+        ----------
+        calling : int
+            Max outstanding requests of client (MMS maxServOutstandingCalling)
+        called : int
+            Max outstanding requests of IED (MMS maxServOutstandingCalled).
+            Default 0 (same as calling)
+        """
+        
+        iec61850_client.MmsConnection_setMaxOutstandingCalls(iec61850_client.IedConnection_getMmsConnection(self.con), calling, called or calling)
+    
+    
+    def get_max_outstanding(self):
+        """
+        Return max number of outstanding requests negotiated with IED
+        
+        Returns
+        -------
+        max_outstanding : int
+            Max outstanding requests of client (MMS maxServOutstandingCalling)
+            or 0 if not connected
+        """
+        
+        if self.get_state() != IED_STATE_CONNECTED:
+            return 0
+        
+        return iec61850_client.MmsConnection_getMmsConnectionParameters(
+            iec61850_client.IedConnection_getMmsConnection(self.con)).maxServOutstandingCalling
+    
+    
+    def get_files(self, list files, int max_outstanding=0, throttle=None):
+        """
+        Download files from the server with outstanding reads on one
+        association
+        
+        Up to max_outstanding files (capped at IED negotiated limit) are read
+        at the same time, so throughput is not bound by round trip time of
+        FileOpen/FileRead/FileClose requests. No new read is started after
+        first failed read; outstanding reads are finished before error is
+        raised.
+        
+        Parameters
+        ----------
+        files : list of tuples
+            Files (ied_file_name, local_file_name, hasher). Hash object
+            (hashlib) is updated with received data, can be None
+        max_outstanding : int
+            Max number of files read at the same time. Default 0 (IED
+            negotiated limit)
+        throttle : Throttle
+            Bandwidth throttle (drec.common) consumed per received block
+            (shared by outstanding reads). Default None (unlimited)
+        
+        Returns
+        -------
+        sizes : list of int
+            Number of received bytes per file
+        
+        Raises
+        ------
+        ConnectionError
+            if file is not retrived from the IED
+        IOError
+            if local file can't be created or opened
+        """
+        
+        cdef iec61850_client.IedClientError error = IED_ERROR_OK
+        cdef _AsyncFileWriter writer
+        cdef bytes iedFileName
+        cdef bytes localFileName
+        cdef const char* c_iedFileName
+        cdef int limit = self.get_max_outstanding()
+        cdef list writers = []
+        cdef list names = []
+        cdef int index = 0
+        
+        if max_outstanding > 0 and (limit <= 0 or max_outstanding < limit):
+            limit = max_outstanding
+        limit = max(limit, 1)
+        
+        cond = threading.Condition()
+        failed = None
+        progress = monotonic()
+        received = 0
+        timeout = self.get_request_timeout() / 1000 * 2
+        
+        while True:
+            # Start file reads up to outstanding limit
+            while failed is None and index < len(files) and sum(1 for w in writers if not (<_AsyncFileWriter> w).finished) < limit:
+                ied_file_name, local_file_name, hasher = files[index]
+                index += 1
+                
+                try:
+                    with open(local_file_name, 'x') as f:
+                        pass
+                except:
+                    failed = IOError('Failed to create local file {}'.format(local_file_name))
+                    break
+                
+                writer = _AsyncFileWriter()
+                writer.cond = cond
+                writer.finished = False
+                writer.error = IED_ERROR_OK
+                writer.hasher = hasher
+                writer.throttle = throttle
+                writer.size = 0
+                writer.limit = 0
+                localFileName = local_file_name.encode()
+                writer.fp = fopen(localFileName, 'w')
+                
+                if writer.fp is NULL:
+                    failed = IOError('Failed to open local file {}'.format(local_file_name))
+                    break
+                
+                iedFileName = ied_file_name.encode()
+                c_iedFileName = iedFileName
+                names.append(ied_file_name)
+                writers.append(writer)
+                
+                with nogil:
+                    iec61850_client.IedConnection_getFileAsync(self.con, &error, c_iedFileName, __getFileAsyncHandler, <void*> writer)
+                
+                if error != IED_ERROR_OK:
+                    fclose(writer.fp)
+                    writer.fp = NULL
+                    writer.finished = True
+                    writer.error = error
+            
+            # Wait for finished file reads
+            with cond:
+                for i, w in enumerate(writers):
+                    if failed is None and (<_AsyncFileWriter> w).finished and (<_AsyncFileWriter> w).error != IED_ERROR_OK:
+                        failed = ConnectionError('Failed to get file {} from IED. {} (code {})'.format(
+                            names[i],
+                            IED_CLIENT_ERROR[(<_AsyncFileWriter> w).error].upper(),
+                            (<_AsyncFileWriter> w).error))
+                
+                active = [w for w in writers if not (<_AsyncFileWriter> w).finished]
+                if not active and (failed is not None or index >= len(files)):
+                    break
+                
+                if active:
+                    cond.wait(WAIT_INTERVAL)
+            
+            # Give up outstanding reads without progress (connection lost)
+            # Note: Writers are kept referenced, handler may still be called
+            total = sum((<_AsyncFileWriter> w).size for w in writers)
+            if total != received:
+                received, progress = total, monotonic()
+            elif active and monotonic() - progress > timeout:
+                self.orphans.extend(w for w in writers if not (<_AsyncFileWriter> w).finished)
+                if failed is None:
+                    failed = ConnectionError('Failed to get files from IED. {} (code {})'.format(
+                        IED_CLIENT_ERROR[IED_ERROR_TIMEOUT].upper(),
+                        IED_ERROR_TIMEOUT))
+                break
+        
+        if failed is not None:
+            raise failed
+        
+        return [(<_AsyncFileWriter> w).size for w in writers]
+    
+    
     def del_file(self, str file_name):
         """
         Delete the file from the server
@@ -596,3 +1149,174 @@ cdef class IEC61850_client:
                 src_file_name,
                 IED_CLIENT_ERROR[error].upper(),
                 error))
+    
+    
+    def get_data_set_directory(self, str data_set_reference):
+        """
+        Return member references of data set
+        
+        Parameters
+        ----------
+        data_set_reference : str
+            Data set object reference (LD/LN.DataSet or LD/LN$DataSet)
+        
+        Returns
+        -------
+        members : list of str
+            Data set member references with functional constraint
+            (LD/LN.DO.DA[FC])
+        
+        Raises
+        ------
+        ConnectionError
+            Error retriving data set directory from IED
+        """
+        
+        cdef iec61850_client.IedClientError error
+        cdef iec61850_client.LinkedList dataSetDirectory
+        cdef iec61850_client.LinkedList directoryEntry
+        cdef bytes dataSetReference = data_set_reference.replace('$', '.').encode()
+        cdef bool isDeletable
+        cdef list members = []
+        
+        dataSetDirectory = iec61850_client.IedConnection_getDataSetDirectory(self.con, &error, dataSetReference, &isDeletable)
+        
+        if error != IED_ERROR_OK:
+            raise ConnectionError('Error retrieving data set directory {}: {} (code {})'.format(
+                data_set_reference,
+                IED_CLIENT_ERROR[error].upper(),
+                error))
+        
+        directoryEntry = iec61850_client.LinkedList_getNext(dataSetDirectory)
+        
+        while directoryEntry is not NULL:
+            members.append((<char*> directoryEntry.data).decode())
+            directoryEntry = iec61850_client.LinkedList_getNext(directoryEntry)
+        
+        iec61850_client.LinkedList_destroy(dataSetDirectory)
+        
+        return members
+    
+    
+    def enable_reporting(self, str rcb_reference, handler):
+        """
+        Enable report control block and install report handler
+        
+        Report handler is called from libIEC61850 connection thread with
+        report control block reference and dictionary of included data set
+        member values {member reference: value}. General interrogation is
+        requested after report control block is enabled, so first report
+        contains current values of all data set members.
+        
+        Parameters
+        ----------
+        rcb_reference : str
+            Buffered or unbuffered report control block reference
+            (LD/LN.BR.brcbName or LD/LN.RP.urcbName)
+        handler : callable
+            Report handler handler(rcb_reference, values)
+        
+        Returns
+        -------
+        members : list of str
+            Data set member references of report control block
+        
+        Raises
+        ------
+        ConnectionError
+            Report control block is not enabled
+        """
+        
+        cdef iec61850_client.IedClientError error
+        cdef iec61850_client.ClientReportControlBlock rcb
+        cdef bytes rcbReference = rcb_reference.encode()
+        cdef const char* dataSetReference
+        cdef const char* rptId = NULL
+        cdef _ReportSubscription subscription = _ReportSubscription()
+        
+        rcb = iec61850_client.IedConnection_getRCBValues(self.con, &error, rcbReference, NULL)
+        
+        if error != IED_ERROR_OK:
+            raise ConnectionError('Failed to read report control block {}: {} (code {})'.format(
+                rcb_reference,
+                IED_CLIENT_ERROR[error].upper(),
+                error))
+        
+        try:
+            subscription.rcb = rcb_reference
+            subscription.handler = handler
+            subscription.rpt_id = b''
+            subscription.members = []
+            
+            dataSetReference = iec61850_client.ClientReportControlBlock_getDataSetReference(rcb)
+            if dataSetReference is not NULL and dataSetReference[0] != 0:
+                subscription.members = self.get_data_set_directory(dataSetReference.decode())
+            
+            # Empty report ID (NULL) matches reports by report control block reference
+            rptId = iec61850_client.ClientReportControlBlock_getRptId(rcb)
+            if rptId is not NULL and rptId[0] != 0:
+                subscription.rpt_id = rptId
+                rptId = subscription.rpt_id
+            else:
+                rptId = NULL
+            
+            # Subscription is referenced by client while report handler is installed
+            self.reports[rcb_reference] = subscription
+            iec61850_client.IedConnection_installReportHandler(self.con, rcbReference, rptId, __reportHandler, <void*> subscription)
+            
+            iec61850_client.ClientReportControlBlock_setRptEna(rcb, True)
+            iec61850_client.IedConnection_setRCBValues(self.con, &error, rcb, iec61850_client.RCB_ELEMENT_RPT_ENA, True)
+            
+            if error != IED_ERROR_OK:
+                iec61850_client.IedConnection_uninstallReportHandler(self.con, rcbReference)
+                del self.reports[rcb_reference]
+                raise ConnectionError('Failed to enable report control block {}: {} (code {})'.format(
+                    rcb_reference,
+                    IED_CLIENT_ERROR[error].upper(),
+                    error))
+            
+            # General interrogation (not supported by every IED)
+            iec61850_client.ClientReportControlBlock_setGI(rcb, True)
+            iec61850_client.IedConnection_setRCBValues(self.con, &error, rcb, iec61850_client.RCB_ELEMENT_GI, True)
+            if DEBUG and error != IED_ERROR_OK:
+                print('General interrogation of {} failed (code {})'.format(rcb_reference, error))
+        finally:
+            iec61850_client.ClientReportControlBlock_destroy(rcb)
+        
+        return list(subscription.members)
+    
+    
+    def disable_reporting(self, str rcb_reference):
+        """
+        Disable report control block and uninstall report handler
+        
+        Parameters
+        ----------
+        rcb_reference : str
+            Report control block reference
+        
+        Raises
+        ------
+        ConnectionError
+            Report control block is not disabled
+        """
+        
+        cdef iec61850_client.IedClientError error
+        cdef iec61850_client.ClientReportControlBlock rcb
+        cdef bytes rcbReference = rcb_reference.encode()
+        
+        iec61850_client.IedConnection_uninstallReportHandler(self.con, rcbReference)
+        self.reports.pop(rcb_reference, None)
+        
+        rcb = iec61850_client.IedConnection_getRCBValues(self.con, &error, rcbReference, NULL)
+        
+        if error == IED_ERROR_OK:
+            iec61850_client.ClientReportControlBlock_setRptEna(rcb, False)
+            iec61850_client.IedConnection_setRCBValues(self.con, &error, rcb, iec61850_client.RCB_ELEMENT_RPT_ENA, True)
+            iec61850_client.ClientReportControlBlock_destroy(rcb)
+        
+        if error != IED_ERROR_OK:
+            raise ConnectionError('Failed to disable report control block {}: {} (code {})'.format(
+                rcb_reference,
+                IED_CLIENT_ERROR[error].upper(),
+                error))
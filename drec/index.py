@@ -0,0 +1,408 @@
+import os
+import re
+import struct
+import logging
+import threading
+import time
+import ctypes
+import ctypes.util
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.index')
+
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ISDIR       = 0x40000000
+
+# Events which add/update or remove index entries
+IN_UPDATE_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+IN_REMOVE_MASK = IN_MOVED_FROM | IN_DELETE
+IN_WATCH_MASK  = IN_UPDATE_MASK | IN_REMOVE_MASK | IN_DELETE_SELF | IN_MOVE_SELF
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+INOTIFY_EVENT = struct.Struct('iIII')
+
+# Local disturbance record filename prefix YYYYMMDD_HHMMSS_
+PREFIX_RE = re.compile(r'^\d{8}_\d{6}_')
+PREFIX_LEN = 16
+
+# Default rescan interval in seconds when inotify is not available
+RESCAN_INTERVAL = 300
+
+
+def _load_libc():
+    """
+    Load C library with inotify support
+    
+    Returns
+    -------
+    libc : ctypes.CDLL or None
+        C library or None if inotify is not supported
+    """
+    
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if hasattr(libc, 'inotify_init1') and hasattr(libc, 'inotify_add_watch'):
+            return libc
+    except OSError:
+        pass
+    
+    return None
+
+
+_libc = _load_libc()
+
+
+def local_suffix(local_basename):
+    """
+    Return device basename of local disturbance record file
+    
+    Parameters
+    ----------
+    local_basename : str
+        Local file basename with YYYYMMDD_HHMMSS_ prefix
+    
+    Returns
+    -------
+    suffix : str or None
+        Basename without date and time prefix or None if basename doesn't
+        start with prefix
+    """
+    
+    if PREFIX_RE.match(local_basename):
+        return local_basename[PREFIX_LEN:]
+    
+    return None
+
+
+class LocalDirIndex:
+    """
+    In-process index of local disturbance record directory
+    
+    Index maps local basename to (path, size, mtime) and device basename
+    (local basename without YYYYMMDD_HHMMSS_ prefix) to local basenames.
+    Local basenames without prefix (files added by hand) are kept in
+    separate set which is scanned for suffix match.
+    Index is built once and kept current through inotify events. If inotify
+    is not available or event queue overflows directory is rescanned.
+    """
+    
+    def __init__(self, path, rescan_interval=RESCAN_INTERVAL, use_inotify=True):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            Path to local directory
+        rescan_interval : int
+            Rescan interval in seconds if inotify is not available.
+            Default 300 s
+        use_inotify : bool
+            Use inotify if it is supported. Default True
+        """
+        
+        self.path = path
+        self.rescan_interval = rescan_interval
+        
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._suffix = {}
+        self._unprefixed = set()
+        self._last_scan = 0
+        
+        self._fd = None
+        self._wd = None
+        self._use_inotify = use_inotify
+        
+        if use_inotify:
+            self._add_watch()
+        
+        self.rescan()
+    
+    
+    @property
+    def inotify(self):
+        """
+        True if index is kept current with inotify
+        """
+        
+        return self._wd is not None
+    
+    
+    def _add_watch(self):
+        """
+        Add inotify watch to local directory
+        """
+        
+        if _libc is None:
+            return
+        
+        if self._fd is None:
+            fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                logger.debug('inotify not available: %s', os.strerror(ctypes.get_errno()))
+                return
+            self._fd = fd
+        
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(self.path), IN_WATCH_MASK)
+        if wd < 0:
+            logger.debug('inotify watch failed %s: %s', self.path, os.strerror(ctypes.get_errno()))
+            self._wd = None
+        else:
+            self._wd = wd
+    
+    
+    def close(self):
+        """
+        Close inotify file descriptor
+        """
+        
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = None
+            self._wd = None
+    
+    
+    def _set(self, basename, entry):
+        """
+        Add or update index entry
+        """
+        
+        if basename not in self._entries:
+            suffix = local_suffix(basename)
+            if suffix is not None:
+                self._suffix.setdefault(suffix, set()).add(basename)
+            else:
+                self._unprefixed.add(basename)
+        self._entries[basename] = entry
+    
+    
+    def _remove(self, basename):
+        """
+        Remove index entry
+        """
+        
+        if self._entries.pop(basename, None) is not None:
+            suffix = local_suffix(basename)
+            if suffix is not None:
+                names = self._suffix.get(suffix)
+                if names is not None:
+                    names.discard(basename)
+                    if not names:
+                        del self._suffix[suffix]
+            else:
+                self._unprefixed.discard(basename)
+    
+    
+    def _stat(self, basename):
+        """
+        Update index entry with file size and mtime
+        """
+        
+        path = os.path.join(self.path, basename)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._remove(basename)
+            return
+        
+        if os.path.isfile(path):
+            self._set(basename, (path, st.st_size, st.st_mtime))
+        else:
+            self._remove(basename)
+    
+    
+    def rescan(self):
+        """
+        Rebuild index from local directory
+        """
+        
+        with self._lock:
+            self._entries = {}
+            self._suffix = {}
+            self._unprefixed = set()
+            
+            if os.path.isdir(self.path):
+                with os.scandir(self.path) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            st = entry.stat()
+                            self._set(entry.name, (entry.path, st.st_size, st.st_mtime))
+            
+            self._last_scan = time.monotonic()
+    
+    
+    def refresh(self):
+        """
+        Apply pending inotify events
+        
+        Directory is rescanned if inotify is not available and rescan interval
+        has elapsed or if inotify event queue has overflowed.
+        """
+        
+        with self._lock:
+            if self._wd is None:
+                # Try to (re)establish watch (directory may be created later)
+                if self._use_inotify and os.path.isdir(self.path):
+                    self._add_watch()
+                    if self._wd is not None:
+                        self.rescan()
+                        return
+                
+                if time.monotonic() - self._last_scan >= self.rescan_interval:
+                    self.rescan()
+                return
+            
+            rescan = False
+            while True:
+                try:
+                    buf = os.read(self._fd, 65536)
+                except BlockingIOError:
+                    break
+                
+                offset = 0
+                while offset + INOTIFY_EVENT.size <= len(buf):
+                    wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(buf, offset)
+                    offset += INOTIFY_EVENT.size
+                    name = os.fsdecode(buf[offset:offset+length].rstrip(b'\0'))
+                    offset += length
+                    
+                    if mask & IN_Q_OVERFLOW:
+                        logger.debug('inotify queue overflow %s', self.path)
+                        rescan = True
+                    elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                        # Directory removed or moved - watch is lost
+                        self._wd = None
+                        rescan = True
+                    elif not name or mask & IN_ISDIR:
+                        continue
+                    elif mask & IN_REMOVE_MASK:
+                        self._remove(name)
+                    elif mask & IN_UPDATE_MASK:
+                        self._stat(name)
+            
+            if rescan:
+                if self._wd is None:
+                    self._add_watch()
+                self.rescan()
+    
+    
+    def add(self, path):
+        """
+        Add or update local file in the index
+        
+        Parameters
+        ----------
+        path : str
+            Path to local file
+        """
+        
+        with self._lock:
+            self._stat(os.path.basename(path))
+    
+    
+    def discard(self, path):
+        """
+        Remove local file from the index
+        
+        Parameters
+        ----------
+        path : str
+            Path to local file
+        """
+        
+        with self._lock:
+            self._remove(os.path.basename(path))
+    
+    
+    def find(self, dev_basename):
+        """
+        Find local file which ends with device basename
+        
+        Parameters
+        ----------
+        dev_basename : str
+            Device file basename
+        
+        Returns
+        -------
+        entry : tuple or None
+            Local file (path, size, mtime) or None if file is not found
+        """
+        
+        with self._lock:
+            names = self._suffix.get(dev_basename)
+            if names:
+                return self._entries[next(iter(names))]
+            
+            # Note: Only local files without date and time prefix are checked by suffix (new device file is not a linear scan)
+            for local_basename in self._unprefixed:
+                if local_basename.endswith(dev_basename):
+                    return self._entries[local_basename]
+        
+        return None
+    
+    
+    def files(self):
+        """
+        Return local file basenames
+        
+        Returns
+        -------
+        files : set
+            Set of local file basenames
+        """
+        
+        with self._lock:
+            return set(self._entries)
+
+
+# Local directory index registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_local_index(path):
+    """
+    Return local directory index for path
+    
+    Index is created on first call and reused during the lifetime of the
+    process. Pending changes are applied before index is returned.
+    
+    Parameters
+    ----------
+    path : str
+        Path to local directory
+    
+    Returns
+    -------
+    index : LocalDirIndex
+        Local directory index
+    """
+    
+    path = os.path.abspath(path)
+    
+    with _registry_lock:
+        index = _registry.get(path)
+        if index is None:
+            index = LocalDirIndex(path)
+            _registry[path] = index
+            logger.debug('Local index %s (inotify %s)', path, 'on' if index.inotify else 'off')
+    
+    index.refresh()
+    
+    return index
@@ -0,0 +1,275 @@
+import os
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Optional xxHash checksums
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.integrity')
+
+
+# Supported checksum algorithms (sidecar file extension is algorithm name)
+CHECKSUM_ALGORITHMS = ('sha256', 'sha512', 'blake2b', 'xxh64', 'xxh3_64', 'xxh128')
+
+# Default checksum algorithm
+CHECKSUM = 'sha256'
+
+# Read chunk size for verification (bytes)
+CHUNK_SIZE = 1024 * 1024
+
+# Number of re-fetch attempts after size mismatch
+REFETCH_ATTEMPTS = 2
+
+# Verification status
+OK = 'ok'
+MISMATCH = 'mismatch'
+MISSING = 'missing'
+ERROR = 'error'
+
+
+def new_hasher(algorithm=CHECKSUM):
+    """
+    Create new hash object
+    
+    Parameters
+    ----------
+    algorithm : str
+        Checksum algorithm. Default sha256
+    
+    Returns
+    -------
+    hasher : hash object
+        Object with update() and hexdigest() methods
+    
+    Raises
+    ------
+    ValueError
+        if algorithm is not supported or xxhash module is not installed
+    """
+    
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError('Unsupported checksum algorithm {}'.format(algorithm))
+    
+    if algorithm.startswith('xxh'):
+        if xxhash is None:
+            raise ValueError('Checksum algorithm {} requires xxhash module'.format(algorithm))
+        return getattr(xxhash, algorithm)()
+    
+    return hashlib.new(algorithm)
+
+
+def is_sidecar(basename):
+    """
+    Return True if basename is checksum sidecar file
+    """
+    
+    return os.path.splitext(basename)[1][1:] in CHECKSUM_ALGORITHMS
+
+
+def strip_sidecar(basename):
+    """
+    Return data file basename of checksum sidecar file
+    
+    Parameters
+    ----------
+    basename : str
+        File basename
+    
+    Returns
+    -------
+    basename : str
+        Basename without checksum extension or unchanged basename if file is
+        not sidecar file
+    """
+    
+    root, ext = os.path.splitext(basename)
+    
+    return root if ext[1:] in CHECKSUM_ALGORITHMS else basename
+
+
+def write_sidecar(path, digest, algorithm=CHECKSUM):
+    """
+    Write checksum sidecar file next to data file
+    
+    Sidecar file uses coreutils format (<digest>  <basename>) so sha256 files
+    can be checked with sha256sum -c.
+    
+    Parameters
+    ----------
+    path : str
+        Data file path
+    digest : str
+        Hex digest
+    algorithm : str
+        Checksum algorithm. Default sha256
+    
+    Returns
+    -------
+    sidecar_path : str
+        Sidecar file path
+    """
+    
+    sidecar_path = '{}.{}'.format(path, algorithm)
+    with open(sidecar_path, 'w') as f:
+        f.write('{}  {}\n'.format(digest, os.path.basename(path)))
+    
+    return sidecar_path
+
+
+def read_sidecar(path):
+    """
+    Read checksum sidecar file of data file
+    
+    Parameters
+    ----------
+    path : str
+        Data file path
+    
+    Returns
+    -------
+    checksum : tuple or None
+        (algorithm, digest) or None if sidecar file doesn't exist
+    """
+    
+    for algorithm in CHECKSUM_ALGORITHMS:
+        sidecar_path = '{}.{}'.format(path, algorithm)
+        try:
+            with open(sidecar_path) as f:
+                line = f.readline()
+        except FileNotFoundError:
+            continue
+        
+        digest = line.split(maxsplit=1)[0] if line.strip() else ''
+        return (algorithm, digest)
+    
+    return None
+
+
+def file_digest(path, algorithm=CHECKSUM, chunk_size=CHUNK_SIZE):
+    """
+    Compute checksum of local file
+    
+    Parameters
+    ----------
+    path : str
+        Local file path
+    algorithm : str
+        Checksum algorithm. Default sha256
+    chunk_size : int
+        Read chunk size in bytes. Default 1 MiB
+    
+    Returns
+    -------
+    digest : str
+        Hex digest
+    """
+    
+    hasher = new_hasher(algorithm)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+    
+    return hasher.hexdigest()
+
+
+def verify_file(path):
+    """
+    Verify local file against its checksum sidecar file
+    
+    Parameters
+    ----------
+    path : str
+        Data file path
+    
+    Returns
+    -------
+    result : tuple
+        (path, status) where status is ok, mismatch, missing (no sidecar
+        file) or error (file can't be read)
+    """
+    
+    checksum = read_sidecar(path)
+    if checksum is None:
+        return (path, MISSING)
+    
+    algorithm, digest = checksum
+    try:
+        if file_digest(path, algorithm) == digest:
+            return (path, OK)
+    except (OSError, ValueError) as err:
+        logger.error('Verification failed %s: %s', path, err)
+        return (path, ERROR)
+    
+    return (path, MISMATCH)
+
+
+def data_files(dirname):
+    """
+    Return data files in directory (checksum sidecar and hidden files are
+    excluded)
+    
+    Parameters
+    ----------
+    dirname : str
+        Path to directory
+    
+    Returns
+    -------
+    paths : list
+        Sorted list of data file paths
+    """
+    
+    if not os.path.isdir(dirname):
+        return []
+    
+    with os.scandir(dirname) as it:
+        return sorted(entry.path for entry in it
+                      if entry.is_file() and not entry.name.startswith('.') and not is_sidecar(entry.name))
+
+
+def verify_files(paths, workers=None, interrupt=None):
+    """
+    Verify local files in parallel
+    
+    Files are read and hashed in thread pool (hash functions release GIL
+    for large buffers).
+    
+    Parameters
+    ----------
+    paths : iterable
+        Data file paths
+    workers : int
+        Number of worker threads. Default number of CPUs
+    interrupt : threading.Event.Event() object
+        Event() object used to stop verification. Default None
+    
+    Yields
+    ------
+    result : tuple
+        (path, status) in order of paths
+    """
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for path in paths:
+            if interrupt is not None and interrupt.is_set():
+                break
+            futures.append(executor.submit(verify_file, path))
+        
+        for future in futures:
+            if interrupt is not None and interrupt.is_set():
+                future.cancel()
+                continue
+            yield future.result()
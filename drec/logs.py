@@ -0,0 +1,278 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+import contextlib
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.logs')
+
+
+# Log record format of console and log files
+FORMAT = '%(asctime)s - %(name)-13s - %(levelname)-8s - %(message)s'
+
+# Log file level
+FILE_LEVEL = logging.INFO
+
+# Max number of log records waiting for listener thread (records are dropped
+# if queue is full, download threads are never blocked by logging)
+QUEUE_SIZE = 10000
+
+# Min interval in seconds between sampled debug dumps (device file listing)
+DUMP_INTERVAL = 3600
+
+
+# Log path of current thread and default log path of threads without route
+_route = threading.local()
+_default_path = None
+
+# Queue listener (one per process)
+_listener = None
+_listener_lock = threading.Lock()
+
+# Last sampled debug dump time per key
+_samples = {}
+_samples_lock = threading.Lock()
+
+
+class FileRouter(logging.Handler):
+    """
+    Log file routing
+    
+    Log records are written to time rotating log file of substation set by
+    set_route() in the thread which made the record. Log file handlers are
+    created once per log path and are kept open between cycles.
+    """
+    
+    def __init__(self, level=FILE_LEVEL, when='midnight', backup_count=30):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        level : int
+            Log file level. Default INFO
+        when : str
+            Log file rotation interval (TimedRotatingFileHandler).
+            Default midnight
+        backup_count : int
+            Number of rotated log files kept. Default 30
+        """
+        
+        super().__init__(level)
+        self.when = when
+        self.backup_count = backup_count
+        self._handlers = {}
+        self._handlers_lock = threading.Lock()
+    
+    
+    def open(self, path):
+        """
+        Create log file handler of log path if it doesn't exist
+        
+        Parameters
+        ----------
+        path : str
+            Log file path
+        """
+        
+        with self._handlers_lock:
+            if path in self._handlers:
+                return
+            
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = logging.handlers.TimedRotatingFileHandler(path, when=self.when, backupCount=self.backup_count, delay=True)
+            handler.setLevel(self.level)
+            handler.setFormatter(logging.Formatter(FORMAT))
+            self._handlers[path] = handler
+    
+    
+    def emit(self, record):
+        """
+        Write log record to log file of record log path
+        """
+        
+        handler = self._handlers.get(getattr(record, 'log_path', None))
+        if handler is not None and record.levelno >= handler.level:
+            handler.handle(record)
+    
+    
+    def close(self):
+        """
+        Close log files
+        """
+        
+        with self._handlers_lock:
+            for handler in self._handlers.values():
+                handler.close()
+            self._handlers.clear()
+        
+        super().close()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking queue handler
+    
+    Record is stamped with log path of current thread. Record is dropped if
+    queue is full (listener thread is stalled by disk I/O) and number of
+    dropped records is logged when queue is drained.
+    """
+    
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+    
+    
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.log_path = getattr(_route, 'path', _default_path)
+        return record
+    
+    
+    def enqueue(self, record):
+        try:
+            # Note: Dropped records are logged when half of queue is free
+            if self.dropped and self.queue.qsize() < self.queue.maxsize // 2:
+                self.queue.put_nowait(self.prepare(logger.makeRecord(logger.name, logging.WARNING, __file__, 0,
+                                                                     'Dropped %s log records (log queue full)', (self.dropped,), None)))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def start(root=None, file_level=FILE_LEVEL):
+    """
+    Move log handlers behind queue listener thread
+    
+    Handlers of root logger (console) and log file router are served by
+    listener thread, logging call only puts record into queue. Logger level
+    is set to the lowest handler level, so disabled debug records are not
+    made at all. Listener is started once per process and stopped at exit.
+    
+    Parameters
+    ----------
+    root : logging.Logger
+        Logger with handlers. Default drec logger
+    file_level : int
+        Log file level. Default INFO
+    
+    Returns
+    -------
+    router : FileRouter
+        Log file router
+    """
+    
+    global _listener
+    
+    root = logging.getLogger('drec') if root is None else root
+    
+    with _listener_lock:
+        if _listener is not None:
+            return _listener.router
+        
+        handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)]
+        router = FileRouter(file_level)
+        
+        log_queue = queue.Queue(QUEUE_SIZE)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, router, respect_handler_level=True)
+        _listener.router = router
+        
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(QueueHandler(log_queue))
+        root.setLevel(min([h.level or logging.DEBUG for h in handlers] + [file_level]))
+        
+        _listener.start()
+        atexit.register(stop)
+        
+        return router
+
+
+def stop():
+    """
+    Write queued log records and stop listener thread
+    """
+    
+    global _listener
+    
+    with _listener_lock:
+        if _listener is None:
+            return
+        
+        _listener.stop()
+        _listener.router.close()
+        for handler in _listener.handlers:
+            handler.flush()
+        _listener = None
+
+
+def set_route(path):
+    """
+    Route log records to log file
+    
+    Records made in current thread are written to log file. Records of
+    threads without route (background workers) are written to the last
+    routed log file. Log file directory is created if it doesn't exist.
+    
+    Parameters
+    ----------
+    path : str or None
+        Log file path or None (records are not written to log file)
+    """
+    
+    global _default_path
+    
+    if path is not None:
+        start().open(path)
+    
+    _route.path = path
+    _default_path = path
+
+
+@contextlib.contextmanager
+def route(path):
+    """
+    Route log records to log file within context (set_route)
+    """
+    
+    previous = getattr(_route, 'path', None)
+    set_route(path)
+    try:
+        yield
+    finally:
+        set_route(previous)
+
+
+def sample(key, interval=DUMP_INTERVAL, now=None):
+    """
+    Return True if sampled debug dump is due
+    
+    Parameters
+    ----------
+    key : hashable
+        Dump key (device address)
+    interval : float
+        Min interval in seconds between dumps. Default 1 hour
+    now : float
+        Current time. Default time.monotonic()
+    
+    Returns
+    -------
+    due : bool
+        True at most once per interval per key
+    """
+    
+    now = time.monotonic() if now is None else now
+    
+    with _samples_lock:
+        last = _samples.get(key)
+        if last is not None and now - last < interval:
+            return False
+        _samples[key] = now
+        return True
@@ -0,0 +1,177 @@
+import os
+import json
+import logging
+import threading
+import time
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.manifest')
+
+
+# Hidden state directory within local directory and manifest file name
+STATE_DIRNAME = '.drec'
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+# Compact manifest when number of lines exceeds number of entries by factor
+COMPACT_RATIO = 2
+
+
+class Manifest:
+    """
+    Download manifest of local disturbance record directory
+    
+    Manifest maps local basename to download attributes (device path, listed
+    size, received size, checksum algorithm and digest, download time).
+    Entries are appended to JSON lines file; when the same basename is
+    appended more than once the last entry wins. File is compacted on load
+    if it contains too many superseded lines.
+    """
+    
+    def __init__(self, dirname):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        dirname : str
+            Path to local directory
+        """
+        
+        self.dirname = dirname
+        self.path = os.path.join(dirname, STATE_DIRNAME, MANIFEST_FILENAME)
+        
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._lines = 0
+        
+        self.load()
+    
+    
+    def load(self):
+        """
+        Load manifest from disk
+        """
+        
+        with self._lock:
+            self._entries = {}
+            self._lines = 0
+            
+            if not os.path.isfile(self.path):
+                return
+            
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Skip partially written line
+                        logger.warning('Invalid manifest line in %s', self.path)
+                        continue
+                    self._entries[entry['name']] = entry
+                    self._lines += 1
+            
+            if self._lines > COMPACT_RATIO * max(len(self._entries), 1):
+                self._compact()
+    
+    
+    def _compact(self):
+        """
+        Rewrite manifest with current entries only
+        """
+        
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        
+        os.replace(tmp_path, self.path)
+        self._lines = len(self._entries)
+    
+    
+    def add(self, name, **attrs):
+        """
+        Add or replace manifest entry
+        
+        Parameters
+        ----------
+        name : str
+            Local file basename
+        **attrs
+            Entry attributes (must be JSON serializable)
+        
+        Returns
+        -------
+        entry : dict
+            Manifest entry
+        """
+        
+        entry = dict(attrs, name=name)
+        entry.setdefault('time', time.time())
+        
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), mode=0o755, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+            self._entries[name] = entry
+            self._lines += 1
+        
+        return entry
+    
+    
+    def get(self, name):
+        """
+        Return manifest entry of local file basename or None
+        """
+        
+        with self._lock:
+            return self._entries.get(name)
+    
+    
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._entries
+    
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# Manifest registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_manifest(dirname):
+    """
+    Return download manifest of local directory
+    
+    Manifest is loaded on first call and reused during the lifetime of the
+    process.
+    
+    Parameters
+    ----------
+    dirname : str
+        Path to local directory
+    
+    Returns
+    -------
+    manifest : Manifest
+        Download manifest
+    """
+    
+    dirname = os.path.abspath(dirname)
+    
+    with _registry_lock:
+        manifest = _registry.get(dirname)
+        if manifest is None:
+            manifest = Manifest(dirname)
+            _registry[dirname] = manifest
+        
+        return manifest
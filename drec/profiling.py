@@ -0,0 +1,294 @@
+import os
+import sys
+import time
+import cProfile
+import logging
+import threading
+from collections import Counter
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.profiling')
+
+
+# Profile directory within log directory
+PROFILE_DIRNAME = 'profile'
+
+# Interval in seconds between wall-clock stack samples of all threads
+SAMPLE_INTERVAL = 0.01
+
+# Max number of stack samples per cycle (sampler stops, bounded overhead of
+# long cycle)
+MAX_SAMPLES = 60000
+
+# Max number of sampled frames per stack (innermost frames are kept)
+MAX_DEPTH = 64
+
+# Max number of profiled cycles per request
+MAX_CYCLES = 100
+
+
+def frame_label(frame):
+    """
+    Return flamegraph label of stack frame (module:function)
+    """
+    
+    code = frame.f_code
+    return '{}:{}'.format(os.path.splitext(os.path.basename(code.co_filename))[0], code.co_name)
+
+
+class StackSampler:
+    """
+    Wall-clock stack sampler
+    
+    Stacks of all threads (waiting threads included) are sampled by
+    background thread and counted as collapsed stacks (thread;outer;...;inner)
+    used by flamegraph tools.
+    """
+    
+    def __init__(self, interval=SAMPLE_INTERVAL, max_samples=MAX_SAMPLES, max_depth=MAX_DEPTH):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        interval : float
+            Interval in seconds between samples. Default 10 ms
+        max_samples : int
+            Max number of samples (sampler stops). Default 60000
+        max_depth : int
+            Max number of frames per stack. Default 64
+        """
+        
+        self.interval = interval
+        self.max_samples = max_samples
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        
+        self._stop = threading.Event()
+        self._thread = None
+    
+    
+    def start(self):
+        """
+        Start sampler thread
+        """
+        
+        self._thread = threading.Thread(target=self._run, name='drec-profile', daemon=True)
+        self._thread.start()
+    
+    
+    def stop(self):
+        """
+        Stop sampler thread
+        """
+        
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    
+    def sample(self):
+        """
+        Count current stacks of all threads except sampler thread
+        """
+        
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            
+            labels.append(names.get(ident, 'thread-{}'.format(ident)))
+            self.stacks[';'.join(reversed(labels))] += 1
+        
+        self.samples += 1
+    
+    
+    def _run(self):
+        while self.samples < self.max_samples and not self._stop.wait(self.interval):
+            self.sample()
+        
+        if self.samples >= self.max_samples:
+            logger.warning('Stack sampling stopped after %s samples', self.samples)
+    
+    
+    def write(self, path):
+        """
+        Write collapsed stacks (one 'stack count' line per stack)
+        
+        Parameters
+        ----------
+        path : str
+            Path to collapsed stack file
+        """
+        
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write('{} {}\n'.format(stack, count))
+        os.replace(tmp_path, path)
+
+
+class Profiler:
+    """
+    Cycle profiler
+    
+    Requested number of client cycles (one config file) is profiled: CPU
+    profile of client thread (cProfile, pstats file) and wall-clock stack
+    samples of all threads (collapsed stack file). Files are written to
+    profile directory next to substation log file. Profiling switches off
+    after requested cycles.
+    """
+    
+    def __init__(self, interval=SAMPLE_INTERVAL, max_samples=MAX_SAMPLES):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        interval : float
+            Interval in seconds between stack samples. Default 10 ms
+        max_samples : int
+            Max number of stack samples per cycle. Default 60000
+        """
+        
+        self.interval = interval
+        self.max_samples = max_samples
+        self.remaining = 0
+        
+        self._lock = threading.Lock()
+        self._cycle = None
+    
+    
+    def enable(self, cycles):
+        """
+        Profile next cycles
+        
+        Parameters
+        ----------
+        cycles : int
+            Number of profiled cycles (0 - profiling is switched off after
+            current cycle). Max MAX_CYCLES
+        
+        Returns
+        -------
+        status : dict
+            Number of remaining profiled cycles and profiling state
+        """
+        
+        with self._lock:
+            self.remaining = max(0, min(int(cycles), MAX_CYCLES))
+            logger.info('Profiling %s cycles', self.remaining)
+            return self.status()
+    
+    
+    def status(self):
+        """
+        Return profiling state
+        
+        Returns
+        -------
+        status : dict
+            remaining - number of remaining profiled cycles, profiling -
+            True if current cycle is profiled
+        """
+        
+        return {'remaining': self.remaining, 'profiling': self._cycle is not None}
+    
+    
+    def start_cycle(self, dirname, label):
+        """
+        Start profiling cycle if profiled cycles remain
+        
+        Parameters
+        ----------
+        dirname : str
+            Log directory (profile files are written to profile
+            subdirectory)
+        label : str
+            Cycle label used in file names (substation)
+        """
+        
+        with self._lock:
+            if self._cycle is not None or self.remaining <= 0:
+                return
+            
+            self.remaining -= 1
+            
+            sampler = StackSampler(self.interval, self.max_samples)
+            profile = cProfile.Profile()
+            self._cycle = (os.path.join(dirname, PROFILE_DIRNAME), label, time.time(), time.monotonic(), profile, sampler)
+            
+            sampler.start()
+            profile.enable()
+    
+    
+    def end_cycle(self):
+        """
+        Stop profiling cycle and write profile files
+        
+        Returns
+        -------
+        paths : list of str
+            Written pstats and collapsed stack file paths (empty if cycle is
+            not profiled)
+        """
+        
+        with self._lock:
+            if self._cycle is None:
+                return []
+            
+            dirname, label, started, started_monotonic, profile, sampler = self._cycle
+            self._cycle = None
+        
+        profile.disable()
+        sampler.stop()
+        
+        base = os.path.join(dirname, '{}_{}'.format(time.strftime('%Y%m%d_%H%M%S', time.localtime(started)), label))
+        paths = [base + '.pstats', base + '.folded']
+        
+        try:
+            os.makedirs(dirname, exist_ok=True)
+            profile.dump_stats(paths[0])
+            sampler.write(paths[1])
+        except OSError as err:
+            logger.error('Profile not written: %s', err)
+            return []
+        
+        logger.info('Profiled cycle %s (%.1f s, %s stack samples): %s', label, time.monotonic() - started_monotonic, sampler.samples, ', '.join(paths))
+        
+        if not self.remaining:
+            logger.info('Profiling finished')
+        
+        return paths
+
+
+# Profiler of client process
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """
+    Return profiler of client process
+    
+    Returns
+    -------
+    profiler : Profiler
+        Profiler (created on first call)
+    """
+    
+    global _profiler
+    
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = Profiler()
+        return _profiler
@@ -0,0 +1,438 @@
+import os
+import re
+import logging
+import threading
+import time
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.reports')
+
+
+# Disturbance recorder (RDRE) data objects
+# RcdMade - record made (SPS), FltNum - fault number (INS)
+RCD_MADE = 'RcdMade'
+FLT_NUM = 'FltNum'
+
+# Functional constraints of data set member references (LD/LN.DO[FC])
+FUNCTIONAL_CONSTRAINTS = ('ST', 'MX', 'SP', 'SV', 'CF', 'DC', 'EX')
+
+# Default report policy
+# rcb - report control block references (LD/LN.BR.brcbName or LD/LN.RP.urcbName)
+# poll_interval - interval in seconds between safety net listings while
+#                 reports are received
+# hold - delay in seconds between record made and download
+# followup - listing in seconds after report-triggered download (records which
+#            were still being written are downloaded without waiting for
+#            safety net listing)
+# reconnect - interval in seconds between report subscription attempts
+POLICY = {
+    'rcb': [],
+    'poll_interval': 3600,
+    'hold': 1,
+    'followup': 60,
+    'reconnect': 30
+}
+
+# Interval in seconds for checking report connection and stop flag
+WATCH_INTERVAL = 0.5
+
+
+def merge_policy(general, device):
+    """
+    Merge GENERAL and DEVICE report policy with default policy
+    
+    Device policy parameters supersede general policy parameters.
+    
+    Parameters
+    ----------
+    general : dict or None
+        Report policy from GENERAL section
+    device : dict or None
+        Report policy from DEVICE section
+    
+    Returns
+    -------
+    policy : dict or None
+        Merged report policy or None if report control blocks are not set
+    """
+    
+    policy = dict(POLICY)
+    for p in (general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY})
+    
+    if not policy['rcb']:
+        return None
+    
+    return policy
+
+
+def status_value(values, name):
+    """
+    Return status value of data object from report values
+    
+    Data set member can be data object (LD/LN.DO[ST], value is structure
+    with stVal first) or status value attribute (LD/LN.DO.stVal[ST]).
+    Quality and time stamp members are ignored.
+    
+    Parameters
+    ----------
+    values : dict
+        Report values {member reference: value}
+    name : str
+        Data object name (RcdMade or FltNum)
+    
+    Returns
+    -------
+    value : bool, int or None
+        Status value or None if data object is not included in report
+    """
+    
+    for ref, value in values.items():
+        tokens = [t for t in re.split(r'[./$\[\]]', ref) if t]
+        if name not in tokens:
+            continue
+        
+        attrs = [t for t in tokens[tokens.index(name) + 1:] if t not in FUNCTIONAL_CONSTRAINTS]
+        if not attrs:
+            return value[0] if isinstance(value, list) and value else value
+        if attrs[0] == 'stVal':
+            return value
+    
+    return None
+
+
+class RecordTrigger:
+    """
+    Report-triggered listing of device
+    
+    Device listing is due when disturbance recorder reports a new record
+    (RcdMade rising edge or FltNum change), after report-triggered download
+    (follow-up listing) and every poll interval (safety net). First report
+    after subscription (general interrogation) only sets current state.
+    Every sweep lists device while reports are not subscribed.
+    """
+    
+    def __init__(self, poll_interval=POLICY['poll_interval'], hold=POLICY['hold'], followup=POLICY['followup']):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        poll_interval : float
+            Interval in seconds between safety net listings. Default 1 h
+        hold : float
+            Delay in seconds between record made and download. Default 1 s
+        followup : float
+            Follow-up listing in seconds after report-triggered download.
+            Default 60 s
+        """
+        
+        self.poll_interval = poll_interval
+        self.hold = hold
+        self.followup = followup
+        
+        self._lock = threading.Lock()
+        self._rcd_made = None
+        self._flt_num = None
+        self._pending = None
+        self._notified = False
+        self._followup = None
+        self._last_poll = None
+        self._subscribed = False
+    
+    
+    @property
+    def subscribed(self):
+        """
+        True if reports are subscribed
+        """
+        
+        return self._subscribed
+    
+    
+    def subscribe(self, subscribed):
+        """
+        Set report subscription state
+        """
+        
+        with self._lock:
+            self._subscribed = subscribed
+    
+    
+    def report(self, rcd_made=None, flt_num=None, now=None):
+        """
+        Update recorder state from received report
+        
+        Parameters
+        ----------
+        rcd_made : bool or None
+            RcdMade status value or None if not included in report
+        flt_num : int or None
+            FltNum status value or None if not included in report
+        now : float
+            Current time. Default time.time()
+        
+        Returns
+        -------
+        triggered : bool
+            True if new record is made
+        """
+        
+        now = time.time() if now is None else now
+        triggered = False
+        
+        with self._lock:
+            if rcd_made is not None:
+                triggered |= bool(rcd_made) and self._rcd_made is False
+                self._rcd_made = bool(rcd_made)
+            
+            if flt_num is not None:
+                triggered |= self._flt_num is not None and flt_num != self._flt_num
+                self._flt_num = flt_num
+            
+            if triggered and self._pending is None:
+                self._pending = now
+                self._notified = False
+        
+        return triggered
+    
+    
+    def due(self, now=None):
+        """
+        Return True if device has to be listed
+        """
+        
+        now = time.time() if now is None else now
+        
+        with self._lock:
+            return (not self._subscribed or
+                    self._last_poll is None or
+                    (self._pending is not None and now - self._pending >= self.hold) or
+                    (self._followup is not None and now >= self._followup) or
+                    now - self._last_poll >= self.poll_interval)
+    
+    
+    def notify_due(self, now=None):
+        """
+        Return True once per new record after hold time (wake client)
+        """
+        
+        now = time.time() if now is None else now
+        
+        with self._lock:
+            if self._pending is None or self._notified or now - self._pending < self.hold:
+                return False
+            
+            self._notified = True
+            
+            return True
+    
+    
+    def served(self, started, now=None):
+        """
+        Record successful device download
+        
+        Records made after download started stay pending.
+        
+        Parameters
+        ----------
+        started : float
+            Download start time
+        now : float
+            Current time. Default time.time()
+        """
+        
+        now = time.time() if now is None else now
+        
+        with self._lock:
+            if self._followup is not None and self._followup <= started:
+                self._followup = None
+            
+            if self._pending is not None and self._pending <= started:
+                self._pending = None
+                self._followup = now + self.followup
+            
+            self._last_poll = started
+
+
+class ReportWatcher(threading.Thread):
+    """
+    Report subscription of device
+    
+    Keeps report connection to device and updates record trigger from
+    received reports. Connection is opened again after reconnect interval
+    if it's lost or subscription fails.
+    """
+    
+    def __init__(self, label, connect, trigger, reconnect=POLICY['reconnect'], callback=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        label : str
+            Device label (log messages)
+        connect : callable
+            Called with report handler handler(rcb_reference, values),
+            returns connected session with is_connected() and close()
+            methods (drec.iec61850.iec61850.ReportClient)
+        trigger : RecordTrigger
+            Record trigger of device
+        reconnect : float
+            Interval in seconds between subscription attempts. Default 30 s
+        callback : callable
+            Called without arguments when new record is ready for download
+            (hold time expired). Default None
+        """
+        
+        super().__init__(name='drec-reports', daemon=True)
+        
+        self.label = label
+        self.trigger = trigger
+        self.reconnect = reconnect
+        self.callback = callback
+        
+        self._connect = connect
+        self._closed = threading.Event()
+    
+    
+    def on_report(self, rcb_reference, values):
+        """
+        Report handler
+        
+        Parameters
+        ----------
+        rcb_reference : str
+            Report control block reference
+        values : dict
+            Included data set member values {member reference: value}
+        """
+        
+        rcd_made = status_value(values, RCD_MADE)
+        flt_num = status_value(values, FLT_NUM)
+        
+        if self.trigger.report(rcd_made, flt_num):
+            logger.info('Record made on %s (%s, FltNum %s)', self.label, rcb_reference, flt_num)
+    
+    
+    def run(self):
+        """
+        Subscription loop
+        """
+        
+        while not self._closed.is_set():
+            try:
+                session = self._connect(self.on_report)
+            except (ConnectionError, OSError) as err:
+                logger.warning('Report subscription %s failed: %s', self.label, err)
+                self._closed.wait(self.reconnect)
+                continue
+            
+            self.trigger.subscribe(True)
+            logger.info('Report subscription %s', self.label)
+            
+            try:
+                while not self._closed.is_set() and session.is_connected():
+                    if self.trigger.notify_due() and self.callback is not None:
+                        self.callback()
+                    self._closed.wait(WATCH_INTERVAL)
+            finally:
+                self.trigger.subscribe(False)
+                session.close()
+            
+            if not self._closed.is_set():
+                logger.warning('Report connection %s lost', self.label)
+                self._closed.wait(self.reconnect)
+    
+    
+    def stop(self, timeout=None):
+        """
+        Stop subscription and close report connection
+        
+        Parameters
+        ----------
+        timeout : float
+            Max time to wait in seconds. Default None
+        """
+        
+        self._closed.set()
+        self.join(timeout)
+
+
+# Report watcher registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def watch(dirname, label, connect, policy, callback=None):
+    """
+    Return record trigger of report-driven device
+    
+    Report watcher is started on first call and reused during the lifetime
+    of the process.
+    
+    Parameters
+    ----------
+    dirname : str
+        Path to local directory
+    label : str
+        Device label (log messages)
+    connect : callable
+        Report connection factory (ReportWatcher)
+    policy : dict
+        Report policy (merge_policy)
+    callback : callable
+        Called when new record is ready for download. Default None
+    
+    Returns
+    -------
+    trigger : RecordTrigger
+        Record trigger of device
+    """
+    
+    dirname = os.path.abspath(dirname)
+    
+    with _registry_lock:
+        watcher = _registry.get(dirname)
+        if watcher is None or not watcher.is_alive():
+            trigger = watcher.trigger if watcher is not None else RecordTrigger()
+            watcher = ReportWatcher(label, connect, trigger, policy['reconnect'], callback)
+            watcher.start()
+            _registry[dirname] = watcher
+        
+        watcher.trigger.poll_interval = policy['poll_interval']
+        watcher.trigger.hold = policy['hold']
+        watcher.trigger.followup = policy['followup']
+        
+        return watcher.trigger
+
+
+def find(dirname):
+    """
+    Return record trigger of device or None if device is not report-driven
+    """
+    
+    with _registry_lock:
+        watcher = _registry.get(os.path.abspath(dirname))
+        
+        return watcher.trigger if watcher is not None else None
+
+
+def shutdown(timeout=None):
+    """
+    Stop report watchers
+    
+    Parameters
+    ----------
+    timeout : float
+        Max time to wait in seconds per watcher. Default None
+    """
+    
+    with _registry_lock:
+        watchers = list(_registry.values())
+        _registry.clear()
+    
+    for watcher in watchers:
+        watcher.stop(timeout)
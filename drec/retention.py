@@ -0,0 +1,761 @@
+import os
+import io
+import json
+import logging
+import threading
+import queue
+import tarfile
+import zipfile
+import time
+from datetime import datetime
+
+# Import from common
+from .common import Throttle
+
+# Import local directory index
+from .index import PREFIX_RE
+
+# Import archive helpers
+from .archive import fsync_dir
+
+# Optional zstd compression
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.retention')
+
+
+# Bundle directory and index file within archive directory
+BUNDLE_DIRNAME = 'bundles'
+INDEX_FILENAME = 'index.jsonl'
+
+# Min interval in seconds between retention runs per archive directory
+RETENTION_INTERVAL = 3600
+
+# Read chunk size (bytes)
+CHUNK_SIZE = 1024 * 1024
+
+# Default I/O rate limit in bytes per second
+IO_RATE = 4 * 1024 * 1024
+
+# Retention policy keys
+POLICY_KEYS = ('max_age', 'max_bytes', 'keep_last', 'compress_after', 'compression', 'io_rate')
+
+
+def merge_policy(general, device):
+    """
+    Merge GENERAL and DEVICE retention policy
+    
+    Device policy parameters supersede general policy parameters.
+    
+    Parameters
+    ----------
+    general : dict or None
+        Retention policy from GENERAL section
+    device : dict or None
+        Retention policy from DEVICE section
+    
+    Returns
+    -------
+    policy : dict
+        Merged retention policy
+    """
+    
+    policy = {}
+    for p in (general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY_KEYS})
+    
+    return policy
+
+
+def record_key(basename):
+    """
+    Return record group key (basename without extension)
+    
+    Parameters
+    ----------
+    basename : str
+        Local file basename
+    
+    Returns
+    -------
+    key : str
+        Record group key
+    """
+    
+    return basename.split('.', 1)[0] if PREFIX_RE.match(basename) else os.path.splitext(basename)[0]
+
+
+def record_time(key, mtime):
+    """
+    Return record trigger time string and timestamp
+    
+    Trigger time is read from YYYYMMDD_HHMMSS_ prefix. File modification time
+    is used if record has no prefix.
+    
+    Parameters
+    ----------
+    key : str
+        Record group key
+    mtime : float
+        File modification time
+    
+    Returns
+    -------
+    trigger_time : str
+        Date and time in format YYYYMMDD_HHMMSS
+    timestamp : float
+        Trigger time as local timestamp
+    """
+    
+    if PREFIX_RE.match(key):
+        try:
+            dt = datetime.strptime(key[:15], '%Y%m%d_%H%M%S')
+            return key[:15], dt.timestamp()
+        except ValueError:
+            pass
+    
+    return datetime.fromtimestamp(mtime).strftime('%Y%m%d_%H%M%S'), mtime
+
+
+def loose_records(archive_path):
+    """
+    Group archived files by record
+    
+    Parameters
+    ----------
+    archive_path : str
+        Path to archive directory
+    
+    Returns
+    -------
+    records : dict
+        Record key -> dict(trigger_time, timestamp, size, files)
+    """
+    
+    records = {}
+    
+    with os.scandir(archive_path) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            
+            st = entry.stat()
+            key = record_key(entry.name)
+            rec = records.get(key)
+            if rec is None:
+                trigger_time, timestamp = record_time(key, st.st_mtime)
+                rec = records[key] = {'record': key,
+                                      'trigger_time': trigger_time,
+                                      'timestamp': timestamp,
+                                      'size': 0,
+                                      'files': []}
+            rec['size'] += st.st_size
+            rec['files'].append(entry.path)
+    
+    return records
+
+
+def read_index(archive_path):
+    """
+    Read bundle index
+    
+    Parameters
+    ----------
+    archive_path : str
+        Path to archive directory
+    
+    Returns
+    -------
+    index : list of dict
+        Bundle index entries
+    """
+    
+    path = os.path.join(archive_path, BUNDLE_DIRNAME, INDEX_FILENAME)
+    entries = []
+    
+    if os.path.isfile(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # Skip partially written line
+                        logger.warning('Invalid bundle index line in %s', path)
+    
+    return entries
+
+
+def write_index(archive_path, entries):
+    """
+    Replace bundle index
+    
+    Parameters
+    ----------
+    archive_path : str
+        Path to archive directory
+    entries : list of dict
+        Bundle index entries
+    """
+    
+    bundle_dirname = os.path.join(archive_path, BUNDLE_DIRNAME)
+    path = os.path.join(bundle_dirname, INDEX_FILENAME)
+    tmp_path = path + '.tmp'
+    
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, sort_keys=True) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    
+    os.replace(tmp_path, path)
+    fsync_dir(bundle_dirname)
+
+
+def append_index(archive_path, entry):
+    """
+    Append entry to bundle index
+    
+    Parameters
+    ----------
+    archive_path : str
+        Path to archive directory
+    entry : dict
+        Bundle index entry
+    """
+    
+    path = os.path.join(archive_path, BUNDLE_DIRNAME, INDEX_FILENAME)
+    
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def find_records(archive_path, start=None, end=None):
+    """
+    Find bundled records by trigger time
+    
+    Parameters
+    ----------
+    archive_path : str
+        Path to archive directory
+    start : str
+        Trigger time from (including) in format YYYYMMDD_HHMMSS.
+        Default None (no limit)
+    end : str
+        Trigger time to (including) in format YYYYMMDD_HHMMSS.
+        Default None (no limit)
+    
+    Returns
+    -------
+    records : list of dict
+        Bundle index entries sorted by trigger time
+    """
+    
+    return sorted((e for e in read_index(archive_path)
+                   if (start is None or e['trigger_time'] >= start) and (end is None or e['trigger_time'] <= end)),
+                  key=lambda e: e['trigger_time'])
+
+
+def extract_record(archive_path, entry, dest):
+    """
+    Extract bundled record
+    
+    Parameters
+    ----------
+    archive_path : str
+        Path to archive directory
+    entry : dict
+        Bundle index entry (find_records)
+    dest : str
+        Destination directory
+    
+    Returns
+    -------
+    files : list
+        Extracted file paths
+    """
+    
+    bundle = os.path.join(archive_path, BUNDLE_DIRNAME, entry['bundle'])
+    os.makedirs(dest, exist_ok=True)
+    
+    if bundle.endswith('.zip'):
+        with zipfile.ZipFile(bundle) as zf:
+            for name in entry['members']:
+                zf.extract(name, dest)
+    else:
+        if zstandard is None:
+            raise RuntimeError('zstandard module is required to extract {}'.format(bundle))
+        with open(bundle, 'rb') as f:
+            f.seek(entry['offset'])
+            frame = f.read(entry['length'])
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(frame)
+        with tarfile.open(fileobj=io.BytesIO(data), mode='r:') as tf:
+            tf.extractall(dest)
+    
+    return [os.path.join(dest, name) for name in entry['members']]
+
+
+class ThrottledReader(io.RawIOBase):
+    """
+    File reader with throttled data rate
+    """
+    
+    def __init__(self, path, throttle):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        path : str
+            File path
+        throttle : Throttle
+            I/O throttle
+        """
+        
+        self._f = open(path, 'rb')
+        self._throttle = throttle
+    
+    
+    def readable(self):
+        """
+        Return True (file is readable)
+        """
+        
+        return True
+    
+    
+    def readinto(self, b):
+        """
+        Read up to CHUNK_SIZE bytes into buffer
+        """
+        
+        n = self._f.readinto(memoryview(b)[:CHUNK_SIZE])
+        if n:
+            self._throttle.consume(n)
+        return n
+    
+    
+    def close(self):
+        """
+        Close file and drop file data from page cache
+        """
+        
+        if not self.closed:
+            # Don't keep archived data in page cache
+            if hasattr(os, 'posix_fadvise'):
+                try:
+                    os.posix_fadvise(self._f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+                except OSError:
+                    pass
+            self._f.close()
+        super().close()
+
+
+def bundle_record_zip(bundle, rec, throttle):
+    """
+    Append record files to zip bundle
+    
+    Files which are already bundle members with the same size (append was
+    interrupted before bundle index was written) are not appended again.
+    
+    Returns
+    -------
+    entry : dict
+        Bundle index entry fields
+    """
+    
+    with zipfile.ZipFile(bundle, 'a', compression=zipfile.ZIP_DEFLATED) as zf:
+        members = {info.filename: info.file_size for info in zf.infolist()}
+        for path in sorted(rec['files']):
+            if members.get(os.path.basename(path)) == os.path.getsize(path):
+                continue
+            
+            info = zipfile.ZipInfo.from_file(path, os.path.basename(path))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with ThrottledReader(path, throttle) as fsrc, zf.open(info, 'w') as fdst:
+                while True:
+                    chunk = fsrc.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    fdst.write(chunk)
+    
+    with open(bundle, 'rb+') as f:
+        os.fsync(f.fileno())
+    
+    return {}
+
+
+def bundle_record_zstd(bundle, rec, throttle):
+    """
+    Append record files as independent zstd frame (tar stream) to bundle
+    
+    Returns
+    -------
+    entry : dict
+        Bundle index entry fields (frame offset and length)
+    """
+    
+    with open(bundle, 'ab') as f:
+        offset = f.seek(0, io.SEEK_END)
+        cctx = zstandard.ZstdCompressor(level=10)
+        with cctx.stream_writer(f, closefd=False) as writer:
+            with tarfile.open(fileobj=writer, mode='w|') as tf:
+                for path in sorted(rec['files']):
+                    info = tf.gettarinfo(path, os.path.basename(path))
+                    with ThrottledReader(path, throttle) as fsrc:
+                        tf.addfile(info, io.BufferedReader(fsrc, CHUNK_SIZE))
+        f.flush()
+        os.fsync(f.fileno())
+        length = f.tell() - offset
+    
+    return {'offset': offset, 'length': length}
+
+
+def select_expired(records, policy, now=None):
+    """
+    Select records which exceed retention policy
+    
+    Record is expired if it's older than max_age, if it's not among keep_last
+    newest records or if cumulative size of newer records exceeds max_bytes.
+    
+    Parameters
+    ----------
+    records : iterable of dict
+        Records with timestamp and size
+    policy : dict
+        Retention policy (max_age in days, max_bytes, keep_last)
+    now : float
+        Current timestamp. Default time.time()
+    
+    Returns
+    -------
+    expired : list of dict
+        Expired records
+    """
+    
+    if now is None:
+        now = time.time()
+    
+    max_age = policy.get('max_age')
+    max_bytes = policy.get('max_bytes')
+    keep_last = policy.get('keep_last')
+    
+    expired = []
+    total_bytes = 0
+    for count, rec in enumerate(sorted(records, key=lambda r: r['timestamp'], reverse=True)):
+        total_bytes += rec['size']
+        if (max_age is not None and now - rec['timestamp'] > max_age * 86400) \
+           or (keep_last is not None and count >= keep_last) \
+           or (max_bytes is not None and total_bytes > max_bytes):
+            expired.append(rec)
+    
+    return expired
+
+
+def apply_policy(archive_path, policy, interrupt=None, now=None, catalog=None):
+    """
+    Compact and apply retention policy to archive directory
+    
+    Records older than compress_after days are packed into per-month bundles
+    (zip or zstd) and recorded in bundle index. Records which exceed
+    retention policy are deleted. Bundles are deleted when all bundled
+    records exceed retention policy. All reads are throttled to io_rate.
+    Catalog rows of compacted records point to bundle file, rows of deleted
+    records are deleted.
+    
+    Parameters
+    ----------
+    archive_path : str
+        Path to archive directory
+    policy : dict
+        Retention policy
+    interrupt : threading.Event.Event() object
+        Event() object used to stop processing. Default None
+    now : float
+        Current timestamp. Default time.time()
+    catalog : DeviceCatalog
+        Record catalog (drec.catalog). Default None
+    """
+    
+    if not os.path.isdir(archive_path):
+        return
+    
+    if interrupt is None:
+        interrupt = threading.Event()
+    
+    if now is None:
+        now = time.time()
+    
+    throttle = Throttle(policy.get('io_rate', IO_RATE), interrupt=interrupt)
+    records = loose_records(archive_path)
+    index = read_index(archive_path)
+    
+    # Bundled members per record (record files can be archived in different
+    # cycles, so one record can have more bundle index entries)
+    bundled = {}
+    for e in index:
+        bundled.setdefault((e['bundle'], e['record']), set()).update(e['members'])
+    
+    # Compacted records (catalog)
+    moves = []
+    
+    # Compaction
+    compress_after = policy.get('compress_after')
+    if compress_after is not None:
+        compression = policy.get('compression', 'zip')
+        if compression == 'zstd' and zstandard is None:
+            logger.warning('zstandard module is not installed, using zip compression')
+            compression = 'zip'
+        
+        bundle_dirname = os.path.join(archive_path, BUNDLE_DIRNAME)
+        
+        for key in sorted(records):
+            if interrupt.is_set():
+                break
+            
+            rec = records[key]
+            if now - rec['timestamp'] <= compress_after * 86400:
+                continue
+            
+            os.makedirs(bundle_dirname, mode=0o755, exist_ok=True)
+            month = '{}-{}'.format(rec['trigger_time'][:4], rec['trigger_time'][4:6])
+            bundle_name = month + ('.zip' if compression == 'zip' else '.tar.zst')
+            bundle = os.path.join(bundle_dirname, bundle_name)
+            
+            # Files which are already bundled are only deleted (interrupted
+            # before loose files were deleted), files which arrived later are
+            # bundled as new index entry of record
+            members = bundled.setdefault((bundle_name, key), set())
+            files = [f for f in rec['files'] if os.path.basename(f) not in members]
+            
+            if files:
+                part = dict(rec, files=files, size=sum(os.path.getsize(f) for f in files))
+                if compression == 'zip':
+                    fields = bundle_record_zip(bundle, part, throttle)
+                else:
+                    fields = bundle_record_zstd(bundle, part, throttle)
+                
+                entry = {'record': key,
+                         'trigger_time': rec['trigger_time'],
+                         'timestamp': rec['timestamp'],
+                         'size': part['size'],
+                         'bundle': bundle_name,
+                         'members': sorted(os.path.basename(f) for f in files)}
+                entry.update(fields)
+                index.append(entry)
+                members.update(entry['members'])
+                
+                # Persist index before loose files are deleted
+                append_index(archive_path, entry)
+            
+            for path in rec['files']:
+                os.remove(path)
+            del records[key]
+            moves.append((archive_path, key, bundle))
+            logger.debug('Compacted record %s -> %s', key, bundle)
+    
+    if catalog is not None and moves:
+        catalog.move(moves)
+    
+    if interrupt.is_set():
+        return
+    
+    # Retention
+    if not any(policy.get(key) is not None for key in ('max_age', 'max_bytes', 'keep_last')):
+        return
+    
+    expired = select_expired(list(records.values()) + index, policy, now)
+    
+    # Deleted records (catalog)
+    removes = []
+    
+    # Delete expired loose records
+    for rec in expired:
+        if 'files' in rec:
+            for path in rec['files']:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removes.append((archive_path, rec['record']))
+            logger.info('Retention deleted record %s', rec['record'])
+    
+    # Delete bundles with all records expired
+    expired_bundled = {(e['bundle'], e['record']) for e in expired if 'bundle' in e}
+    bundles = {}
+    for e in index:
+        bundles.setdefault(e['bundle'], []).append((e['bundle'], e['record']) in expired_bundled)
+    
+    delete_bundles = {bundle for bundle, flags in bundles.items() if all(flags)}
+    if delete_bundles:
+        write_index(archive_path, [e for e in index if e['bundle'] not in delete_bundles])
+        for bundle in delete_bundles:
+            try:
+                os.remove(os.path.join(archive_path, BUNDLE_DIRNAME, bundle))
+            except FileNotFoundError:
+                pass
+            removes.append((os.path.join(archive_path, BUNDLE_DIRNAME, bundle), None))
+            logger.info('Retention deleted bundle %s', bundle)
+    
+    if catalog is not None and removes:
+        catalog.remove(removes)
+
+
+class RetentionWorker(threading.Thread):
+    """
+    Background worker which applies retention policies to archive
+    directories
+    """
+    
+    def __init__(self, interval=RETENTION_INTERVAL):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        interval : int
+            Min interval in seconds between runs per archive directory.
+            Default 3600 s
+        """
+        
+        super().__init__(name='drec-retention', daemon=True)
+        
+        self.interval = interval
+        
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._last_run = {}
+        self._lock = threading.Lock()
+        self._interrupt = threading.Event()
+    
+    
+    def put(self, archive_path, policy, catalog=None):
+        """
+        Enqueue archive directory
+        
+        Archive directory is skipped if it's already queued or if it was
+        processed within interval.
+        
+        Parameters
+        ----------
+        archive_path : str
+            Path to archive directory
+        policy : dict
+            Retention policy
+        catalog : DeviceCatalog
+            Record catalog (drec.catalog). Default None
+        
+        Returns
+        -------
+        queued : bool
+            True if archive directory is queued
+        """
+        
+        with self._lock:
+            if archive_path in self._pending:
+                return False
+            if time.monotonic() - self._last_run.get(archive_path, -self.interval) < self.interval:
+                return False
+            self._pending.add(archive_path)
+        
+        self._queue.put((archive_path, policy, catalog))
+        
+        return True
+    
+    
+    def run(self):
+        """
+        Worker loop
+        """
+        
+        while not self._interrupt.is_set():
+            item = self._queue.get()
+            if item is None:
+                break
+            
+            archive_path, policy, catalog = item
+            try:
+                apply_policy(archive_path, policy, self._interrupt, catalog=catalog)
+            except:
+                logger.exception('Retention failed %s', archive_path)
+            finally:
+                with self._lock:
+                    self._pending.discard(archive_path)
+                    self._last_run[archive_path] = time.monotonic()
+    
+    
+    def stop(self, interrupt=True, timeout=None):
+        """
+        Stop worker
+        
+        Parameters
+        ----------
+        interrupt : bool
+            Interrupt current archive directory processing. If False queued
+            archive directories are processed before worker stops.
+            Default True
+        timeout : float
+            Max time to wait in seconds. Default None
+        """
+        
+        if interrupt:
+            self._interrupt.set()
+        self._queue.put(None)
+        self.join(timeout)
+
+
+# Retention worker instance
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_retention_worker():
+    """
+    Return running retention worker
+    
+    Worker is started on first call.
+    
+    Returns
+    -------
+    worker : RetentionWorker
+        Retention worker
+    """
+    
+    global _worker
+    
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = RetentionWorker()
+            _worker.start()
+        
+        return _worker
+
+
+def shutdown(interrupt=True, timeout=None):
+    """
+    Stop retention worker
+    
+    Parameters
+    ----------
+    interrupt : bool
+        Interrupt processing. If False queued archive directories are
+        processed before worker stops. Default True
+    timeout : float
+        Max time to wait in seconds. Default None
+    """
+    
+    global _worker
+    
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            _worker.stop(interrupt, timeout)
+        _worker = None
@@ -0,0 +1,210 @@
+import logging
+import threading
+from time import monotonic
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.scheduler')
+
+
+# Schedule policy parameters
+POLICY_KEYS = ('cycle_time', 'device_time', 'device_bytes')
+
+
+def merge_policy(general, device):
+    """
+    Merge GENERAL and DEVICE schedule policy
+    
+    Device policy parameters supersede general policy parameters.
+    
+    Parameters
+    ----------
+    general : dict or None
+        Schedule policy from GENERAL section
+    device : dict or None
+        Schedule policy from DEVICE section
+    
+    Returns
+    -------
+    policy : dict
+        Merged schedule policy
+    """
+    
+    policy = {}
+    for p in (general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY_KEYS})
+    
+    return policy
+
+
+class Budget:
+    """
+    Download budget of one device in one cycle
+    
+    Budget is exhausted when device time or byte budget is used or cycle
+    deadline is reached. Download loops check budget before each record, so
+    record which is already started is always completed and records which
+    are not started are deferred to the next cycle.
+    """
+    
+    def __init__(self, seconds=0, nbytes=0, deadline=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        seconds : float
+            Time budget in seconds. Default 0 (unlimited)
+        nbytes : int
+            Byte budget. Default 0 (unlimited)
+        deadline : float
+            Cycle deadline (time.monotonic). Default None
+        """
+        
+        self.seconds = seconds
+        self.nbytes = nbytes
+        self.deadline = deadline
+        
+        self.start = monotonic()
+        self.used_bytes = 0
+    
+    
+    def consume(self, nbytes):
+        """
+        Add number of downloaded bytes
+        """
+        
+        self.used_bytes += nbytes
+    
+    
+    def exhausted(self):
+        """
+        Return True if no new record should be started
+        """
+        
+        now = monotonic()
+        
+        if self.deadline is not None and now >= self.deadline:
+            return True
+        
+        if self.seconds and now - self.start >= self.seconds:
+            return True
+        
+        if self.nbytes and self.used_bytes >= self.nbytes:
+            return True
+        
+        return False
+
+
+class CycleScheduler:
+    """
+    Cycle deadline scheduler of devices in one config file
+    
+    Devices are served round robin. When cycle deadline is reached remaining
+    devices are skipped and served first in the next cycle, so every device
+    is polled within bounded number of cycles even if some devices have
+    large backlog.
+    """
+    
+    def __init__(self):
+        """
+        Initialization
+        """
+        
+        self._next = 0
+        self._count = 0
+        self._deadline = None
+    
+    
+    def start(self, count, cycle_time=0):
+        """
+        Start cycle
+        
+        Parameters
+        ----------
+        count : int
+            Number of devices
+        cycle_time : float
+            Cycle time budget in seconds. Default 0 (unlimited)
+        
+        Returns
+        -------
+        order : list of int
+            Device indexes in service order
+        """
+        
+        self._count = count
+        self._deadline = monotonic() + cycle_time if cycle_time else None
+        
+        first = self._next % count if count else 0
+        
+        return list(range(first, count)) + list(range(first))
+    
+    
+    def expired(self):
+        """
+        Return True if cycle deadline is reached
+        """
+        
+        return self._deadline is not None and monotonic() >= self._deadline
+    
+    
+    def budget(self, seconds=0, nbytes=0):
+        """
+        Return download budget of device
+        
+        Parameters
+        ----------
+        seconds : float
+            Device time budget in seconds. Default 0 (unlimited)
+        nbytes : int
+            Device byte budget. Default 0 (unlimited)
+        
+        Returns
+        -------
+        budget : Budget
+            Device budget limited by cycle deadline
+        """
+        
+        return Budget(seconds, nbytes, self._deadline)
+    
+    
+    def served(self, index):
+        """
+        Mark device as served (next cycle starts after last served device)
+        """
+        
+        self._next = index + 1
+
+
+# Scheduler registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_scheduler(key):
+    """
+    Return cycle scheduler of config file
+    
+    Scheduler is created on first call and reused during the lifetime of the
+    process.
+    
+    Parameters
+    ----------
+    key : str
+        Config file path
+    
+    Returns
+    -------
+    scheduler : CycleScheduler
+        Cycle scheduler
+    """
+    
+    with _registry_lock:
+        scheduler = _registry.get(key)
+        if scheduler is None:
+            scheduler = CycleScheduler()
+            _registry[key] = scheduler
+        
+        return scheduler
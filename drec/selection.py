@@ -0,0 +1,306 @@
+import os
+import re
+import zipfile
+import logging
+
+# Import checksum helpers
+from .integrity import CHECKSUM
+from .integrity import new_hasher
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.selection')
+
+
+# Complete record representations (variant: required extensions, optional
+# extensions). Canonical layout is CFG and DAT files
+VARIANTS = {
+    'cfg': (('.cfg', '.dat'), ('.hdr', '.inf')),
+    'cff': (('.cff',), ()),
+    'zip': (('.zip',), ())
+}
+
+# Default record representation selection policy
+# prefer - variant order used if listed sizes are equal or unknown (size 0)
+# expand - selected ZIP or CFF file is expanded to CFG and DAT files named
+#          after device CFG and DAT files of record
+POLICY = {
+    'prefer': ['zip', 'cff', 'cfg'],
+    'expand': False
+}
+
+# Section header of CFF file (--- file type: DAT BINARY: <number of bytes> ---)
+CFF_SECTION = re.compile(rb'--- *file type: *(CFG|INF|HDR|DAT)\b([^\r\n]*)\r?\n', re.IGNORECASE)
+
+
+def merge_policy(general, device):
+    """
+    Merge GENERAL and DEVICE selection policy with default policy
+    
+    Device policy parameters supersede general policy parameters.
+    
+    Parameters
+    ----------
+    general : dict or None
+        Selection policy from GENERAL section
+    device : dict or None
+        Selection policy from DEVICE section
+    
+    Returns
+    -------
+    policy : dict or None
+        Merged selection policy or None if all record files are downloaded
+    """
+    
+    if general is None and device is None:
+        return None
+    
+    policy = dict(POLICY)
+    for p in (general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY})
+    
+    return policy
+
+
+def variants(dist_rec):
+    """
+    Return complete representations of record
+    
+    Parameters
+    ----------
+    dist_rec : list of tuples
+        Record files (dev_path, dev_size, dev_timestamp)
+    
+    Returns
+    -------
+    variants : dict
+        Variant name (cfg, cff or zip) -> record files of variant in record
+        order
+    """
+    
+    extensions = {os.path.splitext(dev_path)[1].lower() for dev_path, dev_size, dev_timestamp in dist_rec}
+    
+    found = {}
+    for name, (required, optional) in VARIANTS.items():
+        if extensions.issuperset(required):
+            found[name] = [f for f in dist_rec if os.path.splitext(f[0])[1].lower() in required + optional]
+    
+    return found
+
+
+def select(dist_rec, prefer=POLICY['prefer']):
+    """
+    Select the cheapest complete representation of record
+    
+    Variant with the smallest listed size is selected. Variants with
+    unknown size (device lists size 0) are selected only if no variant has
+    known size. Equal and unknown sizes are ordered by preference.
+    
+    Parameters
+    ----------
+    dist_rec : list of tuples
+        Record files (dev_path, dev_size, dev_timestamp)
+    prefer : list of str
+        Variant order. Default ['zip', 'cff', 'cfg']
+    
+    Returns
+    -------
+    variant : str or None
+        Selected variant or None if record is not complete
+    files : list of tuples
+        Record files of selected variant (all record files if record is
+        listed in one format or it is not complete)
+    """
+    
+    found = variants(dist_rec)
+    
+    if len(found) < 2:
+        return next(iter(found), None), dist_rec
+    
+    def cost(name):
+        sizes = [int(dev_size) for dev_path, dev_size, dev_timestamp in found[name]]
+        rank = prefer.index(name) if name in prefer else len(prefer)
+        return (not all(sizes), sum(sizes) if all(sizes) else 0, rank)
+    
+    name = min(found, key=cost)
+    
+    return name, found[name]
+
+
+def split_cff(data):
+    """
+    Split CFF file into sections
+    
+    Parameters
+    ----------
+    data : bytes
+        CFF file content
+    
+    Returns
+    -------
+    sections : dict
+        Extension (.cfg, .inf, .hdr or .dat) -> section content. Empty
+        sections are omitted
+    """
+    
+    sections = {}
+    
+    match = CFF_SECTION.search(data)
+    while match is not None:
+        ext = '.' + match.group(1).decode().lower()
+        
+        # DAT section is the last section (binary content is not searched)
+        if ext == '.dat':
+            content = data[match.end():]
+            if b':' in match.group(2):
+                content = content[:int(match.group(2).rsplit(b':', 1)[1].strip(b' -'))]
+            next_match = None
+        else:
+            next_match = CFF_SECTION.search(data, match.end())
+            content = data[match.end():next_match.start() if next_match is not None else len(data)]
+        
+        if content:
+            sections[ext] = content
+        match = next_match
+    
+    return sections
+
+
+def expand_targets(dist_rec, prefix):
+    """
+    Return local paths of expanded files
+    
+    Expanded files are named after device CFG variant files of record, so
+    they are matched by device listing and are not archived.
+    
+    Parameters
+    ----------
+    dist_rec : list of tuples
+        All record files (dev_path, dev_size, dev_timestamp)
+    prefix : str
+        Local path prefix (local directory and trigger time)
+    
+    Returns
+    -------
+    targets : dict
+        Extension -> local path. Empty if record is not listed as CFG and
+        DAT files
+    """
+    
+    files = variants(dist_rec).get('cfg', [])
+    
+    return {os.path.splitext(dev_path)[1].lower(): prefix + os.path.basename(dev_path.replace('\\', '/')) for dev_path, dev_size, dev_timestamp in files}
+
+
+def expand(path, targets, algorithm=CHECKSUM):
+    """
+    Expand ZIP or CFF file into CFG and DAT files
+    
+    Expanded files get modification time of source file.
+    
+    Parameters
+    ----------
+    path : str
+        Path to local ZIP (with CFG and DAT files or CFF file) or CFF file
+    targets : dict
+        Extension -> local path of expanded file (expand_targets).
+        Extensions which are not set are not expanded
+    algorithm : str
+        Checksum algorithm. Default CHECKSUM
+    
+    Returns
+    -------
+    expanded : list of tuples
+        Expanded files (path, size, digest)
+    
+    Raises
+    ------
+    ValueError
+        if file is not valid ZIP or CFF file or it doesn't contain CFG and
+        DAT content
+    """
+    
+    ext = os.path.splitext(path)[1].lower()
+    
+    if ext == '.zip':
+        try:
+            with zipfile.ZipFile(path) as comtrade_zip:
+                names = {os.path.splitext(name)[1].lower(): name for name in comtrade_zip.namelist()}
+                if '.cff' in names:
+                    sections = split_cff(comtrade_zip.read(names['.cff']))
+                else:
+                    sections = {e: comtrade_zip.read(name) for e, name in names.items() if e in VARIANTS['cfg'][0] + VARIANTS['cfg'][1]}
+        except zipfile.BadZipFile as err:
+            raise ValueError('Invalid ZIP file {}: {}'.format(path, err))
+    elif ext == '.cff':
+        with open(path, 'rb') as f:
+            sections = split_cff(f.read())
+    else:
+        raise ValueError('Not expandable file {}'.format(path))
+    
+    if not all(e in sections for e in VARIANTS['cfg'][0]):
+        raise ValueError('CFG or DAT content not found in {}'.format(path))
+    
+    mtime = os.path.getmtime(path)
+    
+    expanded = []
+    for e, content in sections.items():
+        if e not in targets:
+            continue
+        
+        hasher = new_hasher(algorithm)
+        hasher.update(content)
+        
+        tmp_path = targets[e] + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.utime(tmp_path, (mtime, mtime))
+        os.replace(tmp_path, targets[e])
+        
+        expanded.append((targets[e], len(content), hasher.hexdigest()))
+    
+    return expanded
+
+
+class RecordSelector:
+    """
+    Record representation selection
+    
+    Some devices list the same record as CFG and DAT files, CFF file and
+    ZIP file. Only the cheapest complete representation is downloaded,
+    device cleanup still deletes all representations of record.
+    """
+    
+    def __init__(self, prefer=POLICY['prefer'], expand=POLICY['expand']):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        prefer : list of str
+            Variant order used if listed sizes are equal or unknown.
+            Default ['zip', 'cff', 'cfg']
+        expand : bool
+            Expand selected ZIP or CFF file to CFG and DAT files.
+            Default False
+        """
+        
+        self.prefer = list(prefer)
+        self.expand = expand
+    
+    
+    def select(self, dist_rec):
+        """
+        Return selected variant and its record files (select)
+        """
+        
+        return select(dist_rec, self.prefer)
+    
+    
+    def files(self, dist_rec):
+        """
+        Return record files of selected variant (select)
+        """
+        
+        return select(dist_rec, self.prefer)[1]
@@ -0,0 +1,204 @@
+import os
+import logging
+import threading
+import time
+
+# Import staging group key
+from .staging import group_key
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.stability')
+
+
+# Extensions of complete record (CFG and DAT pair, CFF or ZIP)
+COMPLETE_SETS = (('.cfg', '.dat'), ('.cff',), ('.zip',))
+
+# Extensions of record member files (group without member file is not a
+# record, e.g. settings or log file)
+RECORD_EXTENSIONS = frozenset(ext for complete_set in COMPLETE_SETS for ext in complete_set)
+
+# Default settle time in seconds (0 - record is stable only when it is
+# unchanged since previous listing)
+SETTLE_TIME = 60
+
+
+def is_complete(dist_rec):
+    """
+    Return True if record group contains all files of the record
+    
+    Parameters
+    ----------
+    dist_rec : list of tuples
+        Record files (dev_path, dev_size, dev_timestamp)
+    
+    Returns
+    -------
+    complete : bool
+        True if group contains CFG and DAT files, CFF file or ZIP file
+    """
+    
+    extensions = {os.path.splitext(dev_path)[1].lower() for dev_path, dev_size, dev_timestamp in dist_rec}
+    
+    return any(extensions.issuperset(complete_set) for complete_set in COMPLETE_SETS)
+
+
+def is_record(dist_rec):
+    """
+    Return True if group contains record member file
+    
+    Parameters
+    ----------
+    dist_rec : list of tuples
+        Record files (dev_path, dev_size, dev_timestamp)
+    
+    Returns
+    -------
+    record : bool
+        True if group contains CFG, DAT, CFF or ZIP file
+    """
+    
+    return any(os.path.splitext(dev_path)[1].lower() in RECORD_EXTENSIONS for dev_path, dev_size, dev_timestamp in dist_rec)
+
+
+def is_changed(dev_path, dev_size, index, manifest):
+    """
+    Return True if device size of downloaded file changed
+    
+    Device may list file before it is completely written (partial size or
+    size 0). Downloaded file is compared with device size saved in download
+    manifest. Device size 0 is not compared (some devices always list size 0).
+    
+    Parameters
+    ----------
+    dev_path : str
+        Device file path
+    dev_size : int
+        Listed device file size
+    index : LocalDirIndex
+        Local directory index (drec.index)
+    manifest : Manifest
+        Download manifest (drec.manifest)
+    
+    Returns
+    -------
+    changed : bool
+        True if file has to be downloaded again
+    """
+    
+    if not int(dev_size):
+        return False
+    
+    entry = index.find(os.path.basename(dev_path))
+    if entry is None:
+        return False
+    
+    attrs = manifest.get(os.path.basename(entry[0]))
+    if attrs is None or attrs.get('dev_path') != dev_path:
+        return False
+    
+    return attrs.get('dev_size') != int(dev_size)
+
+
+class RecordStability:
+    """
+    Stability of device records between listings
+    
+    Record is stable when it is complete (is_complete) and its file sizes
+    and timestamps are unchanged since the previous listing or its newest
+    file is older than settle time. Records which are not stable are still
+    being written by device and are downloaded in one of the next cycles.
+    Groups without record member file (settings, logs, lone HDR or INF
+    file) can't be completed and they are not checked for completeness.
+    """
+    
+    def __init__(self, settle_time=SETTLE_TIME):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        settle_time : float
+            Settle time in seconds. Default 60 s
+        """
+        
+        self.settle_time = settle_time
+        
+        self._lock = threading.Lock()
+        self._listing = {}
+    
+    
+    def settled(self, dist_recs, now=None):
+        """
+        Return keys of stable records and remember listing
+        
+        Parameters
+        ----------
+        dist_recs : list of list of tuples
+            Grouped device file list (group_dev_file_list)
+        now : float
+            Current time. Default time.time()
+        
+        Returns
+        -------
+        keys : set
+            Group keys of stable records (drec.staging.group_key)
+        """
+        
+        now = time.time() if now is None else now
+        keys = set()
+        listing = {}
+        
+        with self._lock:
+            for dist_rec in dist_recs:
+                key = group_key(dist_rec)
+                signature = tuple((dev_path, int(dev_size), dev_timestamp) for dev_path, dev_size, dev_timestamp in dist_rec)
+                listing[key] = signature
+                
+                if not is_complete(dist_rec) and is_record(dist_rec):
+                    continue
+                
+                # Note: Age is not checked with settle time 0 (timestamp of file being written may be old)
+                if self._listing.get(key) == signature or (self.settle_time > 0 and now - max(s[2] for s in signature) >= self.settle_time):
+                    keys.add(key)
+            
+            self._listing = listing
+        
+        return keys
+
+
+# Record stability registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_stability(dirname, settle_time=SETTLE_TIME):
+    """
+    Return record stability of device
+    
+    Record stability is created on first call and reused during the
+    lifetime of the process, so listings of consecutive cycles are compared.
+    
+    Parameters
+    ----------
+    dirname : str
+        Path to local directory
+    settle_time : float
+        Settle time in seconds. Default 60 s
+    
+    Returns
+    -------
+    stability : RecordStability
+        Record stability
+    """
+    
+    dirname = os.path.abspath(dirname)
+    
+    with _registry_lock:
+        stability = _registry.get(dirname)
+        if stability is None:
+            stability = RecordStability(settle_time)
+            _registry[dirname] = stability
+        stability.settle_time = settle_time
+        
+        return stability
@@ -0,0 +1,284 @@
+import os
+import json
+import shutil
+import logging
+import time
+
+# Import checksum helpers
+from .integrity import file_digest
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.staging')
+
+
+# Staging directory within local directory
+STAGING_DIRNAME = '.tmp'
+
+# Completion marker suffix (marker is hidden file .<basename>.done)
+MARKER_SUFFIX = '.done'
+
+# Staged groups older than max age in seconds are removed
+STAGING_MAX_AGE = 86400
+
+# Device timestamps within window in seconds around listing time are not
+# compared on resume (device lists listing time instead of file time: FTP
+# NLST without MDTM, GE C70)
+LISTING_WINDOW = 300
+
+
+def group_key(dist_rec):
+    """
+    Return staging key of disturbance record group
+    
+    Parameters
+    ----------
+    dist_rec : list of tuples
+        Record files (dev_path, dev_size, dev_timestamp)
+    
+    Returns
+    -------
+    key : str
+        Common basename of record files without extension
+    """
+    
+    return os.path.splitext(os.path.basename(dist_rec[0][0].replace('\\', '/')))[0]
+
+
+def stable_timestamp(dev_timestamp, listed):
+    """
+    Return True if device timestamp identifies file version
+    
+    Timestamp 0 (not listed) and timestamp close to listing time (device
+    lists listing time) change between listings.
+    
+    Parameters
+    ----------
+    dev_timestamp : float
+        Device file timestamp
+    listed : float or None
+        Listing time (None if not known)
+    
+    Returns
+    -------
+    stable : bool
+        True if timestamp is compared
+    """
+    
+    return bool(dev_timestamp) and (listed is None or abs(dev_timestamp - listed) > LISTING_WINDOW)
+
+
+class StagedGroup:
+    """
+    Staging directory of one disturbance record group
+    
+    Files of a group are downloaded to .tmp/<group key>/ and each
+    completely received file gets completion marker with device size,
+    timestamp and checksum. Staging directory is kept between download
+    attempts and restarts, so retry downloads only missing or incomplete
+    files of the group. Device timestamp is compared only if it's stable
+    (stable_timestamp) in both listings.
+    """
+    
+    def __init__(self, staging_dirname, dist_rec, listed=None):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        staging_dirname : str
+            Path to staging directory (.tmp)
+        dist_rec : list of tuples
+            Record files (dev_path, dev_size, dev_timestamp)
+        listed : float
+            Time when device file directory was read. Default None
+            (timestamp 0 is not stable)
+        """
+        
+        self.path = os.path.join(staging_dirname, group_key(dist_rec))
+        self.listed = listed
+        
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+    
+    
+    def _marker_path(self, basename):
+        return os.path.join(self.path, '.' + basename + MARKER_SUFFIX)
+    
+    
+    def completed(self, dev_path, dev_size, dev_timestamp, algorithm):
+        """
+        Return checksum of completely received file
+        
+        Incomplete file or file which changed on device (size or timestamp)
+        is removed.
+        
+        Parameters
+        ----------
+        dev_path : str
+            Device file path
+        dev_size : int
+            Device file size
+        dev_timestamp : float
+            Device file timestamp
+        algorithm : str
+            Checksum algorithm of current download
+        
+        Returns
+        -------
+        checksum : tuple or None
+            (dev_path, dev_size, local_size, digest) or None if file has to be
+            downloaded
+        """
+        
+        basename = os.path.basename(dev_path)
+        path = os.path.join(self.path, basename)
+        marker_path = self._marker_path(basename)
+        
+        try:
+            with open(marker_path, 'r', encoding='utf-8') as f:
+                marker = json.load(f)
+            valid = (marker['dev_path'] == dev_path and
+                     marker['dev_size'] == int(dev_size) and
+                     os.path.getsize(path) == marker['size'])
+            
+            # Note: Timestamp which changes between listings isn't compared
+            if (stable_timestamp(marker['dev_timestamp'], marker.get('listed')) and
+                    stable_timestamp(dev_timestamp, self.listed)):
+                valid = valid and marker['dev_timestamp'] == dev_timestamp
+        except (OSError, ValueError, KeyError):
+            valid = False
+        
+        if not valid:
+            for p in (path, marker_path):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+            return None
+        
+        digest = marker['digest']
+        if marker['algorithm'] != algorithm:
+            digest = file_digest(path, algorithm)
+        
+        return (dev_path, int(dev_size), marker['size'], digest)
+    
+    
+    def mark_done(self, basename, checksum, dev_timestamp, algorithm):
+        """
+        Write completion marker of received file
+        
+        Parameters
+        ----------
+        basename : str
+            File basename
+        checksum : tuple
+            (dev_path, dev_size, local_size, digest)
+        dev_timestamp : float
+            Device file timestamp
+        algorithm : str
+            Checksum algorithm
+        """
+        
+        dev_path, dev_size, local_size, digest = checksum
+        marker = {
+            'dev_path': dev_path,
+            'dev_size': dev_size,
+            'dev_timestamp': dev_timestamp,
+            'listed': self.listed,
+            'size': local_size,
+            'algorithm': algorithm,
+            'digest': digest
+        }
+        
+        marker_path = self._marker_path(basename)
+        tmp_path = marker_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(marker, f, sort_keys=True)
+        os.replace(tmp_path, marker_path)
+    
+    
+    def files(self):
+        """
+        Return basenames of staged files (markers are excluded)
+        """
+        
+        return [f for f in os.listdir(self.path)
+                if not f.startswith('.') and os.path.isfile(os.path.join(self.path, f))]
+    
+    
+    def remove(self):
+        """
+        Remove staging directory of finalized group
+        """
+        
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def staged_keys(staging_dirname):
+    """
+    Return keys of groups with at least one completely received file
+    
+    Parameters
+    ----------
+    staging_dirname : str
+        Path to staging directory (.tmp)
+    
+    Returns
+    -------
+    keys : set
+        Group keys
+    """
+    
+    keys = set()
+    if not os.path.isdir(staging_dirname):
+        return keys
+    
+    with os.scandir(staging_dirname) as it:
+        for entry in it:
+            if entry.is_dir() and any(f.endswith(MARKER_SUFFIX) for f in os.listdir(entry.path)):
+                keys.add(entry.name)
+    
+    return keys
+
+
+def gc(staging_dirname, max_age=STAGING_MAX_AGE, now=None):
+    """
+    Remove stale staging directories
+    
+    Group directories which were not modified for max_age seconds (group
+    was removed from device or device is not reachable anymore) and files
+    in staging directory root (previous staging layout) are removed.
+    
+    Parameters
+    ----------
+    staging_dirname : str
+        Path to staging directory (.tmp)
+    max_age : float
+        Max age in seconds. Default 1 day
+    now : float
+        Current time. Default time.time()
+    
+    Returns
+    -------
+    count : int
+        Number of removed groups and files
+    """
+    
+    if not os.path.isdir(staging_dirname):
+        return 0
+    
+    now = time.time() if now is None else now
+    count = 0
+    
+    with os.scandir(staging_dirname) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if now - entry.stat().st_mtime > max_age:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    logger.debug('Removed stale staging directory %s', entry.path)
+                    count += 1
+            else:
+                os.remove(entry.path)
+                count += 1
+    
+    return count
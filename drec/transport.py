@@ -0,0 +1,251 @@
+import os
+import json
+import logging
+import time
+
+# Import download manifest state directory
+from .manifest import STATE_DIRNAME
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.transport')
+
+
+# MMS transport profile file name within local state directory
+PROFILE_FILENAME = 'mms_profile.json'
+
+# Default MMS transport policy
+# max_pdu_size - max MMS PDU size in bytes proposed to IED (0 - library
+#                default)
+# max_outstanding - max outstanding requests proposed to IED (0 - library
+#                   default)
+POLICY = {
+    'max_pdu_size': 0,
+    'max_outstanding': 0
+}
+
+# Candidate max PDU sizes in bytes (probe)
+PDU_SIZES = (8192, 16384, 32768, 65000)
+
+# Candidate numbers of files read at the same time (probe)
+PIPELINES = (1, 2, 4)
+
+# Max number of bytes downloaded per probe candidate
+PROBE_BYTES = 1000000
+
+
+def merge_policy(general, device, profile=None):
+    """
+    Merge GENERAL and DEVICE MMS transport policy with probed profile and
+    default policy
+    
+    Device policy parameters supersede general policy parameters and
+    configured parameters supersede probed profile.
+    
+    Parameters
+    ----------
+    general : dict or None
+        MMS transport policy from GENERAL section
+    device : dict or None
+        MMS transport policy from DEVICE section
+    profile : dict or None
+        Probed profile of device (load_profile). Default None
+    
+    Returns
+    -------
+    policy : dict or None
+        Merged MMS transport policy or None if library defaults are used
+    """
+    
+    if general is None and device is None and profile is None:
+        return None
+    
+    policy = dict(POLICY)
+    for p in (profile, general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY})
+    
+    return policy
+
+
+def profile_path(local_dirname):
+    """
+    Return path to MMS transport profile of device
+    """
+    
+    return os.path.join(local_dirname, STATE_DIRNAME, PROFILE_FILENAME)
+
+
+def load_profile(local_dirname):
+    """
+    Load probed MMS transport profile of device
+    
+    Parameters
+    ----------
+    local_dirname : str
+        Path to local directory
+    
+    Returns
+    -------
+    profile : dict or None
+        max_pdu_size, max_outstanding, pipeline and probe results or None if
+        device is not probed
+    """
+    
+    path = profile_path(local_dirname)
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logger.warning('Invalid MMS transport profile %s', path)
+        return None
+    
+    return profile if isinstance(profile, dict) else None
+
+
+def save_profile(local_dirname, profile):
+    """
+    Save probed MMS transport profile of device
+    
+    Parameters
+    ----------
+    local_dirname : str
+        Path to local directory
+    profile : dict
+        MMS transport profile
+    """
+    
+    path = profile_path(local_dirname)
+    os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+    
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def probe_files(dev_file_list, limit=PROBE_BYTES):
+    """
+    Return device files downloaded by probe
+    
+    Largest files which fit into limit are selected (throughput is not
+    dominated by per-file requests). Smallest file is selected if no file
+    fits into limit.
+    
+    Parameters
+    ----------
+    dev_file_list : iterable of tuples
+        Device files (dev_path, dev_size, dev_timestamp)
+    limit : int
+        Max total size in bytes. Default 1 MB
+    
+    Returns
+    -------
+    files : list of tuples
+        Selected device files
+    """
+    
+    files = sorted((f for f in dev_file_list if int(f[1]) > 0), key=lambda f: int(f[1]), reverse=True)
+    
+    selected = []
+    total = 0
+    for f in files:
+        if total + int(f[1]) <= limit:
+            selected.append(f)
+            total += int(f[1])
+    
+    if not selected and files:
+        selected.append(files[-1])
+    
+    return selected
+
+
+def probe(measure, pdu_sizes=PDU_SIZES, pipelines=PIPELINES, interrupt=None):
+    """
+    Measure throughput of candidate MMS transport settings
+    
+    Max PDU sizes are probed first with files read one after another, then
+    numbers of files read at the same time with the fastest PDU size.
+    Failed candidate has zero throughput. First candidate wins on equal
+    throughput (smaller PDU size and fewer outstanding requests).
+    
+    Parameters
+    ----------
+    measure : callable
+        Called with max_pdu_size, max_outstanding and pipeline keyword
+        arguments, downloads probe files over new association and returns
+        (bytes, seconds). Raises ConnectionError or OSError on failure
+    pdu_sizes : iterable of int
+        Candidate max PDU sizes. Default PDU_SIZES
+    pipelines : iterable of int
+        Candidate numbers of files read at the same time. Default PIPELINES
+    interrupt : threading.Event.Event() object
+        Probe stops if interrupt flag is set. Default None
+    
+    Returns
+    -------
+    best : dict or None
+        Fastest candidate (max_pdu_size, max_outstanding, pipeline) or None
+        if all candidates failed
+    results : list of tuples
+        (candidate, throughput in bytes per second) per probed candidate
+    """
+    
+    results = []
+    
+    def run(candidate):
+        if interrupt is not None and interrupt.is_set():
+            return
+        
+        try:
+            size, seconds = measure(**candidate)
+            throughput = size / seconds if seconds > 0 else 0
+        except (ConnectionError, OSError) as err:
+            logger.warning('Probe %s failed: %s', candidate, err)
+            throughput = 0
+        
+        logger.info('Probe max PDU size %s, pipeline %s: %.1f kB/s', candidate['max_pdu_size'], candidate['pipeline'], throughput / 1000)
+        results.append((candidate, throughput))
+    
+    for size in pdu_sizes:
+        run({'max_pdu_size': size, 'max_outstanding': POLICY['max_outstanding'], 'pipeline': 1})
+    
+    if not results or max(r[1] for r in results) <= 0:
+        return None, results
+    
+    max_pdu_size = max(results, key=lambda r: r[1])[0]['max_pdu_size']
+    
+    for pipeline in pipelines:
+        if pipeline != 1:
+            run({'max_pdu_size': max_pdu_size, 'max_outstanding': pipeline, 'pipeline': pipeline})
+    
+    return max(results, key=lambda r: r[1])[0], results
+
+
+def new_profile(best, results, now=None):
+    """
+    Return MMS transport profile of probe results
+    
+    Parameters
+    ----------
+    best : dict
+        Fastest candidate (probe)
+    results : list of tuples
+        Probe results (probe)
+    now : float
+        Current time. Default time.time()
+    
+    Returns
+    -------
+    profile : dict
+        max_pdu_size, max_outstanding, pipeline, throughput in bytes per
+        second, probe time and results
+    """
+    
+    return dict(best,
+                throughput=max(r[1] for r in results),
+                probed=time.time() if now is None else now,
+                results=[dict(candidate, throughput=throughput) for candidate, throughput in results])
@@ -0,0 +1,186 @@
+import re
+import json
+import fnmatch
+import logging
+import threading
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.vendor')
+
+
+# Default vendor profile
+# include - device file path globs which are listed (empty - all files)
+# exclude - device file path globs which are not listed (logs, settings, ...)
+# priority - extension order of record files (first file of record is
+#            record header)
+# duplicates - duplicate formats [drop, keep]: file ending with drop suffix is
+#              not listed if file with keep suffix instead of drop suffix is
+#              listed (ABB zipped HDR file REC001h.zip next to REC001.zip)
+# trigger_time - regular expression with named groups year, month, day, hour,
+#                minute and second matched against device file name. Used for
+#                local file name if trigger time can't be read from record
+#                header (instead of file modification time)
+POLICY = {
+    'include': [],
+    'exclude': [],
+    'priority': ['.cfg', '.cff', '.zip', '.dat', '.hdr', '.inf'],
+    'duplicates': [['h.zip', '.zip']],
+    'trigger_time': None
+}
+
+
+def merge_policy(general, device):
+    """
+    Merge GENERAL and DEVICE vendor profile with default profile
+    
+    Device profile parameters supersede general profile parameters.
+    
+    Parameters
+    ----------
+    general : dict or None
+        Vendor profile from GENERAL section
+    device : dict or None
+        Vendor profile from DEVICE section
+    
+    Returns
+    -------
+    policy : dict
+        Merged vendor profile
+    """
+    
+    policy = dict(POLICY)
+    for p in (general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY})
+    
+    return policy
+
+
+def compile_globs(globs):
+    """
+    Compile file path globs into one case-insensitive regular expression
+    
+    Parameters
+    ----------
+    globs : iterable of str
+        Shell-style globs (fnmatch)
+    
+    Returns
+    -------
+    match : callable or None
+        Match method of compiled regular expression or None if globs are
+        empty
+    """
+    
+    globs = list(globs)
+    if not globs:
+        return None
+    
+    return re.compile('|'.join('(?:{})'.format(fnmatch.translate(g)) for g in globs), re.IGNORECASE).match
+
+
+class VendorProfile:
+    """
+    Compiled vendor profile
+    
+    Include and exclude globs are compiled into one regular expression each
+    and applied to device file paths while listing is read, so files which
+    are not disturbance records are never grouped, checked or downloaded.
+    """
+    
+    def __init__(self, include=POLICY['include'], exclude=POLICY['exclude'], priority=POLICY['priority'], duplicates=POLICY['duplicates'], trigger_time=POLICY['trigger_time']):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        include : list of str
+            Listed device file path globs. Default [] (all files)
+        exclude : list of str
+            Not listed device file path globs. Default []
+        priority : list of str
+            Extension order of record files. Default ['.cfg', '.cff',
+            '.zip', '.dat', '.hdr', '.inf']
+        duplicates : list of [drop, keep]
+            Duplicate format rules. Default [['h.zip', '.zip']] (ABB)
+        trigger_time : str
+            Trigger time regular expression of device file name. Default
+            None
+        
+        Raises
+        ------
+        ValueError
+            if glob or trigger time expression is not valid
+        """
+        
+        try:
+            self._include = compile_globs(include)
+            self._exclude = compile_globs(exclude)
+            self.trigger_pattern = re.compile(trigger_time) if trigger_time else None
+        except re.error as err:
+            raise ValueError('Invalid vendor profile: {}'.format(err))
+        
+        self.priority = tuple(ext.lower() for ext in priority)
+        self.duplicates = tuple((drop.lower(), keep) for drop, keep in duplicates)
+    
+    
+    def accepts(self, path):
+        """
+        Return True if device file is listed
+        
+        Parameters
+        ----------
+        path : str
+            Device file path
+        """
+        
+        path = path.replace('\\', '/')
+        
+        if self._include is not None and self._include(path) is None:
+            return False
+        
+        return self._exclude is None or self._exclude(path) is None
+
+
+# Default vendor profile (ABB zipped HDR files)
+DEFAULT = VendorProfile()
+
+
+# Compiled vendor profile registry
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_profile(policy):
+    """
+    Return compiled vendor profile
+    
+    Profiles are compiled once and reused during the lifetime of the
+    process.
+    
+    Parameters
+    ----------
+    policy : dict
+        Vendor profile (merge_policy)
+    
+    Returns
+    -------
+    profile : VendorProfile
+        Compiled vendor profile
+    
+    Raises
+    ------
+    ValueError
+        if glob or trigger time expression is not valid
+    """
+    
+    key = json.dumps(policy, sort_keys=True)
+    
+    with _registry_lock:
+        profile = _registry.get(key)
+        if profile is None:
+            profile = VendorProfile(**policy)
+            _registry[key] = profile
+        
+        return profile
@@ -0,0 +1,259 @@
+import os
+import json
+import logging
+import threading
+import time
+
+# Import download manifest state directory
+from .manifest import STATE_DIRNAME
+
+
+# Set logger name to module name
+logger = logging.getLogger('drec.watermark')
+
+
+# Watermark file name within local state directory
+WATERMARK_FILENAME = 'watermark.json'
+
+# Default watermark policy
+# spot_check - interval in seconds between full listing checks
+# margin - records newer than watermark minus margin in seconds are checked
+#          (device clock and DST offset changes)
+# continue_after - narrow IEC 61850 listing with MMS continueAfter
+# hold - max time in seconds pending record holds watermark (record which is
+#        never completed on device doesn't pin watermark)
+POLICY = {
+    'spot_check': 86400,
+    'margin': 7200,
+    'continue_after': False,
+    'hold': 86400
+}
+
+
+def merge_policy(general, device):
+    """
+    Merge GENERAL and DEVICE watermark policy with default policy
+    
+    Device policy parameters supersede general policy parameters.
+    
+    Parameters
+    ----------
+    general : dict or None
+        Watermark policy from GENERAL section
+    device : dict or None
+        Watermark policy from DEVICE section
+    
+    Returns
+    -------
+    policy : dict or None
+        Merged watermark policy or None if watermark is not used
+    """
+    
+    if general is None and device is None:
+        return None
+    
+    policy = dict(POLICY)
+    for p in (general, device):
+        if p:
+            policy.update({key: val for key, val in p.items() if key in POLICY})
+    
+    return policy
+
+
+def record_mark(dist_rec):
+    """
+    Return watermark of record
+    
+    Parameters
+    ----------
+    dist_rec : list of tuples
+        Record files (dev_path, dev_size, dev_timestamp)
+    
+    Returns
+    -------
+    mark : tuple
+        (newest LastModified timestamp, first device file name)
+    """
+    
+    return (max(dev_timestamp for dev_path, dev_size, dev_timestamp in dist_rec),
+            min(dev_path for dev_path, dev_size, dev_timestamp in dist_rec))
+
+
+class Watermark:
+    """
+    Listing high-water mark of device
+    
+    Records on device are appended in time. Watermark keeps the newest
+    LastModified timestamp and name of finalized records, so records older
+    than watermark are skipped without checking local state. Full listing is
+    checked periodically (spot check) to find older records which were not
+    downloaded.
+    """
+    
+    def __init__(self, local_dirname, spot_check=POLICY['spot_check'], margin=POLICY['margin'], continue_after=POLICY['continue_after'], hold=POLICY['hold']):
+        """
+        Initialization
+        
+        Parameters
+        ----------
+        local_dirname : str
+            Path to local directory
+        spot_check : float
+            Interval in seconds between full listing checks. Default 1 day
+        margin : float
+            Records newer than watermark minus margin are checked.
+            Default 2 h
+        continue_after : bool
+            Narrow device listing to files after watermark name (IEC 61850
+            MMS continueAfter). Default False
+        hold : float
+            Max time in seconds pending record holds watermark. Default 1 day
+        """
+        
+        self.path = os.path.join(local_dirname, STATE_DIRNAME, WATERMARK_FILENAME)
+        self.spot_check = spot_check
+        self.margin = margin
+        self.continue_after = continue_after
+        self.hold = hold
+        
+        self._lock = threading.Lock()
+        self._state = {'timestamp': None, 'name': None, 'checked': 0, 'pending': {}}
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self._state.update({key: state[key] for key in self._state if key in state})
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            logger.warning('Invalid watermark %s', self.path)
+    
+    
+    @property
+    def timestamp(self):
+        """
+        Newest LastModified timestamp of finalized records or None
+        """
+        
+        return self._state['timestamp']
+    
+    
+    @property
+    def name(self):
+        """
+        Device file name of the newest finalized record or None
+        """
+        
+        return self._state['name']
+    
+    
+    def _save(self):
+        """
+        Save watermark
+        """
+        
+        os.makedirs(os.path.dirname(self.path), mode=0o755, exist_ok=True)
+        
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, sort_keys=True)
+        os.replace(tmp_path, self.path)
+    
+    
+    def due(self, now=None):
+        """
+        Return True if full listing has to be checked (spot check)
+        """
+        
+        now = time.time() if now is None else now
+        
+        return self.timestamp is None or now - self._state['checked'] >= self.spot_check
+    
+    
+    def listing_after(self, now=None):
+        """
+        Return device file name after which listing continues or ''
+        
+        Listing is not narrowed if continueAfter is disabled or spot check is
+        due.
+        """
+        
+        if not self.continue_after or self.due(now):
+            return ''
+        
+        return self.name or ''
+    
+    
+    def filter(self, dist_recs):
+        """
+        Return records newer than watermark minus margin
+        
+        Parameters
+        ----------
+        dist_recs : list of list of tuples
+            Grouped device file list (group_dev_file_list)
+        
+        Returns
+        -------
+        dist_recs : list of list of tuples
+            Records which have to be checked against local state
+        """
+        
+        if self.timestamp is None:
+            return dist_recs
+        
+        limit = self.timestamp - self.margin
+        
+        return [dist_rec for dist_rec in dist_recs if record_mark(dist_rec)[0] >= limit]
+    
+    
+    def advance(self, done, pending=(), now=None):
+        """
+        Move watermark to the newest downloaded record
+        
+        Watermark is not moved past records which are not downloaded yet
+        (deferred or still being written by device). Record which is pending
+        longer than hold time (record is never completed on device) doesn't
+        hold watermark, it's checked again in spot check.
+        
+        Parameters
+        ----------
+        done : list of list of tuples
+            Downloaded records (dev_path, dev_size, dev_timestamp)
+        pending : list of list of tuples
+            Records which are not downloaded yet
+        now : float
+            Current time. Default time.time()
+        """
+        
+        now = time.time() if now is None else now
+        
+        with self._lock:
+            # First time pending per record (first device file name)
+            # Note: Records which are not pending anymore are forgotten
+            held = self._state['pending']
+            pending_marks = [record_mark(dist_rec) for dist_rec in pending]
+            held = {name: held.get(name, now) for timestamp, name in pending_marks}
+            changed = held != self._state['pending']
+            self._state['pending'] = held
+            
+            limit = min((mark for mark in pending_marks if now - held[mark[1]] < self.hold), default=None)
+            marks = [record_mark(dist_rec) for dist_rec in done]
+            marks = [mark for mark in marks if limit is None or mark < limit]
+            
+            if marks and (self.timestamp is None or max(marks) > (self.timestamp, self.name)):
+                self._state['timestamp'], self._state['name'] = max(marks)
+                changed = True
+            
+            if changed:
+                self._save()
+    
+    
+    def checked(self, now=None):
+        """
+        Record completed full listing check
+        """
+        
+        with self._lock:
+            self._state['checked'] = time.time() if now is None else now
+            self._save()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/ftp RETR receive path benchmark
+#
+# Usage: python3 -m tests.bench_ftp_retr [SIZE_MB] [REPEAT]
+###############################################################################
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+import threading
+
+from drec.ftp import ftp
+from tests.test_ftp import FTPStandIn
+
+
+def legacy_retr(client, file_name, local_file_name, hasher=None, size=0, recv_size=None, splice=False):
+    """
+    Previous receive path (retrbinary with 8 KiB blocks and callback)
+    """
+    
+    received = 0
+    
+    with open(local_file_name, 'wb') as f:
+        def write(data):
+            nonlocal received
+            f.write(data)
+            if hasher is not None:
+                hasher.update(data)
+            received += len(data)
+        
+        client.retrbinary('RETR ' + file_name, write)
+    
+    return received
+
+
+def bench(client, retr, size, repeat, dirname, **kwargs):
+    """
+    Return best download throughput in MB/s
+    """
+    
+    best = 0
+    for i in range(repeat):
+        local_path = os.path.join(dirname, 'rec.dat')
+        started = time.perf_counter()
+        received = retr(client, 'rec.dat', local_path, size=size, **kwargs)
+        seconds = time.perf_counter() - started
+        assert received == size
+        os.remove(local_path)
+        best = max(best, size / seconds / 1e6)
+    
+    return best
+
+
+def main(size_mb=128, repeat=3):
+    size = size_mb * 1000 * 1000
+    server = FTPStandIn({'rec.dat': os.urandom(size)})
+    
+    client = ftp.FTPClient(threading.Event())
+    client.connect('127.0.0.1', port=server.port, timeout=30)
+    client.login()
+    
+    cases = (
+        ('retrbinary 8 KiB + sha256', legacy_retr, {'hasher': True}),
+        ('recv_into 64 KiB + sha256', ftp.FTPClient.retr, {'hasher': True, 'recv_size': 64 * 1024}),
+        ('recv_into 1 MiB + sha256', ftp.FTPClient.retr, {'hasher': True, 'recv_size': ftp.RECV_SIZE}),
+        ('retrbinary 8 KiB', legacy_retr, {}),
+        ('recv_into 1 MiB', ftp.FTPClient.retr, {'recv_size': ftp.RECV_SIZE}),
+        ('splice 1 MiB', ftp.FTPClient.retr, {'recv_size': ftp.RECV_SIZE, 'splice': True})
+    )
+    
+    print('RETR {} MB from FTP stand-in, best of {}'.format(size_mb, repeat))
+    with tempfile.TemporaryDirectory() as dirname:
+        for label, retr, kwargs in cases:
+            if kwargs.pop('hasher', False):
+                # New hasher per repeat is not needed for throughput
+                kwargs['hasher'] = hashlib.sha256()
+            print('{:<28}{:>10.1f} MB/s'.format(label, bench(client, retr, size, repeat, dirname, **kwargs)))
+    
+    client.quit()
+    server.close()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
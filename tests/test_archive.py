@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/archive test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import archive
+from drec import catalog
+
+import os
+import errno
+
+
+def test_move_file(tmp_path, monkeypatch):
+    src = tmp_path / 'record.cfg'
+    dst = tmp_path / 'record_archived.cfg'
+    src.write_bytes(b'0123456789')
+    os.utime(src, (1000, 1000))
+    
+    assert archive.move_file(str(src), str(dst))
+    assert not src.exists()
+    assert dst.read_bytes() == b'0123456789'
+    
+    # Cross-device move
+    def rename(src, dst):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+    
+    monkeypatch.setattr(os, 'rename', rename)
+    
+    src = tmp_path / 'record.dat'
+    dst = tmp_path / 'record_archived.dat'
+    src.write_bytes(b'0123456789' * 1000)
+    os.utime(src, (1000, 1000))
+    
+    assert not archive.move_file(str(src), str(dst))
+    assert not src.exists()
+    assert dst.read_bytes() == b'0123456789' * 1000
+    assert int(os.path.getmtime(dst)) == 1000
+
+
+def test_archive_worker(tmp_path):
+    archive_path = str(tmp_path / 'archive')
+    files = []
+    for n in range(10):
+        path = tmp_path / '20010203_040508_record_{}.cfg'.format(n)
+        path.write_bytes(b'')
+        files.append(str(path))
+    
+    worker = archive.ArchiveWorker(batch_size=4)
+    for f in files:
+        assert worker.put(f, archive_path)
+    
+    # Duplicate candidates are not queued twice
+    assert not worker.put(files[0], archive_path)
+    assert worker.is_pending(files[0])
+    
+    worker.start()
+    worker.stop()
+    
+    assert worker.qsize() == 0
+    assert sorted(os.listdir(archive_path)) == sorted(os.path.basename(f) for f in files)
+    assert not any(os.path.exists(f) for f in files)
+
+
+def test_archive_worker_catalog(tmp_path):
+    c = catalog.Catalog(os.path.join(tmp_path, catalog.CATALOG_PATH))
+    local_dirname = str(tmp_path)
+    archive_path = os.path.join(local_dirname, 'archive')
+    files = [os.path.join(local_dirname, name) for name in ('20010203_040508_rec.cfg', '20010203_040508_rec.dat', '20010203_040508_rec.cfg.sha256')]
+    for f in files:
+        open(f, 'w').close()
+    
+    device_catalog = catalog.DeviceCatalog(c, {'device': 'REL670'})
+    device_catalog.add(files[:2])
+    
+    worker = archive.ArchiveWorker()
+    for f in files:
+        worker.put(f, archive_path, device_catalog)
+    worker.start()
+    worker.stop()
+    
+    # Catalog record points to archive directory
+    assert [r['dirname'] for r in c.query()] == [archive_path]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/backfill test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import backfill
+
+
+DIST_RECS = [
+    [('a.cfg', 10, 100.0), ('a.dat', 20, 100.0)],
+    [('b.cfg', 10, 300.0), ('b.dat', 20, 300.0)],
+    [('c.cfg', 10, 200.0), ('c.dat', 20, 200.0)]
+]
+
+
+@pytest.mark.parametrize('seconds, expected',
+                         [
+                             (None, '--:--:--'),
+                             (0, '00:00:00'),
+                             (3725.9, '01:02:05'),
+                             (90000, '25:00:00')
+                         ])
+def test_format_eta(seconds, expected):
+    assert backfill.format_eta(seconds) == expected
+
+
+@pytest.mark.parametrize('order, expectation',
+                         [
+                             ('newest', does_not_raise()),
+                             ('oldest', does_not_raise()),
+                             ('random', pytest.raises(ValueError))
+                         ])
+def test_order(tmp_path, order, expectation):
+    with expectation:
+        backfill.Backfill(str(tmp_path), order)
+
+
+def test_sort(tmp_path):
+    b = backfill.Backfill(str(tmp_path), 'newest')
+    dist_recs = list(DIST_RECS)
+    b.sort(dist_recs)
+    assert [d[0][0] for d in dist_recs] == ['b.cfg', 'c.cfg', 'a.cfg']
+    
+    b = backfill.Backfill(str(tmp_path), 'oldest')
+    b.sort(dist_recs)
+    assert [d[0][0] for d in dist_recs] == ['a.cfg', 'c.cfg', 'b.cfg']
+    
+    # Partially downloaded record first
+    b.sort(dist_recs, {'c'})
+    assert [d[0][0] for d in dist_recs] == ['c.cfg', 'a.cfg', 'b.cfg']
+
+
+def test_checkpoint(tmp_path):
+    b = backfill.Backfill(str(tmp_path))
+    b.start('10.0.0.1', 3, 90)
+    b.file_done(10)
+    b.file_done(20)
+    b.record_done(30)
+    
+    # Checkpoint is loaded after restart
+    assert backfill.Backfill(str(tmp_path)).progress() == {'done_records': 1, 'total_records': 3, 'done_bytes': 30, 'total_bytes': 90}
+
+
+def test_progress_resumed(tmp_path):
+    b = backfill.Backfill(str(tmp_path))
+    b.start('10.0.0.1', 3, 90)
+    b.record_done(30)
+    
+    # Total includes records done before restart
+    b = backfill.Backfill(str(tmp_path))
+    b.start('10.0.0.1', 2, 60)
+    assert b.progress() == {'done_records': 1, 'total_records': 3, 'done_bytes': 30, 'total_bytes': 90}
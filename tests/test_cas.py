@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/cas test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import cas
+
+import os
+import hashlib
+
+
+def create_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_put(tmp_path):
+    store = cas.ContentStore(os.path.join(tmp_path, cas.CAS_DIRNAME))
+    
+    path_1 = os.path.join(tmp_path, '20010203_040508_test.cfg')
+    path_2 = os.path.join(tmp_path, '20010210_040508_test.cfg')
+    digest = create_file(path_1, b'test data')
+    create_file(path_2, b'test data')
+    
+    assert store.put(path_1, 'sha256', digest) is False
+    assert store.contains('sha256', digest)
+    assert store.put(path_1, 'sha256', digest) is False
+    assert store.put(path_2, 'sha256', digest) is True
+    
+    assert os.path.samefile(path_1, path_2)
+    assert os.stat(path_1).st_nlink == 3
+    assert open(path_2, 'rb').read() == b'test data'
+
+
+def test_probe(tmp_path):
+    store = cas.ContentStore(os.path.join(tmp_path, cas.CAS_DIRNAME))
+    
+    path = os.path.join(tmp_path, '20010203_040508_test.dat')
+    digest = create_file(path, b'0' * 10000)
+    key = cas.probe_key(10000, 981173108.5, hashlib.sha256(b'0' * cas.PROBE_SIZE).hexdigest(), 'sha256')
+    
+    # Probe is unknown until content is stored
+    store.add_probe(key, digest)
+    assert store.lookup_probe(key, 'sha256') is None
+    
+    store.put(path, 'sha256', digest)
+    assert store.lookup_probe(key, 'sha256') == digest
+    
+    # Probe index is persistent
+    store = cas.ContentStore(store.path)
+    assert store.lookup_probe(key, 'sha256') == digest
+    
+    # First block is probed only for candidate size and timestamp
+    assert store.has_candidate(10000, 981173108.9, 'sha256')
+    assert not store.has_candidate(10001, 981173108.5, 'sha256')
+    assert cas.head_digest(path) == hashlib.sha256(b'0' * cas.PROBE_SIZE).hexdigest()
+    
+    dst = os.path.join(tmp_path, 'linked.dat')
+    store.link('sha256', digest, dst)
+    assert os.path.samefile(path, dst)
+
+
+def test_gc(tmp_path):
+    store = cas.ContentStore(os.path.join(tmp_path, cas.CAS_DIRNAME))
+    
+    path = os.path.join(tmp_path, '20010203_040508_test.cfg')
+    digest = create_file(path, b'test data')
+    store.put(path, 'sha256', digest)
+    
+    assert store.gc() == 0
+    
+    os.remove(path)
+    
+    assert store.gc() == 1
+    assert not store.contains('sha256', digest)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/catalog test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import catalog
+from drec import common
+
+import os
+
+
+LOCAL_DR_PATH = os.path.join(os.path.dirname(__file__), 'DR_test_cases')
+
+
+def test_format_cfg_datetime():
+    assert catalog.format_cfg_datetime((2001, 2, 3, 4, 5, 7.8)) == '2001-02-03 04:05:07.800000'
+
+
+def test_catalog(tmp_path):
+    c = catalog.Catalog(os.path.join(tmp_path, catalog.CATALOG_PATH))
+    header = common.read_cfg_header(os.path.join(LOCAL_DR_PATH, 'test_1998.cfg'))
+    
+    device_1 = {'substation': 'TS_1', 'bay': 'E01', 'device': 'REL670', 'dev_address': '10.0.0.1'}
+    device_2 = {'substation': 'TS_2', 'bay': 'E02', 'device': 'RED670', 'dev_address': '10.0.0.2'}
+    
+    c.add(device_1, [os.path.join(tmp_path, '20010203_040508_test.cfg'), os.path.join(tmp_path, '20010203_040508_test.dat')], header)
+    c.add(device_1, [os.path.join(tmp_path, '20010203_040508_test.cfg'), os.path.join(tmp_path, '20010203_040508_test.dat')], header)
+    c.add(device_2, [os.path.join(tmp_path, 'E02', '20020101_000000_rec.cfg')])
+    
+    records = c.query()
+    assert [r['substation'] for r in records] == ['TS_1', 'TS_2']
+    assert records[0]['record'] == '20010203_040508_test'
+    assert records[0]['trigger_time'] == '2001-02-03 04:05:07.800000'
+    assert records[0]['channels'] == 16
+    assert records[0]['sampling_rates'] == [[1000.0, 20], [1000.0, 101]]
+    assert records[0]['files'] == ['20010203_040508_test.cfg', '20010203_040508_test.dat']
+    assert records[1]['trigger_time'] == '2002-01-01 00:00:00.000000'
+    
+    assert len(c.query(substation='TS_1')) == 1
+    assert len(c.query(device='RE%')) == 2
+    assert len(c.query(start='2001-02-03', end='2001-02-04')) == 1
+    assert len(c.query(start='2001-02-04')) == 1
+    assert [r['substation'] for r in c.query(limit=1, newest=True)] == ['TS_2']
+
+
+def test_move_remove(tmp_path):
+    c = catalog.Catalog(os.path.join(tmp_path, catalog.CATALOG_PATH))
+    device = {'substation': 'TS_1', 'device': 'REL670'}
+    local_dirname = str(tmp_path / 'REL670')
+    archive_dirname = os.path.join(local_dirname, 'archive')
+    
+    c.add(device, [os.path.join(local_dirname, '20010203_040508_rec_1.cfg')])
+    c.add(device, [os.path.join(local_dirname, '20010204_040508_rec_2.cfg')])
+    
+    # Archived record (sidecar file is moved with record files)
+    c.move([(local_dirname, catalog.record_key('20010203_040508_rec_1.cfg.sha256'), archive_dirname)])
+    assert [r['dirname'] for r in c.query()] == [archive_dirname, local_dirname]
+    
+    # Compacted and deleted records
+    bundle = os.path.join(archive_dirname, 'bundles', '2001-02.zip')
+    c.move([(archive_dirname, '20010203_040508_rec_1', bundle)])
+    c.remove([(local_dirname, '20010204_040508_rec_2')])
+    assert [r['dirname'] for r in c.query()] == [bundle]
+    
+    c.remove([(bundle, None)])
+    assert c.query() == []
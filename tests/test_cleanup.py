@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/cleanup test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import cleanup
+
+import os
+import threading
+from drec.index import LocalDirIndex
+from drec.manifest import Manifest
+from drec.integrity import file_digest
+
+
+DAY = 86400
+NOW = 100 * DAY
+
+
+def record(name, timestamp, extensions=('.cfg', '.dat'), size=4):
+    return [('COMTRADE/' + name + ext, size, timestamp) for ext in extensions]
+
+
+RECORDS = [
+    record('rec1', NOW - 10 * DAY),
+    record('rec2', NOW - 5 * DAY),
+    record('rec3', NOW - 2 * DAY, ('.cfg',)),
+    record('rec4', NOW - 3600)
+]
+
+
+@pytest.mark.parametrize('general, device, expected',
+                         [
+                             (None, None, None),
+                             ({'keep_last': 5}, None, dict(cleanup.POLICY, keep_last=5)),
+                             ({'keep_last': 5}, {'keep_last': 2, 'dry_run': True}, dict(cleanup.POLICY, keep_last=2, dry_run=True))
+                         ])
+def test_merge_policy(general, device, expected):
+    assert cleanup.merge_policy(general, device) == expected
+
+
+@pytest.mark.parametrize('keep_last, min_age, expected',
+                         [
+                             (0, DAY, ['rec1', 'rec2']),
+                             (0, 0, ['rec1', 'rec2', 'rec4']),
+                             (1, 0, ['rec1', 'rec2']),
+                             (2, DAY, ['rec1']),
+                             (3, 0, [])
+                         ])
+def test_select(keep_last, min_age, expected):
+    selected = cleanup.select(RECORDS, keep_last, min_age, NOW)
+    assert [os.path.basename(r[0][0])[:-4] for r in selected] == expected
+
+
+@pytest.fixture
+def local(tmp_path):
+    dirname = str(tmp_path)
+    manifest = Manifest(dirname)
+    for dev_path, dev_size, dev_timestamp in RECORDS[0] + RECORDS[1]:
+        path = os.path.join(dirname, '20240101_000000_' + os.path.basename(dev_path))
+        with open(path, 'wb') as f:
+            f.write(b'data')
+        manifest.add(os.path.basename(path), dev_path=dev_path, dev_size=dev_size, size=4, algorithm='sha256', digest=file_digest(path, 'sha256'))
+    return LocalDirIndex(dirname, use_inotify=False), manifest
+
+
+def test_is_verified(local):
+    index, manifest = local
+    
+    assert cleanup.is_verified(RECORDS[0], index, manifest)
+    
+    # Record is not downloaded
+    assert not cleanup.is_verified(RECORDS[3], index, manifest)
+    
+    # Device file size changed
+    assert not cleanup.is_verified(record('rec1', NOW - 10 * DAY, size=8), index, manifest)
+    
+    # Local file changed
+    path = index.find('rec2.dat')[0]
+    with open(path, 'wb') as f:
+        f.write(b'DATA')
+    assert not cleanup.is_verified(RECORDS[1], index, manifest)
+    assert cleanup.is_verified(RECORDS[1], index, manifest, verify=False)
+
+
+@pytest.mark.parametrize('dry_run, fail, expected_deleted, expected_files',
+                         [
+                             (False, None, 2, ['COMTRADE/rec1.cfg', 'COMTRADE/rec1.dat', 'COMTRADE/rec2.cfg', 'COMTRADE/rec2.dat']),
+                             (True, None, 2, []),
+                             (False, 'COMTRADE/rec2.cfg', 1, ['COMTRADE/rec1.cfg', 'COMTRADE/rec1.dat'])
+                         ])
+def test_run(local, dry_run, fail, expected_deleted, expected_files):
+    index, manifest = local
+    deleted_files = []
+    
+    def delete(dev_path):
+        if dev_path == fail:
+            raise ConnectionError('Failed to delete file')
+        deleted_files.append(dev_path)
+    
+    deleted = cleanup.DeviceCleanup(min_age=0, dry_run=dry_run).run(RECORDS, delete, index, manifest, threading.Event(), NOW)
+    
+    assert len(deleted) == expected_deleted
+    assert deleted_files == expected_files
+
+
+def test_run_select(local):
+    index, manifest = local
+    deleted_files = []
+    
+    # Record is listed in two formats, only CFG and DAT files are downloaded
+    records = [record('rec1', NOW - 10 * DAY, ('.cfg', '.dat', '.zip'))]
+    downloaded = lambda dist_rec: dist_rec[:2]
+    
+    assert cleanup.DeviceCleanup(min_age=0).run(records, deleted_files.append, index, manifest, threading.Event(), NOW) == []
+    
+    deleted = cleanup.DeviceCleanup(min_age=0).run(records, deleted_files.append, index, manifest, threading.Event(), NOW, downloaded=downloaded)
+    
+    assert len(deleted) == 1
+    assert deleted_files == ['COMTRADE/rec1.cfg', 'COMTRADE/rec1.dat', 'COMTRADE/rec1.zip']
@@ -219,3 +219,21 @@ def test_valid_args():
     }
     
     assert client.valid_args(config, valid_keys) == valid_config
+
+
+def test_device_args_policies(tmp_path):
+    config = copy.deepcopy(config_ftp)
+    config['GENERAL']['root_path'] = str(tmp_path)
+    config['GENERAL']['watermark'] = {'margin': 60}
+    config['DEVICE'][0]['cleanup'] = {'keep_last': 2}
+    config['DEVICE'][0]['select'] = {'prefer': ['cfg']}
+    
+    # Policy sections are passed to download as policy objects
+    args = client.device_args(config, 0)
+    assert args['watermark'].margin == 60
+    assert hasattr(args['cleanup'], 'run')
+    assert hasattr(args['selector'], 'select')
+    assert 'select' not in args
+    
+    args = client.device_args(config, 1)
+    assert 'cleanup' not in args and 'selector' not in args
@@ -8,8 +8,10 @@ import pytest
 from contextlib import nullcontext as does_not_raise
 
 from drec import common
+from drec import index
 
 import os
+import re
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
@@ -64,6 +66,10 @@ def test_filter_file_list():
     
     assert common.filter_file_list(files) == filtered_files
     assert common.filter_file_list(files, directory='COMTRADE') == filtered_files
+    
+    # Duplicate format rules (drop, keep)
+    assert ('COMTRADE/file_2h.zip', 0, 0) in common.filter_file_list(files, rem_hdr_zip=False)
+    assert common.filter_file_list(files, duplicates=[('h.zip', '.zip'), ('_4.ZIP', '_3.txt')]) == filtered_files[:3]
 
 
 def test_order_file_list():
@@ -218,6 +224,9 @@ def test_group_dev_file_list():
     assert common.group_dev_file_list(files) == grouped_files
     assert common.group_dev_file_list(files, directory='COMTRADE', criteria=('.cfg', '.cff', '.zip', '.dat', '.hdr', '.inf')) == grouped_files
 
+    # Listing generator
+    assert common.group_dev_file_list(f for f in files) == grouped_files
+
 
 def test_is_downloaded():
     assert common.is_downloaded('COMTRADE/test_1991.cfg', LOCAL_DR_PATH)
@@ -254,6 +263,36 @@ def test_get_trigger_time():
     assert common.get_trigger_time(os.path.join(LOCAL_DR_PATH, 'test_2013.cff.zip')) == test_time
 
 
+def test_get_trigger_time_malformed(tmp_path):
+    with open(os.path.join(LOCAL_DR_PATH, 'test_2013.cfg')) as f:
+        lines = f.read().splitlines()
+    
+    # Analog channel line without multiplier (strict header parse fails)
+    lines[2] = ','.join(lines[2].split(',')[:5])
+    path = tmp_path / 'rec.cfg'
+    path.write_text('\r\n'.join(lines) + '\r\n')
+    os.utime(path, (0, 0))
+    
+    assert common.read_cfg_header(str(path)) is None
+    assert common.get_trigger_time(str(path)) == '20010203_040508'
+
+
+@pytest.mark.parametrize('name, pattern, expected',
+                         [
+                             ('REL670_20240102_030405.cfg', r'_(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})_(?P<hour>\d{2})(?P<minute>\d{2})(?P<second>\d{2})', '20240102_030405'),
+                             ('F0012_240102-0304.cfg', r'(?P<year>\d{2})(?P<month>\d{2})(?P<day>\d{2})-(?P<hour>\d{2})(?P<minute>\d{2})', '20240102_030400'),
+                             ('REL670.cfg', r'_(?P<year>\d{4})', None)
+                         ])
+def test_get_trigger_time_pattern(tmp_path, name, pattern, expected):
+    path = tmp_path / name
+    path.write_text('not a comtrade file')
+    os.utime(path, (0, 0))
+    
+    # Trigger time in file name is used only if record header can't be read
+    assert common.get_trigger_time(str(path), pattern=re.compile(pattern)) == (expected or '19700101_000000')
+    assert common.get_trigger_time(os.path.join(LOCAL_DR_PATH, 'test_2013.cfg'), pattern=re.compile(pattern)) == '20010203_040508'
+
+
 def test_file_attr_str_format():
     file_list = ()
     format_str_len = (8, 8, 8)
@@ -267,3 +306,60 @@ def test_file_attr_str_format():
     format_str_len = (24, 16, 16)
     
     assert common.file_attr_format_str_len(file_list) == format_str_len
+
+
+def test_is_downloaded_index():
+    local_index = index.LocalDirIndex(LOCAL_DR_PATH, use_inotify=False)
+    
+    assert common.is_downloaded('COMTRADE/test_1991.cfg', LOCAL_DR_PATH, index=local_index)
+    assert common.is_downloaded('COMTRADE/test_1991.cfg', LOCAL_DR_PATH, dev_size=630, size=True, index=local_index)
+    assert not common.is_downloaded('COMTRADE/test_1991.dat', LOCAL_DR_PATH, index=local_index)
+
+
+def test_dir_list_diff_index():
+    local_index = index.LocalDirIndex(LOCAL_DR_PATH, use_inotify=False)
+    
+    files = [('COMTRADE/test_1991.cfg', 0, 0),
+             ('COMTRADE/test_1998.cfg', 0, 0),
+             ('COMTRADE/test_2013.cff', 0, 0),
+             ('COMTRADE/test_2013.cfg', 0, 0)]
+    
+    assert common.dir_list_diff(files, LOCAL_DR_PATH, index=local_index) == common.dir_list_diff(files, LOCAL_DR_PATH)
+
+
+def test_dir_list_diff_sidecar(tmp_path):
+    for name in ('20010203_040508_test.cfg', '20010203_040508_test.cfg.sha256',
+                 '20010203_040508_old.cfg', '20010203_040508_old.cfg.sha256'):
+        open(os.path.join(tmp_path, name), 'w').close()
+    
+    files = [('COMTRADE/test.cfg', 0, 0)]
+    
+    assert common.dir_list_diff(files, str(tmp_path)) == [os.path.join(tmp_path, '20010203_040508_old.cfg'),
+                                                         os.path.join(tmp_path, '20010203_040508_old.cfg.sha256')]
+
+
+def test_read_cfg_header():
+    header = common.read_cfg_header(os.path.join(LOCAL_DR_PATH, 'test_2013.cff.zip'))
+    
+    assert header['station_name'] == 'test_station_name'
+    assert header['rev_year'] == '2013'
+    assert (header['channels'], header['analog_channels'], header['digital_channels']) == (27, 6, 21)
+    assert header['trigger_time'] == (2001, 2, 3, 4, 5, 7.8)
+    assert header['file_type'] == 'ASCII'
+    
+    assert common.read_cfg_header(os.path.join(LOCAL_DR_PATH, 'test.txt')) is None
+
+
+def test_cfg_lines_cff(tmp_path):
+    with open(os.path.join(LOCAL_DR_PATH, 'test_2013.cff'), 'rb') as f:
+        data = f.read()
+    
+    # Only CFG section of CFF file is read (binary DAT section is not decoded)
+    path = str(tmp_path / 'rec.cff')
+    with open(path, 'wb') as f:
+        f.write(data.split(b'--- file type: INF')[0] + b'--- file type: DAT BINARY: 4 ---\r\n\xff\xfe\x00\x01')
+    
+    lines = list(common._cfg_lines(path))
+    assert len(lines) == 38
+    assert not any('file type' in line for line in lines)
+    assert common.read_cfg_header(path)['trigger_time'] == (2001, 2, 3, 4, 5, 7.8)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/control test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import control
+
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+DEVICE = {'name': 'REL670', 'device': 'F21', 'dev_address': '10.0.0.1'}
+
+
+@pytest.mark.parametrize('substation, device, expected',
+                         [
+                             (None, None, True),
+                             ('SS1', None, True),
+                             ('SS2', None, False),
+                             ('SS1', 'REL670', True),
+                             (None, '10.0.0.1', True),
+                             (None, 'F21', True),
+                             ('SS1', 'REL650', False)
+                         ])
+def test_matches(substation, device, expected):
+    assert control.PollRequest(substation, device).matches('SS1', DEVICE) == expected
+
+
+def fake_poll(request):
+    if not request.matches('SS1', DEVICE):
+        return []
+    return [{'substation': 'SS1', 'device': 'SS1/REL670', 'dev_address': '10.0.0.1', 'success': True, 'records': [['rec.cfg', 'rec.dat']]}]
+
+
+@pytest.fixture
+def controller(tmp_path):
+    c = control.Controller(os.path.join(tmp_path, 'control.sock'), fake_poll, threading.Event())
+    c.start()
+    yield c
+    c.close()
+
+
+def test_poll(controller):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(control.send_request, controller.path, {'cmd': 'poll', 'device': 'REL670'}, 10)
+        
+        # Request is served while client waits between loops
+        while not future.done():
+            controller.wait(0.1)
+        
+        response = future.result()
+    
+    assert response['ok']
+    assert response['devices'][0]['records'] == [['rec.cfg', 'rec.dat']]
+    assert controller.status()['last']['SS1/REL670']['records'] == 1
+
+
+def test_poll_failed(tmp_path):
+    def failing_poll(request):
+        raise AttributeError("'dict' object has no attribute 'due'")
+    
+    c = control.Controller(os.path.join(tmp_path, 'control.sock'), failing_poll, threading.Event())
+    c.start()
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(control.send_request, c.path, {'cmd': 'poll'}, 10)
+            
+            # Failed poll doesn't stop serving and releases waiting client
+            while not future.done():
+                c.wait(0.1)
+            
+            response = future.result()
+    finally:
+        c.close()
+    
+    assert not response['ok']
+    assert response['error'].startswith('Poll failed')
+    assert c.status()['pending'] == 0
+
+
+def test_poll_no_device(controller):
+    poll = controller.request('SS2')
+    controller.serve()
+    assert poll.wait(0) == []
+    assert control.send_request(controller.path, {'cmd': 'poll', 'substation': 'SS2', 'wait': False}, 10) == {'ok': True, 'queued': True}
+
+
+def test_status(controller):
+    controller.request('SS1', 'REL670')
+    controller.request('SS1', 'REL670')
+    controller.request('SS1')
+    controller.sweep('SS1/REL650')
+    
+    status = control.send_request(controller.path, {'cmd': 'status'}, 10)
+    assert status['ok']
+    assert status['state'] == 'sweep'
+    assert status['device'] == 'SS1/REL650'
+    assert status['pending'] == 3
+    assert status['queue'] == {'SS1/REL670': 2, 'SS1/*': 1}
+    
+    controller.serve()
+    assert controller.status()['pending'] == 0
+    assert controller.status()['state'] == 'sweep'
+
+
+@pytest.mark.parametrize('request_line, expected',
+                         [
+                             ('{"cmd": "restart"}', 'Unknown command restart'),
+                             ('[1, 2]', 'Invalid request'),
+                         ])
+def test_invalid_request(controller, request_line, expected):
+    assert control.send_request(controller.path, json.loads(request_line), 10)['error'] == expected
+
+
+def test_request_file(controller):
+    with open(controller.request_path, 'w') as f:
+        f.write('{"substation": "SS1", "device": "REL670"}\n\n{"substation": "SS2"}\n')
+    
+    controller._read_request_file()
+    assert controller.status()['queue'] == {'SS1/REL670': 1, 'SS2/*': 1}
+    assert not os.path.exists(controller.request_path)
+    
+    # Signal without request file polls all devices
+    controller.notify()
+    controller.serve()
+    assert controller.status()['pending'] == 0
+    assert 'SS1/REL670' in controller.status()['last']
+
+
+@pytest.mark.parametrize('request_line, expected',
+                         [
+                             ('{"cmd": "profile", "cycles": 3}', {'ok': True, 'remaining': 3}),
+                             ('{"cmd": "profile"}', {'ok': True, 'remaining': 1}),
+                             ('{"cmd": "profile", "cycles": "x"}', {'ok': False, 'error': "Invalid cycles: invalid literal for int() with base 10: 'x'"}),
+                         ])
+def test_profile(tmp_path, request_line, expected):
+    c = control.Controller(os.path.join(tmp_path, 'control.sock'), fake_poll, threading.Event(), lambda cycles: {'remaining': int(cycles)})
+    c.start()
+    try:
+        assert control.send_request(c.path, json.loads(request_line), 10) == expected
+    finally:
+        c.close()
+
+
+def test_profile_not_supported(controller):
+    assert control.send_request(controller.path, {'cmd': 'profile'}, 10)['error'] == 'Unknown command profile'
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/convert test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import convert
+from drec import common
+
+import os
+import json
+import struct
+
+np = pytest.importorskip('numpy')
+
+
+LOCAL_DR_PATH = os.path.join(os.path.dirname(__file__), 'DR_test_cases')
+
+
+def create_binary_record(tmp_path, file_type, analog_format):
+    # Binary config from 2013 test case
+    with open(os.path.join(LOCAL_DR_PATH, 'test_2013.cfg'), 'rb') as f:
+        cfg = f.read().replace(b'ASCII', file_type.encode())
+    
+    cfg_path = os.path.join(tmp_path, '20010203_040508_test.cfg')
+    with open(cfg_path, 'wb') as f:
+        f.write(cfg)
+    
+    # 6 analog and 10 digital channels
+    dat_path = os.path.join(tmp_path, '20010203_040508_test.dat')
+    with open(dat_path, 'wb') as f:
+        for n in range(21):
+            f.write(struct.pack('<II6' + analog_format + 'H', n + 1, n * 1000, *([n] * 6), 1 << (n % 10)))
+    
+    return [cfg_path, dat_path]
+
+
+def test_parse_dat_ascii():
+    cff_path = os.path.join(LOCAL_DR_PATH, 'test_2013.cff')
+    header = common.read_cfg_header(cff_path)
+    
+    sample, timestamp, analog, digital = convert.parse_dat(convert._cff_data(convert._read_file(cff_path)), header)
+    
+    assert len(sample) == 21
+    assert analog.shape == (21, 6)
+    assert digital.shape == (21, 3)
+    assert timestamp[1] == 1000
+    assert analog[1, 0] == 309016994
+    
+    bits = np.unpackbits(digital, axis=1, bitorder='little')
+    assert bits[0, 0] == 1 and bits[1, 1] == 1 and bits[1, 0] == 0
+
+
+@pytest.mark.parametrize(
+    'file_type, analog_format',
+    [
+        ('BINARY', 'h'),
+        ('BINARY32', 'i'),
+        ('FLOAT32', 'f'),
+    ]
+)
+def test_convert_record_binary(tmp_path, file_type, analog_format):
+    local_files = create_binary_record(tmp_path, file_type, analog_format)
+    out_dirname = os.path.join(tmp_path, convert.COLUMNAR_DIRNAME)
+    
+    path = convert.convert_record(local_files, out_dirname)
+    
+    assert path == os.path.join(out_dirname, '20010203_040508_test')
+    
+    analog = np.load(os.path.join(path, 'analog.npy'), mmap_mode='r')
+    digital = np.load(os.path.join(path, 'digital.npy'), mmap_mode='r')
+    time = np.load(os.path.join(path, 'time.npy'))
+    meta = json.load(open(os.path.join(path, 'meta.json')))
+    
+    assert analog.shape == (21, 6)
+    assert analog[2, 0] == pytest.approx(2 * 1.414214e-9)
+    assert time[3] == 3000
+    
+    bits = np.unpackbits(digital, axis=1, bitorder='little')[:, :10]
+    assert bits.shape == (21, 10)
+    assert bits[12, 2] == 1 and bits[12].sum() == 1
+    assert meta['file_type'] == file_type
+    assert meta['analog'][3]['unit'] == 'V'
+
+
+def test_scale_analog_ascii_missing():
+    header = {'file_type': 'ASCII', 'analog': [{'a': 2.0, 'b': 1.0}, {'a': 1.0, 'b': 0.0}]}
+    values = convert.scale_analog(np.array([[1.0, 99999.0], [99999.0, 3.0]]), header)
+    
+    assert values[0, 0] == 3.0 and values[1, 1] == 3.0
+    assert np.isnan(values[0, 1]) and np.isnan(values[1, 0])
+
+
+@pytest.mark.parametrize(
+    'timestamp, time_mult, sampling_rates, expected',
+    [
+        ([0, 1000, 2000, 3000], 1.0, [(1000.0, 4)], [0, 1000, 2000, 3000]),
+        ([0, 10, 20, 30], 2.0, [(0.0, 4)], [0, 20, 40, 60]),
+        ([0, 0, 0, 0], 1.0, [(1000.0, 4)], [0, 1000, 2000, 3000]),
+        ([0, 1000, 2000, 3000], 0.0, [(4000.0, 4)], [0, 250, 500, 750]),
+        ([0xFFFFFFFF] * 5, 1.0, [(1000.0, 2), (500.0, 4)], [0, 1000, 3000, 5000, 7000]),
+        ([0, 0, 0], 1.0, [(0.0, 3)], [0, 0, 0])
+    ]
+)
+def test_sample_time(timestamp, time_mult, sampling_rates, expected):
+    header = {'time_mult': time_mult, 'sampling_rates': sampling_rates}
+    assert convert.sample_time(np.array(timestamp, dtype=np.uint32), header).tolist() == expected
+
+
+def test_converter_start_method():
+    converter = convert.Converter(1)
+    try:
+        assert converter._executor._mp_context.get_start_method() == convert.START_METHOD
+    finally:
+        converter.stop()
+
+
+def test_convert_record_no_data(tmp_path):
+    assert convert.convert_record([os.path.join(LOCAL_DR_PATH, 'test_2013.cfg')], str(tmp_path)) is None
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/events test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import events
+
+import os
+import json
+import socket
+
+
+FILES = [
+    {'path': '/dr/E01/20010203_040508_test.dat', 'dev_path': 'test.dat', 'dev_size': 20, 'size': 20, 'algorithm': 'sha256', 'digest': 'b'},
+    {'path': '/dr/E01/20010203_040508_test.cfg', 'dev_path': 'test.cfg', 'dev_size': 10, 'size': 10, 'algorithm': 'sha256', 'digest': 'a'}
+]
+
+
+def test_record_event():
+    event = events.record_event({'substation': 'TS_1', 'bay': 'E01', 'unknown': 1}, FILES,
+                                {'trigger_time': (2001, 2, 3, 4, 5, 7.8)})
+    
+    assert event['event'] == events.RECORD_FINALIZED
+    assert event['device']['substation'] == 'TS_1'
+    assert 'unknown' not in event['device']
+    assert event['dirname'] == '/dr/E01'
+    assert event['record'] == '20010203_040508_test'
+    assert event['trigger_time'] == '2001-02-03 04:05:07.800000'
+    assert event['size'] == 30
+    assert [f['dev_path'] for f in event['files']] == ['test.cfg', 'test.dat']
+    
+    assert events.record_event({}, FILES)['trigger_time'] is None
+
+
+def test_spool(tmp_path):
+    spool = events.EventSpool(os.path.join(tmp_path, events.SPOOL_PATH))
+    
+    assert list(spool.consume('alarm')) == []
+    
+    for n in range(3):
+        spool.append({'n': n})
+    
+    # Partially written event is not read
+    with open(spool.path, 'ab') as f:
+        f.write(b'{"n": 3')
+    
+    assert [event['n'] for offset, event in spool.read()] == [0, 1, 2]
+    assert [event['n'] for offset, event in spool.read(limit=2)] == [0, 1]
+    
+    # Consumer stops while processing second event
+    for event in spool.consume('alarm'):
+        if event['n'] == 1:
+            break
+    assert [event['n'] for event in spool.consume('alarm')] == [1, 2]
+    assert list(spool.consume('alarm')) == []
+    
+    # Consumers are independent
+    assert [event['n'] for event in spool.consume('analysis', limit=1)] == [0]
+    
+    with open(spool.path, 'ab') as f:
+        f.write(b'}\n')
+    assert [event['n'] for event in spool.consume('alarm')] == [3]
+    assert [event['n'] for event in spool.consume('analysis')] == [1, 2, 3]
+
+
+@pytest.mark.parametrize('consumer, expectation',
+                         [
+                             ('alarm', does_not_raise()),
+                             ('', pytest.raises(ValueError)),
+                             ('.hidden', pytest.raises(ValueError)),
+                             (os.path.join('..', 'alarm'), pytest.raises(ValueError))
+                         ])
+def test_spool_consumer_name(tmp_path, consumer, expectation):
+    spool = events.EventSpool(os.path.join(tmp_path, events.SPOOL_PATH))
+    
+    with expectation:
+        spool.commit(consumer, 10)
+        assert spool.get_offset(consumer) == 10
+
+
+def test_spool_replaced(tmp_path):
+    spool = events.EventSpool(os.path.join(tmp_path, events.SPOOL_PATH))
+    spool.append({'n': 0})
+    spool.commit('alarm', 1000)
+    
+    assert [event['n'] for event in spool.consume('alarm')] == [0]
+
+
+def test_publisher_socket(tmp_path):
+    socket_path = os.path.join(tmp_path, 'events.sock')
+    spool_path = os.path.join(tmp_path, events.SPOOL_PATH)
+    publisher = events.EventPublisher(spool=spool_path, socket=socket_path)
+    
+    # No consumer, event is only spooled
+    publisher.publish({'n': 0})
+    
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.bind(socket_path)
+        sock.settimeout(1)
+        events.DevicePublisher(publisher, {'substation': 'TS_1'}).publish(FILES)
+        event = json.loads(sock.recv(65536))
+    
+    assert event['device']['substation'] == 'TS_1'
+    assert len(list(events.EventSpool(spool_path).read())) == 2
+    
+    publisher.close()
+
+
+def test_publisher_fifo(tmp_path):
+    fifo_path = os.path.join(tmp_path, 'events.fifo')
+    publisher = events.EventPublisher(fifo=fifo_path)
+    
+    # No reader, named pipe is created and event is dropped
+    publisher.publish({'n': 0})
+    assert os.path.exists(fifo_path)
+    
+    fd = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        publisher.publish({'n': 1})
+        assert json.loads(os.read(fd, 65536)) == {'n': 1}
+    finally:
+        os.close(fd)
+    
+    # Reader closed pipe
+    publisher.publish({'n': 2})
+    
+    publisher.close()
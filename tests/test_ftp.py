@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/ftp test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec.ftp import ftp
+
+import os
+import socket
+import threading
+import hashlib
+
+
+class FTPStandIn:
+    """
+    Stand-in of device FTP server
+    
+    Minimal passive mode FTP server (USER, PASS, TYPE, PASV, RETR, DELE,
+    MLSD, NLST, SIZE, MDTM, CWD, NOOP, QUIT) serving files {name: bytes}
+    from memory, one control connection at a time. MLSD command is not
+    supported if mlsd is False. Listed sizes can differ from served content
+    {name: size}. Retrieved file names are recorded.
+    """
+    
+    # Modification time of served files (MLSD and MDTM)
+    MODIFY = '20240102030405'
+    
+    def __init__(self, files, mlsd=True, sizes=None):
+        self.files = files
+        self.mlsd = mlsd
+        self.sizes = {} if sizes is None else sizes
+        self.retrieved = []
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+    
+    def close(self):
+        self.sock.close()
+    
+    def serve(self):
+        while True:
+            try:
+                con, address = self.sock.accept()
+            except OSError:
+                return
+            with con:
+                self.session(con)
+    
+    def session(self, con):
+        control = con.makefile('rb')
+        reply = lambda line: con.sendall(line.encode() + b'\r\n')
+        data = None
+        reply('220 drec FTP stand-in')
+        
+        for line in control:
+            cmd, _, arg = line.decode().strip().partition(' ')
+            cmd = cmd.upper()
+            
+            if cmd == 'USER':
+                reply('331 Password required')
+            elif cmd == 'PASS':
+                reply('230 Logged in')
+            elif cmd in ('TYPE', 'NOOP'):
+                reply('200 OK')
+            elif cmd == 'PASV':
+                data = socket.socket()
+                data.bind(('127.0.0.1', 0))
+                data.listen(1)
+                port = data.getsockname()[1]
+                reply('227 Entering Passive Mode (127,0,0,1,{},{})'.format(port >> 8, port & 0xFF))
+            elif cmd == 'RETR':
+                self.retrieved.append(arg)
+                if arg not in self.files:
+                    reply('550 File not found')
+                    continue
+                self.send(reply, data, self.files[arg])
+            elif cmd == 'MLSD' and self.mlsd:
+                self.send(reply, data, ''.join('type=file;size={};modify={}; {}\r\n'.format(self.sizes.get(name, len(content)), self.MODIFY, name)
+                                               for name, content in self.files.items()).encode())
+            elif cmd == 'NLST':
+                self.send(reply, data, ''.join(name + '\r\n' for name in self.files).encode())
+            elif cmd == 'SIZE' and arg in self.files:
+                reply('213 {}'.format(self.sizes.get(arg, len(self.files[arg]))))
+            elif cmd == 'MDTM' and arg in self.files:
+                reply('213 ' + self.MODIFY)
+            elif cmd == 'CWD' and arg in ('.', '/'):
+                reply('250 OK')
+            elif cmd == 'CWD':
+                reply('550 Not a directory')
+            elif cmd == 'DELE':
+                if self.files.pop(arg, None) is None:
+                    reply('550 File not found')
+                else:
+                    reply('250 Deleted')
+            elif cmd == 'QUIT':
+                reply('221 Bye')
+                return
+            else:
+                reply('502 Not implemented')
+    
+    def send(self, reply, data, payload):
+        reply('150 Opening data connection')
+        conn, address = data.accept()
+        with conn:
+            conn.sendall(payload)
+        data.close()
+        reply('226 Transfer complete')
+
+
+@pytest.fixture
+def server():
+    files = {
+        'rec1.cfg': b'cfg' * 100,
+        'rec1.dat': os.urandom(3 * 1024 * 1024 + 7),
+        'empty.dat': b''
+    }
+    server = FTPStandIn(files)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(server):
+    client = ftp.FTPClient(threading.Event())
+    client.connect('127.0.0.1', port=server.port, timeout=5)
+    client.login()
+    yield client
+    client.close()
+
+
+@pytest.mark.parametrize('name, size, recv_size, splice',
+                         [
+                             ('rec1.dat', 0, ftp.RECV_SIZE, False),
+                             ('rec1.dat', 3 * 1024 * 1024 + 7, 4096, False),
+                             ('rec1.dat', 4 * 1024 * 1024, ftp.RECV_SIZE, False),
+                             ('rec1.dat', 3 * 1024 * 1024 + 7, ftp.RECV_SIZE, True),
+                             ('rec1.cfg', 300, ftp.RECV_SIZE, False),
+                             ('empty.dat', 100, ftp.RECV_SIZE, False)
+                         ])
+def test_retr(server, client, tmp_path, name, size, recv_size, splice):
+    local_path = str(tmp_path / name)
+    hasher = None if splice else hashlib.sha256()
+    
+    received = client.retr(name, local_path, hasher=hasher, size=size, recv_size=recv_size, splice=splice)
+    
+    data = server.files[name]
+    assert received == len(data)
+    assert os.path.getsize(local_path) == len(data)
+    with open(local_path, 'rb') as f:
+        assert f.read() == data
+    if hasher is not None:
+        assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+    
+    # Control connection is ready for the next command
+    assert client.get_connection_state() == 'connected'
+
+
+class CountingThrottle:
+    def __init__(self):
+        self.blocks = []
+    
+    def consume(self, nbytes):
+        self.blocks.append(nbytes)
+
+
+@pytest.mark.parametrize('splice', [False, True])
+def test_retr_throttle(server, client, tmp_path, splice):
+    throttle = CountingThrottle()
+    received = client.retr('rec1.dat', str(tmp_path / 'rec1.dat'), recv_size=65536, splice=splice, throttle=throttle)
+    
+    # Throttle is consumed per received block (not once per file)
+    assert sum(throttle.blocks) == received
+    assert len(throttle.blocks) > 1
+    assert max(throttle.blocks) <= 65536
+
+
+@pytest.mark.parametrize('name, expectation',
+                         [
+                             ('rec1.cfg', does_not_raise()),
+                             ('missing.cfg', pytest.raises(ConnectionError))
+                         ])
+def test_del_file(server, client, name, expectation):
+    with expectation:
+        client.del_file(name)
+        assert name not in server.files
+
+
+def test_retr_head(server, client):
+    assert client.retr_head('rec1.dat', 4096) == server.files['rec1.dat'][:4096]
+    assert client.get_connection_state() == 'connected'
+
+
+@pytest.mark.parametrize('mlsd', [True, False])
+def test_iter_file_directory(mlsd):
+    files = {'rec{}.cfg'.format(n): b'cfg' * n for n in range(1, 4)}
+    files['log.txt'] = b'log'
+    server = FTPStandIn(files, mlsd=mlsd)
+    client = ftp.FTPClient(threading.Event())
+    client.connect('127.0.0.1', port=server.port, timeout=5)
+    client.login()
+    
+    listing = client.iter_file_directory(accept=lambda path: path.endswith('.cfg'))
+    
+    # Listing is a generator consumed by grouping
+    assert iter(listing) is listing
+    assert sorted(listing) == [('rec1.cfg', 3, 1704164645.0), ('rec2.cfg', 6, 1704164645.0), ('rec3.cfg', 9, 1704164645.0)]
+    
+    # Control connection is ready for the next command
+    assert client.get_file_directory(known=lambda name: name == 'log.txt')[-1] == ('log.txt', 3 if mlsd else 0, 1704164645.0 if mlsd else 0)
+    
+    client.close()
+    server.close()
+
+
+def test_download_size_mismatch(tmp_path):
+    files = {'rec1.cfg': b'cfg' * 100, 'rec1.dat': os.urandom(1000), 'rec2.cfg': b'cfg' * 100, 'rec2.dat': os.urandom(1000)}
+    server = FTPStandIn(files, sizes={'rec1.dat': 2000})
+    local_dirname = str(tmp_path)
+    downloaded = lambda: sorted(name.split('_', 2)[-1] for name in os.listdir(local_dirname) if name.endswith(('.cfg', '.dat')))
+    
+    # Truncated file is not finalized after re-fetch attempts, next record is downloaded
+    assert ftp.FTPClient(threading.Event()).download('127.0.0.1', local_dirname, dev_dir='', dev_port=server.port, con_timeout=5, ret_timeout=0, no_retry=0)
+    assert downloaded() == ['rec2.cfg', 'rec2.dat']
+    assert server.retrieved.count('rec1.dat') == ftp.REFETCH_ATTEMPTS + 1
+    
+    # Record is downloaded when listed size matches (complete file is resumed from staging directory)
+    server.sizes.clear()
+    server.retrieved.clear()
+    assert ftp.FTPClient(threading.Event()).download('127.0.0.1', local_dirname, dev_dir='', dev_port=server.port, con_timeout=5, ret_timeout=0, no_retry=0)
+    assert downloaded() == ['rec1.cfg', 'rec1.dat', 'rec2.cfg', 'rec2.dat']
+    assert server.retrieved == ['rec1.dat']
+    
+    server.close()
+
+
+def test_download_dedupe(tmp_path):
+    files = {'rec1.cfg': b'cfg' * 100, 'rec1.dat': os.urandom(10000)}
+    server = FTPStandIn(files)
+    cas_dirname = str(tmp_path / 'cas')
+    
+    download = lambda local_dirname: ftp.FTPClient(threading.Event()).download('127.0.0.1', local_dirname, dev_dir='', dev_port=server.port, con_timeout=5,
+                                                                              ret_timeout=0, no_retry=0, cas_dirname=cas_dirname)
+    
+    # First block is not probed if store has no file with the same size and timestamp
+    assert download(str(tmp_path / 'D1'))
+    assert sorted(server.retrieved) == ['rec1.cfg', 'rec1.dat']
+    
+    # Known content is linked after first block probe (data is not downloaded or copied)
+    server.retrieved.clear()
+    assert download(str(tmp_path / 'D2'))
+    assert sorted(server.retrieved) == ['rec1.cfg', 'rec1.dat']
+    
+    paths = [os.path.join(tmp_path, dirname, name) for dirname in ('D1', 'D2') for name in os.listdir(tmp_path / dirname) if name.endswith('_rec1.dat')]
+    assert len(paths) == 2 and os.path.samefile(*paths)
+    assert os.stat(paths[0]).st_nlink == 3
+    assert os.path.getmtime(paths[0]) == 1704164645.0
+    
+    server.close()
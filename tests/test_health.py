@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/health test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import health
+
+import os
+import json
+import random
+import socket
+
+
+def test_merge_policy():
+    assert health.merge_policy(None, None) == health.POLICY
+    assert health.merge_policy({'threshold': 5, 'unknown': 1}, {'backoff': 10}) == dict(health.POLICY, threshold=5, backoff=10)
+    assert health.merge_policy({'threshold': 5}, {'threshold': 2})['threshold'] == 2
+
+
+@pytest.mark.parametrize('opened, expected',
+                         [
+                             (1, 60),
+                             (2, 120),
+                             (3, 240),
+                             (10, 3600)
+                         ])
+def test_backoff_delay(opened, expected):
+    rnd = random.Random(1)
+    for _ in range(100):
+        assert expected / 2 <= health.backoff_delay(opened, 60, 3600, rnd) <= expected
+
+
+def test_tcp_probe():
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', 0))
+        server.listen()
+        port = server.getsockname()[1]
+        assert health.tcp_probe('127.0.0.1', port, 1)
+    
+    assert not health.tcp_probe('127.0.0.1', port, 1)
+
+
+def test_breaker(tmp_path):
+    path = os.path.join(tmp_path, health.HEALTH_PATH)
+    monitor = health.HealthMonitor(path)
+    
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', 0))
+        port = server.getsockname()[1]
+    
+    breaker = monitor.device('E01', 'FTP', '127.0.0.1', port, {'threshold': 2, 'backoff': 100})
+    
+    # Breaker opens after threshold failures
+    assert breaker.allow(now=0)
+    breaker.record(False, now=0)
+    assert breaker.state == health.CLOSED
+    breaker.record(False, now=1)
+    assert breaker.state == health.OPEN
+    assert 51 <= breaker.next_attempt <= 101
+    
+    # Device is skipped until backoff expires
+    assert not breaker.allow(now=50)
+    assert breaker.total_skipped == 1
+    
+    # Probe fails (port is closed), backoff is doubled
+    assert not breaker.allow(now=101)
+    assert breaker.state == health.OPEN
+    assert breaker.opened == 2
+    assert 201 <= breaker.next_attempt <= 301
+    
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', port))
+        server.listen()
+        
+        # Probe succeeds, failed download opens breaker again
+        assert breaker.allow(now=301)
+        assert breaker.state == health.HALF_OPEN
+        breaker.record(False, now=302)
+        assert breaker.state == health.OPEN
+        assert breaker.opened == 3
+        
+        # Successful download closes breaker
+        assert breaker.allow(now=1000)
+        breaker.record(True, now=1001)
+    
+    assert breaker.state == health.CLOSED
+    assert breaker.failures == 0
+    assert breaker.opened == 0
+    assert monitor.summary() == {health.CLOSED: 1, health.OPEN: 0, health.HALF_OPEN: 0}
+    
+    # State is saved and loaded
+    with open(path) as f:
+        state = json.load(f)['E01']
+    assert state['total_failures'] == 3
+    assert state['total_successes'] == 1
+    assert state['last_success'] == 1001
+    
+    breaker.record(False, now=1002)
+    breaker.record(False, now=1003)
+    breaker = health.HealthMonitor(path).device('E01', 'FTP', '127.0.0.1', port)
+    assert breaker.state == health.OPEN
+    assert breaker.failures == 2
+    assert not breaker.allow(now=1004)
+
+
+@pytest.mark.parametrize('protocol, port, expected',
+                         [
+                             ('FTP', None, 21),
+                             ('IEC61850', None, 102),
+                             ('IEC61850', 10102, 10102)
+                         ])
+def test_default_port(tmp_path, protocol, port, expected):
+    monitor = health.HealthMonitor(os.path.join(tmp_path, health.HEALTH_PATH))
+    
+    assert monitor.device('E01', protocol, '127.0.0.1', port).port == expected
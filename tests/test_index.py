@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/index test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import index
+
+import os
+
+
+def test_local_suffix():
+    assert index.local_suffix('20010203_040508_test_1991.cfg') == 'test_1991.cfg'
+    assert index.local_suffix('test_1991.cfg') is None
+
+
+def test_local_dir_index(tmp_path):
+    local_file = tmp_path / '20010203_040508_test.cfg'
+    local_file.write_bytes(b'0123456789')
+    
+    local_index = index.LocalDirIndex(str(tmp_path))
+    
+    path, size, mtime = local_index.find('test.cfg')
+    assert path == str(local_file)
+    assert size == 10
+    assert local_index.find('test.dat') is None
+    assert local_index.files() == {'20010203_040508_test.cfg'}
+    
+    # Files created by download loop
+    local_file = tmp_path / '20010203_040508_test.dat'
+    local_file.write_bytes(b'01234')
+    local_index.add(str(local_file))
+    assert local_index.find('test.dat')[1] == 5
+    
+    local_index.discard(str(local_file))
+    assert local_index.find('test.dat') is None
+    
+    # Suffix match without date and time prefix
+    (tmp_path / 'manual_test.hdr').write_bytes(b'')
+    local_index.rescan()
+    assert local_index.find('test.hdr')[0] == str(tmp_path / 'manual_test.hdr')
+    
+    local_index.discard(str(tmp_path / 'manual_test.hdr'))
+    assert local_index.find('test.hdr') is None
+    
+    # Prefixed file is found only by exact device basename (no suffix scan)
+    local_file = tmp_path / '20010203_040508_other_test.inf'
+    local_file.write_bytes(b'')
+    local_index.add(str(local_file))
+    assert local_index.find('test.inf') is None
+    assert local_index.find('other_test.inf')[0] == str(local_file)
+    
+    local_index.close()
+
+
+@pytest.mark.skipif(index._libc is None, reason='inotify not supported')
+def test_local_dir_index_inotify(tmp_path):
+    local_index = index.LocalDirIndex(str(tmp_path))
+    assert local_index.inotify
+    
+    # Files added and removed by hand are picked up through inotify
+    (tmp_path / '20010203_040508_test.cfg').write_bytes(b'012')
+    local_index.refresh()
+    assert local_index.find('test.cfg')[1] == 3
+    
+    os.remove(tmp_path / '20010203_040508_test.cfg')
+    local_index.refresh()
+    assert local_index.find('test.cfg') is None
+    
+    local_index.close()
+
+
+def test_local_dir_index_rescan(tmp_path):
+    local_index = index.LocalDirIndex(str(tmp_path), rescan_interval=0, use_inotify=False)
+    assert not local_index.inotify
+    
+    # Periodic rescan if inotify is not used
+    (tmp_path / '20010203_040508_test.cfg').write_bytes(b'012')
+    local_index.refresh()
+    assert local_index.find('test.cfg')[1] == 3
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/integrity test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import integrity
+
+import os
+import hashlib
+
+
+@pytest.mark.parametrize(
+    'algorithm, expectation',
+    [
+        ('sha256', does_not_raise()),
+        ('blake2b', does_not_raise()),
+        ('md5', pytest.raises(ValueError)),
+    ]
+)
+def test_new_hasher(algorithm, expectation):
+    with expectation:
+        assert integrity.new_hasher(algorithm).hexdigest()
+
+
+def test_strip_sidecar():
+    assert integrity.strip_sidecar('20010203_040508_test.cfg.sha256') == '20010203_040508_test.cfg'
+    assert integrity.strip_sidecar('20010203_040508_test.cfg') == '20010203_040508_test.cfg'
+    assert integrity.is_sidecar('test.cfg.xxh64')
+    assert not integrity.is_sidecar('test.cfg')
+
+
+def test_sidecar(tmp_path):
+    path = os.path.join(tmp_path, '20010203_040508_test.cfg')
+    with open(path, 'wb') as f:
+        f.write(b'test data')
+    
+    digest = hashlib.sha256(b'test data').hexdigest()
+    sidecar_path = integrity.write_sidecar(path, digest)
+    
+    assert sidecar_path == path + '.sha256'
+    assert open(sidecar_path).read() == '{}  20010203_040508_test.cfg\n'.format(digest)
+    assert integrity.read_sidecar(path) == ('sha256', digest)
+    assert integrity.file_digest(path, chunk_size=4) == digest
+
+
+def test_verify_files(tmp_path):
+    paths = []
+    for name in ('ok.cfg', 'bad.cfg', 'missing.cfg'):
+        path = os.path.join(tmp_path, name)
+        with open(path, 'wb') as f:
+            f.write(name.encode())
+        paths.append(path)
+    
+    integrity.write_sidecar(paths[0], hashlib.sha256(b'ok.cfg').hexdigest())
+    integrity.write_sidecar(paths[1], hashlib.sha256(b'truncated').hexdigest())
+    
+    assert integrity.data_files(str(tmp_path)) == sorted(paths)
+    assert list(integrity.verify_files(paths, workers=2)) == [(paths[0], integrity.OK),
+                                                              (paths[1], integrity.MISMATCH),
+                                                              (paths[2], integrity.MISSING)]
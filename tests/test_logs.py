@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/logs test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import logs
+
+import os
+import queue
+import logging
+import threading
+
+
+class ListHandler(logging.Handler):
+    """
+    Stand-in of console handler
+    """
+    
+    def __init__(self, level):
+        super().__init__(level)
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_file_router(tmp_path):
+    router = logs.FileRouter()
+    path_a = str(tmp_path / 'a' / 'a.log')
+    path_b = str(tmp_path / 'b' / 'b.log')
+    router.open(path_a)
+    router.open(path_b)
+    router.open(path_a)
+    
+    def record(msg, level=logging.INFO, log_path=None):
+        record = logging.LogRecord('drec.test', level, __file__, 0, msg, None, None)
+        record.log_path = log_path
+        return record
+    
+    router.handle(record('to a', log_path=path_a))
+    router.handle(record('to b', log_path=path_b))
+    router.handle(record('debug', logging.DEBUG, path_a))
+    router.handle(record('no route'))
+    router.close()
+    
+    with open(path_a) as f:
+        assert [line.rsplit(' - ', 1)[1] for line in f.read().splitlines()] == ['to a']
+    with open(path_b) as f:
+        assert [line.rsplit(' - ', 1)[1] for line in f.read().splitlines()] == ['to b']
+
+
+def test_queue_handler():
+    log_queue = queue.Queue(2)
+    handler = logs.QueueHandler(log_queue)
+    test_logger = logging.getLogger('drec.test_logs.queue')
+    test_logger.propagate = False
+    test_logger.addHandler(handler)
+    
+    # Full queue drops records (logging call never blocks)
+    with logs.route(None):
+        for n in range(5):
+            test_logger.warning('record %s', n)
+    
+    assert handler.dropped == 3
+    assert [log_queue.get_nowait().getMessage() for n in range(2)] == ['record 0', 'record 1']
+    
+    # Number of dropped records is logged when queue is drained
+    test_logger.warning('record 5')
+    assert [log_queue.get_nowait().getMessage() for n in range(2)] == ['Dropped 3 log records (log queue full)', 'record 5']
+    assert handler.dropped == 0
+    
+    test_logger.removeHandler(handler)
+
+
+def test_route(tmp_path):
+    test_logger = logging.getLogger('drec.test_logs.route')
+    test_logger.propagate = False
+    test_logger.setLevel(logging.DEBUG)
+    console = ListHandler(logging.WARNING)
+    test_logger.addHandler(console)
+    
+    logs.start(test_logger)
+    try:
+        # Logger level is the lowest handler level (debug records are not made)
+        assert test_logger.level == logging.INFO
+        assert not any(isinstance(h, ListHandler) for h in test_logger.handlers)
+        
+        path = str(tmp_path / 'substation.log')
+        with logs.route(path):
+            test_logger.info('routed')
+            test_logger.warning('routed warning')
+            
+            # Thread without route writes to the last routed log file
+            thread = threading.Thread(target=test_logger.info, args=('worker',))
+            thread.start()
+            thread.join()
+        test_logger.info('not routed')
+    finally:
+        logs.stop()
+    
+    with open(path) as f:
+        assert [line.rsplit(' - ', 1)[1] for line in f.read().splitlines()] == ['routed', 'routed warning', 'worker']
+    assert [r.getMessage() for r in console.records] == ['routed warning']
+
+
+def test_sample():
+    key = ('listing', 'test_sample')
+    
+    assert logs.sample(key, 60, now=1000)
+    assert not logs.sample(key, 60, now=1030)
+    assert logs.sample(key, 60, now=1060)
+    assert logs.sample(('listing', 'other'), 60, now=1030)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/manifest test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import manifest
+
+import os
+
+
+def test_manifest(tmp_path):
+    m = manifest.Manifest(str(tmp_path))
+    
+    assert len(m) == 0
+    assert m.get('20010203_040508_test.cfg') is None
+    
+    m.add('20010203_040508_test.cfg', size=10, digest='a')
+    m.add('20010203_040508_test.dat', size=20, digest='b')
+    m.add('20010203_040508_test.cfg', size=10, digest='c')
+    
+    # Reload from disk - last entry wins
+    m = manifest.Manifest(str(tmp_path))
+    
+    assert len(m) == 2
+    assert '20010203_040508_test.dat' in m
+    assert m.get('20010203_040508_test.cfg')['digest'] == 'c'
+
+
+def test_manifest_compact(tmp_path):
+    m = manifest.Manifest(str(tmp_path))
+    for i in range(10):
+        m.add('20010203_040508_test.cfg', size=i)
+    
+    m = manifest.Manifest(str(tmp_path))
+    
+    with open(m.path) as f:
+        assert len(f.readlines()) == 1
+    assert m.get('20010203_040508_test.cfg')['size'] == 9
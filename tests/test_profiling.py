@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/profiling test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import profiling
+
+import os
+import time
+import pstats
+import threading
+
+
+def busy(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(1000))
+
+
+def worker(stop):
+    while not stop.wait(0.001):
+        pass
+
+
+@pytest.mark.parametrize('cycles, expected',
+                         [
+                             (2, 2),
+                             (0, 0),
+                             (-1, 0),
+                             (1000, profiling.MAX_CYCLES)
+                         ])
+def test_enable(cycles, expected):
+    assert profiling.Profiler().enable(cycles) == {'remaining': expected, 'profiling': False}
+
+
+def test_cycles(tmp_path):
+    profiler = profiling.Profiler(interval=0.001)
+    profiler.enable(2)
+    
+    stop = threading.Event()
+    thread = threading.Thread(target=worker, args=(stop,), name='drec-worker')
+    thread.start()
+    
+    written = []
+    try:
+        for i in range(3):
+            profiler.start_cycle(str(tmp_path), 'SS{}'.format(i))
+            busy(0.05)
+            written.append(profiler.end_cycle())
+    finally:
+        stop.set()
+        thread.join()
+    
+    # Profiling switches off after requested cycles
+    assert [len(paths) for paths in written] == [2, 2, 0]
+    assert profiler.status() == {'remaining': 0, 'profiling': False}
+    
+    pstats_path, folded_path = written[0]
+    assert os.path.dirname(pstats_path) == os.path.join(tmp_path, profiling.PROFILE_DIRNAME)
+    assert pstats_path.endswith('_SS0.pstats') and folded_path.endswith('_SS0.folded')
+    
+    # CPU profile of cycle thread
+    assert any(func[2] == 'busy' for func in pstats.Stats(pstats_path).stats)
+    
+    # Wall-clock stacks of all threads (count is the last field)
+    with open(folded_path) as f:
+        lines = f.read().splitlines()
+    
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+    assert any(line.startswith('drec-worker;') and ';test_profiling:worker' in line for line in lines)
+    assert any(line.startswith('MainThread;') and 'test_profiling:busy' in line for line in lines)
+    assert not any(line.startswith('drec-profile;') for line in lines)
+
+
+def test_max_samples():
+    sampler = profiling.StackSampler(interval=0.001, max_samples=5, max_depth=3)
+    sampler.start()
+    sampler._thread.join(5)
+    sampler.stop()
+    
+    assert sampler.samples == 5
+    assert max(len(stack.split(';')) for stack in sampler.stacks) <= 4
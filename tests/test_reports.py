@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/reports test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import reports
+
+import threading
+
+
+RCB = 'IED1LD0/LLN0.BR.brcbRDRE01'
+RCD_MADE = 'IED1LD0/RDRE1.RcdMade[ST]'
+FLT_NUM = 'IED1LD0/RDRE1.FltNum.stVal[ST]'
+FLT_NUM_Q = 'IED1LD0/RDRE1.FltNum.q[ST]'
+
+
+class FakeIed:
+    """
+    Stand-in of libIEC61850 server with RDRE data set report control block
+    
+    Reports are delivered as by ReportClient report handler: report control
+    block reference and included data set members {member reference: value}.
+    """
+    
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.handler = None
+        self.connected = False
+        self.opened = threading.Event()
+        self.closed = 0
+        self.rcd_made = False
+        self.flt_num = 1
+    
+    def connect(self, handler):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError('Failed to connect')
+        self.handler = handler
+        self.connected = True
+        # General interrogation
+        self.handler(RCB, {RCD_MADE: [self.rcd_made, 0, 0], FLT_NUM: self.flt_num, FLT_NUM_Q: 0})
+        self.opened.set()
+        return self
+    
+    def is_connected(self):
+        return self.connected
+    
+    def close(self):
+        self.connected = False
+        self.closed += 1
+    
+    def record(self):
+        self.rcd_made = True
+        self.flt_num += 1
+        self.handler(RCB, {RCD_MADE: [True, 0, 0], FLT_NUM: self.flt_num})
+        self.rcd_made = False
+        self.handler(RCB, {RCD_MADE: [False, 0, 0]})
+
+
+@pytest.mark.parametrize('general, device, expected',
+                         [
+                             (None, None, None),
+                             ({'poll_interval': 60}, None, None),
+                             ({'poll_interval': 60}, {'rcb': [RCB]}, dict(reports.POLICY, rcb=[RCB], poll_interval=60)),
+                             ({'poll_interval': 60}, {'rcb': [RCB], 'poll_interval': 120}, dict(reports.POLICY, rcb=[RCB], poll_interval=120))
+                         ])
+def test_merge_policy(general, device, expected):
+    assert reports.merge_policy(general, device) == expected
+
+
+@pytest.mark.parametrize('values, name, expected',
+                         [
+                             ({RCD_MADE: [True, 0, 0]}, 'RcdMade', True),
+                             ({FLT_NUM_Q: 0, FLT_NUM: 5}, 'FltNum', 5),
+                             ({'IED1LD0/RDRE1$ST$FltNum$stVal': 7}, 'FltNum', 7),
+                             ({FLT_NUM_Q: 0}, 'FltNum', None),
+                             ({RCD_MADE: [True, 0, 0]}, 'FltNum', None)
+                         ])
+def test_status_value(values, name, expected):
+    assert reports.status_value(values, name) == expected
+
+
+def test_trigger():
+    trigger = reports.RecordTrigger(poll_interval=3600, hold=1, followup=60)
+    
+    # Not subscribed - every sweep lists device
+    assert trigger.due(0)
+    
+    trigger.subscribe(True)
+    trigger.served(0, 5)
+    
+    # General interrogation only sets current state
+    assert not trigger.report(False, 1, 10)
+    assert not trigger.due(10)
+    
+    # Record made - download after hold time
+    assert trigger.report(True, 2, 20)
+    assert not trigger.due(20.5)
+    assert trigger.due(21)
+    assert trigger.notify_due(21)
+    assert not trigger.notify_due(22)
+    
+    # Record made during download stays pending
+    assert not trigger.report(False, None, 22)
+    trigger.served(19, 30)
+    assert trigger.due(30)
+    trigger.served(25, 30)
+    assert not trigger.due(31)
+    
+    # Follow-up listing after report-triggered download and safety net
+    assert trigger.due(90)
+    trigger.served(90, 91)
+    assert not trigger.due(100)
+    assert trigger.due(3690)
+    
+    # Report connection lost
+    trigger.subscribe(False)
+    assert trigger.due(100)
+
+
+def test_watcher():
+    ied = FakeIed(fail=1)
+    trigger = reports.RecordTrigger(hold=0)
+    made = threading.Event()
+    
+    watcher = reports.ReportWatcher('SS1/REL670', ied.connect, trigger, reconnect=0.1, callback=made.set)
+    watcher.start()
+    try:
+        assert ied.opened.wait(5)
+        assert trigger.subscribed
+        trigger.served(0)
+        
+        ied.record()
+        assert made.wait(5)
+        assert trigger.due()
+        
+        # Reconnect after connection is lost
+        ied.opened.clear()
+        ied.connected = False
+        assert ied.opened.wait(5)
+    finally:
+        watcher.stop(5)
+    
+    assert not watcher.is_alive()
+    assert not trigger.subscribed
+    assert ied.closed == 2
+
+
+def test_watch(tmp_path):
+    ied = FakeIed()
+    policy = dict(reports.POLICY, rcb=[RCB], poll_interval=60)
+    
+    assert reports.find(str(tmp_path)) is None
+    
+    trigger = reports.watch(str(tmp_path), 'SS1/REL670', ied.connect, policy)
+    try:
+        assert reports.watch(str(tmp_path), 'SS1/REL670', ied.connect, policy) is trigger
+        assert reports.find(str(tmp_path)) is trigger
+        assert trigger.poll_interval == 60
+        assert ied.opened.wait(5)
+    finally:
+        reports.shutdown(5)
+    
+    assert reports.find(str(tmp_path)) is None
+    assert not ied.connected
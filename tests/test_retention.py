@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/retention test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import retention
+from drec import catalog
+
+import os
+from datetime import datetime
+
+
+def create_record(archive_path, trigger_time, name, size=100):
+    files = []
+    for ext in ('.cfg', '.dat'):
+        path = os.path.join(archive_path, '{}_{}{}'.format(trigger_time, name, ext))
+        with open(path, 'wb') as f:
+            f.write(b'0' * size)
+        files.append(path)
+    return files
+
+
+def test_merge_policy():
+    general = {'max_age': 365, 'keep_last': 10}
+    device = {'keep_last': 5, 'compression': 'zstd'}
+    
+    assert retention.merge_policy(general, device) == {'max_age': 365, 'keep_last': 5, 'compression': 'zstd'}
+    assert retention.merge_policy(None, None) == {}
+
+
+def test_record_key():
+    assert retention.record_key('20010203_040508_test.cfg') == '20010203_040508_test'
+    assert retention.record_key('20010203_040508_test.cfg.zip') == '20010203_040508_test'
+    assert retention.record_key('test.cfg') == 'test'
+
+
+def test_select_expired():
+    now = datetime(2001, 3, 1).timestamp()
+    records = [{'record': 'a', 'timestamp': datetime(2001, 2, 28).timestamp(), 'size': 10},
+               {'record': 'b', 'timestamp': datetime(2001, 2, 20).timestamp(), 'size': 10},
+               {'record': 'c', 'timestamp': datetime(2001, 1, 1).timestamp(), 'size': 10}]
+    
+    expired = lambda policy: sorted(r['record'] for r in retention.select_expired(records, policy, now))
+    
+    assert expired({}) == []
+    assert expired({'max_age': 30}) == ['c']
+    assert expired({'keep_last': 1}) == ['b', 'c']
+    assert expired({'max_bytes': 20}) == ['c']
+    assert expired({'max_age': 5, 'keep_last': 2}) == ['b', 'c']
+
+
+def test_apply_policy(tmp_path):
+    archive_path = str(tmp_path)
+    now = datetime(2001, 6, 1).timestamp()
+    
+    create_record(archive_path, '20010203_040508', 'rec_1')
+    create_record(archive_path, '20010210_040508', 'rec_2')
+    create_record(archive_path, '20010305_040508', 'rec_3')
+    create_record(archive_path, '20010530_040508', 'rec_4')
+    
+    # Compaction into per-month bundles
+    retention.apply_policy(archive_path, {'compress_after': 30, 'io_rate': 0}, now=now)
+    
+    assert sorted(os.listdir(os.path.join(archive_path, 'bundles'))) == ['2001-02.zip', '2001-03.zip', 'index.jsonl']
+    assert sorted(f for f in os.listdir(archive_path) if f != 'bundles') == ['20010530_040508_rec_4.cfg',
+                                                                               '20010530_040508_rec_4.dat']
+    
+    # Find bundled record by trigger time and extract it
+    entries = retention.find_records(archive_path, '20010210_000000', '20010210_235959')
+    assert [e['record'] for e in entries] == ['20010210_040508_rec_2']
+    
+    files = retention.extract_record(archive_path, entries[0], str(tmp_path / 'extract'))
+    assert [os.path.basename(f) for f in files] == ['20010210_040508_rec_2.cfg', '20010210_040508_rec_2.dat']
+    assert open(files[0], 'rb').read() == b'0' * 100
+    
+    # Retention - bundle is deleted only when all bundled records are expired
+    retention.apply_policy(archive_path, {'keep_last': 3}, now=now)
+    
+    assert [e['record'] for e in retention.find_records(archive_path)] == ['20010203_040508_rec_1',
+                                                                          '20010210_040508_rec_2',
+                                                                          '20010305_040508_rec_3']
+    
+    retention.apply_policy(archive_path, {'keep_last': 2}, now=now)
+    
+    assert [e['record'] for e in retention.find_records(archive_path)] == ['20010305_040508_rec_3']
+    assert sorted(os.listdir(os.path.join(archive_path, 'bundles'))) == ['2001-03.zip', 'index.jsonl']
+
+
+@pytest.mark.skipif(retention.zstandard is None, reason='zstandard module is not installed')
+def test_apply_policy_zstd(tmp_path):
+    archive_path = str(tmp_path)
+    now = datetime(2001, 6, 1).timestamp()
+    
+    create_record(archive_path, '20010203_040508', 'rec_1')
+    create_record(archive_path, '20010210_040508', 'rec_2', size=200)
+    
+    retention.apply_policy(archive_path, {'compress_after': 30, 'compression': 'zstd', 'io_rate': 0}, now=now)
+    
+    assert sorted(os.listdir(os.path.join(archive_path, 'bundles'))) == ['2001-02.tar.zst', 'index.jsonl']
+    
+    # Records are independent zstd frames
+    entry = retention.find_records(archive_path, '20010210_000000')[0]
+    files = retention.extract_record(archive_path, entry, str(tmp_path / 'extract'))
+    assert open(files[1], 'rb').read() == b'0' * 200
+
+
+def test_apply_policy_late_files(tmp_path):
+    archive_path = str(tmp_path)
+    now = datetime(2001, 6, 1).timestamp()
+    
+    cfg_path, dat_path = create_record(archive_path, '20010203_040508', 'rec_1')
+    os.remove(dat_path)
+    
+    retention.apply_policy(archive_path, {'compress_after': 30, 'io_rate': 0}, now=now)
+    
+    # DAT file of already bundled record arrives later and it's bundled as new entry
+    create_record(archive_path, '20010203_040508', 'rec_1', size=200)
+    
+    # Bundle append interrupted before bundle index was written
+    with retention.zipfile.ZipFile(os.path.join(archive_path, 'bundles', '2001-02.zip'), 'a') as zf:
+        zf.write(dat_path, os.path.basename(dat_path))
+    
+    retention.apply_policy(archive_path, {'compress_after': 30, 'io_rate': 0}, now=now)
+    
+    assert sorted(f for f in os.listdir(archive_path) if f != 'bundles') == []
+    assert [e['members'] for e in retention.find_records(archive_path)] == [['20010203_040508_rec_1.cfg'],
+                                                                            ['20010203_040508_rec_1.dat']]
+    
+    with retention.zipfile.ZipFile(os.path.join(archive_path, 'bundles', '2001-02.zip')) as zf:
+        assert sorted(zf.namelist()) == ['20010203_040508_rec_1.cfg', '20010203_040508_rec_1.dat']
+    
+    files = retention.extract_record(archive_path, retention.find_records(archive_path)[1], str(tmp_path / 'extract'))
+    assert open(files[0], 'rb').read() == b'0' * 200
+
+
+def test_apply_policy_catalog(tmp_path):
+    archive_path = str(tmp_path / 'archive')
+    os.makedirs(archive_path)
+    now = datetime(2001, 6, 1).timestamp()
+    
+    c = catalog.Catalog(os.path.join(tmp_path, catalog.CATALOG_PATH))
+    device_catalog = catalog.DeviceCatalog(c, {'device': 'REL670'})
+    for trigger_time, name in (('20010203_040508', 'rec_1'), ('20010530_040508', 'rec_2')):
+        device_catalog.add(create_record(archive_path, trigger_time, name))
+    
+    # Compacted record is listed with bundle path
+    retention.apply_policy(archive_path, {'compress_after': 30, 'io_rate': 0}, now=now, catalog=device_catalog)
+    bundle = os.path.join(archive_path, 'bundles', '2001-02.zip')
+    assert [r['dirname'] for r in c.query()] == [bundle, archive_path]
+    
+    # Deleted loose record and deleted bundle are removed from catalog
+    retention.apply_policy(archive_path, {'keep_last': 0}, now=now, catalog=device_catalog)
+    assert c.query() == []
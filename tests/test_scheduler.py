@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/scheduler test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import scheduler
+
+import time
+
+
+def test_merge_policy():
+    assert scheduler.merge_policy(None, None) == {}
+    assert scheduler.merge_policy({'cycle_time': 300, 'device_time': 60}, {'device_time': 10, 'unknown': 1}) == {'cycle_time': 300, 'device_time': 10}
+
+
+def test_budget():
+    assert not scheduler.Budget().exhausted()
+    
+    budget = scheduler.Budget(nbytes=100)
+    budget.consume(99)
+    assert not budget.exhausted()
+    budget.consume(1)
+    assert budget.exhausted()
+    
+    assert scheduler.Budget(deadline=time.monotonic()).exhausted()
+
+
+def test_budget_time():
+    budget = scheduler.Budget(seconds=0.01)
+    assert not budget.exhausted()
+    time.sleep(0.02)
+    assert budget.exhausted()
+
+
+@pytest.mark.parametrize('served, expected',
+                         [
+                             ([0, 1, 2, 3], [0, 1, 2, 3]),
+                             ([0, 1], [2, 3, 0, 1]),
+                             ([0, 1, 2], [3, 0, 1, 2]),
+                             ([], [0, 1, 2, 3])
+                         ])
+def test_round_robin(served, expected):
+    cycle = scheduler.CycleScheduler()
+    
+    assert cycle.start(4) == [0, 1, 2, 3]
+    for index in served:
+        cycle.served(index)
+    
+    assert cycle.start(4) == expected
+
+
+def test_cycle_deadline():
+    cycle = scheduler.CycleScheduler()
+    
+    cycle.start(2)
+    assert not cycle.expired()
+    assert cycle.budget().deadline is None
+    
+    cycle.start(2, cycle_time=0.01)
+    assert not cycle.expired()
+    budget = cycle.budget(seconds=60)
+    time.sleep(0.02)
+    assert cycle.expired()
+    assert budget.exhausted()
+    
+    # Device count changed
+    cycle.served(5)
+    assert cycle.start(3) == [0, 1, 2]
+    assert cycle.start(0) == []
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/selection test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import selection
+
+import os
+import shutil
+import zipfile
+import hashlib
+
+
+LOCAL_DR_PATH = os.path.join(os.path.dirname(__file__), 'DR_test_cases')
+
+
+def record(name, sizes):
+    return [('COMTRADE/' + name + ext, size, 0) for ext, size in sizes]
+
+
+@pytest.mark.parametrize('general, device, expected',
+                         [
+                             (None, None, None),
+                             ({}, None, selection.POLICY),
+                             ({'expand': True}, {'prefer': ['cfg']}, {'prefer': ['cfg'], 'expand': True})
+                         ])
+def test_merge_policy(general, device, expected):
+    assert selection.merge_policy(general, device) == expected
+
+
+@pytest.mark.parametrize('sizes, expected',
+                         [
+                             ([('.cfg', 10), ('.dat', 100), ('.hdr', 5)], {'cfg': ['.cfg', '.dat', '.hdr']}),
+                             ([('.cfg', 10), ('.dat', 100), ('.zip', 50)], {'cfg': ['.cfg', '.dat'], 'zip': ['.zip']}),
+                             ([('.cfg', 10), ('.cff', 120), ('.zip', 50)], {'cff': ['.cff'], 'zip': ['.zip']}),
+                             ([('.cfg', 10)], {})
+                         ])
+def test_variants(sizes, expected):
+    found = selection.variants(record('rec1', sizes))
+    assert {name: [os.path.splitext(f[0])[1] for f in files] for name, files in found.items()} == expected
+
+
+@pytest.mark.parametrize('sizes, prefer, expected_variant, expected_files',
+                         [
+                             # Smallest complete representation
+                             ([('.cfg', 10), ('.dat', 100), ('.hdr', 5), ('.zip', 50)], ['cfg'], 'zip', ['.zip']),
+                             ([('.cfg', 10), ('.dat', 30), ('.cff', 60), ('.zip', 50)], ['zip'], 'cfg', ['.cfg', '.dat']),
+                             # Equal size by preference
+                             ([('.cff', 50), ('.zip', 50)], ['cff', 'zip'], 'cff', ['.cff']),
+                             # Unknown size (0) after known size, unknown sizes by preference
+                             ([('.cfg', 10), ('.dat', 100), ('.zip', 0)], ['zip'], 'cfg', ['.cfg', '.dat']),
+                             ([('.cfg', 0), ('.dat', 0), ('.zip', 0)], ['cfg', 'zip'], 'cfg', ['.cfg', '.dat']),
+                             ([('.cfg', 0), ('.dat', 0), ('.zip', 0)], [], 'cfg', ['.cfg', '.dat']),
+                             # One representation or incomplete record (all files)
+                             ([('.cfg', 10), ('.dat', 100), ('.txt', 1)], ['zip'], 'cfg', ['.cfg', '.dat', '.txt']),
+                             ([('.cfg', 10)], ['zip'], None, ['.cfg'])
+                         ])
+def test_select(sizes, prefer, expected_variant, expected_files):
+    variant, files = selection.RecordSelector(prefer).select(record('rec1', sizes))
+    
+    assert variant == expected_variant
+    assert [os.path.splitext(f[0])[1] for f in files] == expected_files
+
+
+def test_split_cff():
+    with open(os.path.join(LOCAL_DR_PATH, 'test_2013.cff'), 'rb') as f:
+        sections = selection.split_cff(f.read())
+    
+    # Empty INF and HDR sections are omitted
+    assert sorted(sections) == ['.cfg', '.dat']
+    assert sections['.cfg'].startswith(b'test_station_name,test_dev_id,2013')
+    assert sections['.dat'].count(b'\n') == 21
+    
+    binary = b'--- file type: CFG ---\r\ncfg\r\n--- file type: DAT BINARY: 7 ---\r\n\x00--- \r\nextra'
+    assert selection.split_cff(binary) == {'.cfg': b'cfg\r\n', '.dat': b'\x00--- \r\n'}
+
+
+def test_expand_targets():
+    dist_rec = record('rec1', [('.cfg', 10), ('.dat', 100), ('.zip', 50)])
+    
+    assert selection.expand_targets(dist_rec, '/local/20240101_000000_') == {'.cfg': '/local/20240101_000000_rec1.cfg', '.dat': '/local/20240101_000000_rec1.dat'}
+    assert selection.expand_targets(dist_rec[2:], '/local/20240101_000000_') == {}
+
+
+@pytest.mark.parametrize('source, expectation',
+                         [
+                             ('test_2013.cfg.zip', pytest.raises(ValueError)),
+                             ('test_2013.cff.zip', does_not_raise()),
+                             ('test_2013.cff', does_not_raise()),
+                             ('test_2013.cfg', pytest.raises(ValueError)),
+                             ('test.txt', pytest.raises(ValueError))
+                         ])
+def test_expand(tmp_path, source, expectation):
+    path = str(tmp_path / source)
+    shutil.copy2(os.path.join(LOCAL_DR_PATH, source), path)
+    targets = {'.cfg': str(tmp_path / 'rec1.cfg'), '.dat': str(tmp_path / 'rec1.dat')}
+    
+    with expectation:
+        expanded = selection.expand(path, targets, 'sha256')
+        
+        assert sorted(e[0] for e in expanded) == sorted(targets.values())
+        for expanded_path, size, digest in expanded:
+            with open(expanded_path, 'rb') as f:
+                data = f.read()
+            assert size == len(data)
+            assert digest == hashlib.sha256(data).hexdigest()
+            assert os.path.getmtime(expanded_path) == os.path.getmtime(path)
+        
+        with open(targets['.cfg'], 'rb') as f:
+            assert f.read().startswith(b'test_station_name,test_dev_id,2013')
+
+
+def test_expand_zip(tmp_path):
+    path = str(tmp_path / 'rec1.zip')
+    with zipfile.ZipFile(path, 'w') as comtrade_zip:
+        comtrade_zip.writestr('REC1.CFG', 'cfg')
+        comtrade_zip.writestr('REC1.DAT', 'dat')
+        comtrade_zip.writestr('REC1.HDR', 'hdr')
+    
+    # HDR file is not expanded (device doesn't list HDR file)
+    expanded = selection.expand(path, {'.cfg': str(tmp_path / 'rec1.cfg'), '.dat': str(tmp_path / 'rec1.dat')})
+    
+    assert sorted((os.path.basename(e[0]), e[1]) for e in expanded) == [('rec1.cfg', 3), ('rec1.dat', 3)]
+    assert not os.path.exists(str(tmp_path / 'rec1.hdr'))
+
+
+def test_expand_invalid_zip(tmp_path):
+    path = str(tmp_path / 'rec1.zip')
+    with zipfile.ZipFile(path, 'w') as comtrade_zip:
+        comtrade_zip.writestr('rec1.cfg', 'cfg')
+    
+    # ZIP without DAT file
+    with pytest.raises(ValueError):
+        selection.expand(path, {'.cfg': str(tmp_path / 'rec1.cfg')})
+    
+    with open(path, 'wb') as f:
+        f.write(b'not a zip')
+    with pytest.raises(ValueError):
+        selection.expand(path, {'.cfg': str(tmp_path / 'rec1.cfg')})
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/stability test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import stability
+from drec import manifest
+from drec import index
+
+import os
+
+
+@pytest.mark.parametrize('dist_rec, expected',
+                         [
+                             ([('rec.cfg', 10, 0.0), ('rec.dat', 20, 0.0)], True),
+                             ([('rec.CFG', 10, 0.0), ('rec.DAT', 20, 0.0), ('rec.hdr', 5, 0.0)], True),
+                             ([('rec.cff', 10, 0.0)], True),
+                             ([('rec.zip', 10, 0.0)], True),
+                             ([('rec.cfg', 10, 0.0)], False),
+                             ([('rec.dat', 20, 0.0), ('rec.hdr', 5, 0.0)], False)
+                         ])
+def test_is_complete(dist_rec, expected):
+    assert stability.is_complete(dist_rec) == expected
+
+
+@pytest.mark.parametrize('dist_rec, expected',
+                         [
+                             ([('rec.dat', 20, 0.0), ('rec.hdr', 5, 0.0)], True),
+                             ([('rec.ZIP', 10, 0.0)], True),
+                             ([('rec.hdr', 5, 0.0), ('rec.inf', 5, 0.0)], False),
+                             ([('settings.txt', 10, 0.0)], False)
+                         ])
+def test_is_record(dist_rec, expected):
+    assert stability.is_record(dist_rec) == expected
+
+
+def test_settled():
+    s = stability.RecordStability(settle_time=60)
+    now = 1000.0
+    
+    dist_recs = [
+        [('old.cfg', 10, 100.0), ('old.dat', 20, 100.0)],
+        [('new.cfg', 10, 990.0), ('new.dat', 0, 990.0)],
+        [('part.cfg', 10, 100.0)],
+        [('settings.txt', 10, 100.0)],
+        [('lone.hdr', 10, 100.0)]
+    ]
+    assert s.settled(dist_recs, now) == {'old', 'settings', 'lone'}
+    
+    # New record is unchanged since previous listing
+    assert s.settled(dist_recs, now + 1) == {'old', 'new', 'settings', 'lone'}
+    
+    # New record is still being written
+    dist_recs[1] = [('new.cfg', 10, 990.0), ('new.dat', 100, 995.0)]
+    assert s.settled(dist_recs, now + 2) == {'old', 'settings', 'lone'}
+    
+    # Settle time elapsed
+    assert stability.RecordStability(settle_time=60).settled(dist_recs, now + 60) == {'old', 'new', 'settings', 'lone'}
+
+
+def test_settled_default():
+    dist_recs = [[('new.cfg', 10, 990.0), ('new.dat', 0, 990.0)]]
+    
+    # Complete record listed for the first time isn't settled by default
+    s = stability.RecordStability()
+    assert s.settled(dist_recs, 1000.0) == set()
+    assert s.settled(dist_recs, 1001.0) == {'new'}
+
+
+def test_settled_zero():
+    dist_recs = [[('old.cfg', 10, 100.0), ('old.dat', 20, 100.0)]]
+    
+    # Record is settled only when unchanged since previous listing
+    s = stability.RecordStability(settle_time=0)
+    assert s.settled(dist_recs, 1000.0) == set()
+    assert s.settled(dist_recs, 1001.0) == {'old'}
+
+
+def test_is_changed(tmp_path):
+    local_dirname = str(tmp_path)
+    with open(os.path.join(local_dirname, '20230101_000000_rec.dat'), 'wb') as f:
+        f.write(b'0' * 10)
+    
+    m = manifest.Manifest(local_dirname)
+    m.add('20230101_000000_rec.dat', dev_path='COMTRADE/rec.dat', dev_size=10, size=10)
+    i = index.LocalDirIndex(local_dirname, use_inotify=False)
+    
+    assert not stability.is_changed('COMTRADE/rec.dat', 10, i, m)
+    assert stability.is_changed('COMTRADE/rec.dat', '20', i, m)
+    
+    # Devices which list size 0
+    assert not stability.is_changed('COMTRADE/rec.dat', 0, i, m)
+    
+    # File is not downloaded or not in manifest
+    assert not stability.is_changed('COMTRADE/rec.cfg', 20, i, m)
+    assert not stability.is_changed('COMTRADE2/rec.dat', 20, i, m)
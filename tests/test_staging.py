@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/staging test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import staging
+
+import os
+import time
+import hashlib
+
+
+DIST_REC = [('COMTRADE/rec1.cfg', 10, 100.0), ('COMTRADE/rec1.dat', 20, 100.0)]
+
+
+def write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'0' * size)
+
+
+@pytest.mark.parametrize('dist_rec, expected',
+                         [
+                             (DIST_REC, 'rec1'),
+                             ([('rec2.CFG', 10, 100.0)], 'rec2'),
+                             ([('COMTRADE\\rec3.cfg', 10, 100.0)], 'rec3')
+                         ])
+def test_group_key(dist_rec, expected):
+    assert staging.group_key(dist_rec) == expected
+
+
+def test_resume(tmp_path):
+    staging_dirname = os.path.join(tmp_path, staging.STAGING_DIRNAME)
+    
+    # Connection dropped while rec1.dat was received
+    group = staging.StagedGroup(staging_dirname, DIST_REC)
+    write(os.path.join(group.path, 'rec1.cfg'), 10)
+    group.mark_done('rec1.cfg', ('COMTRADE/rec1.cfg', 10, 10, 'digest'), 100.0, 'sha256')
+    write(os.path.join(group.path, 'rec1.dat'), 5)
+    assert staging.staged_keys(staging_dirname) == {'rec1'}
+    
+    # Next attempt
+    group = staging.StagedGroup(staging_dirname, DIST_REC)
+    assert group.completed('COMTRADE/rec1.cfg', '10', 100.0, 'sha256') == ('COMTRADE/rec1.cfg', 10, 10, 'digest')
+    assert group.completed('COMTRADE/rec1.dat', '20', 100.0, 'sha256') is None
+    assert group.files() == ['rec1.cfg']
+    
+    group.remove()
+    assert staging.staged_keys(staging_dirname) == set()
+
+
+@pytest.mark.parametrize('dev_size, dev_timestamp, local_size',
+                         [
+                             (11, 100.0, 10),
+                             (10, 101.0, 10),
+                             (10, 100.0, 9)
+                         ])
+def test_resume_changed(tmp_path, dev_size, dev_timestamp, local_size):
+    group = staging.StagedGroup(str(tmp_path), DIST_REC)
+    write(os.path.join(group.path, 'rec1.cfg'), local_size)
+    group.mark_done('rec1.cfg', ('COMTRADE/rec1.cfg', 10, 10, 'digest'), 100.0, 'sha256')
+    
+    # File changed on device or staged file is incomplete
+    assert group.completed('COMTRADE/rec1.cfg', dev_size, dev_timestamp, 'sha256') is None
+    assert os.listdir(group.path) == []
+
+
+@pytest.mark.parametrize('marked, marked_listed, dev_timestamp, listed',
+                         [
+                             (0, None, 0, None),
+                             (1000.0, 1000.0, 2000.0, 2000.0),
+                             (1000.0, 1010.0, 2000.0, 2005.0),
+                             (100.0, 1000.0, 2000.0, 2000.0),
+                             (0, None, 100.0, 1000.0)
+                         ])
+def test_resume_unstable(tmp_path, marked, marked_listed, dev_timestamp, listed):
+    group = staging.StagedGroup(str(tmp_path), DIST_REC, marked_listed)
+    write(os.path.join(group.path, 'rec1.cfg'), 10)
+    group.mark_done('rec1.cfg', ('COMTRADE/rec1.cfg', 10, 10, 'digest'), marked, 'sha256')
+    
+    # Timestamp not listed or listing time (NLST without MDTM, GE C70) is not compared
+    group = staging.StagedGroup(str(tmp_path), DIST_REC, listed)
+    assert group.completed('COMTRADE/rec1.cfg', 10, dev_timestamp, 'sha256') == ('COMTRADE/rec1.cfg', 10, 10, 'digest')
+    assert group.completed('COMTRADE/rec1.cfg', 11, dev_timestamp, 'sha256') is None
+
+
+def test_resume_algorithm(tmp_path):
+    group = staging.StagedGroup(str(tmp_path), DIST_REC)
+    write(os.path.join(group.path, 'rec1.cfg'), 10)
+    group.mark_done('rec1.cfg', ('COMTRADE/rec1.cfg', 10, 10, 'digest'), 100.0, 'sha256')
+    
+    # Checksum is computed again if algorithm changed
+    dev_path, dev_size, local_size, digest = group.completed('COMTRADE/rec1.cfg', 10, 100.0, 'sha512')
+    assert digest == hashlib.sha512(b'0' * 10).hexdigest()
+
+
+def test_gc(tmp_path):
+    staging_dirname = str(tmp_path)
+    now = time.time()
+    
+    old = staging.StagedGroup(staging_dirname, [('old.cfg', 10, 100.0)])
+    os.utime(old.path, (now - 2 * staging.STAGING_MAX_AGE, now - 2 * staging.STAGING_MAX_AGE))
+    staging.StagedGroup(staging_dirname, DIST_REC)
+    
+    # File of previous staging layout
+    write(os.path.join(staging_dirname, 'rec0.cfg'), 10)
+    
+    assert staging.gc(staging_dirname, now=now) == 2
+    assert os.listdir(staging_dirname) == ['rec1']
+    assert staging.gc(os.path.join(staging_dirname, 'missing')) == 0
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/transport test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import transport
+
+import threading
+
+
+PROFILE = {'max_pdu_size': 65000, 'max_outstanding': 4, 'pipeline': 4}
+
+
+def measure(max_pdu_size, max_outstanding, pipeline):
+    """
+    Stand-in of IED download: throughput grows with PDU size up to 32768
+    bytes and with pipeline, 16384 bytes PDU fails
+    """
+    
+    if max_pdu_size == 16384:
+        raise ConnectionError('Failed to connect')
+    
+    return min(max_pdu_size, 32768) * pipeline, 1.0
+
+
+@pytest.mark.parametrize('general, device, profile, expected',
+                         [
+                             (None, None, None, None),
+                             (None, None, PROFILE, {'max_pdu_size': 65000, 'max_outstanding': 4}),
+                             ({'max_pdu_size': 8192}, None, PROFILE, {'max_pdu_size': 8192, 'max_outstanding': 4}),
+                             ({'max_pdu_size': 8192}, {'max_pdu_size': 16384}, None, dict(transport.POLICY, max_pdu_size=16384))
+                         ])
+def test_merge_policy(general, device, profile, expected):
+    assert transport.merge_policy(general, device, profile) == expected
+
+
+def test_profile(tmp_path):
+    assert transport.load_profile(str(tmp_path)) is None
+    
+    transport.save_profile(str(tmp_path), PROFILE)
+    assert transport.load_profile(str(tmp_path)) == PROFILE
+    
+    with open(transport.profile_path(str(tmp_path)), 'w') as f:
+        f.write('{')
+    assert transport.load_profile(str(tmp_path)) is None
+
+
+@pytest.mark.parametrize('files, limit, expected',
+                         [
+                             ([('a.dat', 600, 0), ('b.dat', 300, 0), ('c.cfg', 200, 0), ('d.cfg', 0, 0)], 1000, ['a.dat', 'b.dat']),
+                             ([('a.dat', 600, 0), ('b.dat', 300, 0), ('c.cfg', 200, 0)], 100, ['c.cfg']),
+                             ([('d.cfg', 0, 0)], 1000, [])
+                         ])
+def test_probe_files(files, limit, expected):
+    assert [f[0] for f in transport.probe_files(files, limit)] == expected
+
+
+def test_probe():
+    best, results = transport.probe(measure)
+    
+    # PDU sizes first, then pipelines with the fastest PDU size (first wins on equal throughput)
+    assert [(c['max_pdu_size'], c['pipeline']) for c, throughput in results] == [(8192, 1), (16384, 1), (32768, 1), (65000, 1), (32768, 2), (32768, 4)]
+    assert results[1][1] == 0
+    assert best == {'max_pdu_size': 32768, 'max_outstanding': 4, 'pipeline': 4}
+    
+    profile = transport.new_profile(best, results, now=10)
+    assert profile['throughput'] == 32768 * 4
+    assert profile['probed'] == 10
+    assert len(profile['results']) == 6
+
+
+@pytest.mark.parametrize('interrupted, expected_best, expected_results',
+                         [
+                             (False, None, 4),
+                             (True, None, 0)
+                         ])
+def test_probe_failed(interrupted, expected_best, expected_results):
+    def fail(**candidate):
+        raise OSError('No route to host')
+    
+    interrupt = threading.Event()
+    if interrupted:
+        interrupt.set()
+    
+    best, results = transport.probe(fail, interrupt=interrupt)
+    
+    assert best == expected_best
+    assert len(results) == expected_results
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/vendor test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import vendor
+
+from drec.common import group_dev_file_list
+
+
+LISTING = [
+    ('COMTRADE/REC001.cfg', 10, 0),
+    ('COMTRADE/REC001.dat', 20, 0),
+    ('COMTRADE/REC001.cff', 30, 0),
+    ('COMTRADE/REC002.CFG', 10, 0),
+    ('COMTRADE/REC002.DAT', 20, 0),
+    ('COMTRADE/events.log', 5, 0),
+    ('COMTRADE/SETTINGS/relay.xml', 5, 0),
+    ('COMTRADE\\SETTINGS\\relay.cfg', 5, 0)
+]
+
+
+@pytest.mark.parametrize('general, device, expected',
+                         [
+                             (None, None, vendor.POLICY),
+                             ({'exclude': ['*.log']}, None, dict(vendor.POLICY, exclude=['*.log'])),
+                             ({'exclude': ['*.log']}, {'exclude': [], 'priority': ['.cff']}, dict(vendor.POLICY, exclude=[], priority=['.cff']))
+                         ])
+def test_merge_policy(general, device, expected):
+    assert vendor.merge_policy(general, device) == expected
+
+
+@pytest.mark.parametrize('include, exclude, expected',
+                         [
+                             ([], [], [f[0] for f in LISTING]),
+                             ([], ['*.log', 'COMTRADE/SETTINGS/*'], ['COMTRADE/REC001.cfg', 'COMTRADE/REC001.dat', 'COMTRADE/REC001.cff', 'COMTRADE/REC002.CFG', 'COMTRADE/REC002.DAT']),
+                             (['*/REC*.cfg', '*/rec*.dat'], [], ['COMTRADE/REC001.cfg', 'COMTRADE/REC001.dat', 'COMTRADE/REC002.CFG', 'COMTRADE/REC002.DAT']),
+                             (['*.cfg'], ['*SETTINGS*'], ['COMTRADE/REC001.cfg', 'COMTRADE/REC002.CFG'])
+                         ])
+def test_accepts(include, exclude, expected):
+    profile = vendor.VendorProfile(include=include, exclude=exclude)
+    assert [f[0] for f in LISTING if profile.accepts(f[0])] == expected
+
+
+@pytest.mark.parametrize('policy, expectation',
+                         [
+                             (vendor.POLICY, does_not_raise()),
+                             (dict(vendor.POLICY, trigger_time='(?P<year>'), pytest.raises(ValueError))
+                         ])
+def test_get_profile(policy, expectation):
+    with expectation:
+        profile = vendor.get_profile(policy)
+        assert vendor.get_profile(dict(policy)) is profile
+
+
+def test_grouping():
+    profile = vendor.VendorProfile(exclude=['*.log', '*/SETTINGS/*'], priority=['.dat', '.cfg'], duplicates=[['.cff', '.cfg']])
+    
+    dist_recs = group_dev_file_list([f for f in LISTING if profile.accepts(f[0])], 'COMTRADE', profile.priority, profile.duplicates)
+    
+    assert [[f[0] for f in dist_rec] for dist_rec in dist_recs] == [
+        ['COMTRADE/REC001.dat', 'COMTRADE/REC001.cfg'],
+        ['COMTRADE/REC002.DAT', 'COMTRADE/REC002.CFG']
+    ]
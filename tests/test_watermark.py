@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+###############################################################################
+# drec/watermark test file
+###############################################################################
+
+import pytest
+from contextlib import nullcontext as does_not_raise
+
+from drec import watermark
+
+
+DIST_RECS = [
+    [('rec1.cfg', 10, 1000.0), ('rec1.dat', 20, 1000.0)],
+    [('rec2.cfg', 10, 2000.0), ('rec2.dat', 20, 2001.0)],
+    [('rec3.cfg', 10, 9000.0), ('rec3.dat', 20, 9000.0)]
+]
+
+
+def test_merge_policy():
+    assert watermark.merge_policy(None, None) is None
+    assert watermark.merge_policy({}, None) == watermark.POLICY
+    assert watermark.merge_policy({'margin': 0, 'spot_check': 60}, {'spot_check': 10, 'unknown': 1}) == {'spot_check': 10, 'margin': 0, 'continue_after': False, 'hold': 86400}
+
+
+def test_record_mark():
+    assert watermark.record_mark(DIST_RECS[1]) == (2001.0, 'rec2.cfg')
+
+
+def test_advance(tmp_path):
+    w = watermark.Watermark(str(tmp_path), margin=0)
+    assert w.due()
+    assert w.filter(DIST_RECS) == DIST_RECS
+    
+    # Watermark is not moved past pending record
+    w.advance([DIST_RECS[0], DIST_RECS[2]], [DIST_RECS[1]])
+    assert (w.timestamp, w.name) == (1000.0, 'rec1.cfg')
+    
+    w.advance(DIST_RECS[1:])
+    w.checked(now=0)
+    
+    # Watermark is loaded after restart
+    w = watermark.Watermark(str(tmp_path), margin=0)
+    assert (w.timestamp, w.name) == (9000.0, 'rec3.cfg')
+    assert w.filter(DIST_RECS) == DIST_RECS[2:]
+    
+    # Watermark is not moved back
+    w.advance(DIST_RECS[:1])
+    assert w.timestamp == 9000.0
+
+
+def test_advance_hold(tmp_path):
+    w = watermark.Watermark(str(tmp_path), margin=0, hold=3600)
+    
+    # Record which is never completed holds watermark only for hold time
+    w.advance(DIST_RECS[:1], DIST_RECS[1:2], now=0)
+    w.advance(DIST_RECS[:1] + DIST_RECS[2:], DIST_RECS[1:2], now=3599)
+    assert w.timestamp == 1000.0
+    
+    w.advance(DIST_RECS[:1] + DIST_RECS[2:], DIST_RECS[1:2], now=3600)
+    assert w.timestamp == 9000.0
+    
+    # Hold time is kept after restart and reset when record isn't pending
+    w = watermark.Watermark(str(tmp_path), margin=0, hold=3600)
+    assert w._state['pending'] == {'rec2.cfg': 0}
+    w.advance([], now=3700)
+    assert w._state['pending'] == {}
+
+
+def test_filter_margin(tmp_path):
+    w = watermark.Watermark(str(tmp_path), margin=7000)
+    w.advance(DIST_RECS)
+    assert w.filter(DIST_RECS) == DIST_RECS[1:]
+
+
+@pytest.mark.parametrize('continue_after, now, expected',
+                         [
+                             (False, 100, ''),
+                             (True, 100, 'rec3.cfg'),
+                             (True, 86400, '')
+                         ])
+def test_spot_check(tmp_path, continue_after, now, expected):
+    w = watermark.Watermark(str(tmp_path), continue_after=continue_after)
+    w.advance(DIST_RECS)
+    w.checked(now=0)
+    
+    assert w.due(now) == (now >= 86400)
+    assert w.listing_after(now) == expected